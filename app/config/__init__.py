@@ -22,6 +22,7 @@ from .schemas import (
     AIGroupChatConfig,
     AIGroupConfig,
     AIImageConfig,
+    AIQueueConfig,
     AIVisionConfig,
     AppConfig,
     AutoUnbanConfig,
@@ -51,6 +52,7 @@ __all__ = [
     "AIGroupChatConfig",
     "AIGroupConfig",
     "AIImageConfig",
+    "AIQueueConfig",
     "AIVisionConfig",
     "AppConfig",
     "AutoUnbanConfig",
@@ -9,6 +9,8 @@ from typing import cast
 
 from pydantic import ValidationError
 
+from app.utils.tokenizer import BPETokenizer
+
 from .schemas import (
     AIGroupChatConfig,
     AIGroupConfig,
@@ -74,6 +76,7 @@ class MaterializedAIGroupChatConfig:
     groups: tuple[MaterializedAIGroupConfig, ...]
     vision_system_prompt: str | None
     vision_user_prompt: str | None
+    tokenizer: BPETokenizer | None = None
 
 
 type PluginConfigValue = (
@@ -230,6 +233,27 @@ def _read_config_text(
     return path, content
 
 
+def _load_tokenizer(
+    *, config_root: Path, file_value: str, label: str
+) -> tuple[Path, BPETokenizer]:
+    """读取本地 BPE 词表，格式错误时作为配置错误拒绝。"""
+    path = resolve_config_file(
+        config_root=config_root,
+        file_value=file_value,
+        label=label,
+    )
+    try:
+        return path, BPETokenizer.from_file(path)
+    except OSError as exc:
+        raise ConfigLoadError(
+            (ConfigIssue(label, type(exc).__name__, "词表文件无法读取"),)
+        ) from exc
+    except ValueError as exc:
+        raise ConfigLoadError(
+            (ConfigIssue(label, "invalid_tokenizer", str(exc)),)
+        ) from exc
+
+
 def _validate_model_ref(
     *, reference: ModelRef, provider_ids: frozenset[str], label: str
 ) -> None:
@@ -271,6 +295,14 @@ def _materialize_plugins(
             require_content=True,
         )
         referenced_files.add(extra_path)
+        tokenizer: BPETokenizer | None = None
+        if ai_config.model.tokenizer_file is not None:
+            tokenizer_path, tokenizer = _load_tokenizer(
+                config_root=config_root,
+                file_value=ai_config.model.tokenizer_file,
+                label="plugins.ai_group_chat.model.tokenizer_file",
+            )
+            referenced_files.add(tokenizer_path)
         vision_system_prompt: str | None = None
         vision_user_prompt: str | None = None
         if ai_config.vision is not None:
@@ -325,6 +357,7 @@ def _materialize_plugins(
             groups=tuple(materialized_groups),
             vision_system_prompt=vision_system_prompt,
             vision_user_prompt=vision_user_prompt,
+            tokenizer=tokenizer,
         )
 
     image_generate = config.plugins.image_generate
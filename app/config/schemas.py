@@ -19,6 +19,9 @@ type AppEnvironment = Literal["development", "staging", "production", "test"]
 type UvicornLogLevel = Literal[
     "critical", "error", "warning", "info", "debug", "trace"
 ]
+type IncomingWriteMode = Literal["immediate", "group_commit"]
+type FrameCodecName = Literal["stdlib", "pydantic"]
+type PluginOverloadPolicy = Literal["drop_oldest", "drop_newest", "coalesce"]
 type LogLevelName = Literal[
     "TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL"
 ]
@@ -64,6 +67,8 @@ class NapCatConfig(ConfigModel):
     websocket_token: SecretStr | None = None
     send_max_attempts: int = Field(default=5, ge=1)
     send_retry_delay_seconds: float = Field(default=0, ge=0)
+    pipeline_queue_size: int = Field(default=256, ge=1)
+    frame_codec: FrameCodecName = "stdlib"
 
     @field_validator("websocket_token")
     @classmethod
@@ -85,6 +90,8 @@ class ImageStorageConfig(ConfigModel):
     max_bytes: int = Field(default=50 * 1024 * 1024, ge=1)
     retry_delays_seconds: tuple[float, float, float] = (1, 5, 20)
     lease_seconds: float = Field(default=45, gt=0)
+    # 本地路径图片优先以硬链接纳入归档；与 NapCat 缓存共享数据，缓存被原地改写会影响归档。
+    hardlink_local_files: bool = False
 
     @field_validator("directory")
     @classmethod
@@ -125,6 +132,9 @@ class DatabaseConfig(ConfigModel):
     max_overflow: int = Field(default=20, ge=0)
     pool_timeout_seconds: float = Field(default=2, gt=0)
     statement_timeout_seconds: float = Field(default=5, gt=0)
+    incoming_write_mode: IncomingWriteMode = "immediate"
+    group_commit_delay_seconds: float = Field(default=0.005, gt=0, le=1)
+    group_commit_max_batch_size: int = Field(default=64, ge=1, le=500)
 
     @field_validator("host", "name", "user")
     @classmethod
@@ -191,6 +201,14 @@ class NetworkConfig(ConfigModel):
 
     proxy: str | None = None
     timeout_seconds: float = Field(default=15, gt=0)
+    # 直连和代理客户端各自的连接池上限；空闲连接保留一段时间，突发请求可复用已握手的连接。
+    max_connections: int = Field(default=100, ge=1)
+    max_keepalive_connections: int = Field(default=20, ge=0)
+    keepalive_expiry_seconds: float = Field(default=30, ge=0)
+    # 需要安装 h2，未安装时回退到 HTTP/1.1。
+    http2: bool = False
+    # LLM provider 复用直连客户端的连接池，不再各自创建连接池。
+    share_llm_connections: bool = True
 
     @field_validator("proxy")
     @classmethod
@@ -220,6 +238,19 @@ class LLMProviderConfig(ConfigModel):
     base_url: str | None = None
     max_attempts: int = Field(default=5, ge=1)
     retry_delay_seconds: float = Field(default=0, ge=0)
+    # 相同文本请求的响应缓存时长；0 表示只合并并发中的相同请求。
+    response_cache_ttl_seconds: float = Field(default=0, ge=0)
+    response_cache_max_entries: int = Field(default=256, ge=1)
+    # 同一 provider 所有插件共享的并发上限，收到 429 时自动减半再逐步恢复。
+    max_concurrency: int = Field(default=8, ge=1)
+    # 每分钟请求数和 token 数上限；0 表示不限制。
+    requests_per_minute: int = Field(default=0, ge=0)
+    tokens_per_minute: int = Field(default=0, ge=0)
+    # 与 base_url 提供相同模型的其他端点，共用 api_key，按延迟和错误率路由。
+    extra_base_urls: tuple[str, ...] = ()
+    # 请求耗时超过所选端点近期 p95 时向次优端点补发一次，先返回者胜出。
+    hedge_requests: bool = False
+    hedge_min_delay_seconds: float = Field(default=1.0, ge=0)
 
     @field_validator("api_key")
     @classmethod
@@ -290,9 +321,19 @@ class ModelRef(ConfigModel):
 
 
 class ChatModelRef(ModelRef):
-    """引用聊天模型及其图片输入能力。"""
+    """引用聊天模型及其图片输入能力和可选的本地 BPE 词表。"""
 
     supports_images: bool = False
+    tokenizer_file: str | None = None
+
+    @field_validator("tokenizer_file")
+    @classmethod
+    def normalize_tokenizer_file(cls, value: str | None) -> str | None:
+        """空词表路径等同于使用字符规则估算。"""
+        if value is None:
+            return None
+        cleaned_value = value.strip()
+        return cleaned_value or None
 
 
 class AIGroupConfig(ConfigModel):
@@ -331,6 +372,9 @@ class AIVisionConfig(ConfigModel):
     max_attempts: int = Field(default=5, ge=1, le=10)
     retry_delay_seconds: float = Field(default=0.25, gt=0, le=10)
     retain_descriptions: bool = True
+    cache_enabled: bool = True
+    cache_max_entries: int = Field(default=1024, ge=1, le=100_000)
+    cache_ttl_seconds: float = Field(default=7 * 24 * 3600, gt=0)
 
 
 class AIImageConfig(ConfigModel):
@@ -344,22 +388,36 @@ class AIImageConfig(ConfigModel):
     forward_max_per_turn: int = Field(default=50, ge=1, le=50)
 
 
+class AIQueueConfig(ConfigModel):
+    """AI 群聊插件事件队列的过载保护配置。"""
+
+    max_depth: int | None = Field(default=None, ge=1)
+    overload_policy: PluginOverloadPolicy = "coalesce"
+    busy_notice: str = ""
+
+
 class AIGroupChatConfig(ConfigModel):
     """AI 群聊插件配置。"""
 
     model: ChatModelRef
     vision: AIVisionConfig | None = None
     images: AIImageConfig = Field(default_factory=AIImageConfig)
+    queue: AIQueueConfig = Field(default_factory=AIQueueConfig)
     max_tool_rounds: int = Field(default=16, ge=1)
+    tool_concurrency: int = Field(default=4, ge=1, le=16)
     token_safety_factor: float = Field(default=1.05, ge=1)
+    background_compression: bool = True
+    compression_watermark: float = Field(default=0.7, gt=0, lt=1)
     context_compression_notice: str = "上下文有点长，我先整理一下记忆，稍等我几秒喵~"
     max_reply_chars: int = Field(default=1000, ge=1)
+    stream_replies: bool = False
     show_reasoning: bool = False
     retain_reasoning: bool = False
     debug_dump_messages: bool = False
     extra_requirements_file: str = "ai_group_chat/prompts/extra_requirements.md"
     allow_mention_all: bool = False
     retain_tool_results: bool = False
+    persist_context: bool = True
     groups: tuple[AIGroupConfig, ...] = ()
 
     @model_validator(mode="after")
@@ -0,0 +1,27 @@
+"""NapCat WebSocket 入站帧的 JSON 解码器。"""
+
+import json
+from collections.abc import Callable, Mapping
+from typing import Final, cast
+
+from pydantic_core import from_json
+
+from app.config.schemas import FrameCodecName
+
+type FrameDecoder = Callable[[str | bytes], object]
+
+
+def decode_stdlib(frame: str | bytes) -> object:
+    """使用标准库 json 模块解码。"""
+    return cast(object, json.loads(frame))
+
+
+def decode_pydantic(frame: str | bytes) -> object:
+    """使用 pydantic-core 的 jiter 解码，非法 JSON 同样抛出 ValueError。"""
+    return from_json(frame)
+
+
+FRAME_DECODERS: Final[Mapping[FrameCodecName, FrameDecoder]] = {
+    "stdlib": decode_stdlib,
+    "pydantic": decode_pydantic,
+}
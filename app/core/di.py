@@ -12,6 +12,7 @@ from app.api import BOTClient
 from app.config import ConfigManager, ConfigWatcher, MyBotConfig
 from app.database import (
     DatabaseMigrator,
+    GroupMessageBatchWriter,
     PluginMigrationRegistry,
     PluginRepositoryBuilder,
     PostgreSQLMessageRepository,
@@ -31,6 +32,7 @@ from app.services.napcat import (
     ImageStore,
     InlineImageArchiver,
 )
+from app.utils.http_pool import MeteredAsyncClient
 
 from .dispatcher import EventDispatcher
 from .event_parser import EventTypeChecker
@@ -100,6 +102,22 @@ class MyProvider(Provider):
             image_root=Path(config.storage.images.directory).resolve(),
         )
 
+    @provide(scope=Scope.APP)
+    def get_group_message_batch_writer(
+        self,
+        repository: PostgreSQLMessageRepository,
+        config: MyBotConfig,
+    ) -> GroupMessageBatchWriter | None:
+        """group_commit 模式下创建跨会话共享的入站批量写入器。"""
+        database = config.database
+        if database.incoming_write_mode != "group_commit":
+            return None
+        return GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=database.group_commit_delay_seconds,
+            max_batch_size=database.group_commit_max_batch_size,
+        )
+
     @provide(scope=Scope.APP)
     def get_plugin_repository_builder(
         self,
@@ -131,7 +149,7 @@ class MyProvider(Provider):
     @provide(scope=Scope.APP)
     def get_direct_httpx(self, config: MyBotConfig) -> DirectHttpx:
         """创建不带代理的 HTTP 客户端。"""
-        return DirectHttpx(httpx.AsyncClient(timeout=config.network.timeout_seconds))
+        return DirectHttpx(MeteredAsyncClient(name="direct", network=config.network))
 
     @provide(scope=Scope.APP)
     def get_event_type_checker(self) -> EventTypeChecker:
@@ -145,15 +163,22 @@ class MyProvider(Provider):
         if proxy is None:
             return None
         return ProxyHttpx(
-            httpx.AsyncClient(proxy=proxy, timeout=config.network.timeout_seconds)
+            MeteredAsyncClient(name="proxy", network=config.network, proxy=proxy)
         )
 
     @provide(scope=Scope.APP)
-    def get_llm_handler(self, config: MyBotConfig) -> LLMHandler | None:
-        """初始化可选 LLM 服务。"""
+    def get_llm_handler(
+        self, config: MyBotConfig, direct_httpx: DirectHttpx
+    ) -> LLMHandler | None:
+        """初始化可选 LLM 服务，按配置复用直连客户端的连接池。"""
         if not config.llm.providers:
             return None
-        return LLMHandler.register_instance(config.llm.providers)
+        return LLMHandler.register_instance(
+            config.llm.providers,
+            http_client=(
+                direct_httpx if config.network.share_llm_connections else None
+            ),
+        )
 
     @provide(scope=Scope.APP)
     def get_mcp_tool_manager(self, config: MyBotConfig) -> MCPToolManager:
@@ -166,6 +191,7 @@ class MyProvider(Provider):
         return ImageStore(
             root=Path(config.storage.images.directory).resolve(),
             max_image_bytes=config.storage.images.max_bytes,
+            hardlink_local_files=config.storage.images.hardlink_local_files,
         )
 
     @provide(scope=Scope.APP)
@@ -225,6 +251,7 @@ class MyProvider(Provider):
         proxy_httpx: ProxyHttpx | None,
         llm: LLMHandler | None,
         mcp_tool_manager: MCPToolManager,
+        image_store: ImageStore,
     ) -> PluginController:
         """实例化插件控制器。"""
         load_all_plugins()
@@ -239,6 +266,7 @@ class MyProvider(Provider):
                 mcp_tool_manager=mcp_tool_manager,
                 direct_httpx=directhttpx,
                 proxy_httpx=proxy_httpx,
+                image_store=image_store,
             )
             plugin_objects.append(
                 cls(
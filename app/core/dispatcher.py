@@ -1,9 +1,12 @@
 """事件分发器。"""
 
+import asyncio
+
 from app.api import BOTClient
 from app.models import AllEvent
+from app.utils.log import log_event
 
-from .plugin_manager import PluginController
+from .plugin_manager import PluginController, PluginRoute
 
 
 class EventDispatcher:
@@ -15,9 +18,46 @@ class EventDispatcher:
         self.bot: BOTClient = bot
 
     async def dispatch_event(self, event: AllEvent) -> None:
-        """按插件优先级依次分发事件，插件返回 True 时终止链路。"""
-        event_type = type(event)
-        handlers = self.plugincontroller.handlers_map.get(event_type, [])
-        for handler, param_name in handlers:
-            if await handler(**{param_name: event}):
+        """按插件优先级分发事件，可终止链路的插件返回 True 时停止。
+
+        声明 ``stops_chain = False`` 的插件不会影响后续插件，只需等待
+        排在它之前的可终止插件放行，随后与链路其余部分并发运行。
+        """
+        observers: list[tuple[PluginRoute, asyncio.Future[bool]]] = []
+        try:
+            await self._run_chain(event=event, observers=observers)
+        finally:
+            outcomes = await asyncio.gather(
+                *(task for _, task in observers), return_exceptions=True
+            )
+        for (route, _), outcome in zip(observers, outcomes, strict=True):
+            if isinstance(outcome, BaseException):
+                raise outcome
+            if outcome:
+                log_event(
+                    level="WARNING",
+                    event="dispatcher.observer.returned_true",
+                    category="dispatcher",
+                    message="声明不终止链路的插件返回了 True，已忽略",
+                    plugin_name=route.plugin_name,
+                    event_model=type(event).__name__,
+                )
+
+    async def _run_chain(
+        self,
+        *,
+        event: AllEvent,
+        observers: list[tuple[PluginRoute, asyncio.Future[bool]]],
+    ) -> None:
+        """依次等待可终止插件，把不终止链路的插件放到后台任务。"""
+        routes = self.plugincontroller.handlers_map.get(type(event), [])
+        for route in routes:
+            # 预过滤在分发协程内同步执行，不相关插件不创建 Future 也不入队。
+            if not route.prefilter(event):
+                continue
+            call = route.handler(**{route.param_name: event})
+            if not route.stops_chain:
+                observers.append((route, asyncio.ensure_future(call)))
+                continue
+            if await call:
                 return
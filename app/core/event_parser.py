@@ -1,13 +1,92 @@
 """事件载荷解析器。"""
 
+from collections.abc import Callable, Mapping
+from typing import Final
+
 from pydantic import TypeAdapter, ValidationError
 
-from app.models import AllEvent
+from app.models import (
+    AllEvent,
+    BotOfflineEvent,
+    FriendAddNoticeEvent,
+    FriendRecallNoticeEvent,
+    FriendRequestEvent,
+    GroupAdminNoticeEvent,
+    GroupBanEvent,
+    GroupCardEvent,
+    GroupDecreaseEvent,
+    GroupEssenceEvent,
+    GroupIncreaseEvent,
+    GroupMessage,
+    GroupMsgEmojiLikeEvent,
+    GroupRecallNoticeEvent,
+    GroupRequestEvent,
+    GroupUploadNoticeEvent,
+    HeartBeat,
+    LifeCycle,
+    NotifyEvent,
+    PrivateMessage,
+    Response,
+)
 from app.utils.log import log_event
 
+type EventValidator = Callable[[dict[str, object]], AllEvent]
+
+# post_type 到二级判别字段；与 AllEvent 中各层 discriminator 保持一致。
+_SUBTYPE_FIELDS: Final[Mapping[str, str]] = {
+    "message": "message_type",
+    "message_sent": "message_type",
+    "meta_event": "meta_event_type",
+    "notice": "notice_type",
+    "request": "request_type",
+}
+
+_MESSAGE_VALIDATORS: Final[Mapping[str, EventValidator]] = {
+    "group": GroupMessage.model_validate,
+    "private": PrivateMessage.model_validate,
+}
+
+# notify 的 sub_type 不参与 AllEvent 判别，统一落到 NotifyEvent。
+_FAST_VALIDATORS: Final[Mapping[tuple[str, str], EventValidator]] = {
+    **{("message", key): value for key, value in _MESSAGE_VALIDATORS.items()},
+    **{("message_sent", key): value for key, value in _MESSAGE_VALIDATORS.items()},
+    ("meta_event", "heartbeat"): HeartBeat.model_validate,
+    ("meta_event", "lifecycle"): LifeCycle.model_validate,
+    ("notice", "notify"): NotifyEvent.model_validate,
+    ("notice", "group_recall"): GroupRecallNoticeEvent.model_validate,
+    ("notice", "group_decrease"): GroupDecreaseEvent.model_validate,
+    ("notice", "group_admin"): GroupAdminNoticeEvent.model_validate,
+    ("notice", "group_increase"): GroupIncreaseEvent.model_validate,
+    ("notice", "group_ban"): GroupBanEvent.model_validate,
+    ("notice", "group_upload"): GroupUploadNoticeEvent.model_validate,
+    ("notice", "group_card"): GroupCardEvent.model_validate,
+    ("notice", "essence"): GroupEssenceEvent.model_validate,
+    ("notice", "group_msg_emoji_like"): GroupMsgEmojiLikeEvent.model_validate,
+    ("notice", "friend_add"): FriendAddNoticeEvent.model_validate,
+    ("notice", "friend_recall"): FriendRecallNoticeEvent.model_validate,
+    ("notice", "bot_offline"): BotOfflineEvent.model_validate,
+    ("request", "friend"): FriendRequestEvent.model_validate,
+    ("request", "group"): GroupRequestEvent.model_validate,
+}
+
+
+def _validate_response(data: dict[str, object]) -> Response:
+    """校验回包头字段；``data`` 已是合法 JSON 值，不再逐层校验。"""
+    if "data" not in data:
+        return Response.model_validate(data)
+    header = Response.model_validate(
+        {key: value for key, value in data.items() if key != "data"}
+    )
+    return header.model_copy(update={"data": data["data"]})
+
 
 class EventTypeChecker:
-    """将 WebSocket 原始数据解析为具体事件模型。"""
+    """将 WebSocket 原始数据解析为具体事件模型。
+
+    已知事件按判别字段查表后直接校验对应模型，避免每帧都走完整
+    ``AllEvent`` 联合类型；未知组合或快路径校验失败时回退到联合类型，
+    解析结果与失败日志保持不变。输入应是 ``json.loads`` 解出的对象。
+    """
 
     def __init__(self) -> None:
         """初始化事件联合类型适配器。"""
@@ -15,6 +94,13 @@ class EventTypeChecker:
 
     def get_event(self, data: dict[str, object]) -> AllEvent | None:
         """解析事件，无法识别时记录原因并返回 None。"""
+        validator = self._select_validator(data)
+        if validator is not None:
+            try:
+                return validator(data)
+            except ValidationError:
+                # 交给联合类型重新校验，失败日志沿用原有格式。
+                pass
         try:
             return self.adapter.validate_python(data)
         except ValidationError as exc:
@@ -37,3 +123,19 @@ class EventTypeChecker:
                 first_error=first_error,
             )
             return None
+
+    def _select_validator(self, data: dict[str, object]) -> EventValidator | None:
+        """按 post_type 和二级判别字段选出具体模型的校验函数。"""
+        post_type = data.get("post_type")
+        if post_type is None:
+            # 只有 Action 回包不带 post_type。
+            return _validate_response
+        if not isinstance(post_type, str):
+            return None
+        subtype_field = _SUBTYPE_FIELDS.get(post_type)
+        if subtype_field is None:
+            return None
+        subtype = data.get(subtype_field)
+        if not isinstance(subtype, str):
+            return None
+        return _FAST_VALIDATORS.get((post_type, subtype))
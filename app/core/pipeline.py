@@ -0,0 +1,298 @@
+"""NapCat 单连接的分阶段接收流水线。"""
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Final, Protocol, cast
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+
+from app.api import BOTClient
+from app.database import IncomingMessageWriter
+from app.models import AllEvent, GroupMessage, GroupRecallNoticeEvent, Meta, Response
+from app.utils.log import log_event
+
+from .codec import FrameDecoder
+from .event_parser import EventTypeChecker
+
+_BACKPRESSURE_LOG_EVERY: Final[int] = 100
+
+
+class _StopMarker:
+    """上游阶段结束后向下游传递的停止标记。"""
+
+
+_STOP: Final = _StopMarker()
+
+type _PersistedEvent = tuple[AllEvent, asyncio.Task[None] | None]
+
+
+class EventPersister(Protocol):
+    """在分发前持久化群消息或撤回归档。"""
+
+    async def __call__(
+        self,
+        *,
+        event: GroupMessage | GroupRecallNoticeEvent,
+        incoming_writer: IncomingMessageWriter | None,
+    ) -> None:
+        """写入事件；连续失败时抛出会话级异常。"""
+        ...
+
+
+@dataclass(frozen=True, slots=True)
+class StageQueueStats:
+    """单个流水线阶段入口队列的深度指标。"""
+
+    stage: str
+    depth: int
+    peak_depth: int
+    capacity: int
+    blocked_puts: int
+
+
+class StageQueue[ItemT]:
+    """带深度统计的有界阶段队列，队列满时阻塞上游形成背压。"""
+
+    def __init__(self, *, stage: str, maxsize: int, client_id: str) -> None:
+        """创建指定容量的阶段队列。"""
+        if maxsize < 1:
+            raise ValueError("maxsize 必须大于等于 1")
+        self.stage: str = stage
+        self._client_id: str = client_id
+        self._queue: asyncio.Queue[ItemT] = asyncio.Queue(maxsize=maxsize)
+        self._peak_depth = 0
+        self._blocked_puts = 0
+
+    async def put(self, item: ItemT) -> None:
+        """放入一项；队列已满时记录背压并等待下游消费。"""
+        if self._queue.full():
+            self._blocked_puts += 1
+            if (
+                self._blocked_puts == 1
+                or self._blocked_puts % _BACKPRESSURE_LOG_EVERY == 0
+            ):
+                log_event(
+                    level="WARNING",
+                    event="websocket.pipeline.backpressure",
+                    category="websocket",
+                    message="流水线阶段队列已满，上游正在等待",
+                    client_id=self._client_id,
+                    stage=self.stage,
+                    capacity=self._queue.maxsize,
+                    blocked_puts=self._blocked_puts,
+                )
+        await self._queue.put(item)
+        self._peak_depth = max(self._peak_depth, self._queue.qsize())
+
+    async def get(self) -> ItemT:
+        """取出下一项。"""
+        return await self._queue.get()
+
+    def drain(self) -> list[ItemT]:
+        """不等待地取出所有剩余项。"""
+        items: list[ItemT] = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return items
+
+    def stats(self) -> StageQueueStats:
+        """返回当前深度、峰值和背压次数。"""
+        return StageQueueStats(
+            stage=self.stage,
+            depth=self._queue.qsize(),
+            peak_depth=self._peak_depth,
+            capacity=self._queue.maxsize,
+            blocked_puts=self._blocked_puts,
+        )
+
+
+class ConnectionPipeline:
+    """把读帧、解析、有序持久化和分发拆成由有界队列连接的阶段。
+
+    ``Response`` 回包在读帧阶段直接交给 ``BOTClient.receive_data``，
+    不会排在入站事件的数据库写入之后。
+    """
+
+    def __init__(
+        self,
+        *,
+        websocket: WebSocket,
+        client_id: str,
+        checker: EventTypeChecker,
+        bot: BOTClient,
+        persist: EventPersister,
+        dispatch: Callable[[AllEvent], None],
+        on_bot_identified: Callable[[str], None],
+        incoming_writer: IncomingMessageWriter | None,
+        queue_size: int,
+        decode_frame: FrameDecoder,
+    ) -> None:
+        """绑定当前连接的协作对象并创建三个阶段队列。"""
+        self._websocket: WebSocket = websocket
+        self._client_id: str = client_id
+        self._checker: EventTypeChecker = checker
+        self._bot: BOTClient = bot
+        self._persist: EventPersister = persist
+        self._dispatch: Callable[[AllEvent], None] = dispatch
+        self._on_bot_identified: Callable[[str], None] = on_bot_identified
+        self._incoming_writer: IncomingMessageWriter | None = incoming_writer
+        self._decode_frame: FrameDecoder = decode_frame
+        self._parse_queue: StageQueue[dict[str, object] | _StopMarker] = StageQueue(
+            stage="parse", maxsize=queue_size, client_id=client_id
+        )
+        self._persist_queue: StageQueue[AllEvent | _StopMarker] = StageQueue(
+            stage="persist", maxsize=queue_size, client_id=client_id
+        )
+        self._dispatch_queue: StageQueue[_PersistedEvent | _StopMarker] = StageQueue(
+            stage="dispatch", maxsize=queue_size, client_id=client_id
+        )
+        self._connection_error: BaseException | None = None
+        self._last_deferred_write: asyncio.Task[None] | None = None
+        self._stage_tasks: list[asyncio.Task[None]] = []
+
+    def stats(self) -> tuple[StageQueueStats, ...]:
+        """按流水线顺序返回各阶段队列指标。"""
+        return (
+            self._parse_queue.stats(),
+            self._persist_queue.stats(),
+            self._dispatch_queue.stats(),
+        )
+
+    async def run(self) -> None:
+        """运行到连接结束；读端断开时先排空已接收事件再抛出断开原因。"""
+        self._stage_tasks = [
+            asyncio.create_task(self._read_frames()),
+            asyncio.create_task(self._parse_events()),
+            asyncio.create_task(self._persist_events()),
+            asyncio.create_task(self._dispatch_events()),
+        ]
+        dispatch_task = self._stage_tasks[-1]
+        try:
+            pending = set(self._stage_tasks)
+            while dispatch_task in pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is not None:
+                        raise error
+        finally:
+            await self.close()
+        if self._connection_error is not None:
+            raise self._connection_error
+
+    async def close(self) -> None:
+        """取消仍在运行的阶段，并回收未分发事件的写入任务。"""
+        for task in self._stage_tasks:
+            _ = task.cancel()
+        _ = await asyncio.gather(*self._stage_tasks, return_exceptions=True)
+        persist_tasks = [
+            item[1]
+            for item in self._dispatch_queue.drain()
+            if not isinstance(item, _StopMarker) and item[1] is not None
+        ]
+        # 已交给写入器的批次仍会提交，这里只回收结果，避免遗留未读取的异常。
+        _ = await asyncio.gather(*persist_tasks, return_exceptions=True)
+
+    async def _read_frames(self) -> None:
+        """读帧并解码 JSON；回包走快路径，事件交给解析阶段。"""
+        try:
+            while True:
+                data_str = await self._websocket.receive_text()
+                raw_data = self._decode_frame(data_str)
+                if not isinstance(raw_data, dict):
+                    log_event(
+                        level="WARNING",
+                        event="websocket.event.invalid_payload",
+                        category="websocket",
+                        message="收到非对象格式事件，已跳过",
+                        client_id=self._client_id,
+                    )
+                    continue
+                data = cast(dict[str, object], raw_data)
+                if "post_type" not in data:
+                    response = self._checker.get_event(data)
+                    if isinstance(response, Response):
+                        await self._bot.receive_data(response=response)
+                        continue
+                await self._parse_queue.put(data)
+        except (WebSocketDisconnect, RuntimeError) as exc:
+            self._connection_error = exc
+        await self._parse_queue.put(_STOP)
+
+    async def _parse_events(self) -> None:
+        """校验协议模型并确认机器人身份。"""
+        while not isinstance(data := await self._parse_queue.get(), _StopMarker):
+            event = self._checker.get_event(data)
+            if event is None:
+                continue
+            if isinstance(event, Response):
+                await self._bot.receive_data(response=event)
+                continue
+            if not isinstance(event, Meta):
+                log_event(
+                    level="DEBUG",
+                    event="websocket.event.received",
+                    category="websocket",
+                    message="收到 NapCat 事件",
+                    client_id=self._client_id,
+                    event_type=event.post_type,
+                    event_model=type(event).__name__,
+                )
+            if self._bot.boot_id != "" and str(self._bot.boot_id) != str(
+                event.self_id
+            ):
+                log_event(
+                    level="CRITICAL",
+                    event="websocket.bot_identity.changed",
+                    category="websocket",
+                    message="同一 NapCat 会话出现不同机器人身份，已拒绝继续处理",
+                    client_id=self._client_id,
+                    expected_bot_id=str(self._bot.boot_id),
+                    actual_bot_id=str(event.self_id),
+                )
+                await self._websocket.close(
+                    code=status.WS_1008_POLICY_VIOLATION,
+                    reason="NapCat 机器人身份发生变化",
+                )
+                break
+            self._bot.get_self_qq_id(msg=event)
+            self._on_bot_identified(str(event.self_id))
+            await self._persist_queue.put(event)
+        await self._persist_queue.put(_STOP)
+
+    async def _persist_events(self) -> None:
+        """按接收顺序持久化；group_commit 模式只登记写入任务不等待提交。"""
+        while not isinstance(event := await self._persist_queue.get(), _StopMarker):
+            persisted: asyncio.Task[None] | None = None
+            if isinstance(event, GroupMessage):
+                if self._incoming_writer is None:
+                    await self._persist(event=event, incoming_writer=None)
+                else:
+                    persisted = asyncio.create_task(
+                        self._persist(
+                            event=event,
+                            incoming_writer=self._incoming_writer,
+                        )
+                    )
+                    self._last_deferred_write = persisted
+            elif isinstance(event, GroupRecallNoticeEvent):
+                previous = self._last_deferred_write
+                if previous is not None and not previous.done():
+                    # 撤回必须排在之前的群消息提交之后，才能找到目标行。
+                    _ = await asyncio.wait({previous})
+                await self._persist(event=event, incoming_writer=None)
+            await self._dispatch_queue.put((event, persisted))
+        await self._dispatch_queue.put(_STOP)
+
+    async def _dispatch_events(self) -> None:
+        """等待每个事件落库完成后按原顺序分发。"""
+        while not isinstance(item := await self._dispatch_queue.get(), _StopMarker):
+            event, persisted = item
+            if persisted is not None:
+                await persisted
+            self._dispatch(event)
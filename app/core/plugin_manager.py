@@ -3,6 +3,7 @@
 import inspect
 from collections import defaultdict
 from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 from typing import TYPE_CHECKING, cast, get_args, get_type_hints
 
 from app.models import AllEvent
@@ -11,6 +12,18 @@ if TYPE_CHECKING:
     from app.plugins.base import BasePlugin
 
 type EventHandler = Callable[..., Awaitable[bool]]
+type EventPrefilter = Callable[[AllEvent], bool]
+
+
+@dataclass(frozen=True, slots=True)
+class PluginRoute:
+    """单个插件对某种事件的路由项。"""
+
+    plugin_name: str
+    prefilter: EventPrefilter
+    handler: EventHandler
+    param_name: str
+    stops_chain: bool
 
 
 class PluginController:
@@ -22,9 +35,9 @@ class PluginController:
     ) -> None:
         """保存插件实例并构建事件路由。"""
         self.plugin_objects: list["BasePlugin[AllEvent]"] = plugin_objects
-        self.handlers_map: dict[
-            type[AllEvent], list[tuple[EventHandler, str]]
-        ] = defaultdict(list)
+        self.handlers_map: dict[type[AllEvent], list[PluginRoute]] = defaultdict(
+            list
+        )
         self._load_plugins()
 
     @staticmethod
@@ -61,4 +74,12 @@ class PluginController:
         for plugin in self.plugin_objects:
             param_name, annotation = self._get_event_parameter(plugin.run)
             for event_type in self._resolve_event_types(annotation):
-                self.handlers_map[event_type].append((plugin.add_to_queue, param_name))
+                self.handlers_map[event_type].append(
+                    PluginRoute(
+                        plugin_name=plugin.name,
+                        prefilter=plugin.accepts,
+                        handler=plugin.enqueue,
+                        param_name=param_name,
+                        stops_chain=plugin.stops_chain,
+                    )
+                )
@@ -1,13 +1,10 @@
 """FastAPI WebSocket 服务入口。"""
 
 import asyncio
-import copy
-import json
 import secrets
 from collections.abc import AsyncIterator, Awaitable, Callable
 from contextlib import asynccontextmanager
 from datetime import UTC, datetime
-from typing import cast
 
 from dishka import AsyncContainer
 from dishka.integrations.fastapi import FromDishka, inject, setup_dishka
@@ -18,18 +15,23 @@ from app.config import ConfigManager, ConfigWatcher, MyBotConfig
 from app.database import (
     DatabaseMigrator,
     GroupDataScope,
+    GroupMessageBatchWriter,
+    IncomingMessageWriter,
     PostgreSQLMessageRepository,
     PostgreSQLRuntime,
 )
-from app.models import GroupMessage, GroupRecallNoticeEvent, Meta, Response
+from app.models import AllEvent, GroupMessage, GroupRecallNoticeEvent
 from app.services import LLMHandler, MCPToolManager
 from app.services.napcat import ImageArchiveWorkerFactory
+from app.utils.http_pool import MeteredAsyncClient
 from app.utils.log import log_event, log_exception, log_run_end, log_run_start
 from app.webui import PowerController, create_webui_router, mount_webui_static
 
+from .codec import FRAME_DECODERS
 from .di import DirectHttpx, ProxyHttpx
 from .dispatcher import EventDispatcher
 from .event_parser import EventTypeChecker
+from .pipeline import ConnectionPipeline, StageQueueStats
 
 _PERSISTENCE_RETRY_DELAY_SECONDS = 0.25
 _IMAGE_WORKER_STOP_TIMEOUT_SECONDS = 5.0
@@ -62,6 +64,106 @@ class NapCatServer:
         self._register_routes()
         mount_webui_static(self.app)
         self._background_tasks: set[asyncio.Task[None]] = set()
+        self._pipelines: dict[str, ConnectionPipeline] = {}
+
+    def pipeline_stats(self) -> dict[str, tuple[StageQueueStats, ...]]:
+        """返回当前每个 NapCat 连接的流水线队列指标。"""
+        return {
+            client_id: pipeline.stats()
+            for client_id, pipeline in self._pipelines.items()
+        }
+
+    def _log_pipeline_stats(
+        self, *, client_id: str, pipeline: ConnectionPipeline
+    ) -> None:
+        """连接结束时记录各阶段峰值深度和背压次数。"""
+        for stats in pipeline.stats():
+            log_event(
+                level="DEBUG",
+                event="websocket.pipeline.stats",
+                category="websocket",
+                message="流水线阶段队列统计",
+                client_id=client_id,
+                stage=stats.stage,
+                peak_depth=stats.peak_depth,
+                capacity=stats.capacity,
+                blocked_puts=stats.blocked_puts,
+            )
+
+    def _log_llm_coalescing_stats(self, *, llm_handler: LLMHandler) -> None:
+        """关闭服务时记录各 provider 的文本请求合并与缓存命中。"""
+        for stats in llm_handler.coalescing_stats():
+            log_event(
+                level="DEBUG",
+                event="llm.coalescing.stats",
+                category="runtime",
+                message="LLM 文本请求合并与缓存统计",
+                provider=stats.provider,
+                requests=stats.requests,
+                upstream_calls=stats.upstream_calls,
+                coalesced=stats.coalesced,
+                cache_hits=stats.cache_hits,
+                cache_entries=stats.cache_entries,
+            )
+
+    def _log_llm_rate_limit_stats(self, *, llm_handler: LLMHandler) -> None:
+        """关闭服务时记录各 provider 的并发上限、排队等待和限流次数。"""
+        for stats in llm_handler.rate_limit_stats():
+            log_event(
+                level="DEBUG",
+                event="llm.rate_limit.stats",
+                category="runtime",
+                message="LLM provider 并发与速率限制统计",
+                provider=stats.provider,
+                concurrency_limit=stats.concurrency_limit,
+                max_concurrency=stats.max_concurrency,
+                acquired=stats.acquired,
+                throttled=stats.throttled,
+                average_wait_seconds=round(stats.average_wait_seconds, 3),
+                max_wait_seconds=round(stats.max_wait_seconds, 3),
+            )
+
+    def _log_llm_endpoint_stats(self, *, llm_handler: LLMHandler) -> None:
+        """关闭服务时记录多端点 provider 各端点的延迟、错误率和对冲次数。"""
+        for stats in llm_handler.endpoint_stats():
+            log_event(
+                level="DEBUG",
+                event="llm.endpoint.stats",
+                category="runtime",
+                message="LLM 端点健康统计",
+                provider=stats.provider,
+                base_url=stats.base_url,
+                requests=stats.requests,
+                failures=stats.failures,
+                error_rate=round(stats.error_rate, 3),
+                latency_ewma_seconds={
+                    kind: round(latency, 3)
+                    for kind, latency in stats.latency_ewma_seconds.items()
+                },
+                hedged=stats.hedged,
+                hedge_wins=stats.hedge_wins,
+            )
+
+    def _log_http_pool_stats(self, *clients: object) -> None:
+        """关闭服务时记录共享 HTTP 客户端的连接复用和排队计数。"""
+        for client in clients:
+            if not isinstance(client, MeteredAsyncClient):
+                continue
+            stats = client.pool_stats()
+            log_event(
+                level="DEBUG",
+                event="network.http_pool.stats",
+                category="runtime",
+                message="HTTP 连接池统计",
+                client=stats.name,
+                http2=stats.http2,
+                requests=stats.requests,
+                active=stats.active,
+                peak_active=stats.peak_active,
+                connections=stats.connections,
+                idle_connections=stats.idle_connections,
+                waits=stats.waits,
+            )
 
     def _track_background_task(self, task: asyncio.Task[None]) -> None:
         """持有后台事件分发任务引用，并在失败时记录异常。"""
@@ -106,6 +208,8 @@ class NapCatServer:
         proxy_httpx: ProxyHttpx | None = None
         config_watcher: ConfigWatcher | None = None
         config_watcher_task: asyncio.Task[None] | None = None
+        batch_writer: GroupMessageBatchWriter | None = None
+        llm_handler: LLMHandler | None = None
         active_error: BaseException | None = None
         try:
             runtime = await self.container.get(PostgreSQLRuntime)
@@ -118,8 +222,9 @@ class NapCatServer:
             await migrator.assert_current()
             await mcp_tool_manager.start()
             _ = await self.container.get(PostgreSQLMessageRepository)
+            batch_writer = await self.container.get(GroupMessageBatchWriter | None)
             _ = await self.container.get(ImageArchiveWorkerFactory)
-            _ = await self.container.get(LLMHandler | None)
+            llm_handler = await self.container.get(LLMHandler | None)
             config_watcher_task = asyncio.create_task(config_watcher.run())
             log_event(
                 level="SUCCESS",
@@ -158,6 +263,11 @@ class NapCatServer:
                         resource_name=resource_name,
                     )
 
+            if llm_handler is not None:
+                self._log_llm_coalescing_stats(llm_handler=llm_handler)
+                self._log_llm_rate_limit_stats(llm_handler=llm_handler)
+                self._log_llm_endpoint_stats(llm_handler=llm_handler)
+            self._log_http_pool_stats(direct_httpx, proxy_httpx)
             if config_watcher is not None:
                 config_watcher.stop()
             if config_watcher_task is not None:
@@ -183,6 +293,11 @@ class NapCatServer:
                     resource_name="proxy_httpx",
                     operation=proxy_httpx.aclose,
                 )
+            if batch_writer is not None:
+                await close_resource(
+                    resource_name="group_message_batch_writer",
+                    operation=batch_writer.close,
+                )
             if runtime is not None:
                 await close_resource(
                     resource_name="postgresql_runtime",
@@ -275,11 +390,14 @@ class NapCatServer:
         *,
         event: GroupMessage | GroupRecallNoticeEvent,
         repository: PostgreSQLMessageRepository,
+        incoming_writer: IncomingMessageWriter | None = None,
     ) -> None:
         """在插件分发前持久化群消息或撤回归档。"""
         if isinstance(event, GroupMessage):
+            writer: IncomingMessageWriter = incoming_writer or repository
+
             async def save_message() -> None:
-                await repository.save_incoming(event)
+                await writer.save_incoming(event)
 
             _ = await self._persist_with_retry(
                 operation=save_message,
@@ -320,6 +438,23 @@ class NapCatServer:
                 recalled_by_id=str(event.operator_id),
             )
 
+    def _dispatch(self, *, dispatcher: EventDispatcher, event: AllEvent) -> None:
+        """在后台任务中把事件交给插件链；协议模型不可变，插件共享同一实例。"""
+        task = asyncio.create_task(dispatcher.dispatch_event(event=event))
+        self._track_background_task(task=task)
+
+    async def _close_after_persistence_failure(self, websocket: WebSocket) -> None:
+        """持久化连续失败后以 1011 关闭仍然连接的 NapCat 会话。"""
+        if websocket.client_state.name != "CONNECTED":
+            return
+        try:
+            await websocket.close(
+                code=status.WS_1011_INTERNAL_ERROR,
+                reason="PostgreSQL 持久化失败",
+            )
+        except RuntimeError:
+            pass
+
     async def _stop_image_worker(
         self,
         *,
@@ -359,6 +494,7 @@ class NapCatServer:
             checker: FromDishka[EventTypeChecker],
             repository: FromDishka[PostgreSQLMessageRepository],
             image_worker_factory: FromDishka[ImageArchiveWorkerFactory],
+            batch_writer: FromDishka[GroupMessageBatchWriter | None],
         ) -> None:
             """处理单个 NapCat WebSocket 客户端连接。"""
             async with self.container(
@@ -372,81 +508,48 @@ class NapCatServer:
                 bot = await request_container.get(BOTClient)
                 image_worker_stop: asyncio.Event | None = None
                 image_worker_task: asyncio.Task[None] | None = None
+
+                def start_image_worker(bot_id: str) -> None:
+                    """首次确认机器人身份后启动该机器人的图片 worker。"""
+                    nonlocal image_worker_stop, image_worker_task
+                    if image_worker_task is not None:
+                        return
+                    image_worker_stop = asyncio.Event()
+                    image_worker = image_worker_factory.create(bot_id=bot_id, bot=bot)
+                    image_worker_task = asyncio.create_task(
+                        image_worker.run(stop_event=image_worker_stop)
+                    )
+
+                async def persist(
+                    *,
+                    event: GroupMessage | GroupRecallNoticeEvent,
+                    incoming_writer: IncomingMessageWriter | None,
+                ) -> None:
+                    await self._persist_event(
+                        event=event,
+                        repository=repository,
+                        incoming_writer=incoming_writer,
+                    )
+
+                pipeline = ConnectionPipeline(
+                    websocket=websocket,
+                    client_id=client_id,
+                    checker=checker,
+                    bot=bot,
+                    persist=persist,
+                    dispatch=lambda event: self._dispatch(
+                        dispatcher=dispatcher, event=event
+                    ),
+                    on_bot_identified=start_image_worker,
+                    incoming_writer=batch_writer,
+                    queue_size=self.config.napcat.pipeline_queue_size,
+                    decode_frame=FRAME_DECODERS[self.config.napcat.frame_codec],
+                )
+                self._pipelines[client_id] = pipeline
                 try:
-                    while True:
-                        data_str = await websocket.receive_text()
-                        raw_data = cast(object, json.loads(data_str))
-                        if not isinstance(raw_data, dict):
-                            log_event(
-                                level="WARNING",
-                                event="websocket.event.invalid_payload",
-                                category="websocket",
-                                message="收到非对象格式事件，已跳过",
-                                client_id=client_id,
-                            )
-                            continue
-                        event = checker.get_event(cast(dict[str, object], raw_data))
-                        if event is None:
-                            continue
-                        if isinstance(event, Response):
-                            await bot.receive_data(response=event)
-                            continue
-                        if not isinstance(event, Meta):
-                            log_event(
-                                level="DEBUG",
-                                event="websocket.event.received",
-                                category="websocket",
-                                message="收到 NapCat 事件",
-                                client_id=client_id,
-                                event_type=event.post_type,
-                                event_model=type(event).__name__,
-                            )
-                        if (
-                            bot.boot_id != ""
-                            and str(bot.boot_id) != str(event.self_id)
-                        ):
-                            log_event(
-                                level="CRITICAL",
-                                event="websocket.bot_identity.changed",
-                                category="websocket",
-                                message="同一 NapCat 会话出现不同机器人身份，已拒绝继续处理",
-                                client_id=client_id,
-                                expected_bot_id=str(bot.boot_id),
-                                actual_bot_id=str(event.self_id),
-                            )
-                            await websocket.close(
-                                code=status.WS_1008_POLICY_VIOLATION,
-                                reason="NapCat 机器人身份发生变化",
-                            )
-                            break
-                        bot.get_self_qq_id(msg=event)
-                        if image_worker_task is None:
-                            image_worker_stop = asyncio.Event()
-                            image_worker = image_worker_factory.create(
-                                bot_id=str(event.self_id),
-                                bot=bot,
-                            )
-                            image_worker_task = asyncio.create_task(
-                                image_worker.run(stop_event=image_worker_stop)
-                            )
-                        if isinstance(event, (GroupMessage, GroupRecallNoticeEvent)):
-                            await self._persist_event(
-                                event=event,
-                                repository=repository,
-                            )
-                        task = asyncio.create_task(
-                            dispatcher.dispatch_event(event=copy.deepcopy(event))
-                        )
-                        self._track_background_task(task=task)
+                    await pipeline.run()
                 except EventPersistenceError:
-                    if websocket.client_state.name == "CONNECTED":
-                        try:
-                            await websocket.close(
-                                code=status.WS_1011_INTERNAL_ERROR,
-                                reason="PostgreSQL 持久化失败",
-                            )
-                        except RuntimeError:
-                            pass
+                    await self._close_after_persistence_failure(websocket)
                 except WebSocketDisconnect as exc:
                     log_event(
                         level="INFO",
@@ -493,6 +596,9 @@ class NapCatServer:
                         message="正在清理客户端资源",
                         client_id=client_id,
                     )
+                    if self._pipelines.get(client_id) is pipeline:
+                        del self._pipelines[client_id]
+                    self._log_pipeline_stats(client_id=client_id, pipeline=pipeline)
                     await self._stop_image_worker(
                         stop_event=image_worker_stop,
                         worker_task=image_worker_task,
@@ -1,5 +1,6 @@
 """PostgreSQL 持久化服务的公共导出。"""
 
+from .batch_writer import GroupMessageBatchWriter
 from .models import CORE_SCHEMA, CORE_VERSION_TABLE, DatabaseBase
 from .migration import (
     DatabaseMigrationStateError,
@@ -19,6 +20,7 @@ from .plugins import (
 from .plugin_migration import run_plugin_migration_environment
 from .protocols import (
     GroupMessageReader,
+    IncomingMessageBatchWriter,
     IncomingMessageWriter,
     RecallArchiver,
     SentMessageRecorder,
@@ -43,8 +45,10 @@ __all__ = [
     "DatabaseMigrationStateError",
     "DatabaseMigrator",
     "GroupDataScope",
+    "GroupMessageBatchWriter",
     "GroupMessageReader",
     "ImageArchiveStatus",
+    "IncomingMessageBatchWriter",
     "IncomingMessageWriter",
     "MessageCursor",
     "MessageDirection",
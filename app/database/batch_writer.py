@@ -0,0 +1,174 @@
+"""入站群消息的 group-commit 写入器。"""
+
+import asyncio
+from collections.abc import Sequence
+
+from app.models import GroupMessage
+from app.utils.log import log_event, log_exception
+
+from .protocols import IncomingMessageBatchWriter
+
+type _PendingWrite = tuple[GroupMessage, asyncio.Future[None]]
+
+
+class GroupMessageBatchWriter:
+    """把几毫秒内到达的入站群消息合并为一次 PostgreSQL 事务。
+
+    调用方仍逐条等待 ``save_incoming``，只有所在批次提交后才返回，
+    因此“先落库再分发”的语义保持不变。
+    """
+
+    def __init__(
+        self,
+        *,
+        repository: IncomingMessageBatchWriter,
+        max_delay_seconds: float,
+        max_batch_size: int,
+    ) -> None:
+        """保存批次窗口，flush 任务在第一次写入时才创建。"""
+        if max_delay_seconds <= 0:
+            raise ValueError("max_delay_seconds 必须大于 0")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size 必须大于等于 1")
+        self._repository: IncomingMessageBatchWriter = repository
+        self._max_delay_seconds: float = max_delay_seconds
+        self._max_batch_size: int = max_batch_size
+        # None 是 close 投递的停止标记，排在它之前的写入都会先提交。
+        self._queue: asyncio.Queue[_PendingWrite | None] = asyncio.Queue()
+        self._flush_task: asyncio.Task[None] | None = None
+        self._closed = False
+
+    async def save_incoming(self, message: GroupMessage) -> None:
+        """把消息排入当前批次，并在批次提交后返回。"""
+        if self._closed:
+            raise RuntimeError("群消息批量写入器已关闭")
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((message, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+        await future
+
+    async def close(self) -> None:
+        """停止接收新消息，提交已排队批次后结束 flush 任务。"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._flush_task is None:
+            return
+        self._queue.put_nowait(None)
+        _ = await asyncio.gather(self._flush_task, return_exceptions=True)
+        self._flush_task = None
+
+    async def _flush_loop(self) -> None:
+        """按“首条到达后等待窗口或批次装满”的节奏持续提交。
+
+        任务被取消或因非 ``Exception`` 中止时，当前批次和队列中剩余的等待方
+        都会得到结果，不会永远挂起。
+        """
+        batch: list[_PendingWrite] = []
+        try:
+            await self._run_batches(batch)
+        except BaseException as exc:
+            self._abort_pending(batch, exc=exc)
+            raise
+
+    async def _run_batches(self, batch: list[_PendingWrite]) -> None:
+        """循环收集并提交批次；``batch`` 始终保存正在处理的批次。"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch.clear()
+            first = await self._queue.get()
+            if first is None:
+                return
+            batch.append(first)
+            stopping = False
+            deadline = loop.time() + self._max_delay_seconds
+            while len(batch) < self._max_batch_size:
+                remaining = deadline - loop.time()
+                try:
+                    item = (
+                        self._queue.get_nowait()
+                        if remaining <= 0
+                        else await asyncio.wait_for(
+                            self._queue.get(), timeout=remaining
+                        )
+                    )
+                except (TimeoutError, asyncio.QueueEmpty):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write_batch(batch)
+            if stopping:
+                return
+
+    def _abort_pending(
+        self, batch: Sequence[_PendingWrite], *, exc: BaseException
+    ) -> None:
+        """flush 任务异常终止时结束当前批次和所有排队写入的等待。"""
+        pending = list(batch)
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None:
+                pending.append(item)
+        for _, future in pending:
+            if future.done():
+                continue
+            if isinstance(exc, asyncio.CancelledError):
+                _ = future.cancel()
+            else:
+                error = RuntimeError("群消息批量写入任务异常终止")
+                error.__cause__ = exc
+                future.set_exception(error)
+
+    async def _write_batch(self, batch: Sequence[_PendingWrite]) -> None:
+        """整批提交；整批失败时逐条重写，避免一条坏消息拖垮整批。"""
+        if not batch:
+            return
+        try:
+            await self._repository.save_incoming_batch(
+                [message for message, _ in batch]
+            )
+        except Exception as exc:
+            if len(batch) == 1:
+                self._settle(batch[0][1], error=exc)
+                return
+            log_exception(
+                event="database.group_message.batch_failed",
+                category="database",
+                message="群消息批量写入失败，正在逐条重写该批次",
+                exc=exc,
+                batch_size=len(batch),
+            )
+            for message, future in batch:
+                try:
+                    await self._repository.save_incoming(message)
+                except Exception as item_exc:
+                    self._settle(future, error=item_exc)
+                else:
+                    self._settle(future)
+            return
+        for _, future in batch:
+            self._settle(future)
+        log_event(
+            level="DEBUG",
+            event="database.group_message.batch_committed",
+            category="database",
+            message="群消息批次已提交",
+            batch_size=len(batch),
+        )
+
+    def _settle(
+        self,
+        future: asyncio.Future[None],
+        *,
+        error: Exception | None = None,
+    ) -> None:
+        """回填等待方结果；调用方已取消时忽略。"""
+        if future.done():
+            return
+        if error is None:
+            future.set_result(None)
+        else:
+            future.set_exception(error)
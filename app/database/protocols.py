@@ -63,6 +63,14 @@ class IncomingMessageWriter(Protocol):
         ...
 
 
+class IncomingMessageBatchWriter(IncomingMessageWriter, Protocol):
+    """支持在单个事务内写入多条入站群消息。"""
+
+    async def save_incoming_batch(self, messages: Sequence[GroupMessage]) -> None:
+        """原子写入一批入站群消息，语义与逐条 save_incoming 一致。"""
+        ...
+
+
 class SentMessageRecorder(Protocol):
     """记录已被 NapCat 确认发送的群消息。"""
 
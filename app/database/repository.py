@@ -48,6 +48,8 @@ from .schemas import (
 
 _SEGMENTS_ADAPTER = TypeAdapter(list[MessageSegment])
 _MAX_IMAGE_ATTEMPTS = 4
+# asyncpg 单条语句最多 32767 个参数，图片任务每行 9 列。
+_IMAGE_INSERT_CHUNK_ROWS = 1000
 _INLINE_PREFIXES = ("base64://", "data:")
 _PATH_SEGMENT_TYPES = frozenset(("image", "record", "video"))
 _FILE_SEGMENT_TYPES = frozenset(("image", "record", "video", "file"))
@@ -75,6 +77,27 @@ class _PreparedImage:
     file_id: str | None
 
 
+@dataclass(frozen=True, slots=True)
+class _PreparedMessage:
+    """已清理消息段、可直接写入核心表的群消息。"""
+
+    scope: GroupDataScope
+    message_id: str
+    direction: MessageDirection
+    group_name: str | None
+    sender_id: str
+    sender_name: str
+    sender_role: str | None
+    occurred_at: datetime
+    segments: list[JsonObject]
+    images: list[_PreparedImage]
+
+    @property
+    def identity(self) -> tuple[str, str, str]:
+        """返回与核心表唯一约束一致的复合身份。"""
+        return (self.scope.bot_id, self.scope.group_id, self.message_id)
+
+
 class PostgreSQLMessageRepository:
     """实现群消息读写、撤回归档和图片任务租约。"""
 
@@ -224,61 +247,54 @@ class PostgreSQLMessageRepository:
 
     async def save_incoming(self, message: GroupMessage) -> None:
         """幂等保存入站群消息，且不覆盖已有撤回证据。"""
-        scope = GroupDataScope(bot_id=message.self_id, group_id=message.group_id)
-        occurred_at = datetime.fromtimestamp(message.time, tz=UTC)
-        direction: MessageDirection = (
-            "outgoing" if message.post_type == "message_sent" else "incoming"
-        )
-        sender_name = message.sender.card or message.sender.nickname
-        segments, images = self._prepare_segments(message.message)
+        prepared = self._prepare_message(message)
         async with self._session_factory() as session, session.begin():
-            if direction == "outgoing":
-                row_id, echo_inserted = await self._insert_outgoing_echo(
-                    session=session,
-                    scope=scope,
-                    message_id=message.message_id,
-                    group_name=message.group_name,
-                    sender_id=message.user_id,
-                    sender_name=sender_name,
-                    sender_role=message.sender.role,
-                    occurred_at=occurred_at,
-                    segments=segments,
-                )
-                if echo_inserted:
-                    await self._sync_image_tasks(
-                        session=session,
-                        message_row_id=row_id,
-                        images=images,
-                        next_attempt_at=datetime.now(UTC),
-                    )
-                else:
-                    await self._merge_echo_image_sources(
-                        session=session,
-                        message_row_id=row_id,
-                        images=images,
-                        ready_at=datetime.now(UTC),
-                    )
+            if prepared.direction == "outgoing":
+                await self._save_outgoing_echo(session=session, message=prepared)
                 return
 
             row_id, inserted = await self._insert_incoming_message(
                 session=session,
-                scope=scope,
-                message_id=message.message_id,
-                group_name=message.group_name,
-                sender_id=message.user_id,
-                sender_name=sender_name,
-                sender_role=message.sender.role,
-                occurred_at=occurred_at,
-                segments=segments,
+                scope=prepared.scope,
+                message_id=prepared.message_id,
+                group_name=prepared.group_name,
+                sender_id=prepared.sender_id,
+                sender_name=prepared.sender_name,
+                sender_role=prepared.sender_role,
+                occurred_at=prepared.occurred_at,
+                segments=prepared.segments,
             )
             if inserted:
                 await self._sync_image_tasks(
                     session=session,
                     message_row_id=row_id,
-                    images=images,
+                    images=prepared.images,
                     next_attempt_at=datetime.now(UTC),
                 )
 
+    async def save_incoming_batch(self, messages: Sequence[GroupMessage]) -> None:
+        """在同一事务内幂等保存一批群消息，入站行使用多行 upsert。"""
+        prepared_messages = [self._prepare_message(message) for message in messages]
+        incoming: dict[tuple[str, str, str], _PreparedMessage] = {}
+        outgoing: list[_PreparedMessage] = []
+        for prepared in prepared_messages:
+            if prepared.direction == "outgoing":
+                outgoing.append(prepared)
+                continue
+            # 同一批次内的重复事件与逐条写入一致：首条保留证据，其余不生效。
+            _ = incoming.setdefault(prepared.identity, prepared)
+        if not incoming and not outgoing:
+            return
+        async with self._session_factory() as session, session.begin():
+            if incoming:
+                await self._insert_incoming_batch(
+                    session=session,
+                    messages=list(incoming.values()),
+                    next_attempt_at=datetime.now(UTC),
+                )
+            for prepared in outgoing:
+                await self._save_outgoing_echo(session=session, message=prepared)
+
     async def record_sent(
         self,
         *,
@@ -607,6 +623,106 @@ class PostgreSQLMessageRepository:
             raise RuntimeError("入站群消息冲突后无法读取对应行")
         return existing_id, False
 
+    async def _insert_incoming_batch(
+        self,
+        *,
+        session: AsyncSession,
+        messages: list[_PreparedMessage],
+        next_attempt_at: datetime,
+    ) -> None:
+        """一条多行 INSERT 写入新消息，只为实际插入的行创建图片任务。"""
+        statement = (
+            insert(GroupMessageRow)
+            .values(
+                [
+                    {
+                        "bot_id": message.scope.bot_id,
+                        "group_id": message.scope.group_id,
+                        "message_id": message.message_id,
+                        "sender_id": message.sender_id,
+                        "occurred_at": message.occurred_at,
+                        "direction": "incoming",
+                        "group_name": message.group_name,
+                        "sender_name": message.sender_name,
+                        "sender_role": message.sender_role,
+                        "segments": message.segments,
+                    }
+                    for message in messages
+                ]
+            )
+            .on_conflict_do_nothing(
+                index_elements=["bot_id", "group_id", "message_id"]
+            )
+            .returning(
+                GroupMessageRow.id,
+                GroupMessageRow.bot_id,
+                GroupMessageRow.group_id,
+                GroupMessageRow.message_id,
+            )
+        )
+        inserted_ids = {
+            (bot_id, group_id, message_id): row_id
+            for row_id, bot_id, group_id, message_id in (
+                await session.execute(statement)
+            ).tuples()
+        }
+        # 冲突行沿用逐条写入语义：已有消息不改写证据，也不重新同步图片任务。
+        image_values = [
+            {
+                "message_row_id": inserted_ids[message.identity],
+                "segment_index": image.segment_index,
+                "source_file": image.source_file,
+                "source_url": image.source_url,
+                "source_path": image.source_path,
+                "file_id": image.file_id,
+                "status": "pending",
+                "attempt_count": 0,
+                "next_attempt_at": next_attempt_at,
+            }
+            for message in messages
+            if message.identity in inserted_ids
+            for image in message.images
+        ]
+        for start in range(0, len(image_values), _IMAGE_INSERT_CHUNK_ROWS):
+            _ = await session.execute(
+                insert(GroupMessageImageRow).values(
+                    image_values[start : start + _IMAGE_INSERT_CHUNK_ROWS]
+                )
+            )
+
+    async def _save_outgoing_echo(
+        self,
+        *,
+        session: AsyncSession,
+        message: _PreparedMessage,
+    ) -> None:
+        """写入 NapCat 回显的出站消息，并按是否首写选择图片任务策略。"""
+        row_id, echo_inserted = await self._insert_outgoing_echo(
+            session=session,
+            scope=message.scope,
+            message_id=message.message_id,
+            group_name=message.group_name,
+            sender_id=message.sender_id,
+            sender_name=message.sender_name,
+            sender_role=message.sender_role,
+            occurred_at=message.occurred_at,
+            segments=message.segments,
+        )
+        if echo_inserted:
+            await self._sync_image_tasks(
+                session=session,
+                message_row_id=row_id,
+                images=message.images,
+                next_attempt_at=datetime.now(UTC),
+            )
+        else:
+            await self._merge_echo_image_sources(
+                session=session,
+                message_row_id=row_id,
+                images=message.images,
+                ready_at=datetime.now(UTC),
+            )
+
     async def _insert_outgoing_echo(
         self,
         *,
@@ -840,6 +956,25 @@ class PostgreSQLMessageRepository:
                 )
             )
 
+    def _prepare_message(self, message: GroupMessage) -> _PreparedMessage:
+        """把协议事件转换为写库所需的清理后字段。"""
+        self._validate_message_id(message.message_id)
+        segments, images = self._prepare_segments(message.message)
+        return _PreparedMessage(
+            scope=GroupDataScope(bot_id=message.self_id, group_id=message.group_id),
+            message_id=message.message_id,
+            direction=(
+                "outgoing" if message.post_type == "message_sent" else "incoming"
+            ),
+            group_name=message.group_name,
+            sender_id=message.user_id,
+            sender_name=message.sender.card or message.sender.nickname,
+            sender_role=message.sender.role,
+            occurred_at=datetime.fromtimestamp(message.time, tz=UTC),
+            segments=segments,
+            images=images,
+        )
+
     def _prepare_segments(
         self, segments: Sequence[MessageSegment]
     ) -> tuple[list[JsonObject], list[_PreparedImage]]:
@@ -968,17 +1103,23 @@ class PostgreSQLMessageRepository:
                 raise ValueError(
                     f"图片任务 {image_row.id} 指向的消息段不是图片"
                 )
-            segment.data.file_id = segment.data.file_id or image_row.file_id
-            segment.data.url = segment.data.url or image_row.source_url
+            # 消息段模型不可原地修改，按图片任务补全后替换为新实例。
+            data_update: dict[str, object] = {
+                "file_id": segment.data.file_id or image_row.file_id,
+                "url": segment.data.url or image_row.source_url,
+            }
             if (
                 segment.data.file == "[inline-media]"
                 and image_row.source_file is not None
             ):
-                segment.data.file = image_row.source_file
+                data_update["file"] = image_row.source_file
             if image_row.status == "stored" and image_row.storage_key is not None:
-                segment.data.path = str(
+                data_update["path"] = str(
                     self._resolve_storage_path(storage_key=image_row.storage_key)
                 )
+            parsed_segments[image_row.segment_index] = segment.model_copy(
+                update={"data": segment.data.model_copy(update=data_update)}
+            )
         return StoredGroupMessage(
             row_id=row.id,
             scope=GroupDataScope(bot_id=row.bot_id, group_id=row.group_id),
@@ -16,11 +16,16 @@ class StrictModel(BaseModel):
 
 
 class NapCatModel(BaseModel):
-    """NapCat 入站协议模型基类，吸收上游字段漂移。"""
+    """NapCat 入站协议模型基类，吸收上游字段漂移。
+
+    实例不可原地修改，同一事件可安全地交给多个插件共享；需要变更时用
+    ``model_copy(update=...)`` 生成新实例。
+    """
 
     model_config: ClassVar[ConfigDict] = ConfigDict(
         extra="ignore",
         coerce_numbers_to_str=True,
+        frozen=True,
     )
 
 
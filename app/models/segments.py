@@ -1,8 +1,8 @@
 """NapCat OneBot 消息段模型。"""
 
-from typing import ClassVar, Literal, Self, cast
+from typing import Annotated, ClassVar, Final, Literal, Self, cast
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Discriminator, Field, Tag
 
 from .common import JsonValue, NapCatId, NapCatModel, NapCatStringInteger
 
@@ -369,7 +369,74 @@ class UnknownSegment(NapCatModel):
     data: JsonValue = None
 
 
-type MessageSegment = (
+_SEGMENT_TYPES: Final[frozenset[str]] = frozenset(
+    {
+        "text",
+        "at",
+        "image",
+        "face",
+        "reply",
+        "dice",
+        "rps",
+        "record",
+        "video",
+        "file",
+        "json",
+        "share",
+        "forward",
+        "node",
+        "music",
+        "mface",
+        "markdown",
+        "contact",
+        "poke",
+        "location",
+        "xml",
+        "miniapp",
+        "lightapp",
+    }
+)
+
+
+def _segment_type_tag(value: object) -> str | None:
+    """按 ``type`` 字段预分类消息段，未建模的类型返回 None。"""
+    if isinstance(value, dict):
+        segment_type = cast(dict[str, object], value).get("type")
+    else:
+        segment_type = getattr(value, "type", None)
+    if isinstance(segment_type, str) and segment_type in _SEGMENT_TYPES:
+        return segment_type
+    return None
+
+
+type _TaggedSegment = Annotated[
+    Annotated[Text, Tag("text")]
+    | Annotated[At, Tag("at")]
+    | Annotated[Image, Tag("image")]
+    | Annotated[Face, Tag("face")]
+    | Annotated[Reply, Tag("reply")]
+    | Annotated[Dice, Tag("dice")]
+    | Annotated[Rps, Tag("rps")]
+    | Annotated[Record, Tag("record")]
+    | Annotated[Video, Tag("video")]
+    | Annotated[File, Tag("file")]
+    | Annotated[Json, Tag("json")]
+    | Annotated[Share, Tag("share")]
+    | Annotated[Forward, Tag("forward")]
+    | Annotated[Node, Tag("node")]
+    | Annotated[Music, Tag("music")]
+    | Annotated[MFace, Tag("mface")]
+    | Annotated[Markdown, Tag("markdown")]
+    | Annotated[Contact, Tag("contact")]
+    | Annotated[Poke, Tag("poke")]
+    | Annotated[Location, Tag("location")]
+    | Annotated[Xml, Tag("xml")]
+    | Annotated[MiniApp, Tag("miniapp")]
+    | Annotated[LightApp, Tag("lightapp")],
+    Discriminator(_segment_type_tag),
+]
+
+type _AnySegment = (
     Text
     | At
     | Image
@@ -395,3 +462,9 @@ type MessageSegment = (
     | LightApp
     | UnknownSegment
 )
+
+# 先按 type 直达具体模型；未知类型或字段不合法时再走完整联合类型，
+# 由 UnknownSegment 兜底，保证单个异常消息段不会拖垮整条消息。
+type MessageSegment = Annotated[
+    _TaggedSegment | _AnySegment, Field(union_mode="left_to_right")
+]
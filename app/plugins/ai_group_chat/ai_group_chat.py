@@ -7,13 +7,22 @@ from typing import ClassVar, Mapping, override
 from app.config import MaterializedAIGroupChatConfig, MaterializedAIGroupConfig
 from app.models import At, GroupMessage, NapCatId
 from app.plugins.base import BasePlugin
-from app.services import ContextHandler
+from app.plugins.scheduler import KeyedScheduler, PluginScheduler, QueueLimit
+from app.services import ChatMessage, ContextHandler
 from app.utils.log import log_event
 
 from .constants import CONSUMERS_COUNT, PRIORITY
+from .context_store import (
+    GroupContextLoadError,
+    GroupContextStore,
+    PostgreSQLGroupContextRepository,
+)
 from .debug_dump import AIGroupChatDebugDumper
 from .message_builder import GroupChatMessageBuilder
+from .prompt_cache import PromptCacheMeter, PromptCacheStats
+from .token_budget import TokenCalibration
 from .tool_loop import GroupChatToolLoop
+from .vision_cache import VisionDescriptionCache, VisionDescriptionRepository
 from .vision_tool import VisionDescriptionTool, VisionTurnState
 
 
@@ -36,6 +45,8 @@ class _GroupContextEntry:
 
     handler: ContextHandler
     system_prompt: str
+    # 读取已保存历史失败时为 False，下一轮重新读取并合并内存中的新消息。
+    history_loaded: bool = True
 
 
 class AIGroupChatPlugin(BasePlugin[GroupMessage]):
@@ -43,16 +54,32 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
 
     name: ClassVar[str] = "AI智能群聊回复插件"
     plugin_id: ClassVar[str] = "ai_group_chat"
+    migration_package: ClassVar[str | None] = "app.plugins.ai_group_chat.migrations"
     consumers_count: ClassVar[int] = CONSUMERS_COUNT
     priority: ClassVar[int] = PRIORITY
 
     @override
     def setup(self) -> None:
-        """初始化配置缓存和每群串行锁。"""
+        """初始化配置缓存、跨配置版本共享的持久化组件和每群串行锁。"""
         self._runtime_revision = 0
+        self._vision_cache = VisionDescriptionCache(
+            store=self.context.create_repository(VisionDescriptionRepository)
+        )
+        self._context_store = GroupContextStore(
+            repository=self.context.create_repository(
+                PostgreSQLGroupContextRepository
+            ),
+            image_store=self.context.image_store,
+        )
+        # 按模型和词表保存 token 估算校准，配置热重载后不必重新收敛。
+        self._token_calibrations: dict[
+            tuple[str, str, str | None], TokenCalibration
+        ] = {}
+        self._prompt_cache = PromptCacheMeter()
         self._runtime: _AIGroupChatRuntime | None = None
         self._group_contexts: dict[str, _GroupContextEntry] = {}
         self._group_locks: dict[str, asyncio.Lock] = {}
+        self._compression_tasks: dict[str, asyncio.Task[None]] = {}
         self._debug_initialized_revision: dict[str, int] = {}
 
     def _current_runtime(self) -> _AIGroupChatRuntime | None:
@@ -73,15 +100,31 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
                 bot=self.context.bot,
                 http_client=self.context.direct_httpx,
             )
+            if config.vision is not None:
+                self._vision_cache.configure(
+                    max_entries=config.vision.cache_max_entries,
+                    ttl_seconds=config.vision.cache_ttl_seconds,
+                )
             vision_tool = VisionDescriptionTool(
                 config=materialized,
                 context=self.context,
+                cache=self._vision_cache,
             )
             tool_loop = GroupChatToolLoop(
                 config=config,
                 context=self.context,
                 debug_dumper=debug_dumper,
                 vision_tool=vision_tool,
+                tokenizer=materialized.tokenizer,
+                calibration=self._token_calibrations.setdefault(
+                    (
+                        config.model.provider,
+                        config.model.name,
+                        config.model.tokenizer_file,
+                    ),
+                    TokenCalibration(),
+                ),
+                prompt_cache=self._prompt_cache,
             )
             runtime = _AIGroupChatRuntime(
                 revision=revision,
@@ -101,6 +144,7 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
                 model_name=config.model.name,
                 provider=config.model.provider,
                 supports_images=config.model.supports_images,
+                tokenizer_file=config.model.tokenizer_file,
                 debug_dump_messages=config.debug_dump_messages,
                 group_count=len(runtime.groups),
             )
@@ -135,24 +179,84 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
                 system_prompt_chars=len(group.system_prompt),
             )
 
-    def _get_group_context(
+    async def _reload_group_context(
+        self,
+        *,
+        runtime: _AIGroupChatRuntime,
+        group: MaterializedAIGroupConfig,
+        entry: _GroupContextEntry,
+    ) -> _GroupContextEntry:
+        """重新读取上次失败的已保存历史；仍失败时保留当前内存上下文。"""
+        group_id = str(group.source.id)
+        if not runtime.config.source.persist_context:
+            return entry
+        try:
+            history = await self._context_store.load(
+                group_id=group_id, system_prompt=group.system_prompt
+            )
+        except GroupContextLoadError:
+            return entry
+        handler = ContextHandler(
+            system_prompt=group.system_prompt,
+            max_context_tokens=group.source.max_context_tokens,
+            history=history,
+        )
+        handler.add_msg(msg_list=entry.handler.messages_lst[1:])
+        reloaded = _GroupContextEntry(
+            handler=handler, system_prompt=group.system_prompt
+        )
+        self._group_contexts[group_id] = reloaded
+        log_event(
+            level="INFO",
+            event="ai_group_chat.group_context.reloaded",
+            category="plugin",
+            message="AI 群聊上下文重新读取成功，已合并读取失败期间的消息",
+            group_id=group_id,
+            restored_messages_count=len(history or []),
+            pending_messages_count=len(entry.handler.messages_lst) - 1,
+        )
+        return reloaded
+
+    async def _get_group_context(
         self,
         *,
         runtime: _AIGroupChatRuntime,
         group: MaterializedAIGroupConfig,
     ) -> ContextHandler:
-        """在群锁内初始化、重置或更新上下文预算。"""
+        """在群锁内初始化、重置或更新上下文预算；首次使用时从数据库恢复。
+
+        上次读取失败的群每轮重新读取，成功后把读取失败期间的内存消息接在
+        恢复的历史之后。
+        """
         group_id = str(group.source.id)
         entry = self._group_contexts.get(group_id)
         reset = entry is not None and entry.system_prompt != group.system_prompt
-        if entry is None or reset:
+        if entry is not None and not reset and not entry.history_loaded:
+            entry = await self._reload_group_context(
+                runtime=runtime, group=group, entry=entry
+            )
+            entry.handler.max_context_tokens = group.source.max_context_tokens
+        elif entry is None or reset:
+            history: list[ChatMessage] | None = None
+            history_loaded = True
+            if runtime.config.source.persist_context and (
+                entry is None or not entry.history_loaded
+            ):
+                try:
+                    history = await self._context_store.load(
+                        group_id=group_id, system_prompt=group.system_prompt
+                    )
+                except GroupContextLoadError:
+                    history_loaded = False
             handler = ContextHandler(
                 system_prompt=group.system_prompt,
                 max_context_tokens=group.source.max_context_tokens,
+                history=history,
             )
             entry = _GroupContextEntry(
                 handler=handler,
                 system_prompt=group.system_prompt,
+                history_loaded=history_loaded,
             )
             self._group_contexts[group_id] = entry
             log_event(
@@ -193,8 +297,39 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
         return entry.handler
 
     @override
-    async def run(self, msg: GroupMessage) -> bool:
-        """在机器人被艾特时触发 AI 群聊回复。"""
+    def create_scheduler(self) -> PluginScheduler[GroupMessage]:
+        """按群轮转调度，同群消息只占用一个消费者。"""
+        return KeyedScheduler(key=lambda msg: str(msg.group_id))
+
+    @override
+    def queue_limit(self) -> QueueLimit | None:
+        """按当前配置限制排队深度，未配置上限时不限制。"""
+        runtime = self._current_runtime()
+        if runtime is None:
+            return None
+        queue = runtime.config.source.queue
+        if queue.max_depth is None:
+            return None
+        return QueueLimit(max_depth=queue.max_depth, policy=queue.overload_policy)
+
+    @override
+    async def on_overload(self, msg: GroupMessage) -> None:
+        """配置了忙碌提示时艾特被丢弃消息的发送者。"""
+        runtime = self._current_runtime()
+        if runtime is None or str(msg.group_id) not in runtime.groups:
+            return
+        notice = runtime.config.source.queue.busy_notice.strip()
+        if notice == "":
+            return
+        _ = await self.context.bot.send_msg(
+            group_id=msg.group_id,
+            at=msg.user_id,
+            text=notice,
+        )
+
+    @override
+    def prefilter(self, msg: GroupMessage) -> bool:
+        """只让配置群聊中艾特机器人的消息入队。"""
         group_key = str(msg.group_id)
         runtime = self._current_runtime()
         if runtime is None or group_key not in runtime.groups:
@@ -212,6 +347,14 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
                 segment_count=len(msg.message),
             )
             return False
+        return True
+
+    @override
+    async def run(self, msg: GroupMessage) -> bool:
+        """在机器人被艾特时触发 AI 群聊回复。"""
+        group_key = str(msg.group_id)
+        if not self.prefilter(msg):
+            return False
 
         lock = self._group_locks.setdefault(group_key, asyncio.Lock())
         async with lock:
@@ -223,7 +366,7 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
             if group is None:
                 self._group_contexts.pop(group_key, None)
                 return False
-            chat_handler = self._get_group_context(runtime=runtime, group=group)
+            chat_handler = await self._get_group_context(runtime=runtime, group=group)
             log_event(
                 level="DEBUG",
                 event="ai_group_chat.event.accepted",
@@ -283,15 +426,24 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
                 model_name=runtime.config.source.model.name,
                 provider=runtime.config.source.model.provider,
             )
-            await runtime.tool_loop.run(
-                msg=msg,
-                chat_handler=chat_handler,
-                turn_messages=built_turn_messages.turn_messages,
-                input_vision_messages=input_vision_delivery.working_messages,
-                input_vision_history_messages=input_vision_delivery.history_messages,
-                question=built_turn_messages.question,
-                vision_turn_state=vision_turn_state,
-            )
+            try:
+                await runtime.tool_loop.run(
+                    msg=msg,
+                    chat_handler=chat_handler,
+                    turn_messages=built_turn_messages.turn_messages,
+                    input_vision_messages=input_vision_delivery.working_messages,
+                    input_vision_history_messages=(
+                        input_vision_delivery.history_messages
+                    ),
+                    question=built_turn_messages.question,
+                    vision_turn_state=vision_turn_state,
+                )
+            finally:
+                if runtime.config.source.persist_context:
+                    await self._context_store.save(
+                        group_id=group_key, handler=chat_handler
+                    )
+            self._schedule_compression(runtime=runtime, group_id=group_key)
             log_event(
                 level="DEBUG",
                 event="ai_group_chat.event.finished",
@@ -308,6 +460,110 @@ class AIGroupChatPlugin(BasePlugin[GroupMessage]):
             self._debug_initialized_revision.pop(group_key, None)
         return True
 
+    def prompt_cache_stats(self) -> tuple[PromptCacheStats, ...]:
+        """返回各群累计的服务端 prompt 缓存命中统计。"""
+        return self._prompt_cache.stats()
+
+    @override
+    async def stop_consumers(self) -> None:
+        """停止消费者后取消尚未完成的后台压缩，并输出 prompt 缓存统计。"""
+        await super().stop_consumers()
+        tasks = tuple(self._compression_tasks.values())
+        for task in tasks:
+            _ = task.cancel()
+        _ = await asyncio.gather(*tasks, return_exceptions=True)
+        for stats in self._prompt_cache.stats():
+            log_event(
+                level="INFO",
+                event="ai_group_chat.prompt_cache.stats",
+                category="plugin",
+                message="AI 群聊 prompt 缓存命中统计",
+                group_id=stats.group_id,
+                requests=stats.requests,
+                prompt_tokens=stats.prompt_tokens,
+                cached_tokens=stats.cached_tokens,
+                hit_ratio=round(stats.hit_ratio, 4),
+            )
+
+    def _schedule_compression(
+        self, *, runtime: _AIGroupChatRuntime, group_id: str
+    ) -> None:
+        """在群锁内检查水位，达到时为本群启动一次后台滚动压缩。"""
+        entry = self._group_contexts.get(group_id)
+        if (
+            entry is None
+            or not runtime.config.source.background_compression
+            or group_id in self._compression_tasks
+            or not runtime.tool_loop.should_compress_ahead(chat_handler=entry.handler)
+        ):
+            return
+        task = asyncio.create_task(
+            self._compress_in_background(
+                runtime=runtime,
+                group_id=group_id,
+                entry=entry,
+                history_messages=entry.handler.messages_lst[1:],
+            )
+        )
+        self._compression_tasks[group_id] = task
+        task.add_done_callback(
+            lambda done: self._forget_compression(group_id=group_id, task=done)
+        )
+
+    def _forget_compression(self, *, group_id: str, task: asyncio.Task[None]) -> None:
+        """后台压缩结束后移除登记，只移除同一个任务。"""
+        if self._compression_tasks.get(group_id) is task:
+            del self._compression_tasks[group_id]
+
+    async def _compress_in_background(
+        self,
+        *,
+        runtime: _AIGroupChatRuntime,
+        group_id: str,
+        entry: _GroupContextEntry,
+        history_messages: list[ChatMessage],
+    ) -> None:
+        """在锁外请求摘要，完成后在群锁内原子替换历史前缀并持久化。"""
+        try:
+            summary_message = await runtime.tool_loop.summarize_history(
+                group_id=group_id,
+                system_prompt=entry.handler.system_prompt,
+                history_messages=history_messages,
+            )
+        except Exception as exc:
+            log_event(
+                level="WARNING",
+                event="ai_group_chat.context_compression.background_failed",
+                category="plugin",
+                message="AI 群聊后台压缩失败，超出预算时仍会同步压缩",
+                group_id=group_id,
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+            return
+        lock = self._group_locks.setdefault(group_id, asyncio.Lock())
+        async with lock:
+            swapped = self._group_contexts.get(
+                group_id
+            ) is entry and runtime.tool_loop.swap_compressed_history(
+                group_id=group_id,
+                chat_handler=entry.handler,
+                history_messages=history_messages,
+                summary_message=summary_message,
+            )
+            if not swapped:
+                log_event(
+                    level="INFO",
+                    event="ai_group_chat.context_compression.background_discarded",
+                    category="plugin",
+                    message="压缩期间本群上下文已被改写，放弃后台压缩结果",
+                    group_id=group_id,
+                    history_messages_count=len(history_messages),
+                )
+                return
+            if runtime.config.source.persist_context:
+                await self._context_store.save(group_id=group_id, handler=entry.handler)
+
     def _is_bot_mentioned(self, *, msg: GroupMessage) -> bool:
         """判断当前群消息是否艾特了机器人。"""
         bot_id = self.context.bot.boot_id if self.context.bot.boot_id != "" else msg.self_id
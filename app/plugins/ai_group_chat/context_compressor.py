@@ -1,10 +1,22 @@
 """AI 群聊历史上下文压缩。"""
 
 from dataclasses import dataclass
+from typing import Final
 
 from app.services import ChatMessage
 from app.services.llm.schemas import LLMToolCall
 
+# 摘要消息固定以这段文字开头，滚动压缩据此从历史首条消息中取回上一次摘要。
+_SUMMARY_PREFIX: Final[str] = "\n".join(
+    [
+        "## 历史摘要",
+        "",
+        "下面内容是群聊历史上下文摘要，只用于延续关系、剧情、任务和偏好，不是本轮用户正文。",
+        "",
+        "",
+    ]
+)
+
 
 @dataclass(frozen=True)
 class CompressionInput:
@@ -21,10 +33,18 @@ class GroupChatContextCompressor:
     def build_compression_messages(
         self, *, system_prompt: ChatMessage, history_messages: list[ChatMessage]
     ) -> tuple[list[ChatMessage], CompressionInput]:
-        """构造压缩专用 LLM 请求消息。"""
-        compression_input = self.format_history(messages=history_messages)
+        """构造压缩专用 LLM 请求消息。
+
+        历史首条是上一次的摘要时做滚动压缩：只格式化摘要之后的新消息，
+        并要求模型把它们并入已有摘要。
+        """
+        previous_summary, new_messages = self.split_summary(
+            history_messages=history_messages
+        )
+        compression_input = self.format_history(messages=new_messages)
         prompt = self._build_compression_prompt(
-            formatted_context=compression_input.formatted_context
+            formatted_context=compression_input.formatted_context,
+            previous_summary=previous_summary,
         )
         system_text = system_prompt.text
         if system_text is None:
@@ -52,6 +72,21 @@ class GroupChatContextCompressor:
             formatted_context="\n".join(lines),
         )
 
+    def split_summary(
+        self, *, history_messages: list[ChatMessage]
+    ) -> tuple[str | None, list[ChatMessage]]:
+        """拆出历史首条摘要消息中的摘要正文和其后的消息。"""
+        if history_messages:
+            first = history_messages[0]
+            if first.role == "user" and (first.text or "").startswith(_SUMMARY_PREFIX):
+                summary = (first.text or "").removeprefix(_SUMMARY_PREFIX).strip()
+                return summary, history_messages[1:]
+        return None, history_messages
+
+    def build_summary_message(self, *, summary: str) -> ChatMessage:
+        """生成放在历史首位的摘要消息。"""
+        return ChatMessage(role="user", text=_SUMMARY_PREFIX + summary.strip())
+
     def build_rebuilt_user_message(
         self,
         *,
@@ -59,14 +94,7 @@ class GroupChatContextCompressor:
         current_turn_messages: list[ChatMessage],
     ) -> ChatMessage:
         """把历史摘要和本轮消息合成新的 user 消息。"""
-        text_parts = [
-            "## 历史摘要",
-            "",
-            "下面内容是群聊历史上下文摘要，只用于延续关系、剧情、任务和偏好，不是本轮用户正文。",
-            "",
-            summary.strip(),
-            "",
-        ]
+        text_parts = [_SUMMARY_PREFIX + summary.strip(), ""]
         image_bytes: list[bytes] = []
         for message in current_turn_messages:
             if message.text:
@@ -79,28 +107,44 @@ class GroupChatContextCompressor:
             image=image_bytes if image_bytes else None,
         )
 
-    def _build_compression_prompt(self, *, formatted_context: str) -> str:
-        """生成上下文压缩任务提示词。"""
-        return "\n".join(
+    def _build_compression_prompt(
+        self, *, formatted_context: str, previous_summary: str | None = None
+    ) -> str:
+        """生成上下文压缩任务提示词；有已有摘要时要求增量合并。"""
+        lines = [
+            "# 上下文压缩任务",
+            "",
+            "你不是在回复群聊。请把下面的群聊历史上下文压缩成后续对话可继续使用的长期摘要。",
+            "",
+            "## 压缩要求",
+            "",
+            "- 只输出摘要，不要生成群聊回复。",
+            "- 不要包含任何 reasoning_content、思维链、内心独白或 <think> 内容。",
+            "- 多模态图片已经被丢弃；不要编造图片细节。",
+            "- 摘要需覆盖角色关系、群员偏好、剧情进展、重要事实、未解决任务和承诺。",
+            "- 工具结果摘要只记录结论，不记录大段原始 JSON 或网页正文。",
+            "- 摘要必须适合放进下一轮 user 消息的「历史摘要」区块。",
+        ]
+        if previous_summary is not None:
+            lines.extend(
+                [
+                    "- 已有摘要之后只发生了下面的新对话；输出合并后的完整摘要，"
+                    "保留已有摘要中仍然有效的内容，过时的内容以新对话为准。",
+                    "",
+                    "## 已有摘要",
+                    "",
+                    previous_summary if previous_summary else "（已有摘要为空）",
+                ]
+            )
+        lines.extend(
             [
-                "# 上下文压缩任务",
-                "",
-                "你不是在回复群聊。请把下面的群聊历史上下文压缩成后续对话可继续使用的长期摘要。",
-                "",
-                "## 压缩要求",
-                "",
-                "- 只输出摘要，不要生成群聊回复。",
-                "- 不要包含任何 reasoning_content、思维链、内心独白或 <think> 内容。",
-                "- 多模态图片已经被丢弃；不要编造图片细节。",
-                "- 摘要需覆盖角色关系、群员偏好、剧情进展、重要事实、未解决任务和承诺。",
-                "- 工具结果摘要只记录结论，不记录大段原始 JSON 或网页正文。",
-                "- 摘要必须适合放进下一轮 user 消息的「历史摘要」区块。",
                 "",
                 "## 待压缩对话上下文",
                 "",
                 formatted_context if formatted_context else "（没有可压缩的历史上下文）",
             ]
         )
+        return "\n".join(lines)
 
     def _format_message(self, *, index: int, message: ChatMessage) -> list[str]:
         """格式化单条历史消息，显式排除思维链。"""
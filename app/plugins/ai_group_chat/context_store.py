@@ -0,0 +1,380 @@
+"""AI 群聊长期上下文的 PostgreSQL 持久化。"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from hashlib import sha256
+from typing import Final, Protocol
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import PluginSessionFactory
+from app.models import JsonObject
+from app.services import ChatMessage, ContextHandler
+from app.services.napcat import ImageStore
+from app.utils.log import log_event
+
+from .models import GroupContextMessageRow, GroupContextRow
+
+# 历史图片无法从图片存储恢复时，用这段说明代替只有图片的消息正文。
+_MISSING_IMAGE_TEXT: Final[str] = "（历史图片已不可用，长期上下文只保留了这条消息的位置）"
+
+
+@dataclass(frozen=True, slots=True)
+class StoredContextMessage:
+    """持久化后的单条上下文消息，图片以存储键引用。"""
+
+    message: JsonObject
+    image_keys: list[str]
+
+
+@dataclass(frozen=True, slots=True)
+class StoredGroupContext:
+    """单群已保存的 system prompt 摘要和按位置排列的历史。"""
+
+    system_prompt_digest: str
+    messages: list[StoredContextMessage]
+
+
+class GroupContextRepository(Protocol):
+    """群长期上下文的持久层。"""
+
+    async def load(self, *, group_id: str) -> StoredGroupContext | None:
+        """读取单群已保存的上下文。"""
+        ...
+
+    async def replace(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        messages: Sequence[StoredContextMessage],
+    ) -> None:
+        """整体覆盖单群上下文。"""
+        ...
+
+    async def append(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        start: int,
+        messages: Sequence[StoredContextMessage],
+    ) -> bool:
+        """在已保存的 ``start`` 条消息之后追加；已保存状态不一致时返回 False。"""
+        ...
+
+
+class PostgreSQLGroupContextRepository:
+    """在插件 schema 中按位置追加和覆盖群上下文。"""
+
+    def __init__(self, *, sessions: PluginSessionFactory) -> None:
+        """保存已绑定插件 schema 的 session factory。"""
+        self._sessions: PluginSessionFactory = sessions
+
+    async def load(self, *, group_id: str) -> StoredGroupContext | None:
+        """读取头记录和按位置排序的消息。"""
+        async with self._sessions.transaction() as session:
+            header = await session.get(GroupContextRow, group_id)
+            if header is None:
+                return None
+            rows = await session.scalars(
+                select(GroupContextMessageRow)
+                .where(GroupContextMessageRow.group_id == group_id)
+                .order_by(GroupContextMessageRow.position)
+            )
+            return StoredGroupContext(
+                system_prompt_digest=header.system_prompt_digest,
+                messages=[
+                    StoredContextMessage(
+                        message=row.message,
+                        image_keys=row.image_keys,
+                    )
+                    for row in rows
+                ],
+            )
+
+    async def replace(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        messages: Sequence[StoredContextMessage],
+    ) -> None:
+        """在一个事务内删除旧消息并写入完整历史。"""
+        now = datetime.now(UTC)
+        header = insert(GroupContextRow).values(
+            group_id=group_id,
+            system_prompt_digest=system_prompt_digest,
+            message_count=len(messages),
+            updated_at=now,
+        )
+        async with self._sessions.transaction() as session:
+            _ = await session.execute(
+                delete(GroupContextMessageRow).where(
+                    GroupContextMessageRow.group_id == group_id
+                )
+            )
+            _ = await session.execute(
+                header.on_conflict_do_update(
+                    index_elements=[GroupContextRow.group_id],
+                    set_={
+                        "system_prompt_digest": header.excluded.system_prompt_digest,
+                        "message_count": header.excluded.message_count,
+                        "updated_at": header.excluded.updated_at,
+                    },
+                )
+            )
+            if messages:
+                _ = await session.execute(
+                    insert(GroupContextMessageRow),
+                    self._message_values(
+                        group_id=group_id, start=0, messages=messages, now=now
+                    ),
+                )
+
+    async def append(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        start: int,
+        messages: Sequence[StoredContextMessage],
+    ) -> bool:
+        """锁住头记录，确认已保存条数与调用方一致后只插入新消息。"""
+        now = datetime.now(UTC)
+        async with self._sessions.transaction() as session:
+            header = await session.scalar(
+                select(GroupContextRow)
+                .where(GroupContextRow.group_id == group_id)
+                .with_for_update()
+            )
+            if (
+                header is None
+                or header.system_prompt_digest != system_prompt_digest
+                or header.message_count != start
+            ):
+                return False
+            if messages:
+                _ = await session.execute(
+                    insert(GroupContextMessageRow),
+                    self._message_values(
+                        group_id=group_id, start=start, messages=messages, now=now
+                    ),
+                )
+            header.message_count = start + len(messages)
+            header.updated_at = now
+        return True
+
+    def _message_values(
+        self,
+        *,
+        group_id: str,
+        start: int,
+        messages: Sequence[StoredContextMessage],
+        now: datetime,
+    ) -> list[dict[str, object]]:
+        """生成批量插入的消息行。"""
+        return [
+            {
+                "group_id": group_id,
+                "position": position,
+                "message": message.message,
+                "image_keys": message.image_keys,
+                "created_at": now,
+            }
+            for position, message in enumerate(messages, start=start)
+        ]
+
+
+def system_prompt_digest(system_prompt: str) -> str:
+    """计算 system prompt 摘要，提示词变化后旧历史不再恢复。"""
+    return sha256(system_prompt.encode("utf-8")).hexdigest()
+
+
+class GroupContextLoadError(RuntimeError):
+    """读取已保存的群上下文失败，与“没有保存的上下文”区分。"""
+
+
+class GroupContextStore:
+    """在 ContextHandler 与持久层之间转换消息，并按群懒加载。
+
+    保存只写入上次保存后新增的消息；历史被压缩或删除时整体覆盖。图片
+    字节写入内容寻址图片存储，表中只保存存储键。持久层失败只记录日志，
+    内存上下文继续可用，下次保存时重试。读取失败的群在下次读取成功前
+    不保存，避免用不完整的内存历史覆盖数据库中的历史。
+    """
+
+    def __init__(
+        self,
+        *,
+        repository: GroupContextRepository,
+        image_store: ImageStore | None,
+    ) -> None:
+        """保存持久层和可选图片存储。"""
+        self.repository: GroupContextRepository = repository
+        self.image_store: ImageStore | None = image_store
+        self._unloaded_groups: set[str] = set()
+
+    async def load(
+        self, *, group_id: str, system_prompt: str
+    ) -> list[ChatMessage] | None:
+        """恢复单群非系统历史；不存在或提示词已变化时返回 None。
+
+        读取失败时抛出 ``GroupContextLoadError``，并暂停本群保存直到下次
+        读取成功。
+        """
+        try:
+            stored = await self.repository.load(group_id=group_id)
+        except Exception as exc:
+            self._unloaded_groups.add(group_id)
+            log_event(
+                level="WARNING",
+                event="ai_group_chat.group_context.load_failed",
+                category="plugin",
+                message="读取已保存的 AI 群聊上下文失败，本群暂停保存，下一轮重新读取",
+                group_id=group_id,
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+            raise GroupContextLoadError(f"读取群 {group_id} 的上下文失败") from exc
+        self._unloaded_groups.discard(group_id)
+        if stored is None:
+            return None
+        if stored.system_prompt_digest != system_prompt_digest(system_prompt):
+            log_event(
+                level="INFO",
+                event="ai_group_chat.group_context.stale_discarded",
+                category="plugin",
+                message="已保存上下文的提示词与当前配置不同，不再恢复",
+                group_id=group_id,
+                stored_messages_count=len(stored.messages),
+            )
+            return None
+        messages = [
+            await self._restore_message(stored=message) for message in stored.messages
+        ]
+        log_event(
+            level="INFO",
+            event="ai_group_chat.group_context.restored",
+            category="plugin",
+            message="AI 群聊上下文已从数据库恢复",
+            group_id=group_id,
+            messages_count=len(messages),
+            image_count=sum(len(message.image or []) for message in messages),
+        )
+        return messages
+
+    async def save(self, *, group_id: str, handler: ContextHandler) -> None:
+        """写入上次保存后的变化，成功后标记上下文已持久化。"""
+        if group_id in self._unloaded_groups:
+            log_event(
+                level="DEBUG",
+                event="ai_group_chat.group_context.save_skipped",
+                category="plugin",
+                message="本群已保存的上下文尚未读取成功，跳过保存",
+                group_id=group_id,
+            )
+            return
+        changes = handler.pending_changes()
+        if changes is None:
+            return
+        digest = system_prompt_digest(handler.system_prompt.text or "")
+        history = handler.messages_lst[1:]
+        replace = changes.replace
+        try:
+            records = [
+                await self._store_message(message=message)
+                for message in changes.messages
+            ]
+            if not replace:
+                replace = not await self.repository.append(
+                    group_id=group_id,
+                    system_prompt_digest=digest,
+                    start=len(history) - len(records),
+                    messages=records,
+                )
+                if replace:
+                    records = [
+                        await self._store_message(message=message)
+                        for message in history
+                    ]
+            if replace:
+                await self.repository.replace(
+                    group_id=group_id,
+                    system_prompt_digest=digest,
+                    messages=records,
+                )
+        except Exception as exc:
+            log_event(
+                level="WARNING",
+                event="ai_group_chat.group_context.save_failed",
+                category="plugin",
+                message="AI 群聊上下文写入数据库失败，下次保存时重试",
+                group_id=group_id,
+                replace=replace,
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+            return
+        handler.mark_persisted()
+        log_event(
+            level="DEBUG",
+            event="ai_group_chat.group_context.saved",
+            category="plugin",
+            message="AI 群聊上下文已写入数据库",
+            group_id=group_id,
+            replace=replace,
+            written_messages_count=len(records),
+            history_messages_count=len(history),
+        )
+
+    async def _store_message(self, *, message: ChatMessage) -> StoredContextMessage:
+        """把图片写入图片存储，消息正文序列化为 JSON。"""
+        image_keys: list[str] = []
+        if self.image_store is not None:
+            for image_bytes in message.image or []:
+                try:
+                    stored = await self.image_store.store(image_bytes=image_bytes)
+                except ValueError as exc:
+                    log_event(
+                        level="DEBUG",
+                        event="ai_group_chat.group_context.image_skipped",
+                        category="plugin",
+                        message="上下文图片无法归档，持久化时只保留文字",
+                        error_type=type(exc).__name__,
+                        error=str(exc),
+                    )
+                    continue
+                image_keys.append(stored.storage_key)
+        return StoredContextMessage(
+            message=message.model_dump(
+                mode="json", exclude={"image"}, exclude_none=True
+            ),
+            image_keys=image_keys,
+        )
+
+    async def _restore_message(self, *, stored: StoredContextMessage) -> ChatMessage:
+        """按存储键读回图片；图片缺失时保留消息并补充说明文字。"""
+        images: list[bytes] = []
+        if self.image_store is not None:
+            for storage_key in stored.image_keys:
+                try:
+                    images.append(await self.image_store.read(storage_key=storage_key))
+                except (OSError, ValueError) as exc:
+                    log_event(
+                        level="DEBUG",
+                        event="ai_group_chat.group_context.image_missing",
+                        category="plugin",
+                        message="历史图片已不在图片存储中",
+                        storage_key=storage_key,
+                        error_type=type(exc).__name__,
+                        error=str(exc),
+                    )
+        payload: JsonObject = dict(stored.message)
+        if images:
+            return ChatMessage.model_validate({**payload, "image": images})
+        if payload.get("text") is None and not payload.get("tool_calls"):
+            payload["text"] = _MISSING_IMAGE_TEXT
+        return ChatMessage.model_validate(payload)
@@ -0,0 +1 @@
+"""AI 群聊插件 schema 的 Alembic migration package。"""
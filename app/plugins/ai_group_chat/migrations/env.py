@@ -0,0 +1,6 @@
+"""AI 群聊插件 schema 的 Alembic 运行环境。"""
+
+from app.database import run_plugin_migration_environment
+from app.plugins.ai_group_chat.models import AIGroupChatBase
+
+run_plugin_migration_environment(target_metadata=AIGroupChatBase.metadata)
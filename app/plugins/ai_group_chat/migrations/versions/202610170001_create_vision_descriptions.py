@@ -0,0 +1,66 @@
+"""创建视觉描述缓存表。
+
+Revision ID: 202610170001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+revision: str = "202610170001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _schema() -> str:
+    """读取 DatabaseMigrator 注入的插件 schema。"""
+    config = op.get_context().config
+    schema = None if config is None else config.attributes.get("plugin_schema")
+    if not isinstance(schema, str):
+        raise RuntimeError("插件 migration 缺少 plugin_schema")
+    return schema
+
+
+def upgrade() -> None:
+    """创建按图片摘要、视觉提示词摘要和视觉模型定位的描述缓存表。"""
+    schema = _schema()
+    op.create_table(
+        "vision_descriptions",
+        sa.Column("image_digest", sa.Text(), nullable=False),
+        sa.Column("prompt_digest", sa.Text(), nullable=False),
+        sa.Column("provider", sa.Text(), nullable=False),
+        sa.Column("model_name", sa.Text(), nullable=False),
+        sa.Column("description", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint(
+            "image_digest",
+            "prompt_digest",
+            "provider",
+            "model_name",
+            name="pk_vision_descriptions",
+        ),
+        schema=schema,
+    )
+    op.create_index(
+        "ix_vision_descriptions_expires_at",
+        "vision_descriptions",
+        ["expires_at"],
+        unique=False,
+        schema=schema,
+    )
+
+
+def downgrade() -> None:
+    """删除视觉描述缓存表。"""
+    schema = _schema()
+    op.drop_index(
+        "ix_vision_descriptions_expires_at",
+        table_name="vision_descriptions",
+        schema=schema,
+    )
+    op.drop_table("vision_descriptions", schema=schema)
@@ -0,0 +1,67 @@
+"""创建群长期上下文表。
+
+Revision ID: 202610170002
+Revises: 202610170001
+Create Date: 2026-10-17
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision: str = "202610170002"
+down_revision: str | None = "202610170001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _schema() -> str:
+    """读取 DatabaseMigrator 注入的插件 schema。"""
+    config = op.get_context().config
+    schema = None if config is None else config.attributes.get("plugin_schema")
+    if not isinstance(schema, str):
+        raise RuntimeError("插件 migration 缺少 plugin_schema")
+    return schema
+
+
+def upgrade() -> None:
+    """创建群上下文头记录和按位置追加的消息表。"""
+    schema = _schema()
+    op.create_table(
+        "group_contexts",
+        sa.Column("group_id", sa.Text(), nullable=False),
+        sa.Column("system_prompt_digest", sa.Text(), nullable=False),
+        sa.Column("message_count", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("group_id"),
+        schema=schema,
+    )
+    op.create_table(
+        "group_context_messages",
+        sa.Column("group_id", sa.Text(), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("message", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column(
+            "image_keys", postgresql.JSONB(astext_type=sa.Text()), nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["group_id"],
+            [f"{schema}.group_contexts.group_id"],
+            name="fk_group_context_messages_group",
+            ondelete="CASCADE",
+        ),
+        sa.PrimaryKeyConstraint(
+            "group_id", "position", name="pk_group_context_messages"
+        ),
+        schema=schema,
+    )
+
+
+def downgrade() -> None:
+    """删除群上下文表。"""
+    schema = _schema()
+    op.drop_table("group_context_messages", schema=schema)
+    op.drop_table("group_contexts", schema=schema)
@@ -0,0 +1,82 @@
+"""AI 群聊插件 schema 内的持久化表。"""
+
+from datetime import datetime
+
+from sqlalchemy import (
+    DateTime,
+    ForeignKeyConstraint,
+    Index,
+    Integer,
+    PrimaryKeyConstraint,
+    Text,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+from app.database import PLUGIN_SCHEMA_TOKEN
+from app.models import JsonObject
+
+
+class AIGroupChatBase(DeclarativeBase):
+    """AI 群聊插件表的声明式基类，schema 由插件 session 映射到真实名称。"""
+
+
+class VisionDescriptionRow(AIGroupChatBase):
+    """按图片内容摘要、视觉提示词摘要和视觉模型缓存的文字描述。"""
+
+    __tablename__ = "vision_descriptions"
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "image_digest",
+            "prompt_digest",
+            "provider",
+            "model_name",
+            name="pk_vision_descriptions",
+        ),
+        Index("ix_vision_descriptions_expires_at", "expires_at"),
+        {"schema": PLUGIN_SCHEMA_TOKEN},
+    )
+
+    image_digest: Mapped[str] = mapped_column(Text)
+    prompt_digest: Mapped[str] = mapped_column(Text)
+    provider: Mapped[str] = mapped_column(Text)
+    model_name: Mapped[str] = mapped_column(Text)
+    description: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class GroupContextRow(AIGroupChatBase):
+    """单群长期上下文的头记录，system prompt 摘要变化时历史作废。"""
+
+    __tablename__ = "group_contexts"
+    __table_args__ = ({"schema": PLUGIN_SCHEMA_TOKEN},)
+
+    group_id: Mapped[str] = mapped_column(Text, primary_key=True)
+    system_prompt_digest: Mapped[str] = mapped_column(Text)
+    message_count: Mapped[int] = mapped_column(Integer)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+class GroupContextMessageRow(AIGroupChatBase):
+    """单群长期上下文中按位置排列的一条消息，图片只保存存储键。"""
+
+    __tablename__ = "group_context_messages"
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "group_id", "position", name="pk_group_context_messages"
+        ),
+        ForeignKeyConstraint(
+            ["group_id"],
+            [f"{PLUGIN_SCHEMA_TOKEN}.group_contexts.group_id"],
+            name="fk_group_context_messages_group",
+            ondelete="CASCADE",
+        ),
+        {"schema": PLUGIN_SCHEMA_TOKEN},
+    )
+
+    group_id: Mapped[str] = mapped_column(Text)
+    position: Mapped[int] = mapped_column(Integer)
+    message: Mapped[JsonObject] = mapped_column(JSONB)
+    image_keys: Mapped[list[str]] = mapped_column(JSONB)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
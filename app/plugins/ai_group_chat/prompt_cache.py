@@ -0,0 +1,55 @@
+"""按群统计服务端 prompt 缓存命中情况。"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class PromptCacheStats:
+    """单群累计的请求数、输入 token 和命中缓存的输入 token。"""
+
+    group_id: str
+    requests: int
+    prompt_tokens: int
+    cached_tokens: int
+
+    @property
+    def hit_ratio(self) -> float:
+        """返回命中缓存的输入 token 占比；尚无请求时为 0。"""
+        if self.prompt_tokens <= 0:
+            return 0.0
+        return self.cached_tokens / self.prompt_tokens
+
+
+class PromptCacheMeter:
+    """累计每群每次模型请求返回的 ``usage`` 缓存命中。
+
+    历史只追加时，服务端可以复用上一轮请求的前缀缓存；命中率长期偏低
+    通常说明上下文被频繁压缩或改写。
+    """
+
+    def __init__(self) -> None:
+        """初始化空统计。"""
+        self._groups: dict[str, tuple[int, int, int]] = {}
+
+    def record(self, *, group_id: str, prompt_tokens: int, cached_tokens: int) -> None:
+        """记录一次请求的输入 token 和缓存命中 token。"""
+        requests, prompt_total, cached_total = self._groups.get(group_id, (0, 0, 0))
+        self._groups[group_id] = (
+            requests + 1,
+            prompt_total + prompt_tokens,
+            cached_total + cached_tokens,
+        )
+
+    def stats(self) -> tuple[PromptCacheStats, ...]:
+        """按群号返回当前累计统计。"""
+        return tuple(
+            PromptCacheStats(
+                group_id=group_id,
+                requests=requests,
+                prompt_tokens=prompt_tokens,
+                cached_tokens=cached_tokens,
+            )
+            for group_id, (requests, prompt_tokens, cached_tokens) in sorted(
+                self._groups.items()
+            )
+        )
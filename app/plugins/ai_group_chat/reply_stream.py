@@ -0,0 +1,32 @@
+"""AI 群聊流式回复的段落切分。"""
+
+import re
+from typing import Final
+
+# 空行分隔段落；只含空白字符的行也视为空行。
+PARAGRAPH_BREAK_PATTERN: Final[re.Pattern[str]] = re.compile(r"\n[ \t]*\n\s*")
+
+
+class ReplyParagraphSplitter:
+    """把流式正文增量切成已经写完的段落。
+
+    段落在其后出现空行时才算写完；``<Reply>``、``<At>`` 等标记随所在段落
+    一起发送，因此段落内的标记解析与整段发送时一致。
+    """
+
+    def __init__(self) -> None:
+        """初始化未完成段落缓冲。"""
+        self._buffer: str = ""
+
+    def feed(self, text: str) -> list[str]:
+        """追加正文增量，返回新写完的非空段落。"""
+        self._buffer += text
+        parts = PARAGRAPH_BREAK_PATTERN.split(self._buffer)
+        self._buffer = parts.pop()
+        return [part.strip() for part in parts if part.strip()]
+
+    def flush(self) -> str | None:
+        """流结束时取出最后一个段落。"""
+        tail = self._buffer.strip()
+        self._buffer = ""
+        return tail or None
@@ -1,43 +1,140 @@
 """AI 群聊上下文 token 预算估算。"""
 
+import json
 from dataclasses import dataclass
 from math import ceil
+from typing import Final, Protocol
 
 from app.models import to_json_value
 from app.services.llm.schemas import ChatMessage, LLMToolDefinition
 
 
+# 工具集合估算缓存的条目上限；工具集合很少变化，超限时整体清空即可。
+_TOOL_SET_CACHE_SIZE: Final[int] = 64
+
+# 校准比例的平滑系数和上下限；图片按固定 token 估算，单次样本可能偏差很大。
+_CALIBRATION_SMOOTHING: Final[float] = 0.2
+_CALIBRATION_MIN_RATIO: Final[float] = 0.25
+_CALIBRATION_MAX_RATIO: Final[float] = 4.0
+
+type _ToolFingerprint = tuple[tuple[str, str, str], ...]
+
+
 @dataclass(frozen=True)
 class TokenBudgetEstimate:
-    """描述一次上下文预算估算结果。"""
+    """描述一次上下文预算估算结果。
+
+    ``raw_tokens`` 是未乘校准比例和安全系数的原始估算，用于和服务端
+    返回的 ``usage.prompt_tokens`` 对比校准。
+    """
 
     estimated_tokens: int
     max_context_tokens: int
     should_compress: bool
+    raw_tokens: int = 0
+
+
+class TextTokenizer(Protocol):
+    """统计文本 token 数的分词器。"""
+
+    def count(self, text: str) -> int:
+        """返回文本 token 数。"""
+        ...
+
+
+class CharacterTokenizer:
+    """不依赖词表的保守规则：ASCII 字符计 1，非 ASCII 字符计 2。"""
+
+    def count(self, text: str) -> int:
+        """按字符类别估算文本 token。"""
+        if text.isascii():
+            return len(text)
+        # 丢弃非 ASCII 字符后的编码长度就是 ASCII 字符数，全程在 C 层完成。
+        return 2 * len(text) - len(text.encode("ascii", "ignore"))
+
+
+class TokenCalibration:
+    """用服务端返回的 ``usage.prompt_tokens`` 校准原始估算。
+
+    比例按指数滑动平均更新，首个样本直接采用；同一模型和分词器共享一份
+    校准，配置热重载后继续沿用。
+    """
+
+    def __init__(self) -> None:
+        """未校准时比例为 1。"""
+        self.ratio: float = 1.0
+        self.samples: int = 0
+
+    def observe(self, *, raw_tokens: int, prompt_tokens: int) -> None:
+        """记录一次请求的原始估算与实际 prompt token。"""
+        if raw_tokens <= 0 or prompt_tokens <= 0:
+            return
+        ratio = min(
+            max(prompt_tokens / raw_tokens, _CALIBRATION_MIN_RATIO),
+            _CALIBRATION_MAX_RATIO,
+        )
+        if self.samples == 0:
+            self.ratio = ratio
+        else:
+            self.ratio += _CALIBRATION_SMOOTHING * (ratio - self.ratio)
+        self.samples += 1
 
 
 class ConservativeTokenEstimator:
     """使用宁多不少的规则估算不同模型的上下文 token 数。"""
 
-    def __init__(self, *, safety_factor: float) -> None:
-        """保存最终安全系数。"""
+    def __init__(
+        self,
+        *,
+        safety_factor: float,
+        tokenizer: TextTokenizer | None = None,
+        calibration: TokenCalibration | None = None,
+    ) -> None:
+        """保存安全系数、分词器和校准状态。"""
         self.safety_factor: float = safety_factor
+        self.tokenizer: TextTokenizer = tokenizer or CharacterTokenizer()
+        self.calibration: TokenCalibration = calibration or TokenCalibration()
         self.request_overhead_tokens: int = 128
         self.message_overhead_tokens: int = 16
         self.tool_call_overhead_tokens: int = 64
         self.image_tokens: int = 1024
+        self._tool_set_tokens: dict[_ToolFingerprint, int] = {}
 
     def estimate_request(
-        self, *, messages: list[ChatMessage], tools: list[LLMToolDefinition]
+        self,
+        *,
+        messages: list[ChatMessage],
+        tools: list[LLMToolDefinition],
+        counted_tokens: int = 0,
     ) -> int:
-        """估算一次 LLM 请求的 token 数。"""
-        raw_tokens = self.request_overhead_tokens
+        """估算一次 LLM 请求校准并乘安全系数后的 token 数。
+
+        ``counted_tokens`` 是调用方已用 ``estimate_message`` 累计好的消息
+        原始 token，例如 ContextHandler 的历史合计；``messages`` 只需包含
+        尚未计数的新消息。
+        """
+        return self.scale(
+            self.estimate_raw_request(
+                messages=messages, tools=tools, counted_tokens=counted_tokens
+            )
+        )
+
+    def estimate_raw_request(
+        self,
+        *,
+        messages: list[ChatMessage],
+        tools: list[LLMToolDefinition],
+        counted_tokens: int = 0,
+    ) -> int:
+        """估算一次 LLM 请求未校准的原始 token 数。"""
+        raw_tokens = self.request_overhead_tokens + counted_tokens
         for message in messages:
-            raw_tokens += self._estimate_message(message=message)
-        for tool in tools:
-            raw_tokens += self.tool_call_overhead_tokens
-            raw_tokens += self._estimate_text(text=str(to_json_value(tool)))
-        return ceil(raw_tokens * self.safety_factor)
+            raw_tokens += self.estimate_message(message)
+        return raw_tokens + self.estimate_tools(tools)
+
+    def scale(self, raw_tokens: int) -> int:
+        """把原始估算乘以校准比例和安全系数。"""
+        return ceil(raw_tokens * self.calibration.ratio * self.safety_factor)
 
     def check_request(
         self,
@@ -45,17 +142,49 @@ class ConservativeTokenEstimator:
         messages: list[ChatMessage],
         tools: list[LLMToolDefinition],
         max_context_tokens: int,
+        counted_tokens: int = 0,
     ) -> TokenBudgetEstimate:
         """判断一次 LLM 请求是否超过指定上下文预算。"""
-        estimated_tokens = self.estimate_request(messages=messages, tools=tools)
+        raw_tokens = self.estimate_raw_request(
+            messages=messages,
+            tools=tools,
+            counted_tokens=counted_tokens,
+        )
+        estimated_tokens = self.scale(raw_tokens)
         return TokenBudgetEstimate(
             estimated_tokens=estimated_tokens,
             max_context_tokens=max_context_tokens,
             should_compress=estimated_tokens > max_context_tokens,
+            raw_tokens=raw_tokens,
         )
 
-    def _estimate_message(self, *, message: ChatMessage) -> int:
-        """估算单条消息的 token 数。"""
+    def estimate_tools(self, tools: list[LLMToolDefinition]) -> int:
+        """估算工具定义的原始 token 数，相同工具集合只完整估算一次。"""
+        if not tools:
+            return 0
+        fingerprint = tuple(
+            (
+                tool.name,
+                tool.description,
+                json.dumps(tool.parameters, ensure_ascii=False, sort_keys=True),
+            )
+            for tool in tools
+        )
+        cached = self._tool_set_tokens.get(fingerprint)
+        if cached is not None:
+            return cached
+        tokens = sum(
+            self.tool_call_overhead_tokens
+            + self._estimate_text(text=str(to_json_value(tool)))
+            for tool in tools
+        )
+        if len(self._tool_set_tokens) >= _TOOL_SET_CACHE_SIZE:
+            self._tool_set_tokens.clear()
+        self._tool_set_tokens[fingerprint] = tokens
+        return tokens
+
+    def estimate_message(self, message: ChatMessage) -> int:
+        """估算单条消息未乘安全系数的原始 token 数。"""
         tokens = self.message_overhead_tokens
         tokens += self._estimate_text(text=message.role)
         tokens += self._estimate_text(text=message.text)
@@ -70,13 +199,7 @@ class ConservativeTokenEstimator:
         return tokens
 
     def _estimate_text(self, *, text: str | None) -> int:
-        """按字符保守估算文本 token，非 ASCII 字符按两个 token 计算。"""
-        if text is None:
+        """用当前分词器统计文本 token。"""
+        if not text:
             return 0
-        tokens = 0
-        for character in text:
-            if character.isascii():
-                tokens += 1
-                continue
-            tokens += 2
-        return tokens
+        return self.tokenizer.count(text)
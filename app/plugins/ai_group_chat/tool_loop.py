@@ -1,6 +1,8 @@
 """AI 群聊插件的工具调用循环。"""
 
-from dataclasses import dataclass
+import asyncio
+import time
+from dataclasses import dataclass, field
 
 from app.api.mixins.message import NapCatSendMessageError
 from app.config import AIGroupChatConfig
@@ -12,12 +14,21 @@ from app.services import (
     ContextHandler,
     NapCatGroupToolExecutor,
 )
-from app.services.llm.schemas import LLMResponse, LLMToolCall, LLMToolDefinition
+from app.services.llm.schemas import (
+    LLMContentDelta,
+    LLMResponse,
+    LLMToolCall,
+    LLMToolCallReady,
+    LLMToolDefinition,
+    LLMUsage,
+)
 from app.services.llm.tools import (
     LLMImageArtifact,
     LLMImageError,
     LLMImageItem,
+    LLMToolExecutionResult,
     build_tool_result_message,
+    run_tool_calls,
 )
 from app.utils.log import log_event
 
@@ -27,7 +38,14 @@ from .forward_image_auto_fetch import (
     FORWARD_MESSAGE_IMAGES_TOOL_NAME,
     ForwardImageAutoFetcher,
 )
-from .token_budget import ConservativeTokenEstimator, TokenBudgetEstimate
+from .prompt_cache import PromptCacheMeter
+from .reply_stream import ReplyParagraphSplitter
+from .token_budget import (
+    ConservativeTokenEstimator,
+    TextTokenizer,
+    TokenBudgetEstimate,
+    TokenCalibration,
+)
 from .vision_tool import VisionDescriptionTool, VisionTurnState
 
 
@@ -56,6 +74,25 @@ class PreparedTurnContext:
     working_messages: list[ChatMessage]
     persisted_turn_messages: list[ChatMessage]
     replace_existing_history: bool
+    raw_tokens: int
+
+
+@dataclass
+class StreamedRound:
+    """描述一次流式模型请求：完整响应、已提前发出的段落和已启动的工具。"""
+
+    response: LLMResponse
+    sent_paragraphs: list[str] = field(default_factory=list)
+    tail_paragraph: str | None = None
+    interrupted: ReplySendResult | None = None
+    started_tool_calls: dict[str, asyncio.Task[LLMToolExecutionResult]] = field(
+        default_factory=dict
+    )
+
+    def cancel_tool_calls(self) -> None:
+        """丢弃本轮结果时取消已提前启动的工具调用。"""
+        for task in self.started_tool_calls.values():
+            _ = task.cancel()
 
 
 @dataclass(frozen=True)
@@ -88,6 +125,9 @@ class GroupChatToolLoop:
         context: Context,
         debug_dumper: AIGroupChatDebugDumper,
         vision_tool: VisionDescriptionTool,
+        tokenizer: TextTokenizer | None = None,
+        calibration: TokenCalibration | None = None,
+        prompt_cache: PromptCacheMeter | None = None,
     ) -> None:
         """保存工具循环所需的配置和运行上下文。"""
         self.config: AIGroupChatConfig = config
@@ -95,11 +135,16 @@ class GroupChatToolLoop:
         self.debug_dumper: AIGroupChatDebugDumper = debug_dumper
         self.vision_tool: VisionDescriptionTool = vision_tool
         self.token_estimator: ConservativeTokenEstimator = ConservativeTokenEstimator(
-            safety_factor=config.token_safety_factor
+            safety_factor=config.token_safety_factor,
+            tokenizer=tokenizer,
+            calibration=calibration,
         )
         self.context_compressor: GroupChatContextCompressor = (
             GroupChatContextCompressor()
         )
+        self.prompt_cache: PromptCacheMeter = prompt_cache or PromptCacheMeter()
+        # 最近一轮工具定义的原始 token，后台压缩判断水位时按同样的请求估算。
+        self._tools_tokens: int = 0
         self.forward_image_auto_fetcher: ForwardImageAutoFetcher = (
             ForwardImageAutoFetcher(config=config)
         )
@@ -140,6 +185,8 @@ class GroupChatToolLoop:
             [napcat_executor, self.context.mcp_tool_manager]
         )
         tools = tool_executor.list_tools()
+        read_only_tools = frozenset(tool.name for tool in tools if tool.read_only)
+        tool_slots = asyncio.Semaphore(self.config.tool_concurrency)
         prepared_context = await self._prepare_turn_context(
             msg=msg,
             chat_handler=chat_handler,
@@ -151,6 +198,8 @@ class GroupChatToolLoop:
         working_messages = prepared_context.working_messages
         persisted_turn_messages = prepared_context.persisted_turn_messages
         replace_existing_history = prepared_context.replace_existing_history
+        request_raw_tokens = prepared_context.raw_tokens
+        counted_messages_count = len(working_messages)
         log_event(
             level="DEBUG",
             event="ai_group_chat.tool_loop.start",
@@ -166,6 +215,10 @@ class GroupChatToolLoop:
             tool_names=[tool.name for tool in tools],
         )
         for round_index in range(1, self.config.max_tool_rounds + 1):
+            # 上一轮追加的助手和工具结果消息只在这里估算一次，用于校准。
+            for message in working_messages[counted_messages_count:]:
+                request_raw_tokens += self.token_estimator.estimate_message(message)
+            counted_messages_count = len(working_messages)
             log_event(
                 level="DEBUG",
                 event="ai_group_chat.llm.request",
@@ -181,12 +234,30 @@ class GroupChatToolLoop:
                 tools_count=len(tools),
                 tool_choice="auto",
             )
-            response = await self.context.llm.get_ai_response_with_tools(
-                messages=working_messages,
-                provider=self.config.model.provider,
-                model_name=self.config.model.name,
-                tools=tools,
-            )
+            streamed: StreamedRound | None = None
+            if self.config.stream_replies:
+                streamed = await self._stream_model_round(
+                    msg=msg,
+                    napcat_executor=napcat_executor,
+                    tool_executor=tool_executor,
+                    working_messages=working_messages,
+                    tools=tools,
+                    read_only_tools=read_only_tools,
+                    tool_slots=tool_slots,
+                    round_index=round_index,
+                )
+                response = streamed.response
+            else:
+                response = await self.context.llm.get_ai_response_with_tools(
+                    messages=working_messages,
+                    provider=self.config.model.provider,
+                    model_name=self.config.model.name,
+                    tools=tools,
+                )
+            if response.usage is not None:
+                self._record_usage(
+                    msg=msg, raw_tokens=request_raw_tokens, usage=response.usage
+                )
             content = self._normalize_content(response.content)
             reply_content = self._build_reply_content(
                 content=content,
@@ -208,7 +279,20 @@ class GroupChatToolLoop:
                 tool_call_names=[tool_call.name for tool_call in response.tool_calls],
             )
             content_sent = False
-            if reply_content.visible_content is not None:
+            send_result: ReplySendResult | None = None
+            if streamed is not None and (
+                streamed.sent_paragraphs or streamed.interrupted is not None
+            ):
+                send_result = await self._finish_streamed_reply(
+                    msg=msg,
+                    napcat_executor=napcat_executor,
+                    working_messages=working_messages,
+                    reply_content=reply_content,
+                    streamed=streamed,
+                    sent_content_messages=sent_content_messages,
+                    round_index=round_index,
+                )
+            elif reply_content.visible_content is not None:
                 send_result = await self._send_reply_content(
                     msg=msg,
                     napcat_executor=napcat_executor,
@@ -219,9 +303,14 @@ class GroupChatToolLoop:
                     event_name="ai_group_chat.reply.sent",
                     log_message="模型返回正文，已解析 content 标记并发送群消息",
                 )
+            if send_result is not None:
                 if send_result.should_retry_model:
+                    if streamed is not None:
+                        streamed.cancel_tool_calls()
                     continue
                 if send_result.failure_status_message is not None:
+                    if streamed is not None:
+                        streamed.cancel_tool_calls()
                     await self._finish_turn(
                         msg=msg,
                         chat_handler=chat_handler,
@@ -247,6 +336,11 @@ class GroupChatToolLoop:
                     round_index=round_index,
                     question=question,
                     vision_turn_state=vision_turn_state,
+                    started_tool_calls=(
+                        streamed.started_tool_calls if streamed is not None else {}
+                    ),
+                    read_only_tools=read_only_tools,
+                    tool_slots=tool_slots,
                 )
                 continue
 
@@ -296,6 +390,9 @@ class GroupChatToolLoop:
         tools: list[LLMToolDefinition],
     ) -> PreparedTurnContext:
         """在请求模型前按 token 预算决定是否压缩历史上下文。"""
+        chat_handler.set_token_counter(self.token_estimator.estimate_message)
+        self._tools_tokens = self.token_estimator.estimate_tools(tools)
+        self._check_prompt_prefix(msg=msg, chat_handler=chat_handler)
         stored_messages = chat_handler.messages_lst
         stripped_history_image_count = self._count_images(messages=stored_messages)
         history_messages = self._strip_history_images(messages=stored_messages)
@@ -317,10 +414,12 @@ class GroupChatToolLoop:
             *input_vision_history_messages,
         ]
         candidate_messages = [*history_messages, *current_working_messages]
+        # 历史消息在写入 ContextHandler 时已计数，这里只估算本轮新消息。
         budget = self.token_estimator.check_request(
-            messages=candidate_messages,
+            messages=current_working_messages,
             tools=tools,
             max_context_tokens=chat_handler.max_context_tokens,
+            counted_tokens=chat_handler.token_count,
         )
         log_event(
             level="DEBUG",
@@ -330,6 +429,8 @@ class GroupChatToolLoop:
             group_id=msg.group_id,
             message_id=msg.message_id,
             estimated_tokens=budget.estimated_tokens,
+            raw_tokens=budget.raw_tokens,
+            calibration_ratio=self.token_estimator.calibration.ratio,
             max_context_tokens=budget.max_context_tokens,
             should_compress=budget.should_compress,
             current_history_messages_count=len(chat_handler.messages_lst),
@@ -343,6 +444,7 @@ class GroupChatToolLoop:
                 working_messages=candidate_messages,
                 persisted_turn_messages=current_persisted_messages,
                 replace_existing_history=False,
+                raw_tokens=budget.raw_tokens,
             )
         _ = await self.context.bot.send_msg(
             group_id=msg.group_id,
@@ -398,6 +500,67 @@ class GroupChatToolLoop:
             working_messages=rebuilt_working_messages,
             persisted_turn_messages=[rebuilt_persisted_user_message],
             replace_existing_history=True,
+            raw_tokens=rebuilt_budget.raw_tokens,
+        )
+
+    def _check_prompt_prefix(
+        self, *, msg: GroupMessage, chat_handler: ContextHandler
+    ) -> None:
+        """记录上一轮已发送的历史前缀是否被改写，并标记本轮前缀。
+
+        历史只追加时每轮请求都以上一轮请求为前缀，服务端 prompt 缓存可以
+        命中；压缩、删除或替换历史会让改写位置之后的缓存失效。
+        """
+        marked = chat_handler.marked_prefix_count
+        stable = chat_handler.stable_prefix_count
+        if stable < marked:
+            log_event(
+                level="INFO",
+                event="ai_group_chat.prompt_cache.prefix_rewritten",
+                category="plugin",
+                message="AI 群聊历史前缀已被改写，本轮请求无法完整命中 prompt 缓存",
+                group_id=msg.group_id,
+                message_id=msg.message_id,
+                first_changed_index=stable,
+                previous_prefix_messages_count=marked,
+            )
+        chat_handler.mark_prompt_prefix()
+
+    def _record_usage(
+        self, *, msg: GroupMessage, raw_tokens: int, usage: LLMUsage
+    ) -> None:
+        """用服务端返回的 token 用量更新估算校准比例和 prompt 缓存统计。"""
+        calibration = self.token_estimator.calibration
+        previous_ratio = calibration.ratio
+        calibration.observe(raw_tokens=raw_tokens, prompt_tokens=usage.prompt_tokens)
+        log_event(
+            level="DEBUG",
+            event="ai_group_chat.context_budget.calibrated",
+            category="plugin",
+            message="已按接口返回的 prompt token 校准上下文估算",
+            group_id=msg.group_id,
+            message_id=msg.message_id,
+            raw_tokens=raw_tokens,
+            prompt_tokens=usage.prompt_tokens,
+            previous_ratio=previous_ratio,
+            calibration_ratio=calibration.ratio,
+            calibration_samples=calibration.samples,
+        )
+        group_id = str(msg.group_id)
+        self.prompt_cache.record(
+            group_id=group_id,
+            prompt_tokens=usage.prompt_tokens,
+            cached_tokens=usage.cached_tokens,
+        )
+        log_event(
+            level="DEBUG",
+            event="ai_group_chat.prompt_cache.usage",
+            category="plugin",
+            message="已记录本次请求的 prompt 缓存命中",
+            group_id=msg.group_id,
+            message_id=msg.message_id,
+            prompt_tokens=usage.prompt_tokens,
+            cached_tokens=usage.cached_tokens,
         )
 
     async def _compress_existing_context(
@@ -446,6 +609,96 @@ class GroupChatToolLoop:
         )
         return normalized_summary
 
+    def should_compress_ahead(self, *, chat_handler: ContextHandler) -> bool:
+        """判断下一轮请求的估算是否已到达后台压缩水位。"""
+        history = chat_handler.messages_lst[1:]
+        _, new_messages = self.context_compressor.split_summary(
+            history_messages=history
+        )
+        if not new_messages:
+            return False
+        estimated_tokens = self.token_estimator.scale(
+            self.token_estimator.request_overhead_tokens
+            + chat_handler.token_count
+            + self._tools_tokens
+        )
+        return (
+            estimated_tokens
+            >= chat_handler.max_context_tokens * self.config.compression_watermark
+        )
+
+    async def summarize_history(
+        self,
+        *,
+        group_id: str,
+        system_prompt: ChatMessage,
+        history_messages: list[ChatMessage],
+    ) -> ChatMessage:
+        """把历史快照并入滚动摘要，返回新的摘要消息；不修改上下文。"""
+        compression_messages, compression_input = (
+            self.context_compressor.build_compression_messages(
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+            )
+        )
+        log_event(
+            level="INFO",
+            event="ai_group_chat.context_compression.background_started",
+            category="plugin",
+            message="AI 群聊上下文到达水位，开始后台滚动压缩",
+            group_id=group_id,
+            history_messages_count=len(history_messages),
+            folded_messages_count=len(compression_input.messages),
+            dropped_image_count=compression_input.dropped_image_count,
+        )
+        summary = await self.context.llm.get_ai_text_response(
+            messages=compression_messages,
+            provider=self.config.model.provider,
+            model_name=self.config.model.name,
+        )
+        normalized_summary = self._normalize_content(summary)
+        if normalized_summary is None:
+            raise ValueError("AI 群聊上下文压缩返回了空摘要")
+        return self.context_compressor.build_summary_message(
+            summary=normalized_summary
+        )
+
+    def swap_compressed_history(
+        self,
+        *,
+        group_id: str,
+        chat_handler: ContextHandler,
+        history_messages: list[ChatMessage],
+        summary_message: ChatMessage,
+    ) -> bool:
+        """用摘要替换已压缩的历史前缀，保留压缩期间新增的消息。
+
+        调用方需持有群锁。当前历史前缀与压缩时的快照不一致（例如已被同步
+        压缩改写）时放弃替换并返回 False；只差跨轮次图片剥离的视为一致。
+        """
+        history = chat_handler.messages_lst[1:]
+        prefix = history[: len(history_messages)]
+        if len(prefix) != len(history_messages) or self._strip_history_images(
+            messages=prefix
+        ) != self._strip_history_images(messages=history_messages):
+            return False
+        previous_tokens = chat_handler.token_count
+        chat_handler.replace_history(
+            messages=[summary_message, *history[len(history_messages) :]]
+        )
+        log_event(
+            level="INFO",
+            event="ai_group_chat.context_compression.background_swapped",
+            category="plugin",
+            message="AI 群聊后台压缩完成，已替换历史前缀",
+            group_id=group_id,
+            compressed_messages_count=len(history_messages),
+            kept_messages_count=len(history) - len(history_messages),
+            previous_tokens=previous_tokens,
+            current_tokens=chat_handler.token_count,
+        )
+        return True
+
     async def _handle_tool_response(
         self,
         *,
@@ -458,6 +711,9 @@ class GroupChatToolLoop:
         round_index: int,
         question: str,
         vision_turn_state: VisionTurnState,
+        started_tool_calls: dict[str, asyncio.Task[LLMToolExecutionResult]],
+        read_only_tools: frozenset[str],
+        tool_slots: asyncio.Semaphore,
     ) -> None:
         """处理模型请求的信息工具调用，并把工具结果写回本轮工作上下文。"""
         log_event(
@@ -485,6 +741,9 @@ class GroupChatToolLoop:
             vision_history_messages=vision_history_messages,
             question=question,
             vision_turn_state=vision_turn_state,
+            started_tool_calls=started_tool_calls,
+            read_only_tools=read_only_tools,
+            tool_slots=tool_slots,
         )
         tool_history_messages.extend(tool_result_history)
 
@@ -598,6 +857,204 @@ class GroupChatToolLoop:
         )
         return ReplySendResult(content_sent=True)
 
+    async def _stream_model_round(
+        self,
+        *,
+        msg: GroupMessage,
+        napcat_executor: NapCatGroupToolExecutor,
+        tool_executor: CompositeToolExecutor,
+        working_messages: list[ChatMessage],
+        tools: list[LLMToolDefinition],
+        read_only_tools: frozenset[str],
+        tool_slots: asyncio.Semaphore,
+        round_index: int,
+    ) -> StreamedRound:
+        """流式请求主模型，边接收边发送写完的段落并启动参数完整的工具调用。
+
+        只提前启动排在所有副作用调用之前的只读调用，其余调用在流结束后
+        按顺序执行。展示思维链时正文要排在思维链之后整段发送，因此只提前
+        启动工具。某段发送失败后不再提前发送，剩余正文交给调用方按整段
+        路径处理。
+        """
+        splitter = ReplyParagraphSplitter()
+        dispatch_paragraphs = not self.config.show_reasoning
+        streamed: StreamedRound | None = None
+        sent_paragraphs: list[str] = []
+        interrupted: ReplySendResult | None = None
+        started_tool_calls: dict[str, asyncio.Task[LLMToolExecutionResult]] = {}
+        side_effect_seen = False
+        started_at = time.monotonic()
+        try:
+            async for event in self.context.llm.stream_ai_response_with_tools(
+                messages=working_messages,
+                provider=self.config.model.provider,
+                model_name=self.config.model.name,
+                tools=tools,
+            ):
+                if isinstance(event, LLMToolCallReady):
+                    if event.tool_call.name not in read_only_tools:
+                        side_effect_seen = True
+                    if not side_effect_seen:
+                        started_tool_calls[event.tool_call.id] = asyncio.create_task(
+                            self._call_tool_in_slot(
+                                tool_call=event.tool_call,
+                                tool_executor=tool_executor,
+                                tool_slots=tool_slots,
+                            )
+                        )
+                elif isinstance(event, LLMContentDelta):
+                    if not dispatch_paragraphs or interrupted is not None:
+                        continue
+                    for paragraph in splitter.feed(event.text):
+                        send_result = await self._send_reply_content(
+                            msg=msg,
+                            napcat_executor=napcat_executor,
+                            working_messages=working_messages,
+                            reply_content=ReplyContent(
+                                visible_content=paragraph,
+                                memory_content=None,
+                                memory_reasoning_content=None,
+                            ),
+                            sent_content_messages=[],
+                            round_index=round_index,
+                            event_name="ai_group_chat.reply.paragraph_sent",
+                            log_message="流式正文段落已写完，已提前发送群消息",
+                        )
+                        if not send_result.content_sent:
+                            interrupted = send_result
+                            if send_result.should_retry_model:
+                                self._insert_sent_paragraphs(
+                                    working_messages=working_messages,
+                                    sent_paragraphs=sent_paragraphs,
+                                )
+                            break
+                        if not sent_paragraphs:
+                            log_event(
+                                level="DEBUG",
+                                event="ai_group_chat.reply.first_paragraph_sent",
+                                category="plugin",
+                                message="流式回复首段已发送到群聊",
+                                group_id=msg.group_id,
+                                message_id=msg.message_id,
+                                round_index=round_index,
+                                time_to_first_message_ms=round(
+                                    (time.monotonic() - started_at) * 1000, 1
+                                ),
+                            )
+                        sent_paragraphs.append(paragraph)
+                else:
+                    streamed = StreamedRound(
+                        response=event.response,
+                        sent_paragraphs=sent_paragraphs,
+                        tail_paragraph=(
+                            splitter.flush()
+                            if sent_paragraphs and interrupted is None
+                            else None
+                        ),
+                        interrupted=interrupted,
+                        started_tool_calls=started_tool_calls,
+                    )
+            if streamed is None:
+                raise ValueError("LLM 流式响应缺少结束事件")
+        except BaseException:
+            for task in started_tool_calls.values():
+                _ = task.cancel()
+            raise
+        log_event(
+            level="DEBUG",
+            event="ai_group_chat.llm.stream_finished",
+            category="plugin",
+            message="LLM 流式响应接收完成",
+            group_id=msg.group_id,
+            message_id=msg.message_id,
+            round_index=round_index,
+            elapsed_ms=round((time.monotonic() - started_at) * 1000, 1),
+            paragraphs_sent=len(sent_paragraphs),
+            tool_calls_started=len(started_tool_calls),
+        )
+        return streamed
+
+    async def _call_tool_in_slot(
+        self,
+        *,
+        tool_call: LLMToolCall,
+        tool_executor: CompositeToolExecutor,
+        tool_slots: asyncio.Semaphore,
+    ) -> LLMToolExecutionResult:
+        """占用一个并发名额调用工具。"""
+        async with tool_slots:
+            return await tool_executor.call_tool_with_artifacts(
+                name=tool_call.name,
+                arguments=tool_call.arguments,
+            )
+
+    async def _finish_streamed_reply(
+        self,
+        *,
+        msg: GroupMessage,
+        napcat_executor: NapCatGroupToolExecutor,
+        working_messages: list[ChatMessage],
+        reply_content: ReplyContent,
+        streamed: StreamedRound,
+        sent_content_messages: list[ChatMessage],
+        round_index: int,
+    ) -> ReplySendResult:
+        """发送流式回复的最后一段，并把实际发出的正文记入长期上下文候选。"""
+        if streamed.interrupted is not None:
+            send_result = streamed.interrupted
+        elif streamed.tail_paragraph is not None:
+            send_result = await self._send_reply_content(
+                msg=msg,
+                napcat_executor=napcat_executor,
+                working_messages=working_messages,
+                reply_content=ReplyContent(
+                    visible_content=streamed.tail_paragraph,
+                    memory_content=None,
+                    memory_reasoning_content=None,
+                ),
+                sent_content_messages=[],
+                round_index=round_index,
+                event_name="ai_group_chat.reply.paragraph_sent",
+                log_message="流式回复结束，已发送最后一段群消息",
+            )
+            if send_result.should_retry_model:
+                self._insert_sent_paragraphs(
+                    working_messages=working_messages,
+                    sent_paragraphs=streamed.sent_paragraphs,
+                )
+        else:
+            send_result = ReplySendResult(content_sent=True)
+        if not streamed.sent_paragraphs:
+            return send_result
+        memory_content = (
+            reply_content.memory_content
+            if send_result.content_sent
+            else "\n\n".join(streamed.sent_paragraphs)
+        )
+        sent_content_messages.append(
+            ChatMessage(
+                role="assistant",
+                text=memory_content,
+                reasoning_content=reply_content.memory_reasoning_content,
+            )
+        )
+        return ReplySendResult(
+            content_sent=True,
+            should_retry_model=send_result.should_retry_model,
+            failure_status_message=send_result.failure_status_message,
+        )
+
+    def _insert_sent_paragraphs(
+        self, *, working_messages: list[ChatMessage], sent_paragraphs: list[str]
+    ) -> None:
+        """在纠错提示之前补上已经发出的段落，避免模型重写时重复发送。"""
+        if not sent_paragraphs:
+            return
+        working_messages.insert(
+            len(working_messages) - 1,
+            ChatMessage(role="assistant", text="\n\n".join(sent_paragraphs)),
+        )
+
     def _build_send_failure_status_message(
         self, *, error: NapCatSendMessageError
     ) -> ChatMessage:
@@ -639,8 +1096,16 @@ class GroupChatToolLoop:
         vision_history_messages: list[ChatMessage],
         question: str,
         vision_turn_state: VisionTurnState,
+        started_tool_calls: dict[str, asyncio.Task[LLMToolExecutionResult]],
+        read_only_tools: frozenset[str],
+        tool_slots: asyncio.Semaphore,
     ) -> list[ChatMessage]:
-        """执行工具调用，并只返回 tool 结果消息。"""
+        """执行工具调用，并只返回 tool 结果消息。
+
+        相邻的只读调用在本次处理的并发上限内同时执行，有副作用的调用单独
+        执行；流式响应中已提前启动的调用直接等待其结果。结果按模型给出的
+        ``tool_call_id`` 顺序写回，满足 OpenAI 工具协议。
+        """
         history_messages: list[ChatMessage] = []
         image_items: list[LLMImageItem] = []
         truncated_image_count = 0
@@ -648,23 +1113,20 @@ class GroupChatToolLoop:
             tool_call.name == FORWARD_MESSAGE_IMAGES_TOOL_NAME
             for tool_call in tool_calls
         )
-        for tool_call in tool_calls:
-            log_event(
-                level="DEBUG",
-                event="ai_group_chat.tool_call.start",
-                category="plugin",
-                message="开始执行模型请求的工具调用",
-                group_id=group_id,
-                tool_call_id=tool_call.id,
-                tool_name=tool_call.name,
-                arguments=tool_call.arguments,
-            )
-            outcome = await self._call_tool_for_model(
+        outcomes = await run_tool_calls(
+            tool_calls,
+            call=lambda tool_call: self._call_tool_for_model(
                 tool_call=tool_call,
                 tool_executor=tool_executor,
                 group_id=group_id,
                 explicit_forward_image_call=explicit_forward_image_call,
-            )
+                started=started_tool_calls.get(tool_call.id),
+            ),
+            read_only_tools=read_only_tools,
+            slots=tool_slots,
+            started=started_tool_calls.keys(),
+        )
+        for tool_call, outcome in zip(tool_calls, outcomes, strict=True):
             working_messages.append(outcome.message)
             history_messages.append(outcome.message)
             image_items.extend(outcome.image_items)
@@ -740,16 +1202,30 @@ class GroupChatToolLoop:
         tool_executor: CompositeToolExecutor,
         group_id: str,
         explicit_forward_image_call: bool,
+        started: asyncio.Task[LLMToolExecutionResult] | None = None,
     ) -> ToolCallResultForModel:
         """调用工具并把成功或失败结果都整理为模型可读的 tool 消息。"""
+        log_event(
+            level="DEBUG",
+            event="ai_group_chat.tool_call.start",
+            category="plugin",
+            message="开始执行模型请求的工具调用",
+            group_id=group_id,
+            tool_call_id=tool_call.id,
+            tool_name=tool_call.name,
+            arguments=tool_call.arguments,
+        )
         result: JsonValue
         image_items: list[LLMImageItem] = []
         truncated_image_count = 0
         try:
-            execution_result = await tool_executor.call_tool_with_artifacts(
-                name=tool_call.name,
-                arguments=tool_call.arguments,
-            )
+            if started is None:
+                execution_result = await tool_executor.call_tool_with_artifacts(
+                    name=tool_call.name,
+                    arguments=tool_call.arguments,
+                )
+            else:
+                execution_result = await started
             result = execution_result.result
             image_items = list(execution_result.image_items)
             truncated_image_count = execution_result.truncated_image_count
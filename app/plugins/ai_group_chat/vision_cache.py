@@ -0,0 +1,308 @@
+"""跨轮次、跨群复用的视觉描述缓存。"""
+
+from collections import OrderedDict
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from hashlib import sha256
+from typing import Final, Protocol
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import PluginSessionFactory
+from app.utils.log import log_event
+
+from .models import VisionDescriptionRow
+
+# 持久层过期记录最多每隔这么久清理一次，避免每次写入都扫描索引。
+_PURGE_INTERVAL: Final[timedelta] = timedelta(hours=1)
+
+
+@dataclass(frozen=True, slots=True)
+class VisionCacheKey:
+    """图片内容摘要、视觉提示词摘要与生成描述的视觉模型。"""
+
+    image_digest: str
+    prompt_digest: str
+    provider: str
+    model_name: str
+
+
+@dataclass(frozen=True, slots=True)
+class VisionCacheStats:
+    """视觉描述缓存的容量、命中和淘汰计数。"""
+
+    entries: int
+    max_entries: int
+    memory_hits: int
+    persistent_hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    store_errors: int
+
+    @property
+    def hits(self) -> int:
+        """返回内存与持久层命中总数。"""
+        return self.memory_hits + self.persistent_hits
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedDescription:
+    """内存 LRU 中的一条描述及其过期时间。"""
+
+    description: str
+    expires_at: datetime
+
+
+class VisionDescriptionStore(Protocol):
+    """视觉描述缓存的持久层。"""
+
+    async def get(self, *, key: VisionCacheKey, now: datetime) -> tuple[str, datetime] | None:
+        """返回未过期的描述及其过期时间。"""
+        ...
+
+    async def put(
+        self,
+        *,
+        key: VisionCacheKey,
+        description: str,
+        created_at: datetime,
+        expires_at: datetime,
+    ) -> None:
+        """写入或覆盖一条描述。"""
+        ...
+
+    async def delete_expired(self, *, now: datetime) -> int:
+        """删除已过期描述，返回删除条数。"""
+        ...
+
+
+def build_prompt_digest(texts: Sequence[str]) -> str:
+    """计算视觉提示词的摘要，修改提示词文件后换键。"""
+    digest = sha256()
+    for text in texts:
+        encoded = text.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, byteorder="big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def build_image_digest(images: Sequence[bytes]) -> str:
+    """计算一组图片的内容摘要。
+
+    单张图片直接使用内容 SHA-256，与 ImageStore 的存储键一致；多张图片
+    按顺序对各自摘要再做一次 SHA-256，因为描述会按图片顺序引用它们。
+    """
+    digests = [sha256(image).hexdigest() for image in images]
+    if len(digests) == 1:
+        return digests[0]
+    return sha256("\n".join(digests).encode("ascii")).hexdigest()
+
+
+class VisionDescriptionRepository:
+    """在插件 schema 中读写视觉描述缓存表。"""
+
+    def __init__(self, *, sessions: PluginSessionFactory) -> None:
+        """保存已绑定插件 schema 的 session factory。"""
+        self._sessions: PluginSessionFactory = sessions
+
+    async def get(self, *, key: VisionCacheKey, now: datetime) -> tuple[str, datetime] | None:
+        """按图片摘要、提示词摘要和模型读取未过期描述。"""
+        async with self._sessions.transaction() as session:
+            row = (
+                await session.execute(
+                    select(
+                        VisionDescriptionRow.description,
+                        VisionDescriptionRow.expires_at,
+                    ).where(
+                        VisionDescriptionRow.image_digest == key.image_digest,
+                        VisionDescriptionRow.prompt_digest == key.prompt_digest,
+                        VisionDescriptionRow.provider == key.provider,
+                        VisionDescriptionRow.model_name == key.model_name,
+                        VisionDescriptionRow.expires_at > now,
+                    )
+                )
+            ).one_or_none()
+        if row is None:
+            return None
+        return row.description, row.expires_at
+
+    async def put(
+        self,
+        *,
+        key: VisionCacheKey,
+        description: str,
+        created_at: datetime,
+        expires_at: datetime,
+    ) -> None:
+        """写入描述；同一图片、提示词和模型的旧描述被覆盖并重新计算过期时间。"""
+        statement = insert(VisionDescriptionRow).values(
+            image_digest=key.image_digest,
+            prompt_digest=key.prompt_digest,
+            provider=key.provider,
+            model_name=key.model_name,
+            description=description,
+            created_at=created_at,
+            expires_at=expires_at,
+        )
+        async with self._sessions.transaction() as session:
+            _ = await session.execute(
+                statement.on_conflict_do_update(
+                    constraint="pk_vision_descriptions",
+                    set_={
+                        "description": statement.excluded.description,
+                        "created_at": statement.excluded.created_at,
+                        "expires_at": statement.excluded.expires_at,
+                    },
+                )
+            )
+
+    async def delete_expired(self, *, now: datetime) -> int:
+        """删除已过期描述。"""
+        async with self._sessions.transaction() as session:
+            deleted = await session.scalars(
+                delete(VisionDescriptionRow)
+                .where(VisionDescriptionRow.expires_at <= now)
+                .returning(VisionDescriptionRow.image_digest)
+            )
+            return len(deleted.all())
+
+
+class VisionDescriptionCache:
+    """内存 LRU 在前、PostgreSQL 在后的视觉描述缓存。
+
+    内存未命中时查询持久层，命中结果回填内存；持久层读写失败只记录日志
+    并按未命中处理，缓存不可用时视觉工具照常请求模型。
+    """
+
+    def __init__(
+        self,
+        *,
+        store: VisionDescriptionStore | None,
+        max_entries: int = 1024,
+        ttl_seconds: float = 7 * 24 * 3600,
+        utc_now: Callable[[], datetime] | None = None,
+    ) -> None:
+        """创建空的内存 LRU。"""
+        self._store: VisionDescriptionStore | None = store
+        self._entries: OrderedDict[VisionCacheKey, _CachedDescription] = OrderedDict()
+        self._max_entries: int = 1
+        self._ttl: timedelta = timedelta()
+        self._utc_now: Callable[[], datetime] = utc_now or (
+            lambda: datetime.now(UTC)
+        )
+        self._next_purge_at: datetime | None = None
+        self._memory_hits = 0
+        self._persistent_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._store_errors = 0
+        self.configure(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def configure(self, *, max_entries: int, ttl_seconds: float) -> None:
+        """更新容量和存活时间；容量缩小时立即淘汰最久未用的描述。"""
+        if max_entries < 1:
+            raise ValueError("max_entries 必须大于等于 1")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds 必须大于 0")
+        self._max_entries = max_entries
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._evict_overflow()
+
+    async def get(self, key: VisionCacheKey) -> str | None:
+        """返回未过期描述；内存未命中时查询持久层。"""
+        now = self._utc_now()
+        cached = self._entries.get(key)
+        if cached is not None:
+            if cached.expires_at > now:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return cached.description
+            del self._entries[key]
+            self._expirations += 1
+        stored = await self._load(key=key, now=now)
+        if stored is None:
+            self._misses += 1
+            return None
+        description, expires_at = stored
+        self._persistent_hits += 1
+        self._remember(key, _CachedDescription(description, expires_at))
+        return description
+
+    async def put(self, key: VisionCacheKey, description: str) -> None:
+        """写入内存和持久层，并按间隔清理持久层过期记录。"""
+        now = self._utc_now()
+        expires_at = now + self._ttl
+        self._remember(key, _CachedDescription(description, expires_at))
+        if self._store is None:
+            return
+        try:
+            await self._store.put(
+                key=key,
+                description=description,
+                created_at=now,
+                expires_at=expires_at,
+            )
+            if self._next_purge_at is None or now >= self._next_purge_at:
+                self._next_purge_at = now + _PURGE_INTERVAL
+                self._expirations += await self._store.delete_expired(now=now)
+        except Exception as exc:
+            self._store_errors += 1
+            log_event(
+                level="WARNING",
+                event="ai_group_chat.vision.cache_store_failed",
+                category="plugin",
+                message="视觉描述缓存写入持久层失败，仅保留内存缓存",
+                image_digest=key.image_digest,
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+
+    def stats(self) -> VisionCacheStats:
+        """返回当前容量和累计计数。"""
+        return VisionCacheStats(
+            entries=len(self._entries),
+            max_entries=self._max_entries,
+            memory_hits=self._memory_hits,
+            persistent_hits=self._persistent_hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            expirations=self._expirations,
+            store_errors=self._store_errors,
+        )
+
+    async def _load(
+        self, *, key: VisionCacheKey, now: datetime
+    ) -> tuple[str, datetime] | None:
+        """从持久层读取描述，失败时按未命中处理。"""
+        if self._store is None:
+            return None
+        try:
+            return await self._store.get(key=key, now=now)
+        except Exception as exc:
+            self._store_errors += 1
+            log_event(
+                level="WARNING",
+                event="ai_group_chat.vision.cache_load_failed",
+                category="plugin",
+                message="视觉描述缓存读取持久层失败，按未命中处理",
+                image_digest=key.image_digest,
+                error_type=type(exc).__name__,
+                error=str(exc),
+            )
+            return None
+
+    def _remember(self, key: VisionCacheKey, cached: _CachedDescription) -> None:
+        """放入内存 LRU 尾部并淘汰超出容量的描述。"""
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+        self._evict_overflow()
+
+    def _evict_overflow(self) -> None:
+        """淘汰最久未用的描述直到不超过容量。"""
+        while len(self._entries) > self._max_entries:
+            _ = self._entries.popitem(last=False)
+            self._evictions += 1
@@ -1,5 +1,6 @@
 """AI 群聊内部多模态视觉描述工具。"""
 
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from hashlib import sha256
 
@@ -10,6 +11,14 @@ from app.services import ChatMessage
 from app.services.llm.tools import LLMImageArtifact, LLMImageError, LLMImageItem
 from app.utils.log import log_event
 
+from .vision_cache import (
+    VisionCacheKey,
+    VisionDescriptionCache,
+    build_image_digest,
+    build_prompt_digest,
+)
+
+
 class VisionDescriptionResult(StrictModel):
     """描述内部视觉工具生成的结构化结果。"""
 
@@ -43,11 +52,16 @@ class VisionDescriptionTool:
     """把图片直接交给主模型，或调用独立视觉模型生成文字描述。"""
 
     def __init__(
-        self, *, config: MaterializedAIGroupChatConfig, context: Context
+        self,
+        *,
+        config: MaterializedAIGroupChatConfig,
+        context: Context,
+        cache: VisionDescriptionCache | None = None,
     ) -> None:
-        """保存视觉工具配置与 LLM 访问入口。"""
+        """保存视觉工具配置、LLM 访问入口和可选的跨轮描述缓存。"""
         self.config = config
         self.context: Context = context
+        self.cache: VisionDescriptionCache | None = cache
 
     async def deliver(
         self,
@@ -213,9 +227,8 @@ class VisionDescriptionTool:
 
         vision_errors = list(errors)
         try:
-            description = await self._request_description(
+            description = await self._describe(
                 artifacts=artifacts,
-                question=question,
                 source_name=source_name,
             )
         except Exception as exc:
@@ -261,7 +274,12 @@ class VisionDescriptionTool:
                 else "视觉描述已生成，部分图片未读取或已按上限截断。"
             ),
         )
-        message = self._build_result_message(result=result, source_name=source_name)
+        message = self._build_result_message(
+            result=result,
+            source_name=source_name,
+            labels=[artifact.label for artifact in artifacts],
+            question=question,
+        )
         return VisionDelivery(
             working_messages=[message],
             history_messages=self._history_messages(
@@ -271,34 +289,71 @@ class VisionDescriptionTool:
             result=result,
         )
 
-    async def _request_description(
+    async def _describe(
         self,
         *,
         artifacts: list[LLMImageArtifact],
-        question: str,
         source_name: str,
     ) -> str:
-        """发起不携带群聊角色、历史或工具的独立视觉请求。"""
+        """优先复用相同图片、视觉提示词和视觉模型的缓存描述，未命中时请求视觉模型。
+
+        视觉请求只包含提示词和按顺序编号的图片，不带当前问题或来源标签，
+        描述因此可以跨问题、跨群复用；问题由主模型阅读描述时结合。
+        """
+        messages = self._build_request_messages(artifacts=artifacts)
         vision = self.config.source.vision
-        if vision is None:
-            raise RuntimeError("独立视觉模型配置缺失")
+        if self.cache is None or vision is None or not vision.cache_enabled:
+            return await self._request_description(messages=messages)
+        key = VisionCacheKey(
+            image_digest=build_image_digest(
+                [artifact.image_bytes for artifact in artifacts]
+            ),
+            prompt_digest=build_prompt_digest(
+                [
+                    self.config.vision_system_prompt or "",
+                    self.config.vision_user_prompt or "",
+                ]
+            ),
+            provider=vision.model.provider,
+            model_name=vision.model.name,
+        )
+        cached = await self.cache.get(key)
+        if cached is not None:
+            stats = self.cache.stats()
+            log_event(
+                level="DEBUG",
+                event="ai_group_chat.vision.cache_hit",
+                category="plugin",
+                message="视觉描述命中缓存，已跳过视觉模型请求",
+                source_name=source_name,
+                image_digest=key.image_digest,
+                image_count=len(artifacts),
+                cache_hits=stats.hits,
+                cache_misses=stats.misses,
+            )
+            return cached
+        description = await self._request_description(messages=messages)
+        await self.cache.put(key, description)
+        return description
+
+    def _build_request_messages(
+        self,
+        *,
+        artifacts: list[LLMImageArtifact],
+    ) -> list[ChatMessage]:
+        """构造不携带群聊角色、历史、问题或工具的独立视觉请求消息。"""
         system_prompt = self.config.vision_system_prompt
         user_prompt = self.config.vision_user_prompt
         if system_prompt is None or user_prompt is None:
             raise RuntimeError("独立视觉提示词尚未加载")
-        labels = "\n".join(
-            f"{index}. {artifact.label}"
-            for index, artifact in enumerate(artifacts, start=1)
-        )
-        prompt = "\n\n".join(
-            [
-                user_prompt,
-                f"图片来源：{source_name}",
-                f"当前问题：\n{question.strip() or '（当前消息没有文字问题）'}",
-                f"图片顺序：\n{labels}",
-            ]
+        count = len(artifacts)
+        order = (
+            "图片顺序：共 1 张，称为图片 1。"
+            if count == 1
+            else f"图片顺序：共 {count} 张，按附带顺序依次称为图片 1 到图片 {count}。"
         )
-        messages = [
+        prompt = "\n\n".join([user_prompt, order])
+        return [
             ChatMessage(
                 role="system",
                 text=system_prompt,
@@ -309,12 +364,19 @@ class VisionDescriptionTool:
                 image=[artifact.image_bytes for artifact in artifacts],
             ),
         ]
+
+    async def _request_description(self, *, messages: list[ChatMessage]) -> str:
+        """把独立视觉请求发给配置的视觉模型。"""
+        vision = self.config.source.vision
+        if vision is None:
+            raise RuntimeError("独立视觉模型配置缺失")
         response = await self.context.llm.get_ai_text_response(
             messages=messages,
             provider=vision.model.provider,
             model_name=vision.model.name,
             max_attempts=vision.max_attempts,
             retry_delay_seconds=vision.retry_delay_seconds,
+            cacheable=True,
         )
         description = response.strip()
         if description == "":
@@ -341,14 +403,33 @@ class VisionDescriptionTool:
         )
 
     def _build_result_message(
-        self, *, result: VisionDescriptionResult, source_name: str
+        self,
+        *,
+        result: VisionDescriptionResult,
+        source_name: str,
+        labels: Sequence[str] = (),
+        question: str | None = None,
     ) -> ChatMessage:
-        """把视觉结果整理为明确标注来源的模型观察消息。"""
+        """把视觉结果整理为明确标注来源的模型观察消息。
+
+        缓存的描述只按编号称呼图片，这里补上编号对应的图片标签和当前问题，
+        由主模型结合问题使用描述。
+        """
         lines = [
             "视觉工具观察结果（系统生成，不是用户原话，只作为事实参考）：",
             f"来源：{source_name}",
             f"状态：{result.message}",
         ]
+        if labels:
+            lines.append("图片编号：")
+            lines.extend(
+                f"- 图片 {index}：{label}"
+                for index, label in enumerate(labels, start=1)
+            )
+        if question is not None:
+            lines.append(
+                f"当前问题：{question.strip() or '（当前消息没有文字问题）'}"
+            )
         if result.description is not None:
             lines.extend(["", result.description])
         if result.truncated_count > 0:
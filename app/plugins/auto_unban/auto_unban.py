@@ -52,6 +52,16 @@ class AutoUnbanPlugin(BasePlugin[GroupBanEvent]):
         self._runtime_revision = revision
         return runtime
 
+    @override
+    def prefilter(self, msg: GroupBanEvent) -> bool:
+        """只让受保护用户的禁言事件入队。"""
+        runtime = self._current_runtime()
+        return (
+            runtime is not None
+            and msg.sub_type == "ban"
+            and msg.user_id in runtime.protected_users
+        )
+
     @override
     async def run(self, msg: GroupBanEvent) -> bool:
         """在 Root 用户被禁言时自动解除禁言。"""
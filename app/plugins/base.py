@@ -5,7 +5,7 @@ from __future__ import annotations
 import asyncio
 from abc import ABC, ABCMeta, abstractmethod
 from collections.abc import Callable
-from typing import ClassVar, cast
+from typing import ClassVar, Final, cast
 
 import httpx
 
@@ -18,8 +18,19 @@ from app.database import (
 )
 from app.models import AllEvent
 from app.services import LLMHandler, MCPToolManager
+from app.services.napcat import ImageStore
 from app.utils.log import log_event, log_exception
 
+from .scheduler import (
+    FifoScheduler,
+    PluginQueueStats,
+    PluginScheduler,
+    PluginTask,
+    QueueLimit,
+)
+
+_SHED_LOG_EVERY: Final[int] = 100
+
 
 PLUGINS: list[type["BasePlugin[AllEvent]"]] = []
 
@@ -84,6 +95,7 @@ class Context:
         proxy_httpx: httpx.AsyncClient | None = None,
         llm: LLMHandler | None = None,
         mcp_tool_manager: MCPToolManager | None = None,
+        image_store: ImageStore | None = None,
     ) -> None:
         """保存插件运行期可用服务。"""
         self.bot: BOTClient = bot
@@ -94,6 +106,8 @@ class Context:
         self._llm: LLMHandler | None = llm
         self._mcp_tool_manager: MCPToolManager | None = mcp_tool_manager
         self._proxy_httpx: httpx.AsyncClient | None = proxy_httpx
+        # 内容寻址图片存储；未提供时插件只能保存图片占位说明。
+        self.image_store: ImageStore | None = image_store
 
     def create_repository[RepositoryT](
         self,
@@ -135,6 +149,8 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
     migration_package: ClassVar[str | None] = None
     consumers_count: ClassVar[int]
     priority: ClassVar[int]
+    # 为 False 时插件承诺不终止链路，分发器让它与低优先级插件并发运行。
+    stops_chain: ClassVar[bool] = True
 
     def __init__(
         self,
@@ -144,26 +160,115 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
         """初始化插件上下文、任务队列和消费者。"""
         self.context: Context = context
         self.plugin_config: PluginConfigView = plugin_config
-        self.task_queue: asyncio.Queue[tuple[T, asyncio.Future[bool]]] = asyncio.Queue()
+        self.task_queue: PluginScheduler[T] = self.create_scheduler()
         self.consumers: list[asyncio.Task[None]] = []
         self._active_futures: set[asyncio.Future[bool]] = set()
+        self._overload_tasks: set[asyncio.Task[None]] = set()
         self._stopped = False
         self.register_consumers()
         self.setup()
 
+    def create_scheduler(self) -> PluginScheduler[T]:
+        """创建事件队列调度器，默认全局先进先出。
+
+        需要按群等维度公平调度的插件可以返回 ``KeyedScheduler``。
+        """
+        return FifoScheduler()
+
+    def queue_limit(self) -> QueueLimit | None:
+        """返回入队时使用的深度上限和丢弃策略，默认不限制。
+
+        每次入队都会调用，插件可以从当前配置版本读取。
+        """
+        return None
+
+    async def on_overload(self, msg: T) -> None:
+        """事件因队列过载被丢弃后调用，可用于向用户发送忙碌提示。"""
+        _ = msg
+
+    def queue_stats(self) -> PluginQueueStats:
+        """返回插件队列深度和按调度键统计的等待时间。"""
+        return self.task_queue.stats()
+
+    def prefilter(self, msg: T) -> bool:
+        """在入队前同步判断是否可能处理该事件，默认全部接收。
+
+        返回 False 时事件不会创建 Future 也不会进入队列。实现只能做
+        无 IO 的廉价判断；``run`` 仍需自行复核，因为配置可能在入队后变化。
+        """
+        _ = msg
+        return True
+
+    def accepts(self, msg: T) -> bool:
+        """执行 prefilter，异常时记录日志并视为不处理。"""
+        try:
+            return self.prefilter(msg)
+        except Exception as e:
+            log_exception(
+                event="plugin.prefilter.exception",
+                category="plugin",
+                message="插件预过滤失败，已跳过该事件",
+                exc=e,
+                plugin_name=self.name,
+                event_model=type(msg).__name__,
+            )
+            return False
+
     async def add_to_queue(self, msg: T) -> bool:
-        """将事件放入插件队列并等待消费结果。"""
+        """预过滤通过后放入插件队列并等待消费结果。"""
+        if not self.accepts(msg):
+            return False
+        return await self.enqueue(msg)
+
+    async def enqueue(self, msg: T) -> bool:
+        """跳过预过滤，直接放入插件队列并等待消费结果。"""
         if self._stopped:
             raise RuntimeError(f"插件 {self.name} 已停止，无法接收新事件")
         loop = asyncio.get_running_loop()
         future: asyncio.Future[bool] = loop.create_future()
-        await self.task_queue.put((msg, future))
+        for task in self.task_queue.put(msg, future, limit=self.queue_limit()):
+            self._shed(task)
         return await future
 
+    def _shed(self, task: PluginTask[T]) -> None:
+        """以未处理结束被丢弃的事件，并在后台调用忙碌回调。"""
+        if not task.future.done():
+            task.future.set_result(False)
+        shed_count = self.task_queue.stats().shed
+        if shed_count == 1 or shed_count % _SHED_LOG_EVERY == 0:
+            log_event(
+                level="WARNING",
+                event="plugin.queue.shed",
+                category="plugin",
+                message="插件队列过载，已丢弃事件",
+                plugin_name=self.name,
+                key=task.key,
+                shed=shed_count,
+                depth=self.task_queue.qsize(),
+            )
+        notify = asyncio.create_task(self._notify_overload(task.msg))
+        self._overload_tasks.add(notify)
+        notify.add_done_callback(self._overload_tasks.discard)
+
+    async def _notify_overload(self, msg: T) -> None:
+        """执行忙碌回调，失败只记录日志。"""
+        try:
+            await self.on_overload(msg)
+        except Exception as e:
+            log_exception(
+                event="plugin.overload_callback.exception",
+                category="plugin",
+                message="插件过载回调失败",
+                exc=e,
+                plugin_name=self.name,
+                event_model=type(msg).__name__,
+            )
+
     async def consumer(self) -> None:
         """持续消费插件事件队列。"""
         while not self._stopped:
-            data, future = await self.task_queue.get()
+            task = await self.task_queue.get()
+            data, future = task.msg, task.future
             self._active_futures.add(future)
             try:
                 if future.cancelled():
@@ -188,7 +293,7 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
                     future.set_exception(e)
             finally:
                 self._active_futures.discard(future)
-                self.task_queue.task_done()
+                self.task_queue.task_done(task)
 
     def register_consumers(self) -> None:
         """启动插件消费者任务。"""
@@ -204,15 +309,13 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
                 _ = future.cancel()
         for consumer in self.consumers:
             _ = consumer.cancel()
+        for notify in tuple(self._overload_tasks):
+            _ = notify.cancel()
 
-        while True:
-            try:
-                _, future = self.task_queue.get_nowait()
-            except asyncio.QueueEmpty:
-                break
-            if not future.done():
-                _ = future.cancel()
-            self.task_queue.task_done()
+        for task in self.task_queue.drain():
+            if not task.future.done():
+                _ = task.future.cancel()
+        self._log_queue_stats()
 
         if self.consumers:
             try:
@@ -230,6 +333,29 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
             finally:
                 self.consumers.clear()
 
+    def _log_queue_stats(self) -> None:
+        """关闭时按调度键记录排队等待时间。"""
+        stats = self.task_queue.stats()
+        for key_stats in stats.keys:
+            if key_stats.dequeued == 0 and key_stats.shed == 0:
+                continue
+            log_event(
+                level="DEBUG",
+                event="plugin.queue.stats",
+                category="plugin",
+                message="插件队列等待时间统计",
+                plugin_name=self.name,
+                key=key_stats.key,
+                dequeued=key_stats.dequeued,
+                mean_wait_ms=round(
+                    key_stats.total_wait_seconds * 1000 / max(key_stats.dequeued, 1),
+                    3,
+                ),
+                max_wait_ms=round(key_stats.max_wait_seconds * 1000, 3),
+                shed=key_stats.shed,
+                peak_depth=stats.peak_depth,
+            )
+
     @abstractmethod
     def setup(self) -> None:
         """初始化插件运行所需的状态与服务。"""
@@ -237,5 +363,5 @@ class BasePlugin[T: AllEvent](ABC, metaclass=PluginMeta):
 
     @abstractmethod
     async def run(self, msg: T) -> bool:
-        """处理指定事件并返回是否终止后续插件链。"""
+        """处理指定事件并返回是否终止后续插件链；``stops_chain`` 为 False 时返回值被忽略。"""
         raise NotImplementedError
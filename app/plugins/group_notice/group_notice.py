@@ -66,6 +66,14 @@ class GroupNoticePlugin(
         self._runtime_revision = revision
         return runtime
 
+    @override
+    def prefilter(
+        self, msg: GroupRequestEvent | GroupIncreaseEvent | GroupDecreaseEvent
+    ) -> bool:
+        """只让配置群聊的成员变动事件入队。"""
+        runtime = self._current_runtime()
+        return runtime is not None and msg.group_id in runtime.groups
+
     @override
     async def run(
         self, msg: GroupRequestEvent | GroupIncreaseEvent | GroupDecreaseEvent
@@ -81,6 +81,15 @@ class ImageGeneratePlugin(BasePlugin[GroupMessage]):
         self._runtime_revision = revision
         return runtime
 
+    @override
+    def prefilter(self, msg: GroupMessage) -> bool:
+        """只让配置群聊中的生图指令和帮助指令入队。"""
+        runtime = self._current_runtime()
+        if runtime is None or msg.group_id not in runtime.groups:
+            return False
+        text = self._extract_plain_text(msg=msg)
+        return text == HELP_TOKEN or self._extract_prompt(text=text) is not None
+
     @override
     async def run(self, msg: GroupMessage) -> bool:
         """解析群消息中的生图指令并发送生成结果。"""
@@ -147,16 +147,14 @@ class NeavoImageGeneratePlugin(BasePlugin[GroupMessage]):
         return runtime
 
     @override
-    async def add_to_queue(self, msg: GroupMessage) -> bool:
+    def prefilter(self, msg: GroupMessage) -> bool:
         """在耗时队列外过滤无关群聊和普通消息。"""
         runtime = self._current_runtime()
-        if (
-            runtime is None
-            or msg.group_id not in runtime.groups
-            or extract_command(msg) is None
-        ):
-            return False
-        return await super().add_to_queue(msg)
+        return (
+            runtime is not None
+            and msg.group_id in runtime.groups
+            and extract_command(msg) is not None
+        )
 
     @override
     async def run(self, msg: GroupMessage) -> bool:
@@ -26,6 +26,15 @@ class RecallBotImagePlugin(BasePlugin[GroupMessage]):
     def setup(self) -> None:
         """图片撤回插件无需额外配置。"""
 
+    @override
+    def prefilter(self, msg: GroupMessage) -> bool:
+        """只让启用本插件时的撤回指令入队。"""
+        return (
+            self.plugin_config.get(EmptyPluginConfig) is not None
+            and msg.post_type == "message"
+            and self._extract_plain_text(msg=msg) == RECALL_COMMAND
+        )
+
     @override
     async def run(self, msg: GroupMessage) -> bool:
         """识别引用撤回指令，校验目标归属并尝试撤回图片。"""
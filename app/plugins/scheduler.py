@@ -0,0 +1,389 @@
+"""插件事件队列的调度器。"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Final
+
+from app.config.schemas import PluginOverloadPolicy
+
+# FIFO 调度器把全部事件记在同一个键下。
+SHARED_KEY: Final[str] = "*"
+
+
+@dataclass(frozen=True, slots=True)
+class PluginTask[T]:
+    """排队等待插件消费者处理的一个事件。"""
+
+    msg: T
+    future: asyncio.Future[bool]
+    key: str
+    enqueued_at: float
+
+
+@dataclass(frozen=True, slots=True)
+class QueueLimit:
+    """队列深度上限和超限时的丢弃策略。
+
+    ``drop_oldest`` 丢弃最早排队的事件；``drop_newest`` 拒绝新事件；
+    ``coalesce`` 让每个调度键最多保留一个排队事件，新事件替换同键的
+    旧事件，总深度仍超限时再丢弃最早排队的事件。
+    """
+
+    max_depth: int
+    policy: PluginOverloadPolicy
+
+
+@dataclass(frozen=True, slots=True)
+class KeyWaitStats:
+    """单个调度键的排队深度、等待时间和丢弃次数。"""
+
+    key: str
+    pending: int
+    dequeued: int
+    shed: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+
+
+@dataclass(frozen=True, slots=True)
+class PluginQueueStats:
+    """插件队列整体深度、丢弃次数和按键汇总的等待时间。"""
+
+    depth: int
+    peak_depth: int
+    shed: int
+    keys: tuple[KeyWaitStats, ...]
+
+
+@dataclass(slots=True)
+class _KeyCounters:
+    """单个调度键的累计指标。"""
+
+    pending: int = 0
+    dequeued: int = 0
+    shed: int = 0
+    total_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+
+
+class PluginScheduler[T](ABC):
+    """插件事件队列：决定消费者下一次取出哪个事件，并记录等待指标。
+
+    ``put`` 不阻塞；``get`` 等待下一个可运行事件；消费者处理完后必须
+    调用 ``task_done`` 归还该事件，键控调度器据此放行同键的下一个事件。
+    """
+
+    def __init__(self) -> None:
+        """初始化深度与等待时间统计。"""
+        self._depth = 0
+        self._peak_depth = 0
+        self._shed = 0
+        self._unfinished = 0
+        self._finished = asyncio.Event()
+        self._finished.set()
+        self._counters: dict[str, _KeyCounters] = {}
+
+    @abstractmethod
+    def key_of(self, msg: T) -> str:
+        """返回事件所属的调度键。"""
+        raise NotImplementedError
+
+    def put(
+        self,
+        msg: T,
+        future: asyncio.Future[bool],
+        limit: QueueLimit | None = None,
+    ) -> list[PluginTask[T]]:
+        """登记一个事件，返回按 ``limit`` 被丢弃的事件，可能包含新事件本身。"""
+        task = PluginTask(
+            msg=msg,
+            future=future,
+            key=self.key_of(msg),
+            enqueued_at=time.monotonic(),
+        )
+        counters = self._counters.setdefault(task.key, _KeyCounters())
+        shed: list[PluginTask[T]] = []
+        if limit is not None:
+            if limit.policy == "coalesce":
+                shed.extend(self._forget(self._remove_pending(task.key)))
+            if self._depth >= limit.max_depth:
+                if limit.policy == "drop_newest":
+                    counters.shed += 1
+                    self._shed += 1
+                    return [task]
+                while self._depth >= limit.max_depth:
+                    shed.extend(self._forget(self._remove_oldest()))
+        self._depth += 1
+        self._peak_depth = max(self._peak_depth, self._depth)
+        self._unfinished += 1
+        self._finished.clear()
+        counters.pending += 1
+        self._push(task)
+        return shed
+
+    async def get(self) -> PluginTask[T]:
+        """等待并取出下一个可运行事件。"""
+        task = await self._pop()
+        self._depth -= 1
+        counters = self._counters[task.key]
+        counters.pending -= 1
+        counters.dequeued += 1
+        waited = time.monotonic() - task.enqueued_at
+        counters.total_wait_seconds += waited
+        counters.max_wait_seconds = max(counters.max_wait_seconds, waited)
+        return task
+
+    def task_done(self, task: PluginTask[T]) -> None:
+        """标记事件处理结束。"""
+        self._release(task)
+        self._finish(1)
+
+    def drain(self) -> list[PluginTask[T]]:
+        """不等待地取出全部排队事件，取出的事件视为已结束。"""
+        tasks = self._take_all()
+        self._depth -= len(tasks)
+        for task in tasks:
+            self._counters[task.key].pending -= 1
+        self._finish(len(tasks))
+        return tasks
+
+    def qsize(self) -> int:
+        """返回排队中的事件数。"""
+        return self._depth
+
+    def empty(self) -> bool:
+        """返回是否没有排队事件。"""
+        return self._depth == 0
+
+    async def join(self) -> None:
+        """等待已登记事件全部 ``task_done``。"""
+        _ = await self._finished.wait()
+
+    def stats(self) -> PluginQueueStats:
+        """返回当前深度、峰值、丢弃次数和每个键的等待时间。"""
+        return PluginQueueStats(
+            depth=self._depth,
+            peak_depth=self._peak_depth,
+            shed=self._shed,
+            keys=tuple(
+                KeyWaitStats(
+                    key=key,
+                    pending=counters.pending,
+                    dequeued=counters.dequeued,
+                    shed=counters.shed,
+                    total_wait_seconds=counters.total_wait_seconds,
+                    max_wait_seconds=counters.max_wait_seconds,
+                )
+                for key, counters in self._counters.items()
+            ),
+        )
+
+    def _forget(self, tasks: list[PluginTask[T]]) -> list[PluginTask[T]]:
+        """把已移出内部结构的排队事件计为丢弃。"""
+        self._depth -= len(tasks)
+        self._shed += len(tasks)
+        for task in tasks:
+            counters = self._counters[task.key]
+            counters.pending -= 1
+            counters.shed += 1
+        self._finish(len(tasks))
+        return tasks
+
+    def _finish(self, count: int) -> None:
+        """减少未结束事件数，归零时唤醒 ``join``。"""
+        self._unfinished -= count
+        if self._unfinished == 0:
+            self._finished.set()
+
+    @abstractmethod
+    def _push(self, task: PluginTask[T]) -> None:
+        """把事件放入内部结构。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _pop(self) -> PluginTask[T]:
+        """等待并取出下一个可运行事件。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _release(self, task: PluginTask[T]) -> None:
+        """事件处理结束后更新内部结构。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _remove_oldest(self) -> list[PluginTask[T]]:
+        """移出最早排队的一个事件。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _remove_pending(self, key: str) -> list[PluginTask[T]]:
+        """移出指定键的全部排队事件。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def _take_all(self) -> list[PluginTask[T]]:
+        """取出全部排队事件。"""
+        raise NotImplementedError
+
+
+class FifoScheduler[T](PluginScheduler[T]):
+    """全局先进先出，空闲消费者总是取最早入队的事件。"""
+
+    def __init__(self) -> None:
+        """创建共享队列。"""
+        super().__init__()
+        self._items: deque[PluginTask[T]] = deque()
+        # 每次入队放一个令牌；被丢弃事件留下的多余令牌在出队时跳过。
+        self._tokens: asyncio.Queue[None] = asyncio.Queue()
+
+    def key_of(self, msg: T) -> str:
+        """所有事件共用一个键。"""
+        _ = msg
+        return SHARED_KEY
+
+    def _push(self, task: PluginTask[T]) -> None:
+        """追加到共享队列尾部。"""
+        self._items.append(task)
+        self._tokens.put_nowait(None)
+
+    async def _pop(self) -> PluginTask[T]:
+        """取出队首事件。"""
+        while True:
+            await self._tokens.get()
+            if self._items:
+                return self._items.popleft()
+
+    def _release(self, task: PluginTask[T]) -> None:
+        """共享队列不需要释放键。"""
+        _ = task
+
+    def _remove_oldest(self) -> list[PluginTask[T]]:
+        """移出队首事件。"""
+        return [self._items.popleft()] if self._items else []
+
+    def _remove_pending(self, key: str) -> list[PluginTask[T]]:
+        """共享键下的全部排队事件都被移出。"""
+        _ = key
+        return self._take_all()
+
+    def _take_all(self) -> list[PluginTask[T]]:
+        """取出共享队列中的全部事件。"""
+        tasks = list(self._items)
+        self._items.clear()
+        return tasks
+
+
+class KeyedScheduler[T](PluginScheduler[T]):
+    """按键分子队列，键之间公平轮转，同键事件串行且保持顺序。
+
+    同一个键同时最多有一个事件在处理，其余事件留在子队列里，不占用
+    消费者。未提供 ``cost`` 时按事件轮转；提供时使用 deficit round
+    robin：每轮给键增加 ``quantum`` 额度，额度不足以支付队首事件代价的
+    键让出本轮并保留额度。
+    """
+
+    def __init__(
+        self,
+        *,
+        key: Callable[[T], str],
+        cost: Callable[[T], int] | None = None,
+        quantum: int = 1,
+    ) -> None:
+        """创建空的键控子队列。"""
+        super().__init__()
+        if quantum < 1:
+            raise ValueError("quantum 必须大于等于 1")
+        self._key: Callable[[T], str] = key
+        self._cost: Callable[[T], int] | None = cost
+        self._quantum: int = quantum
+        self._pending: dict[str, deque[PluginTask[T]]] = {}
+        self._active: set[str] = set()
+        self._deficit: dict[str, int] = {}
+        # 就绪键按轮转顺序排队，每个键最多一个令牌；键重新就绪时排到队尾。
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+        self._queued: set[str] = set()
+
+    def key_of(self, msg: T) -> str:
+        """按构造时给定的函数计算调度键。"""
+        return self._key(msg)
+
+    def _push(self, task: PluginTask[T]) -> None:
+        """追加到键子队列；键空闲时登记为就绪。"""
+        self._pending.setdefault(task.key, deque()).append(task)
+        if task.key not in self._active:
+            self._mark_ready(task.key)
+
+    async def _pop(self) -> PluginTask[T]:
+        """按轮转顺序取出下一个就绪键的队首事件。"""
+        while True:
+            key = await self._ready.get()
+            self._queued.discard(key)
+            pending = self._pending.get(key)
+            if key in self._active:
+                continue
+            if not pending:
+                # 排队事件已被丢弃，键不再就绪。
+                self._forget_key(key)
+                continue
+            if self._cost is not None:
+                deficit = self._deficit.get(key, 0) + self._quantum
+                cost = self._cost(pending[0].msg)
+                if deficit < cost:
+                    self._deficit[key] = deficit
+                    self._mark_ready(key)
+                    continue
+                self._deficit[key] = deficit - cost
+            self._active.add(key)
+            return pending.popleft()
+
+    def _release(self, task: PluginTask[T]) -> None:
+        """释放键；子队列仍有事件时重新排到就绪队尾。"""
+        self._active.discard(task.key)
+        if self._pending.get(task.key):
+            self._mark_ready(task.key)
+        else:
+            self._forget_key(task.key)
+
+    def _remove_oldest(self) -> list[PluginTask[T]]:
+        """移出所有子队列中最早排队的事件。"""
+        oldest = min(
+            (pending for pending in self._pending.values() if pending),
+            key=lambda pending: pending[0].enqueued_at,
+            default=None,
+        )
+        return [] if oldest is None else [oldest.popleft()]
+
+    def _remove_pending(self, key: str) -> list[PluginTask[T]]:
+        """移出指定键子队列中的全部事件，正在处理的事件不受影响。"""
+        pending = self._pending.get(key)
+        if not pending:
+            return []
+        tasks = list(pending)
+        pending.clear()
+        return tasks
+
+    def _take_all(self) -> list[PluginTask[T]]:
+        """按键取出全部排队事件。"""
+        tasks = [task for pending in self._pending.values() for task in pending]
+        for pending in self._pending.values():
+            pending.clear()
+        return tasks
+
+    def _mark_ready(self, key: str) -> None:
+        """为键放入就绪令牌，已有令牌时不重复放入。"""
+        if key not in self._queued:
+            self._queued.add(key)
+            self._ready.put_nowait(key)
+
+    def _forget_key(self, key: str) -> None:
+        """键没有排队和处理中的事件时清掉子队列和额度。"""
+        if key in self._active or self._pending.get(key):
+            return
+        self._pending.pop(key, None)
+        self._deficit.pop(key, None)
@@ -1,8 +1,11 @@
 """LLM 服务公共导出。"""
 
-from .context_handler import ContextHandler
+from .coalescing import LLMCoalescingStats
+from .context_handler import ContextChanges, ContextHandler
+from .endpoint_pool import LLMEndpointStats
 from .handler import LLMHandler
 from .mcp import MCPConfig, MCPServerConfig, MCPToolManager
+from .rate_limit import LLMRateLimitStats
 from .schemas import (
     ChatMessage,
     LLMContextConfig,
@@ -10,20 +13,26 @@ from .schemas import (
     LLMToolCall,
     LLMToolDefinition,
     LLMToolExecutor,
+    LLMUsage,
 )
 from .tools import CompositeToolExecutor, LLMToolRegistry
 
 __all__ = [
     "ChatMessage",
     "CompositeToolExecutor",
+    "ContextChanges",
     "ContextHandler",
+    "LLMCoalescingStats",
     "LLMContextConfig",
+    "LLMEndpointStats",
     "LLMHandler",
+    "LLMRateLimitStats",
     "LLMResponse",
     "LLMToolCall",
     "LLMToolDefinition",
     "LLMToolExecutor",
     "LLMToolRegistry",
+    "LLMUsage",
     "MCPConfig",
     "MCPServerConfig",
     "MCPToolManager",
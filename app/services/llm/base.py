@@ -1,12 +1,16 @@
 """LLM 服务商基类。"""
 
 from abc import ABC, abstractmethod
+from collections.abc import AsyncGenerator
 from typing import TYPE_CHECKING
 
+from .schemas import LLMContentDelta, LLMStreamCompleted, LLMToolCallReady
+
 if TYPE_CHECKING:
     from .schemas import (
         ChatMessage,
         LLMResponse,
+        LLMStreamEvent,
         LLMToolChoice,
         LLMToolDefinition,
     )
@@ -36,6 +40,32 @@ class LLMProvider(ABC):
         _ = (messages, model, tools, tool_choice, parallel_tool_calls)
         raise NotImplementedError(f"{self.__class__.__name__} 不支持工具调用")
 
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list["ChatMessage"],
+        model: str,
+        tools: list["LLMToolDefinition"],
+        tool_choice: "LLMToolChoice" = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator["LLMStreamEvent"]:
+        """以增量事件返回结构化响应。
+
+        默认实现等待完整的非流式响应后一次性产出全部事件，支持流式接口的
+        服务商应覆盖此方法，在正文增量到达和工具参数完整时立即产出。
+        """
+        response = await self.get_ai_response_with_tools(
+            messages=messages,
+            model=model,
+            tools=tools,
+            tool_choice=tool_choice,
+            parallel_tool_calls=parallel_tool_calls,
+        )
+        if response.content:
+            yield LLMContentDelta(text=response.content)
+        for tool_call in response.tool_calls:
+            yield LLMToolCallReady(tool_call=tool_call)
+        yield LLMStreamCompleted(response=response)
+
     async def get_image(
         self,
         message: "ChatMessage",
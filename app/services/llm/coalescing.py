@@ -0,0 +1,165 @@
+"""相同 LLM 请求的合并与短期响应缓存。"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from hashlib import sha256
+
+from .schemas import ChatMessage
+
+type Clock = Callable[[], float]
+
+
+@dataclass(frozen=True, slots=True)
+class LLMCoalescingStats:
+    """单个 provider 的请求合并与响应缓存计数。"""
+
+    provider: str
+    requests: int
+    upstream_calls: int
+    coalesced: int
+    cache_hits: int
+    cache_entries: int
+
+
+@dataclass(slots=True)
+class _Flight:
+    """正在进行的上游请求及仍在等待结果的调用方数量。"""
+
+    task: asyncio.Task[str]
+    waiters: int = 0
+    cacheable: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class _CachedResponse:
+    """缓存的响应文本及其过期时间。"""
+
+    text: str
+    expires_at: float
+
+
+def chat_request_key(*, model: str, messages: list[ChatMessage]) -> str:
+    """计算模型与规范化消息的摘要，图片按内容摘要参与计算。"""
+    normalized = [
+        {
+            "role": message.role,
+            "text": message.text,
+            "reasoning_content": message.reasoning_content,
+            "images": [sha256(image).hexdigest() for image in message.image or []],
+            "tool_calls": [
+                [tool_call.id, tool_call.name, tool_call.arguments]
+                for tool_call in message.tool_calls or []
+            ],
+            "tool_call_id": message.tool_call_id,
+        }
+        for message in messages
+    ]
+    payload = json.dumps(
+        [model, normalized], ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    )
+    return sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMRequestCoalescer:
+    """合并同一 provider 上并发的相同请求，并可短期缓存响应。
+
+    相同请求同时到达时只发起一次上游调用，其余调用方等待同一结果；上游
+    失败时所有等待者收到同一异常，失败结果不缓存。调用方取消只影响自己，
+    最后一个等待者取消时才取消上游请求。只有调用方声明 ``cacheable`` 的
+    请求才读写响应缓存，其余请求只合并并发调用；``ttl_seconds`` 为 0 时
+    所有请求都不缓存。
+    """
+
+    def __init__(
+        self,
+        *,
+        provider: str,
+        ttl_seconds: float = 0,
+        max_entries: int = 256,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        """保存缓存策略，初始化空的进行中请求表。"""
+        self.provider: str = provider
+        self._ttl_seconds: float = ttl_seconds
+        self._max_entries: int = max_entries
+        self._clock: Clock = clock
+        self._inflight: dict[str, _Flight] = {}
+        self._entries: OrderedDict[str, _CachedResponse] = OrderedDict()
+        self._requests: int = 0
+        self._upstream_calls: int = 0
+        self._coalesced: int = 0
+        self._cache_hits: int = 0
+
+    async def run(
+        self,
+        *,
+        key: str,
+        call: Callable[[], Awaitable[str]],
+        cacheable: bool = False,
+    ) -> str:
+        """返回 ``key`` 对应请求的结果，必要时发起一次上游调用。
+
+        ``cacheable`` 为真时先查响应缓存，上游成功后写入缓存；合并到同一
+        上游请求的调用方只要有一个可缓存，结果就会写入。
+        """
+        self._requests += 1
+        cached = self._entries.get(key) if cacheable else None
+        if cached is not None:
+            if cached.expires_at > self._clock():
+                self._entries.move_to_end(key)
+                self._cache_hits += 1
+                return cached.text
+            del self._entries[key]
+        flight = self._inflight.get(key)
+        if flight is None:
+
+            async def upstream() -> str:
+                return await call()
+
+            flight = _Flight(task=asyncio.create_task(upstream()))
+            self._inflight[key] = flight
+            self._upstream_calls += 1
+            flight.task.add_done_callback(
+                lambda task: self._finish(key=key, flight=flight, task=task)
+            )
+        else:
+            self._coalesced += 1
+        flight.cacheable = flight.cacheable or cacheable
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                _ = flight.task.cancel()
+
+    def stats(self) -> LLMCoalescingStats:
+        """返回当前缓存条目数和累计计数。"""
+        return LLMCoalescingStats(
+            provider=self.provider,
+            requests=self._requests,
+            upstream_calls=self._upstream_calls,
+            coalesced=self._coalesced,
+            cache_hits=self._cache_hits,
+            cache_entries=len(self._entries),
+        )
+
+    def _finish(self, *, key: str, flight: _Flight, task: asyncio.Task[str]) -> None:
+        """上游请求结束后移出进行中表，成功时按策略写入缓存。"""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        # 读取异常，避免所有等待者都已取消时留下未读取异常的警告。
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self._ttl_seconds <= 0 or not flight.cacheable:
+            return
+        self._entries[key] = _CachedResponse(
+            text=task.result(), expires_at=self._clock() + self._ttl_seconds
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            _ = self._entries.popitem(last=False)
@@ -1,25 +1,113 @@
 """LLM 对话上下文管理。"""
 
+from collections.abc import Callable
+from dataclasses import dataclass
 from typing import Literal, overload
 
 from app.utils.encoding import base64_to_bytes
 from .schemas import ChatMessage
 
 ChatRole = Literal["system", "user", "assistant"]
+type TokenCounter = Callable[[ChatMessage], int]
+
+
+@dataclass(frozen=True, slots=True)
+class ContextChanges:
+    """上次持久化以来的非系统历史变化。
+
+    ``replace`` 为 True 时 ``messages`` 是完整历史，需要整体覆盖已保存的
+    历史；否则 ``messages`` 只是追加在已保存历史之后的新消息。
+    """
+
+    replace: bool
+    messages: list[ChatMessage]
 
 
 class ContextHandler:
     """维护单个会话的系统提示词与完整上下文。"""
 
-    def __init__(self, system_prompt: str, max_context_tokens: int) -> None:
-        """初始化上下文并校验最大上下文 token 预算。"""
+    def __init__(
+        self,
+        system_prompt: str,
+        max_context_tokens: int,
+        history: list[ChatMessage] | None = None,
+    ) -> None:
+        """初始化上下文并校验最大上下文 token 预算。
+
+        ``history`` 是从持久层恢复的非系统历史，视为已经保存；未提供时
+        首次持久化会整体覆盖该会话之前保存的历史。
+        """
         if max_context_tokens <= 0:
             raise ValueError(f"最大上下文 token 必须大于0,当前设置: {max_context_tokens}")
         self.system_prompt: ChatMessage = ChatMessage(
             role="system", text=system_prompt
         )
-        self._messages_lst: list[ChatMessage] = [self.system_prompt]
+        self._messages_lst: list[ChatMessage] = [self.system_prompt, *(history or [])]
         self.max_context_tokens: int = max_context_tokens
+        self._persisted_count: int = len(history or [])
+        self._history_rewritten: bool = history is None
+        # 与 _messages_lst 一一对应的单条 token 数，追加时计数一次。
+        self._token_counter: TokenCounter | None = None
+        self._message_tokens: list[int] = [0] * len(self._messages_lst)
+        self._token_total: int = 0
+        # 上次 mark_prompt_prefix 时的消息数，以及此后未被改写的前缀长度。
+        self._marked_prefix_count: int = 0
+        self._stable_prefix_count: int = 0
+
+    @property
+    def token_count(self) -> int:
+        """返回包含系统提示词的全部消息按当前计数器累计的 token 数。"""
+        return self._token_total
+
+    def set_token_counter(self, counter: TokenCounter) -> None:
+        """设置单条消息 token 计数器；计数器变化时重新统计全部消息。"""
+        if counter == self._token_counter:
+            return
+        self._token_counter = counter
+        self._message_tokens = [counter(message) for message in self._messages_lst]
+        self._token_total = sum(self._message_tokens)
+
+    def _count_tokens(self, messages: list[ChatMessage]) -> list[int]:
+        """按当前计数器统计新消息，未设置计数器时记为 0。"""
+        counter = self._token_counter
+        if counter is None:
+            return [0] * len(messages)
+        return [counter(message) for message in messages]
+
+    @property
+    def marked_prefix_count(self) -> int:
+        """返回上次 ``mark_prompt_prefix`` 时包含系统提示词的消息数。"""
+        return self._marked_prefix_count
+
+    @property
+    def stable_prefix_count(self) -> int:
+        """返回自上次 ``mark_prompt_prefix`` 以来未被改写的前缀消息数。
+
+        小于 ``marked_prefix_count`` 说明已发送过的前缀被压缩、删除或
+        替换，服务端 prompt 缓存从该位置起失效。
+        """
+        return self._stable_prefix_count
+
+    def mark_prompt_prefix(self) -> None:
+        """记录当前全部消息已作为请求前缀发送。"""
+        self._marked_prefix_count = len(self._messages_lst)
+        self._stable_prefix_count = self._marked_prefix_count
+
+    def pending_changes(self) -> ContextChanges | None:
+        """返回上次 ``mark_persisted`` 之后的历史变化，没有变化时返回 None。"""
+        history = self._messages_lst[1:]
+        if self._history_rewritten:
+            return ContextChanges(replace=True, messages=history)
+        if len(history) == self._persisted_count:
+            return None
+        return ContextChanges(
+            replace=False, messages=history[self._persisted_count :]
+        )
+
+    def mark_persisted(self) -> None:
+        """记录当前历史已经全部写入持久层。"""
+        self._persisted_count = len(self._messages_lst) - 1
+        self._history_rewritten = False
 
     @property
     def messages_lst(self) -> list[ChatMessage]:
@@ -30,14 +118,25 @@ class ContextHandler:
         self, msg: ChatMessage | None = None, msg_list: list[ChatMessage] | None = None
     ) -> None:
         """向上下文追加单条或多条消息。"""
-        if msg is not None:
-            self._messages_lst.append(msg)
-        if msg_list is not None:
-            self._messages_lst.extend(msg_list)
+        added = [*([msg] if msg is not None else []), *(msg_list or [])]
+        tokens = self._count_tokens(added)
+        self._messages_lst.extend(added)
+        self._message_tokens.extend(tokens)
+        self._token_total += sum(tokens)
 
     def replace_history(self, *, messages: list[ChatMessage]) -> None:
         """用新的非系统历史替换当前上下文历史。"""
+        previous = self._messages_lst
         self._messages_lst = [self.system_prompt, *messages]
+        unchanged = 0
+        for old, new in zip(previous, self._messages_lst):
+            if old != new:
+                break
+            unchanged += 1
+        self._stable_prefix_count = min(self._stable_prefix_count, unchanged)
+        self._message_tokens = self._count_tokens(self._messages_lst)
+        self._token_total = sum(self._message_tokens)
+        self._history_rewritten = True
 
     @overload
     def build_chatmessage(self, *, role: ChatRole, text: str) -> None:
@@ -95,7 +194,12 @@ class ContextHandler:
         if role == "system":
             if not text or image_bytes is not None:
                 raise ValueError("系统提示词应该并且必须是字符串")
-            self._messages_lst[0] = ChatMessage(role="system", text=text)
+            system_message = ChatMessage(role="system", text=text)
+            self._messages_lst[0] = system_message
+            self._stable_prefix_count = 0
+            self._token_total -= self._message_tokens[0]
+            self._message_tokens[0] = self._count_tokens([system_message])[0]
+            self._token_total += self._message_tokens[0]
             return
 
         chatmessage = ChatMessage(role=role, text=text, image=image_bytes)
@@ -122,3 +226,8 @@ class ContextHandler:
             del self._messages_lst[target_index]
         except IndexError as exc:
             raise IndexError("索引超出范围，无法删除对应消息") from exc
+        if target_index < 0:
+            target_index += len(self._messages_lst) + 1
+        self._stable_prefix_count = min(self._stable_prefix_count, target_index)
+        self._token_total -= self._message_tokens.pop(target_index)
+        self._history_rewritten = True
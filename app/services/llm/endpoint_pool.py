@@ -0,0 +1,343 @@
+"""同一 provider 多个 OpenAI 兼容端点的健康路由与对冲请求。"""
+
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Awaitable, Callable
+from contextlib import aclosing
+from dataclasses import dataclass
+from math import ceil
+from typing import Final, override
+
+from .base import LLMProvider
+from .schemas import (
+    ChatMessage,
+    LLMResponse,
+    LLMStreamEvent,
+    LLMToolChoice,
+    LLMToolDefinition,
+)
+
+type Clock = Callable[[], float]
+type _OpenedStream = tuple[
+    "_Endpoint", AsyncGenerator[LLMStreamEvent], LLMStreamEvent | None
+]
+
+_EWMA_ALPHA: Final[float] = 0.3
+# 错误率折算成的额外延迟；错误率 0.3 的端点比健康端点多排 9 秒。
+_ERROR_PENALTY_SECONDS: Final[float] = 30.0
+# 未被选中的端点错误率按此半衰期衰减，故障恢复后能重新得到流量。
+_ERROR_HALF_LIFE_SECONDS: Final[float] = 60.0
+_LATENCY_WINDOW: Final[int] = 100
+# 样本不足时 p95 不可靠，不发对冲请求。
+_HEDGE_MIN_SAMPLES: Final[int] = 20
+
+
+@dataclass(frozen=True, slots=True)
+class LLMEndpointStats:
+    """单个端点的请求数、错误率、按请求类型的延迟和对冲计数。"""
+
+    provider: str
+    base_url: str
+    requests: int
+    failures: int
+    error_rate: float
+    latency_ewma_seconds: dict[str, float]
+    hedged: int
+    hedge_wins: int
+
+
+class _LatencyWindow:
+    """一类请求的 EWMA 延迟和最近样本。"""
+
+    def __init__(self) -> None:
+        """初始化空窗口。"""
+        self.ewma: float = 0.0
+        self.samples: deque[float] = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, latency: float) -> None:
+        """记录一次成功请求的耗时，首个样本直接作为 EWMA。"""
+        if self.samples:
+            self.ewma += _EWMA_ALPHA * (latency - self.ewma)
+        else:
+            self.ewma = latency
+        self.samples.append(latency)
+
+    def p95(self) -> float | None:
+        """返回最近样本的 p95；样本不足时返回 None。"""
+        if len(self.samples) < _HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[ceil(len(ordered) * 0.95) - 1]
+
+
+class _Endpoint:
+    """一个端点的服务实例和跨请求保留的健康状态。"""
+
+    def __init__(self, *, base_url: str, service: LLMProvider, now: float) -> None:
+        """初始化为未采样的健康端点。"""
+        self.base_url: str = base_url
+        self.service: LLMProvider = service
+        self.latency: dict[str, _LatencyWindow] = {}
+        self.requests: int = 0
+        self.failures: int = 0
+        self.hedged: int = 0
+        self.hedge_wins: int = 0
+        self._error_ewma: float = 0.0
+        self._error_updated_at: float = now
+
+    def error_rate(self, now: float) -> float:
+        """返回按半衰期衰减后的错误率。"""
+        elapsed = max(now - self._error_updated_at, 0.0)
+        return self._error_ewma * 0.5 ** (elapsed / _ERROR_HALF_LIFE_SECONDS)
+
+    def score(self, *, kind: str, now: float) -> float:
+        """路由评分，越低越优先；该类请求尚无样本的端点延迟按 0 计，先被探测。"""
+        window = self.latency.get(kind)
+        latency = window.ewma if window is not None else 0.0
+        return latency + self.error_rate(now) * _ERROR_PENALTY_SECONDS
+
+    def record_success(self, *, kind: str, latency: float, now: float) -> None:
+        """记录成功请求的耗时并降低错误率。"""
+        self.requests += 1
+        self.latency.setdefault(kind, _LatencyWindow()).record(latency)
+        self._error_ewma = self.error_rate(now) * (1 - _EWMA_ALPHA)
+        self._error_updated_at = now
+
+    def record_failure(self, *, now: float) -> None:
+        """记录失败请求并提高错误率。"""
+        self.requests += 1
+        self.failures += 1
+        self._error_ewma = self.error_rate(now) * (1 - _EWMA_ALPHA) + _EWMA_ALPHA
+        self._error_updated_at = now
+
+
+class EndpointPoolProvider(LLMProvider):
+    """把请求路由到同一 provider 下延迟和错误率最低的端点。
+
+    每个端点分别按文本、工具、流式首事件和生图记录 EWMA 延迟，错误率
+    所有请求类型共用；健康状态跨请求保留，失败后由外层重试自然切到
+    次优端点。开启 ``hedge_requests`` 时，文本、工具和流式请求耗时超过
+    所选端点近期 p95（不低于 ``hedge_min_delay_seconds``）后向次优端点
+    补发一次，先成功者胜出，另一个请求被取消。生图请求成本高，不对冲。
+    """
+
+    def __init__(
+        self,
+        *,
+        provider: str,
+        endpoints: list[tuple[str, LLMProvider]],
+        hedge_requests: bool = False,
+        hedge_min_delay_seconds: float = 1.0,
+        clock: Clock = time.monotonic,
+    ) -> None:
+        """按配置顺序保存端点，评分相同时靠前的端点优先。"""
+        self.provider: str = provider
+        self._clock: Clock = clock
+        now = clock()
+        self._endpoints: list[_Endpoint] = [
+            _Endpoint(base_url=base_url, service=service, now=now)
+            for base_url, service in endpoints
+        ]
+        self._hedge_requests: bool = hedge_requests
+        self._hedge_min_delay: float = hedge_min_delay_seconds
+
+    @override
+    async def get_ai_response(self, messages: list[ChatMessage], model: str) -> str:
+        """路由文本请求，必要时对冲。"""
+        return await self._run(
+            kind="text",
+            hedge=True,
+            call=lambda endpoint: endpoint.service.get_ai_response(
+                messages=messages, model=model
+            ),
+        )
+
+    @override
+    async def get_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> LLMResponse:
+        """路由工具请求，必要时对冲。"""
+        return await self._run(
+            kind="tools",
+            hedge=True,
+            call=lambda endpoint: endpoint.service.get_ai_response_with_tools(
+                messages=messages,
+                model=model,
+                tools=tools,
+                tool_choice=tool_choice,
+                parallel_tool_calls=parallel_tool_calls,
+            ),
+        )
+
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """按首个事件的到达时间路由和对冲，胜出端点的流继续交给调用方。"""
+
+        async def open_stream(endpoint: _Endpoint) -> _OpenedStream:
+            stream = endpoint.service.stream_ai_response_with_tools(
+                messages=messages,
+                model=model,
+                tools=tools,
+                tool_choice=tool_choice,
+                parallel_tool_calls=parallel_tool_calls,
+            )
+            try:
+                return endpoint, stream, await anext(stream, None)
+            except BaseException:
+                await stream.aclose()
+                raise
+
+        async def close_stream(opened: _OpenedStream) -> None:
+            await opened[1].aclose()
+
+        endpoint, stream, first_event = await self._run(
+            kind="stream", hedge=True, call=open_stream, discard=close_stream
+        )
+        async with aclosing(stream):
+            if first_event is None:
+                return
+            yield first_event
+            try:
+                async for event in stream:
+                    yield event
+            except Exception:
+                endpoint.record_failure(now=self._clock())
+                raise
+
+    @override
+    async def get_image(self, message: ChatMessage, model: str) -> str:
+        """路由生图请求，不对冲。"""
+        return await self._run(
+            kind="image",
+            hedge=False,
+            call=lambda endpoint: endpoint.service.get_image(
+                message=message, model=model
+            ),
+        )
+
+    def stats(self) -> tuple[LLMEndpointStats, ...]:
+        """按配置顺序返回各端点的健康状态。"""
+        now = self._clock()
+        return tuple(
+            LLMEndpointStats(
+                provider=self.provider,
+                base_url=endpoint.base_url,
+                requests=endpoint.requests,
+                failures=endpoint.failures,
+                error_rate=endpoint.error_rate(now),
+                latency_ewma_seconds={
+                    kind: window.ewma for kind, window in endpoint.latency.items()
+                },
+                hedged=endpoint.hedged,
+                hedge_wins=endpoint.hedge_wins,
+            )
+            for endpoint in self._endpoints
+        )
+
+    async def _run[T](
+        self,
+        *,
+        kind: str,
+        hedge: bool,
+        call: Callable[[_Endpoint], Awaitable[T]],
+        discard: Callable[[T], Awaitable[None]] | None = None,
+    ) -> T:
+        """在最优端点执行请求，超过对冲阈值后在次优端点补发。
+
+        ``discard`` 用于释放同时成功的落败结果，例如已打开的流。
+        """
+        now = self._clock()
+        ranked = sorted(
+            self._endpoints, key=lambda endpoint: endpoint.score(kind=kind, now=now)
+        )
+        primary = ranked[0]
+        delay = self._hedge_delay(primary, kind=kind) if hedge else None
+        if delay is None or len(ranked) < 2:
+            return await self._timed(primary, kind=kind, call=call)
+
+        tasks = [asyncio.create_task(self._timed(primary, kind=kind, call=call))]
+        winner: asyncio.Task[T] | None = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                primary.hedged += 1
+                tasks.append(
+                    asyncio.create_task(self._timed(ranked[1], kind=kind, call=call))
+                )
+            winner = await _first_success(tasks)
+            if winner is not tasks[0]:
+                ranked[1].hedge_wins += 1
+            return winner.result()
+        finally:
+            await _cancel_losers(tasks, winner=winner, discard=discard)
+
+    def _hedge_delay(self, endpoint: _Endpoint, *, kind: str) -> float | None:
+        """返回补发对冲请求前的等待时间；未开启或样本不足时返回 None。"""
+        if not self._hedge_requests:
+            return None
+        window = endpoint.latency.get(kind)
+        p95 = window.p95() if window is not None else None
+        if p95 is None:
+            return None
+        return max(p95, self._hedge_min_delay)
+
+    async def _timed[T](
+        self, endpoint: _Endpoint, *, kind: str, call: Callable[[_Endpoint], Awaitable[T]]
+    ) -> T:
+        """执行一次端点请求并记录耗时或失败；被取消的对冲请求不计入。"""
+        started = self._clock()
+        try:
+            result = await call(endpoint)
+        except Exception:
+            endpoint.record_failure(now=self._clock())
+            raise
+        finished = self._clock()
+        endpoint.record_success(kind=kind, latency=finished - started, now=finished)
+        return result
+
+
+async def _first_success[T](tasks: list[asyncio.Task[T]]) -> asyncio.Task[T]:
+    """等待首个成功的任务；全部失败时抛出最后一个错误。"""
+    pending: set[asyncio.Task[T]] = set(tasks)
+    error: BaseException = RuntimeError("没有可用的 LLM 端点")
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in tasks:
+            if task not in done:
+                continue
+            exc = task.exception()
+            if exc is None:
+                return task
+            error = exc
+    raise error
+
+
+async def _cancel_losers[T](
+    tasks: list[asyncio.Task[T]],
+    *,
+    winner: asyncio.Task[T] | None,
+    discard: Callable[[T], Awaitable[None]] | None,
+) -> None:
+    """取消未胜出的请求，并释放已经成功但落败的结果。"""
+    losers = [task for task in tasks if task is not winner]
+    for task in losers:
+        _ = task.cancel()
+    _ = await asyncio.gather(*losers, return_exceptions=True)
+    if discard is None:
+        return
+    for task in losers:
+        if not task.cancelled() and task.exception() is None:
+            await discard(task.result())
@@ -1,56 +1,149 @@
 """LLM 服务注册、路由与工具调用循环。"""
 
+import asyncio
+from collections.abc import AsyncIterator
 from typing import Self
 
-from openai import AsyncOpenAI
+import httpx
+from openai import DEFAULT_TIMEOUT, AsyncOpenAI
 
 from app.config.schemas import LLMProviderConfig
 
+from .base import LLMProvider
+from .coalescing import LLMCoalescingStats, LLMRequestCoalescer, chat_request_key
+from .endpoint_pool import EndpointPoolProvider, LLMEndpointStats
 from .providers.openai import OpenAIService
+from .rate_limit import LLMRateLimitStats, ProviderRateLimiter
 from .schemas import (
     ChatMessage,
     LLMProviderWrapper,
     LLMResponse,
+    LLMStreamEvent,
     LLMToolChoice,
     LLMToolDefinition,
     LLMToolExecutor,
 )
-from .tools import build_tool_result_message
+from .tools import build_tool_result_message, run_tool_calls
 from .wrapper import ResilientLLMProvider
 
 
 class LLMHandler:
     """按模型厂商路由到具体 LLM 服务。"""
 
-    def __init__(self, services: dict[str, LLMProviderWrapper]) -> None:
-        """保存按稳定 ID 注册的服务。"""
+    def __init__(
+        self,
+        services: dict[str, LLMProviderWrapper],
+        coalescers: dict[str, LLMRequestCoalescer] | None = None,
+        rate_limiters: dict[str, ProviderRateLimiter] | None = None,
+        endpoint_pools: dict[str, EndpointPoolProvider] | None = None,
+    ) -> None:
+        """保存按稳定 ID 注册的服务；未指定合并策略的 provider 只合并并发请求。"""
         self.services: dict[str, LLMProviderWrapper] = services
+        self.coalescers: dict[str, LLMRequestCoalescer] = {
+            provider_id: LLMRequestCoalescer(provider=provider_id)
+            for provider_id in services
+        }
+        self.coalescers.update(coalescers or {})
+        self.rate_limiters: dict[str, ProviderRateLimiter] = rate_limiters or {}
+        self.endpoint_pools: dict[str, EndpointPoolProvider] = endpoint_pools or {}
 
     @classmethod
-    def register_instance(cls, providers: dict[str, LLMProviderConfig]) -> Self:
-        """根据配置注册 LLM 服务实例。"""
+    def register_instance(
+        cls,
+        providers: dict[str, LLMProviderConfig],
+        http_client: httpx.AsyncClient | None = None,
+    ) -> Self:
+        """根据配置注册 LLM 服务实例；传入 ``http_client`` 时所有端点共用其连接池。"""
         services: dict[str, LLMProviderWrapper] = {}
+        coalescers: dict[str, LLMRequestCoalescer] = {}
+        rate_limiters: dict[str, ProviderRateLimiter] = {}
+        endpoint_pools: dict[str, EndpointPoolProvider] = {}
         for provider_id, provider_config in providers.items():
             api_key = (
                 provider_config.api_key.get_secret_value()
                 if provider_config.api_key is not None
                 else ""
             )
-            raw_service = OpenAIService(
-                client=AsyncOpenAI(
+            raw_service: LLMProvider = OpenAIService(
+                client=_openai_client(
                     api_key=api_key,
                     base_url=provider_config.base_url,
+                    http_client=http_client,
+                )
+            )
+            if provider_config.extra_base_urls:
+                pool = EndpointPoolProvider(
+                    provider=provider_id,
+                    endpoints=[
+                        (provider_config.base_url or "default", raw_service),
+                        *(
+                            (
+                                base_url,
+                                OpenAIService(
+                                    client=_openai_client(
+                                        api_key=api_key,
+                                        base_url=base_url,
+                                        http_client=http_client,
+                                    )
+                                ),
+                            )
+                            for base_url in provider_config.extra_base_urls
+                        ),
+                    ],
+                    hedge_requests=provider_config.hedge_requests,
+                    hedge_min_delay_seconds=provider_config.hedge_min_delay_seconds,
                 )
+                endpoint_pools[provider_id] = pool
+                raw_service = pool
+            rate_limiter = ProviderRateLimiter(
+                provider=provider_id,
+                max_concurrency=provider_config.max_concurrency,
+                requests_per_minute=provider_config.requests_per_minute,
+                tokens_per_minute=provider_config.tokens_per_minute,
             )
             safe_service = ResilientLLMProvider(
-                inner_provider=raw_service, provider_config=provider_config
+                inner_provider=raw_service,
+                provider_config=provider_config,
+                rate_limiter=rate_limiter,
             )
             wrapper = LLMProviderWrapper(
                 provider_id=provider_id,
                 provider=safe_service,
             )
             services[provider_id] = wrapper
-        return cls(services=services)
+            coalescers[provider_id] = LLMRequestCoalescer(
+                provider=provider_id,
+                ttl_seconds=provider_config.response_cache_ttl_seconds,
+                max_entries=provider_config.response_cache_max_entries,
+            )
+            rate_limiters[provider_id] = rate_limiter
+        return cls(
+            services=services,
+            coalescers=coalescers,
+            rate_limiters=rate_limiters,
+            endpoint_pools=endpoint_pools,
+        )
+
+    def coalescing_stats(self) -> tuple[LLMCoalescingStats, ...]:
+        """按 provider 返回文本请求合并与响应缓存计数。"""
+        return tuple(
+            self.coalescers[provider_id].stats() for provider_id in sorted(self.coalescers)
+        )
+
+    def rate_limit_stats(self) -> tuple[LLMRateLimitStats, ...]:
+        """按 provider 返回当前并发上限、排队等待和限流计数。"""
+        return tuple(
+            self.rate_limiters[provider_id].stats()
+            for provider_id in sorted(self.rate_limiters)
+        )
+
+    def endpoint_stats(self) -> tuple[LLMEndpointStats, ...]:
+        """按 provider 返回多端点 provider 各端点的健康状态和对冲计数。"""
+        return tuple(
+            stats
+            for provider_id in sorted(self.endpoint_pools)
+            for stats in self.endpoint_pools[provider_id].stats()
+        )
 
     async def get_ai_text_response(
         self,
@@ -59,16 +152,27 @@ class LLMHandler:
         model_name: str,
         max_attempts: int | None = None,
         retry_delay_seconds: float | None = None,
+        cacheable: bool = False,
     ) -> str:
-        """获取指定模型厂商的文本响应，可覆盖当前请求的重试参数。"""
+        """获取指定模型厂商的文本响应，可覆盖当前请求的重试参数。
+
+        同一 provider、模型和消息内容的并发请求合并为一次上游调用；重试
+        参数不参与合并判断，后到的调用方沿用先发起请求的重试设置。只有
+        ``cacheable`` 为真的请求才读写 provider 的短期响应缓存，适合同样
+        输入总能复用结果的描述类请求。
+        """
         llm = self.services.get(provider)
         if llm is None:
             raise ValueError(f"未定义的 LLM provider: {provider}")
-        return await llm.provider.get_ai_response(
-            messages=messages,
-            model=model_name,
-            max_attempts=max_attempts,
-            retry_delay_seconds=retry_delay_seconds,
+        return await self.coalescers[provider].run(
+            key=chat_request_key(model=model_name, messages=messages),
+            call=lambda: llm.provider.get_ai_response(
+                messages=messages,
+                model=model_name,
+                max_attempts=max_attempts,
+                retry_delay_seconds=retry_delay_seconds,
+            ),
+            cacheable=cacheable,
         )
 
     async def get_ai_response_with_tools(
@@ -92,6 +196,27 @@ class LLMHandler:
             parallel_tool_calls=parallel_tool_calls,
         )
 
+    def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        provider: str,
+        model_name: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """以增量事件流式获取指定模型厂商的工具调用响应。"""
+        llm = self.services.get(provider)
+        if llm is None:
+            raise ValueError(f"未定义的 LLM provider: {provider}")
+        return llm.provider.stream_ai_response_with_tools(
+            messages=messages,
+            model=model_name,
+            tools=tools,
+            tool_choice=tool_choice,
+            parallel_tool_calls=parallel_tool_calls,
+        )
+
     async def run_ai_with_tools(
         self,
         messages: list[ChatMessage],
@@ -99,10 +224,16 @@ class LLMHandler:
         model_name: str,
         tool_executor: LLMToolExecutor,
         max_tool_rounds: int = 16,
+        max_tool_concurrency: int = 4,
     ) -> str:
-        """执行完整工具调用循环，直到模型返回最终文本。"""
+        """执行完整工具调用循环，直到模型返回最终文本。
+
+        同一轮的只读工具调用最多 ``max_tool_concurrency`` 个并发执行。
+        """
         working_messages = messages[:]
         tools = tool_executor.list_tools()
+        read_only_tools = {tool.name for tool in tools if tool.read_only}
+        tool_slots = asyncio.Semaphore(max_tool_concurrency)
         if not tools:
             return await self.get_ai_text_response(
                 messages=working_messages,
@@ -127,10 +258,15 @@ class LLMHandler:
                     tool_calls=response.tool_calls,
                 )
             )
-            for tool_call in response.tool_calls:
-                result = await tool_executor.call_tool(
+            results = await run_tool_calls(
+                response.tool_calls,
+                call=lambda tool_call: tool_executor.call_tool(
                     name=tool_call.name, arguments=tool_call.arguments
-                )
+                ),
+                read_only_tools=read_only_tools,
+                slots=tool_slots,
+            )
+            for tool_call, result in zip(response.tool_calls, results, strict=True):
                 working_messages.append(
                     build_tool_result_message(
                         tool_call_id=tool_call.id,
@@ -153,3 +289,17 @@ class LLMHandler:
             message=message,
             model=model,
         )
+
+
+def _openai_client(
+    *, api_key: str, base_url: str | None, http_client: httpx.AsyncClient | None
+) -> AsyncOpenAI:
+    """创建 OpenAI 客户端；共享连接池时仍使用 SDK 默认超时，而非通用网络超时。"""
+    if http_client is None:
+        return AsyncOpenAI(api_key=api_key, base_url=base_url)
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        http_client=http_client,
+        timeout=DEFAULT_TIMEOUT,
+    )
@@ -129,6 +129,10 @@ class MCPToolManager(LLMToolExecutor):
                 description=description,
                 parameters=parameters,
                 strict=False,
+                read_only=(
+                    tool.annotations is not None
+                    and tool.annotations.readOnlyHint is True
+                ),
             )
         )
 
@@ -2,15 +2,21 @@
 
 import base64
 import json
+from collections import OrderedDict
+from collections.abc import AsyncGenerator
+from dataclasses import dataclass, field
 from typing import Final, cast, override
 
 from openai import AsyncOpenAI
 from openai.types.chat import (
+    ChatCompletionChunk,
     ChatCompletionMessage,
     ChatCompletionMessageParam,
     ChatCompletionToolChoiceOptionParam,
     ChatCompletionToolParam,
 )
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
+from openai.types.completion_usage import CompletionUsage
 from openai.types.images_response import ImagesResponse
 
 from app.models import JsonObject
@@ -19,10 +25,15 @@ from app.utils.file_type import detect_mime_type
 from ..base import LLMProvider
 from ..schemas import (
     ChatMessage,
+    LLMContentDelta,
     LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
     LLMToolCall,
+    LLMToolCallReady,
     LLMToolChoice,
     LLMToolDefinition,
+    LLMUsage,
 )
 
 REASONING_FIELD_NAMES: Final[tuple[str, ...]] = (
@@ -38,75 +49,163 @@ REASONING_TEXT_KEYS: Final[tuple[str, ...]] = (
     "summary",
     "output_text",
 )
+# tools 参数缓存的条目上限；工具集合很少变化，超限时整体清空即可。
+_TOOL_PAYLOAD_CACHE_SIZE: Final[int] = 64
+# 已转换消息缓存的条目和字节上限；字节主要来自 base64 图片，按最近使用淘汰。
+_MESSAGE_CACHE_MAX_ENTRIES: Final[int] = 4096
+_MESSAGE_CACHE_MAX_BYTES: Final[int] = 64 * 1024 * 1024
+
+
+@dataclass(slots=True)
+class _ToolCallBuffer:
+    """按流式增量拼接中的单个工具调用。"""
+
+    id: str = ""
+    name: str = ""
+    arguments: list[str] = field(default_factory=list)
+
+
+class _MessagePayloadCache:
+    """按 ``ChatMessage`` 对象身份缓存已转换的 OpenAI 消息。
+
+    ``ChatMessage`` 不可原地修改，同一对象的转换结果始终有效；条目中保留
+    消息引用，对象存活期间其 id 不会被复用。
+    """
+
+    def __init__(self, *, max_entries: int, max_bytes: int) -> None:
+        """保存容量上限。"""
+        self._max_entries: int = max_entries
+        self._max_bytes: int = max_bytes
+        self._bytes: int = 0
+        self._entries: OrderedDict[
+            int, tuple[ChatMessage, ChatCompletionMessageParam, int]
+        ] = OrderedDict()
+
+    def get(self, message: ChatMessage) -> ChatCompletionMessageParam | None:
+        """返回消息的缓存结果，并标记为最近使用。"""
+        key = id(message)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] is not message:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(
+        self,
+        message: ChatMessage,
+        payload: ChatCompletionMessageParam,
+        payload_bytes: int,
+    ) -> None:
+        """写入转换结果，超出上限时淘汰最久未使用的条目。"""
+        if payload_bytes > self._max_bytes:
+            return
+        previous = self._entries.pop(id(message), None)
+        if previous is not None:
+            self._bytes -= previous[2]
+        self._entries[id(message)] = (message, payload, payload_bytes)
+        self._bytes += payload_bytes
+        while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+            _, (_, _, evicted_bytes) = self._entries.popitem(last=False)
+            self._bytes -= evicted_bytes
+
+
 class OpenAIService(LLMProvider):
     """通过 OpenAI Chat Completions 和 Images 协议访问模型服务。"""
 
     def __init__(self, client: AsyncOpenAI) -> None:
         """保存 OpenAI 异步客户端。"""
         self.client: AsyncOpenAI = client
+        # 按工具定义对象身份缓存 tools 参数；值中保留定义引用，避免对象 id 被复用。
+        self._tool_payloads: dict[
+            tuple[int, ...],
+            tuple[list[LLMToolDefinition], list[ChatCompletionToolParam]],
+        ] = {}
+        self._message_payloads: _MessagePayloadCache = _MessagePayloadCache(
+            max_entries=_MESSAGE_CACHE_MAX_ENTRIES,
+            max_bytes=_MESSAGE_CACHE_MAX_BYTES,
+        )
 
     def _format_chat_messages(
         self, messages: list[ChatMessage]
     ) -> list[ChatCompletionMessageParam]:
-        """转换为 OpenAI Chat Completions 消息格式。"""
+        """转换为 OpenAI Chat Completions 消息格式。
+
+        工具循环每轮都会重发此前的全部消息；已转换过的消息对象直接复用
+        缓存结果，只有新追加的消息需要编码图片。
+        """
         chat_messages: list[ChatCompletionMessageParam] = []
         for msg in messages:
-            if msg.role == "tool":
-                if msg.tool_call_id is None or msg.text is None:
-                    raise ValueError("tool 消息缺少 tool_call_id 或 text")
-                raw_tool_message = {
-                    "role": "tool",
-                    "tool_call_id": msg.tool_call_id,
-                    "content": msg.text,
-                }
-                chat_messages.append(
-                    cast(ChatCompletionMessageParam, cast(object, raw_tool_message))
-                )
-                continue
-
-            content_items: list[dict[str, object]] = []
-            if msg.text:
-                content_items.append({"type": "text", "text": msg.text})
-            if msg.image:
-                for image_bytes in msg.image:
-                    mime_type = detect_mime_type(image_bytes)
-                    image_data = base64.b64encode(image_bytes).decode("utf-8")
-                    base64_image = f"data:{mime_type};base64,{image_data}"
-                    content_items.append(
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": base64_image, "detail": "auto"},
-                        }
-                    )
-            raw_message: dict[str, object] = {
-                "role": msg.role,
-                "content": content_items if content_items else msg.text,
+            formatted = self._message_payloads.get(msg)
+            if formatted is None:
+                formatted, payload_bytes = self._format_chat_message(msg)
+                self._message_payloads.put(msg, formatted, payload_bytes)
+            chat_messages.append(formatted)
+        return chat_messages
+
+    def _format_chat_message(
+        self, msg: ChatMessage
+    ) -> tuple[ChatCompletionMessageParam, int]:
+        """转换单条消息，并返回正文与图片编码的大致字节数。"""
+        if msg.role == "tool":
+            if msg.tool_call_id is None or msg.text is None:
+                raise ValueError("tool 消息缺少 tool_call_id 或 text")
+            raw_tool_message = {
+                "role": "tool",
+                "tool_call_id": msg.tool_call_id,
+                "content": msg.text,
             }
-            if msg.tool_calls:
-                raw_message["tool_calls"] = [
+            return (
+                cast(ChatCompletionMessageParam, cast(object, raw_tool_message)),
+                len(msg.text),
+            )
+
+        payload_bytes = len(msg.text or "")
+        content_items: list[dict[str, object]] = []
+        if msg.text:
+            content_items.append({"type": "text", "text": msg.text})
+        if msg.image:
+            for image_bytes in msg.image:
+                mime_type = detect_mime_type(image_bytes)
+                image_data = base64.b64encode(image_bytes).decode("utf-8")
+                base64_image = f"data:{mime_type};base64,{image_data}"
+                payload_bytes += len(base64_image)
+                content_items.append(
                     {
-                        "id": tool_call.id,
-                        "type": "function",
-                        "function": {
-                            "name": tool_call.name,
-                            "arguments": json.dumps(
-                                tool_call.arguments, ensure_ascii=False
-                            ),
-                        },
+                        "type": "image_url",
+                        "image_url": {"url": base64_image, "detail": "auto"},
                     }
-                    for tool_call in msg.tool_calls
-                ]
-            if msg.role == "assistant" and msg.reasoning_content is not None:
-                raw_message["reasoning_content"] = msg.reasoning_content
-            chat_messages.append(
-                cast(ChatCompletionMessageParam, cast(object, raw_message))
-            )
-        return chat_messages
+                )
+        raw_message: dict[str, object] = {
+            "role": msg.role,
+            "content": content_items if content_items else msg.text,
+        }
+        if msg.tool_calls:
+            raw_message["tool_calls"] = [
+                {
+                    "id": tool_call.id,
+                    "type": "function",
+                    "function": {
+                        "name": tool_call.name,
+                        # 固定键顺序，数据库恢复的参数与原始参数序列化结果一致。
+                        "arguments": json.dumps(
+                            tool_call.arguments, ensure_ascii=False, sort_keys=True
+                        ),
+                    },
+                }
+                for tool_call in msg.tool_calls
+            ]
+        if msg.role == "assistant" and msg.reasoning_content is not None:
+            raw_message["reasoning_content"] = msg.reasoning_content
+        return cast(ChatCompletionMessageParam, cast(object, raw_message)), payload_bytes
 
     def _format_tools(
         self, tools: list[LLMToolDefinition]
     ) -> list[ChatCompletionToolParam]:
-        """转换为 OpenAI Chat Completions tools 参数。"""
+        """转换为 OpenAI Chat Completions tools 参数，相同工具定义复用结果。"""
+        key = tuple(id(tool) for tool in tools)
+        cached = self._tool_payloads.get(key)
+        if cached is not None:
+            return cached[1]
         formatted_tools: list[ChatCompletionToolParam] = []
         for tool in tools:
             raw_tool = {
@@ -119,6 +218,9 @@ class OpenAIService(LLMProvider):
                 },
             }
             formatted_tools.append(cast(ChatCompletionToolParam, cast(object, raw_tool)))
+        if len(self._tool_payloads) >= _TOOL_PAYLOAD_CACHE_SIZE:
+            self._tool_payloads.clear()
+        self._tool_payloads[key] = (list(tools), formatted_tools)
         return formatted_tools
 
     def _build_image_files(
@@ -236,6 +338,7 @@ class OpenAIService(LLMProvider):
             return LLMResponse(
                 content=message.content,
                 reasoning_content=self._extract_reasoning_content(message),
+                usage=self._extract_usage(response.usage),
             )
         response = await self.client.chat.completions.create(
             model=model,
@@ -261,8 +364,171 @@ class OpenAIService(LLMProvider):
             content=message.content,
             reasoning_content=self._extract_reasoning_content(message),
             tool_calls=tool_calls,
+            usage=self._extract_usage(response.usage),
         )
 
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """流式调用 Chat Completions，按增量拼接正文、思维链和工具调用。
+
+        工具调用按 ``index`` 依次输出；出现更大的下标或收到 ``finish_reason``
+        时，之前的工具调用参数已经完整，立即产出 ``LLMToolCallReady``。
+        """
+        if tools:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=self._format_chat_messages(messages),
+                tools=self._format_tools(tools),
+                tool_choice=cast(ChatCompletionToolChoiceOptionParam, tool_choice),
+                parallel_tool_calls=parallel_tool_calls,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        else:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=self._format_chat_messages(messages),
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+        content_parts: list[str] = []
+        reasoning_parts: list[str] = []
+        pending: dict[int, _ToolCallBuffer] = {}
+        tool_calls: list[LLMToolCall] = []
+        usage: LLMUsage | None = None
+        async with stream:
+            async for chunk in stream:
+                # include_usage 时用量在最后一个不带 choices 的分片中返回。
+                if chunk.usage is not None:
+                    usage = self._extract_usage(chunk.usage)
+                for event in self._consume_chunk(
+                    chunk=chunk,
+                    content_parts=content_parts,
+                    reasoning_parts=reasoning_parts,
+                    pending=pending,
+                    tool_calls=tool_calls,
+                ):
+                    yield event
+        for tool_call in self._complete_tool_calls(pending=pending):
+            tool_calls.append(tool_call)
+            yield LLMToolCallReady(tool_call=tool_call)
+        reasoning_content = "".join(reasoning_parts).strip()
+        yield LLMStreamCompleted(
+            response=LLMResponse(
+                content="".join(content_parts) if content_parts else None,
+                reasoning_content=reasoning_content or None,
+                tool_calls=tool_calls,
+                usage=usage,
+            )
+        )
+
+    def _consume_chunk(
+        self,
+        *,
+        chunk: ChatCompletionChunk,
+        content_parts: list[str],
+        reasoning_parts: list[str],
+        pending: dict[int, _ToolCallBuffer],
+        tool_calls: list[LLMToolCall],
+    ) -> list[LLMStreamEvent]:
+        """把一个流式分片并入累积状态，返回可以立即产出的事件。"""
+        if not chunk.choices:
+            return []
+        choice = chunk.choices[0]
+        delta = choice.delta
+        events: list[LLMStreamEvent] = []
+        reasoning_delta = self._extract_reasoning_delta(delta)
+        if reasoning_delta is not None:
+            reasoning_parts.append(reasoning_delta)
+        if delta.content:
+            content_parts.append(delta.content)
+            events.append(LLMContentDelta(text=delta.content))
+        for raw_tool_call in delta.tool_calls or []:
+            if raw_tool_call.type not in (None, "function"):
+                raise ValueError("当前仅支持 function 类型工具调用")
+            if raw_tool_call.index not in pending:
+                # 新下标出现时，下标更小的工具调用不会再收到参数增量。
+                for tool_call in self._complete_tool_calls(
+                    pending=pending, before=raw_tool_call.index
+                ):
+                    tool_calls.append(tool_call)
+                    events.append(LLMToolCallReady(tool_call=tool_call))
+                pending[raw_tool_call.index] = _ToolCallBuffer()
+            buffer = pending[raw_tool_call.index]
+            if raw_tool_call.id:
+                buffer.id = raw_tool_call.id
+            if raw_tool_call.function is not None:
+                buffer.name += raw_tool_call.function.name or ""
+                buffer.arguments.append(raw_tool_call.function.arguments or "")
+        if choice.finish_reason is not None:
+            for tool_call in self._complete_tool_calls(pending=pending):
+                tool_calls.append(tool_call)
+                events.append(LLMToolCallReady(tool_call=tool_call))
+        return events
+
+    def _complete_tool_calls(
+        self,
+        *,
+        pending: dict[int, _ToolCallBuffer],
+        before: int | None = None,
+    ) -> list[LLMToolCall]:
+        """按下标顺序取出已完整的工具调用并解析参数。"""
+        completed: list[LLMToolCall] = []
+        for index in sorted(pending):
+            if before is not None and index >= before:
+                break
+            buffer = pending.pop(index)
+            if not buffer.id or not buffer.name:
+                raise ValueError("流式工具调用缺少 id 或名称")
+            completed.append(
+                LLMToolCall(
+                    id=buffer.id,
+                    name=buffer.name,
+                    arguments=self._parse_tool_arguments(
+                        "".join(buffer.arguments) or "{}"
+                    ),
+                )
+            )
+        return completed
+
+    def _extract_usage(self, usage: CompletionUsage | None) -> LLMUsage | None:
+        """转换服务端返回的 token 用量；兼容服务可能不返回。
+
+        缓存命中优先读 OpenAI 的 ``prompt_tokens_details.cached_tokens``，
+        其次读 DeepSeek 等服务的 ``prompt_cache_hit_tokens`` 扩展字段。
+        """
+        if usage is None:
+            return None
+        cached_tokens: object = None
+        if usage.prompt_tokens_details is not None:
+            cached_tokens = usage.prompt_tokens_details.cached_tokens
+        if cached_tokens is None and usage.model_extra is not None:
+            cached_tokens = usage.model_extra.get("prompt_cache_hit_tokens")
+        return LLMUsage(
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=cached_tokens if isinstance(cached_tokens, int) else 0,
+        )
+
+    def _extract_reasoning_delta(self, delta: ChoiceDelta) -> str | None:
+        """提取流式分片中的思维链增量，保留原始空白以便拼接。"""
+        raw_extra = cast(object, delta.model_extra)
+        if not isinstance(raw_extra, dict):
+            return None
+        extra_items = cast(dict[str, object], raw_extra)
+        for field_name in REASONING_FIELD_NAMES:
+            value = extra_items.get(field_name)
+            if isinstance(value, str) and value:
+                return value
+        return None
+
     def _parse_tool_arguments(self, raw_arguments: str) -> JsonObject:
         """解析模型返回的工具参数 JSON。"""
         try:
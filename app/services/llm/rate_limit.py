@@ -0,0 +1,219 @@
+"""按 provider 共享的 LLM 并发与速率限制。"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from math import ceil
+from typing import Final
+
+from app.utils.log import log_event
+
+from .schemas import ChatMessage
+
+type Clock = Callable[[], float]
+type SleepFunction = Callable[[float], Awaitable[None]]
+
+# 图片 token 按 OpenAI 高清单图的常见开销粗估。
+_IMAGE_TOKENS: Final[int] = 765
+# Retry-After 过大时按此上限暂停，避免异常响应让 provider 长时间不可用。
+_MAX_RETRY_AFTER_SECONDS: Final[float] = 120.0
+
+
+@dataclass(frozen=True, slots=True)
+class LLMRateLimitStats:
+    """单个 provider 的并发上限、排队等待和限流计数。"""
+
+    provider: str
+    concurrency_limit: int
+    max_concurrency: int
+    in_flight: int
+    acquired: int
+    throttled: int
+    total_wait_seconds: float
+    max_wait_seconds: float
+
+    @property
+    def average_wait_seconds(self) -> float:
+        """返回每次获取请求槽位的平均排队时间。"""
+        if self.acquired == 0:
+            return 0.0
+        return self.total_wait_seconds / self.acquired
+
+
+class _TokenBucket:
+    """按每分钟额度匀速补充的令牌桶；额度为 0 表示不限制。"""
+
+    def __init__(self, *, per_minute: int, now: float) -> None:
+        """初始为满桶。"""
+        self.capacity: float = float(per_minute)
+        self.tokens: float = float(per_minute)
+        self._rate: float = per_minute / 60
+        self._updated_at: float = now
+
+    def delay(self, *, cost: float, now: float) -> float:
+        """补充令牌后返回凑够 ``cost`` 还需等待的秒数。"""
+        if self.capacity <= 0:
+            return 0.0
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+        missing = min(cost, self.capacity) - self.tokens
+        return max(missing / self._rate, 0.0)
+
+    def take(self, cost: float) -> None:
+        """扣除令牌，负数表示退还；实际用量超出预估时允许欠额，由后续请求等待补齐。"""
+        if self.capacity > 0:
+            self.tokens = min(max(self.tokens - cost, -self.capacity), self.capacity)
+
+
+def estimate_request_tokens(messages: list[ChatMessage]) -> int:
+    """粗估请求 token，用于速率限制预扣；响应带 usage 时再按实际值结算。"""
+    text_bytes = 0
+    images = 0
+    for message in messages:
+        text_bytes += len((message.text or "").encode("utf-8"))
+        text_bytes += len((message.reasoning_content or "").encode("utf-8"))
+        images += len(message.image or [])
+    return ceil(text_bytes / 3) + images * _IMAGE_TOKENS
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    """解析 ``retry-after-ms`` 或 ``retry-after``（秒数或 HTTP 日期）响应头。"""
+    raw_ms = headers.get("retry-after-ms")
+    if raw_ms is not None:
+        try:
+            return min(max(float(raw_ms) / 1000, 0.0), _MAX_RETRY_AFTER_SECONDS)
+        except ValueError:
+            pass
+    raw = headers.get("retry-after")
+    if raw is None:
+        return None
+    try:
+        seconds = float(raw)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(raw)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=UTC)
+        seconds = (retry_at - datetime.now(UTC)).total_seconds()
+    return min(max(seconds, 0.0), _MAX_RETRY_AFTER_SECONDS)
+
+
+class ProviderRateLimiter:
+    """限制单个 provider 的并发请求数、每分钟请求数和每分钟 token 数。
+
+    同一 provider 的全部插件共用一个限制器，请求按到达顺序排队。并发上限
+    按 AIMD 自适应：每次成功加 ``1 / 当前上限``，收到 429 时减半，最低为 1，
+    最高为配置的 ``max_concurrency``；429 带 ``Retry-After`` 时，所有新请求
+    等到该时间之后再发出。
+    """
+
+    def __init__(
+        self,
+        *,
+        provider: str,
+        max_concurrency: int,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        clock: Clock = time.monotonic,
+        sleep: SleepFunction = asyncio.sleep,
+    ) -> None:
+        """保存限制配置，初始并发上限取最大值。"""
+        self.provider: str = provider
+        self._max_concurrency: int = max_concurrency
+        self._limit: float = float(max_concurrency)
+        self._clock: Clock = clock
+        self._sleep: SleepFunction = sleep
+        now = clock()
+        self._requests: _TokenBucket = _TokenBucket(
+            per_minute=requests_per_minute, now=now
+        )
+        self._tokens: _TokenBucket = _TokenBucket(per_minute=tokens_per_minute, now=now)
+        self._blocked_until: float = now
+        self._queue: asyncio.Lock = asyncio.Lock()
+        self._slot_freed: asyncio.Event = asyncio.Event()
+        self._in_flight: int = 0
+        self._acquired: int = 0
+        self._throttled: int = 0
+        self._total_wait: float = 0.0
+        self._max_wait: float = 0.0
+
+    @property
+    def concurrency_limit(self) -> int:
+        """返回当前生效的并发上限。"""
+        return max(int(self._limit), 1)
+
+    async def acquire(self, *, estimated_tokens: int) -> None:
+        """排队等待并发槽位和速率额度，返回后调用方必须调用 ``release``。"""
+        started = self._clock()
+        async with self._queue:
+            while True:
+                while self._in_flight >= self.concurrency_limit:
+                    self._slot_freed.clear()
+                    _ = await self._slot_freed.wait()
+                now = self._clock()
+                delay = max(
+                    self._blocked_until - now,
+                    self._requests.delay(cost=1, now=now),
+                    self._tokens.delay(cost=estimated_tokens, now=now),
+                )
+                if delay <= 0:
+                    break
+                await self._sleep(delay)
+            self._requests.take(1)
+            self._tokens.take(estimated_tokens)
+            self._in_flight += 1
+        waited = self._clock() - started
+        self._acquired += 1
+        self._total_wait += waited
+        self._max_wait = max(self._max_wait, waited)
+
+    def release(self, *, succeeded: bool) -> None:
+        """归还槽位；成功的请求按加性规则提高并发上限。"""
+        self._in_flight -= 1
+        if succeeded:
+            self._limit = min(
+                self._limit + 1 / self._limit, float(self._max_concurrency)
+            )
+        self._slot_freed.set()
+
+    def record_rate_limited(self, *, retry_after: float | None) -> None:
+        """收到 429 后把并发上限减半，并按 Retry-After 暂停新请求。"""
+        previous_limit = self.concurrency_limit
+        self._throttled += 1
+        self._limit = max(self._limit / 2, 1.0)
+        if retry_after is not None:
+            self._blocked_until = max(self._blocked_until, self._clock() + retry_after)
+        log_event(
+            level="INFO",
+            event="llm.rate_limit.throttled",
+            category="retry",
+            message="LLM provider 返回限流，已降低并发上限",
+            provider=self.provider,
+            retry_after_seconds=retry_after,
+            previous_concurrency_limit=previous_limit,
+            concurrency_limit=self.concurrency_limit,
+        )
+
+    def record_usage(self, *, estimated_tokens: int, actual_tokens: int) -> None:
+        """按响应返回的实际 token 结算预扣额度。"""
+        self._tokens.take(actual_tokens - estimated_tokens)
+
+    def stats(self) -> LLMRateLimitStats:
+        """返回当前并发上限和累计排队计数。"""
+        return LLMRateLimitStats(
+            provider=self.provider,
+            concurrency_limit=self.concurrency_limit,
+            max_concurrency=self._max_concurrency,
+            in_flight=self._in_flight,
+            acquired=self._acquired,
+            throttled=self._throttled,
+            total_wait_seconds=self._total_wait,
+            max_wait_seconds=self._max_wait,
+        )
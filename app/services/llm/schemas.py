@@ -1,15 +1,22 @@
 """LLM 服务配置与消息模型。"""
 
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
-from typing import Literal, Protocol
+from typing import ClassVar, Literal, Protocol
 
-from pydantic import Field, field_serializer, model_validator
+from pydantic import ConfigDict, Field, field_serializer, model_validator
 
 from app.models import JsonObject, JsonValue, StrictModel
 
 
 class ChatMessage(StrictModel):
-    """定义传递给 LLM 的统一聊天消息。"""
+    """定义传递给 LLM 的统一聊天消息。
+
+    实例不可原地修改，服务商可以按对象身份缓存转换结果；需要变更时用
+    ``model_copy(update=...)`` 生成新实例。
+    """
+
+    model_config: ClassVar[ConfigDict] = ConfigDict(extra="forbid", frozen=True)
 
     role: Literal["system", "user", "assistant", "tool"]
     text: str | None = None
@@ -67,6 +74,17 @@ class LLMProviderProtocol(Protocol):
         """获取可能包含工具调用的结构化响应。"""
         ...
 
+    def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list["LLMToolDefinition"],
+        tool_choice: "LLMToolChoice" = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncIterator["LLMStreamEvent"]:
+        """以增量事件流式获取结构化响应。"""
+        ...
+
     async def get_image(
         self,
         message: ChatMessage,
@@ -101,6 +119,8 @@ class LLMToolDefinition(StrictModel):
     description: str
     parameters: JsonObject
     strict: bool = True
+    # 只读工具不改变外部状态，同一轮内可以与其他只读调用并发执行。
+    read_only: bool = False
 
 
 class LLMToolCall(StrictModel):
@@ -111,12 +131,46 @@ class LLMToolCall(StrictModel):
     arguments: JsonObject = Field(default_factory=dict)
 
 
+class LLMUsage(StrictModel):
+    """服务端返回的单次请求 token 用量。"""
+
+    prompt_tokens: int
+    completion_tokens: int = 0
+    # 命中服务端 prompt 缓存的输入 token，服务未报告时为 0。
+    cached_tokens: int = 0
+
+
 class LLMResponse(StrictModel):
     """LLM 单轮结构化响应。"""
 
     content: str | None = None
     reasoning_content: str | None = None
     tool_calls: list[LLMToolCall] = Field(default_factory=list)
+    usage: LLMUsage | None = None
+
+
+@dataclass(frozen=True, slots=True)
+class LLMContentDelta:
+    """流式响应中新到达的一段正文。"""
+
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class LLMToolCallReady:
+    """流式响应中参数已经完整的一次工具调用。"""
+
+    tool_call: LLMToolCall
+
+
+@dataclass(frozen=True, slots=True)
+class LLMStreamCompleted:
+    """流式响应结束，携带与非流式接口一致的完整响应。"""
+
+    response: LLMResponse
+
+
+type LLMStreamEvent = LLMContentDelta | LLMToolCallReady | LLMStreamCompleted
 
 
 class LLMToolExecutor(Protocol):
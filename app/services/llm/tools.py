@@ -1,15 +1,22 @@
 """LLM 工具注册与执行循环。"""
 
+import asyncio
 import json
-from collections.abc import Awaitable, Callable
+from collections.abc import Awaitable, Callable, Collection, Sequence
 from dataclasses import dataclass, field
-from typing import Protocol, cast, override, runtime_checkable
+from typing import Final, Protocol, cast, override, runtime_checkable
 
 from pydantic import BaseModel
 
 from app.models import JsonObject, JsonValue, StrictModel, to_json_value
 
-from .schemas import ChatMessage, LLMToolDefinition, LLMToolExecutor
+from .schemas import ChatMessage, LLMToolCall, LLMToolDefinition, LLMToolExecutor
+
+type _ToolDefinitionKey = tuple[str, str, type[BaseModel], bool, bool]
+
+# 编译后的工具定义按声明内容跨注册表共享；工具由代码静态声明，条目数有限。
+# 共享的定义与 schema 不可修改。
+_COMPILED_TOOL_DEFINITIONS: Final[dict[_ToolDefinitionKey, LLMToolDefinition]] = {}
 
 
 @dataclass(frozen=True)
@@ -92,20 +99,29 @@ class LLMToolRegistry(LLMToolExecutor):
         parameters_model: type[BaseModel],
         handler: ToolHandler,
         strict: bool = True,
+        read_only: bool = False,
     ) -> None:
-        """使用 Pydantic 参数模型注册本地工具。"""
-        raw_schema = cast(
-            JsonObject, parameters_model.model_json_schema(mode="validation")
-        )
-        schema = self._build_strict_parameters_schema(raw_schema)
-        definition = LLMToolDefinition(
-            name=name,
-            description=description,
-            parameters=schema,
-            strict=strict,
-        )
+        """使用 Pydantic 参数模型注册本地工具。
+
+        参数 schema 只在同一声明首次注册时生成，之后每轮构造执行器只复用
+        已编译的工具定义。
+        """
         if name in self._tools:
             raise ValueError(f"LLM 工具已存在: {name}")
+        key = (name, description, parameters_model, strict, read_only)
+        definition = _COMPILED_TOOL_DEFINITIONS.get(key)
+        if definition is None:
+            raw_schema = cast(
+                JsonObject, parameters_model.model_json_schema(mode="validation")
+            )
+            definition = LLMToolDefinition(
+                name=name,
+                description=description,
+                parameters=self._build_strict_parameters_schema(raw_schema),
+                strict=strict,
+                read_only=read_only,
+            )
+            _COMPILED_TOOL_DEFINITIONS[key] = definition
         self._tools[name] = RegisteredLLMTool(
             definition=definition,
             parameters_model=parameters_model,
@@ -228,18 +244,20 @@ class CompositeToolExecutor(LLMToolExecutor):
     def __init__(self, executors: list[LLMToolExecutor]) -> None:
         """保存工具执行器列表。"""
         self._executors: list[LLMToolExecutor] = executors
+        self._tool_index: dict[str, LLMToolExecutor] = {}
 
     @override
     def list_tools(self) -> list[LLMToolDefinition]:
-        """合并所有工具定义并检查重名。"""
+        """合并所有工具定义并检查重名，同时重建工具名到执行器的索引。"""
         tools: list[LLMToolDefinition] = []
-        seen: set[str] = set()
+        index: dict[str, LLMToolExecutor] = {}
         for executor in self._executors:
             for tool in executor.list_tools():
-                if tool.name in seen:
+                if tool.name in index:
                     raise ValueError(f"LLM 工具名重复: {tool.name}")
-                seen.add(tool.name)
+                index[tool.name] = executor
                 tools.append(tool)
+        self._tool_index = index
         return tools
 
     @override
@@ -254,18 +272,58 @@ class CompositeToolExecutor(LLMToolExecutor):
     async def call_tool_with_artifacts(
         self, name: str, arguments: JsonObject
     ) -> LLMToolExecutionResult:
-        """按执行器顺序查找并调用工具，保留内部附件。"""
-        for executor in self._executors:
-            tool_names = {tool.name for tool in executor.list_tools()}
-            if name in tool_names:
-                if isinstance(executor, LLMToolArtifactExecutor):
-                    return await executor.call_tool_with_artifacts(
-                        name=name,
-                        arguments=arguments,
-                    )
-                result = await executor.call_tool(name=name, arguments=arguments)
-                return LLMToolExecutionResult(result=result)
-        raise KeyError(f"未知 LLM 工具: {name}")
+        """按工具名索引查找执行器并调用工具，保留内部附件。
+
+        索引在 ``list_tools`` 时建立；未命中时重新合并一次，兼容执行器的
+        工具集合在两次调用之间发生变化。
+        """
+        executor = self._tool_index.get(name)
+        if executor is None:
+            _ = self.list_tools()
+            executor = self._tool_index.get(name)
+        if executor is None:
+            raise KeyError(f"未知 LLM 工具: {name}")
+        if isinstance(executor, LLMToolArtifactExecutor):
+            return await executor.call_tool_with_artifacts(
+                name=name,
+                arguments=arguments,
+            )
+        result = await executor.call_tool(name=name, arguments=arguments)
+        return LLMToolExecutionResult(result=result)
+
+
+async def run_tool_calls[ResultT](
+    tool_calls: Sequence[LLMToolCall],
+    *,
+    call: Callable[[LLMToolCall], Awaitable[ResultT]],
+    read_only_tools: Collection[str],
+    slots: asyncio.Semaphore,
+    started: Collection[str] = (),
+) -> list[ResultT]:
+    """执行一轮工具调用，并按模型给出的顺序返回结果。
+
+    相邻的只读调用在 ``slots`` 限制内并发执行；有副作用的调用等待之前的
+    调用全部完成后单独执行，之后的调用也等它完成再开始。``started`` 中的
+    调用已在别处占用名额启动，这里只等待结果，不再占用第二个名额。
+    """
+
+    async def limited(tool_call: LLMToolCall) -> ResultT:
+        if tool_call.id in started:
+            return await call(tool_call)
+        async with slots:
+            return await call(tool_call)
+
+    results: list[ResultT] = []
+    batch: list[LLMToolCall] = []
+    for tool_call in tool_calls:
+        if tool_call.name in read_only_tools:
+            batch.append(tool_call)
+            continue
+        results.extend(await asyncio.gather(*(limited(item) for item in batch)))
+        batch = []
+        results.append(await limited(tool_call))
+    results.extend(await asyncio.gather(*(limited(item) for item in batch)))
+    return results
 
 
 def tool_result_to_text(result: JsonValue) -> str:
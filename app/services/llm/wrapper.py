@@ -1,5 +1,7 @@
 """LLM 提供商重试包装器。"""
 
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import AsyncExitStack, aclosing, asynccontextmanager
 from typing import override
 
 from openai import APIConnectionError, APITimeoutError, RateLimitError
@@ -8,23 +10,64 @@ from app.config.schemas import LLMProviderConfig
 from app.utils.retry_utils import create_retry_manager
 
 from .base import LLMProvider
+from .rate_limit import (
+    ProviderRateLimiter,
+    estimate_request_tokens,
+    retry_after_seconds,
+)
 from .schemas import (
     ChatMessage,
     LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
     LLMToolChoice,
     LLMToolDefinition,
+    LLMUsage,
 )
 
 
 class ResilientLLMProvider(LLMProvider):
-    """为底层 LLM 提供商增加统一重试能力。"""
+    """为底层 LLM 提供商增加统一重试和可选的并发与速率限制。"""
 
     def __init__(
-        self, inner_provider: LLMProvider, provider_config: LLMProviderConfig
+        self,
+        inner_provider: LLMProvider,
+        provider_config: LLMProviderConfig,
+        rate_limiter: ProviderRateLimiter | None = None,
     ) -> None:
-        """保存底层服务商与重试配置。"""
+        """保存底层服务商、重试配置和同一 provider 共享的限制器。"""
         self.inner_provider: LLMProvider = inner_provider
         self.provider_config: LLMProviderConfig = provider_config
+        self.rate_limiter: ProviderRateLimiter | None = rate_limiter
+
+    @asynccontextmanager
+    async def _rate_limited(self, *, estimated_tokens: int) -> AsyncIterator[None]:
+        """占用一个请求槽位执行单次上游调用；限流错误会降低并发上限。"""
+        limiter = self.rate_limiter
+        if limiter is None:
+            yield
+            return
+        await limiter.acquire(estimated_tokens=estimated_tokens)
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        except RateLimitError as exc:
+            limiter.record_rate_limited(
+                retry_after=retry_after_seconds(exc.response.headers)
+            )
+            raise
+        finally:
+            limiter.release(succeeded=succeeded)
+
+    def _settle_usage(self, *, estimated_tokens: int, usage: LLMUsage | None) -> None:
+        """响应带 token 用量时按实际值结算速率限制额度。"""
+        if self.rate_limiter is None or usage is None:
+            return
+        self.rate_limiter.record_usage(
+            estimated_tokens=estimated_tokens,
+            actual_tokens=usage.prompt_tokens + usage.completion_tokens,
+        )
 
     @override
     async def get_ai_response(
@@ -53,11 +96,13 @@ class ResilientLLMProvider(LLMProvider):
                 ValueError,
             ),
         )
+        estimated_tokens = estimate_request_tokens(messages)
         async for attempt in retrier:
             with attempt:
-                response = await self.inner_provider.get_ai_response(
-                    messages=messages, model=model
-                )
+                async with self._rate_limited(estimated_tokens=estimated_tokens):
+                    response = await self.inner_provider.get_ai_response(
+                        messages=messages, model=model
+                    )
                 if not response:
                     raise ValueError("LLM 提供商返回了空响应")
                 return response
@@ -83,20 +128,92 @@ class ResilientLLMProvider(LLMProvider):
                 ValueError,
             ),
         )
+        estimated_tokens = estimate_request_tokens(messages)
         async for attempt in retrier:
             with attempt:
-                response = await self.inner_provider.get_ai_response_with_tools(
-                    messages=messages,
-                    model=model,
-                    tools=tools,
-                    tool_choice=tool_choice,
-                    parallel_tool_calls=parallel_tool_calls,
+                async with self._rate_limited(estimated_tokens=estimated_tokens):
+                    response = await self.inner_provider.get_ai_response_with_tools(
+                        messages=messages,
+                        model=model,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        parallel_tool_calls=parallel_tool_calls,
+                    )
+                self._settle_usage(
+                    estimated_tokens=estimated_tokens, usage=response.usage
                 )
                 if response.content is None and not response.tool_calls:
                     raise ValueError("LLM 提供商返回了空工具响应")
                 return response
         raise RuntimeError("LLM 工具接口重试次数已耗尽")
 
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """流式调用底层工具接口，只在收到首个事件前重试。
+
+        首个事件交给调用方后，正文可能已经发到群里，之后的错误直接抛出，
+        不再重放整个请求。请求槽位一直占用到流结束。
+        """
+        retrier = create_retry_manager(
+            max_attempts=self.provider_config.max_attempts,
+            retry_delay_seconds=self.provider_config.retry_delay_seconds,
+            error_types=(
+                RateLimitError,
+                APIConnectionError,
+                APITimeoutError,
+                ValueError,
+            ),
+        )
+        estimated_tokens = estimate_request_tokens(messages)
+        stream: AsyncGenerator[LLMStreamEvent] | None = None
+        first_event: LLMStreamEvent | None = None
+        async with AsyncExitStack() as lease:
+            async for attempt in retrier:
+                with attempt:
+                    async with AsyncExitStack() as attempt_lease:
+                        await attempt_lease.enter_async_context(
+                            self._rate_limited(estimated_tokens=estimated_tokens)
+                        )
+                        stream = self.inner_provider.stream_ai_response_with_tools(
+                            messages=messages,
+                            model=model,
+                            tools=tools,
+                            tool_choice=tool_choice,
+                            parallel_tool_calls=parallel_tool_calls,
+                        )
+                        first_event = await anext(stream, None)
+                        if first_event is None or (
+                            isinstance(first_event, LLMStreamCompleted)
+                            and first_event.response.content is None
+                            and not first_event.response.tool_calls
+                        ):
+                            await stream.aclose()
+                            raise ValueError("LLM 提供商返回了空工具响应")
+                        # 首个事件已到达，槽位转交给外层，直到流结束才归还。
+                        _ = lease.push_async_exit(attempt_lease.pop_all())
+            if stream is None or first_event is None:
+                raise RuntimeError("LLM 工具接口重试次数已耗尽")
+            async with aclosing(stream):
+                event = first_event
+                while True:
+                    if isinstance(event, LLMStreamCompleted):
+                        self._settle_usage(
+                            estimated_tokens=estimated_tokens,
+                            usage=event.response.usage,
+                        )
+                    yield event
+                    next_event = await anext(stream, None)
+                    if next_event is None:
+                        break
+                    event = next_event
+
     @override
     async def get_image(
         self,
@@ -114,12 +231,14 @@ class ResilientLLMProvider(LLMProvider):
                 ValueError,
             ),
         )
+        estimated_tokens = estimate_request_tokens([message])
         async for attempt in retrier:
             with attempt:
-                response = await self.inner_provider.get_image(
-                    message=message,
-                    model=model,
-                )
+                async with self._rate_limited(estimated_tokens=estimated_tokens):
+                    response = await self.inner_provider.get_image(
+                        message=message,
+                        model=model,
+                    )
                 if not response:
                     raise ValueError("LLM 提供商返回了空图片响应")
                 return response
@@ -15,11 +15,14 @@ from .image_archive import (
     StoredImage,
 )
 from .image_reader import (
+    ImageChunkConsumer,
+    ImagePathConsumer,
     ImageReadTooLargeError,
     NapCatImageBot,
     NapCatImageReader,
     NapCatImageReadResult,
     NapCatImageResource,
+    NapCatImageStreamResult,
 )
 from .group_tools import (
     NapCatGroupToolBot,
@@ -39,11 +42,14 @@ __all__ = [
     "InvalidImageContentError",
     "InvalidInlineImageSourceError",
     "StoredImage",
+    "ImageChunkConsumer",
+    "ImagePathConsumer",
     "ImageReadTooLargeError",
     "NapCatImageBot",
     "NapCatImageReader",
     "NapCatImageReadResult",
     "NapCatImageResource",
+    "NapCatImageStreamResult",
     "NapCatGroupToolBot",
     "NapCatGroupToolExecutor",
 ]
@@ -32,6 +32,7 @@ class GroupFileToolset:
             ),
             parameters_model=ListGroupRootFilesArgs,
             handler=self.list_group_root_files,
+            read_only=True,
         )
         registry.register_tool(
             name="qq__list_group_files_by_folder",
@@ -43,6 +44,7 @@ class GroupFileToolset:
             ),
             parameters_model=ListGroupFilesByFolderArgs,
             handler=self.list_group_files_by_folder,
+            read_only=True,
         )
         registry.register_tool(
             name="qq__get_group_file_url",
@@ -54,6 +56,7 @@ class GroupFileToolset:
             ),
             parameters_model=GetGroupFileUrlArgs,
             handler=self.get_group_file_url,
+            read_only=True,
         )
 
     async def list_group_root_files(self, arguments: JsonObject) -> JsonValue:
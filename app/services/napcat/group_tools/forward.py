@@ -29,6 +29,9 @@ from .forward_reference import (
 )
 from .protocols import NapCatGroupToolBot
 
+_SEGMENT_ADAPTER: TypeAdapter[MessageSegment] = TypeAdapter(MessageSegment)
+_SEGMENTS_ADAPTER: TypeAdapter[list[MessageSegment]] = TypeAdapter(list[MessageSegment])
+
 
 @dataclass
 class ForwardReadResult:
@@ -57,10 +60,6 @@ class GroupForwardToolset:
         self.group_messages: GroupMessageReader = group_messages
         self.event: GroupMessage = event
         self.message_formatter: NapCatMessageTextFormatter = NapCatMessageTextFormatter()
-        self.segment_adapter: TypeAdapter[MessageSegment] = TypeAdapter(MessageSegment)
-        self.segments_adapter: TypeAdapter[list[MessageSegment]] = TypeAdapter(
-            list[MessageSegment]
-        )
 
     def register_tools(self, registry: LLMToolRegistry) -> None:
         """向工具注册表登记合并转发读取工具。"""
@@ -74,6 +73,7 @@ class GroupForwardToolset:
             ),
             parameters_model=GetForwardMessageArgs,
             handler=self.get_forward_message,
+            read_only=True,
         )
 
     async def get_forward_message(self, arguments: JsonObject) -> JsonValue:
@@ -451,12 +451,12 @@ class GroupForwardToolset:
         """尝试把消息内容解析为消息段列表。"""
         if isinstance(content, list):
             try:
-                return self.segments_adapter.validate_python(content)
+                return _SEGMENTS_ADAPTER.validate_python(content)
             except ValidationError:
                 return None
         if isinstance(content, dict) and "type" in content:
             try:
-                return [self.segment_adapter.validate_python(content)]
+                return [_SEGMENT_ADAPTER.validate_python(content)]
             except ValidationError:
                 return None
         return None
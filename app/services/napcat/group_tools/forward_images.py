@@ -37,6 +37,8 @@ from .forward_reference import (
 )
 from .protocols import NapCatGroupToolBot
 
+_SEGMENTS_ADAPTER: TypeAdapter[list[MessageSegment]] = TypeAdapter(list[MessageSegment])
+
 
 @dataclass(frozen=True)
 class ForwardImageTarget:
@@ -89,9 +91,6 @@ class GroupForwardImageToolset:
             fetch_concurrency=fetch_concurrency,
             download_timeout_seconds=download_timeout_seconds,
         )
-        self.segments_adapter: TypeAdapter[list[MessageSegment]] = TypeAdapter(
-            list[MessageSegment]
-        )
 
     def register_tools(self, registry: LLMToolRegistry) -> None:
         """向工具注册表登记合并转发图片读取工具。"""
@@ -107,6 +106,7 @@ class GroupForwardImageToolset:
             ),
             parameters_model=GetForwardMessageImagesArgs,
             handler=self.get_forward_message_images,
+            read_only=True,
         )
 
     async def get_forward_message_images(
@@ -273,7 +273,7 @@ class GroupForwardImageToolset:
         if not isinstance(content, list):
             return []
         try:
-            return self.segments_adapter.validate_python(content)
+            return _SEGMENTS_ADAPTER.validate_python(content)
         except ValidationError:
             return []
 
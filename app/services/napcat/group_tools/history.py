@@ -37,6 +37,7 @@ class GroupHistoryToolset:
             ),
             parameters_model=GetGroupHistoryMessagesArgs,
             handler=self.get_group_history_messages,
+            read_only=True,
         )
 
     async def get_group_history_messages(self, arguments: JsonObject) -> JsonValue:
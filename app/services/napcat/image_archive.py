@@ -9,11 +9,13 @@ import hashlib
 import os
 import re
 import secrets
-from collections.abc import Callable, Sequence
+import shutil
+import sys
+from collections.abc import AsyncIterable, Callable, Sequence
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
-from typing import Protocol, cast
+from typing import Literal, Protocol, cast
 
 import aiofiles
 import filetype  # pyright: ignore[reportMissingTypeStubs]
@@ -21,10 +23,12 @@ import httpx
 
 from app.models import ImageArchiveTask, StoredImage
 from app.services.napcat.image_reader import (
+    ImageChunkConsumer,
+    ImagePathConsumer,
     NapCatImageBot,
     NapCatImageReader,
-    NapCatImageReadResult,
     NapCatImageResource,
+    NapCatImageStreamResult,
 )
 from app.utils.log import log_event, log_exception
 
@@ -35,6 +39,12 @@ DEFAULT_ARCHIVE_LEASE_SECONDS = 45.0
 DEFAULT_ARCHIVE_POLL_INTERVAL_SECONDS = 1.0
 DEFAULT_ARCHIVE_RETRY_DELAYS_SECONDS = (1.0, 5.0, 20.0)
 MAX_ARCHIVE_ATTEMPTS = 1 + len(DEFAULT_ARCHIVE_RETRY_DELAYS_SECONDS)
+# filetype 最多检查文件开头这么多字节，流式写入时收满后即可判断类型。
+_SNIFF_BYTES = 8192
+# Linux FICLONE ioctl：在 btrfs、XFS 等文件系统上创建共享数据块的写时复制副本。
+_FICLONE = 0x40049409
+
+type LocalIngestMethod = Literal["hardlink", "reflink", "copy"]
 
 
 class ImageArchiveError(ValueError):
@@ -68,12 +78,16 @@ class _DetectedFileType(Protocol):
 
 
 class ImageArchiveReader(Protocol):
-    """图片归档仅需要的单图读取能力。"""
+    """图片归档仅需要的单图流式读取能力。"""
 
-    async def read(
-        self, *, resource: NapCatImageResource
-    ) -> NapCatImageReadResult:
-        """读取一张 NapCat 图片。"""
+    async def read_into[T](
+        self,
+        *,
+        resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None = None,
+    ) -> NapCatImageStreamResult[T]:
+        """把一张 NapCat 图片的块流或本地文件交给消费方。"""
         ...
 
 
@@ -115,6 +129,16 @@ class ImageArchiveTaskRepository(Protocol):
         ...
 
 
+def _clone_file(*, source: Path, target: Path) -> None:
+    """以 reflink 创建写时复制副本；平台或文件系统不支持时抛出 OSError。"""
+    if sys.platform != "linux":
+        raise OSError("当前平台不支持 reflink")
+    import fcntl
+
+    with source.open("rb") as source_file, target.open("xb") as target_file:
+        _ = fcntl.ioctl(target_file.fileno(), _FICLONE, source_file.fileno())
+
+
 class ImageStore:
     """校验图片内容并按 SHA-256 原子写入本地存储。"""
 
@@ -123,35 +147,22 @@ class ImageStore:
         *,
         root: Path,
         max_image_bytes: int = MAX_ARCHIVE_IMAGE_BYTES,
+        hardlink_local_files: bool = False,
     ) -> None:
-        """设置图片根目录和单文件大小限制。"""
+        """设置图片根目录、单文件大小限制和本地文件是否优先硬链接。"""
         if max_image_bytes < 1:
             raise ValueError("单张图片大小限制必须大于等于 1")
         self.root: Path = root
         self.max_image_bytes: int = max_image_bytes
+        self.hardlink_local_files: bool = hardlink_local_files
 
     async def store(self, *, image_bytes: bytes) -> StoredImage:
         """按实际内容识别图片类型，去重后原子写入。"""
         image_size = len(image_bytes)
-        if image_size > self.max_image_bytes:
-            raise ImageTooLargeError(
-                f"图片大小 {image_size} 字节超过上限 "
-                f"{self.max_image_bytes} 字节"
-            )
-
-        guess_file_type = cast(
-            Callable[[bytes], _DetectedFileType | None],
-            filetype.guess,
-        )
-        detected = guess_file_type(image_bytes)
-        if detected is None or not detected.mime.startswith("image/"):
-            raise InvalidImageContentError("文件内容无法识别为图片")
-
-        digest = hashlib.sha256(image_bytes).hexdigest()
-        storage_path = Path(
-            digest[:2],
-            digest[2:4],
-            f"{digest}.{detected.extension.lower()}",
+        self._check_size(size_bytes=image_size)
+        detected = self._detect(head=image_bytes)
+        storage_path = self._storage_path(
+            digest=hashlib.sha256(image_bytes).hexdigest(), detected=detected
         )
         destination = self.root / storage_path
         await asyncio.to_thread(destination.parent.mkdir, parents=True, exist_ok=True)
@@ -168,6 +179,80 @@ class ImageStore:
             size_bytes=image_size,
         )
 
+    async def store_stream(self, *, chunks: AsyncIterable[bytes]) -> StoredImage:
+        """边接收边写入临时文件并增量计算 SHA-256，完成后按摘要原子发布。
+
+        内存占用只有当前块和用于识别类型的文件开头；开头收满后立即识别，
+        不是图片或超过大小上限时中止接收。临时文件位于图片根目录，与最终
+        路径在同一文件系统，发布时直接改名。
+        """
+        await asyncio.to_thread(self.root.mkdir, parents=True, exist_ok=True)
+        temporary = self._incoming_path()
+        hasher = hashlib.sha256()
+        head = bytearray()
+        detected: _DetectedFileType | None = None
+        image_size = 0
+        try:
+            async with aiofiles.open(temporary, mode="xb") as target:
+                async for chunk in chunks:
+                    image_size += len(chunk)
+                    self._check_size(size_bytes=image_size)
+                    hasher.update(chunk)
+                    if detected is None:
+                        head += chunk[: _SNIFF_BYTES - len(head)]
+                        if len(head) >= _SNIFF_BYTES:
+                            detected = self._detect(head=bytes(head))
+                    _ = await target.write(chunk)
+                await target.flush()
+            if detected is None:
+                detected = self._detect(head=bytes(head))
+            storage_path = self._storage_path(
+                digest=hasher.hexdigest(), detected=detected
+            )
+            await asyncio.to_thread(
+                self._publish_file, temporary=temporary, storage_path=storage_path
+            )
+        finally:
+            await self._remove_temporary(temporary=temporary)
+
+        return StoredImage(
+            storage_key=storage_path.as_posix(),
+            mime_type=detected.mime,
+            size_bytes=image_size,
+        )
+
+    async def store_file(self, *, path: Path) -> StoredImage:
+        """把与 NapCat 共享文件系统的本地图片纳入存储，不经过用户态逐块复制。
+
+        可用时依次尝试硬链接（需开启 ``hardlink_local_files``）、reflink 和
+        内核态复制，先放到图片根目录下的临时路径，再对这份副本识别类型并计算
+        SHA-256，避免来源文件在校验后被替换。硬链接与来源共享同一份数据，
+        NapCat 原地改写缓存文件会同时改变归档内容，因此默认关闭。
+
+        复制、校验、发布和清理临时文件在同一个线程中完成；调用方超时取消时
+        线程仍会执行到底并自行清理，不会在复制途中删除临时文件而留下残留。
+        """
+        stored, method = await asyncio.to_thread(self._store_local_file, source=path)
+        log_event(
+            level="DEBUG",
+            event="napcat.image_archive.local_ingested",
+            category="napcat_tools",
+            message="本地图片已纳入归档存储",
+            method=method,
+            path=str(path),
+            storage_key=stored.storage_key,
+        )
+        return stored
+
+    async def read(self, *, storage_key: str) -> bytes:
+        """读取已归档图片内容，拒绝越出图片根目录的存储键。"""
+        root = await asyncio.to_thread(self.root.resolve)
+        path = await asyncio.to_thread((root / Path(storage_key)).resolve)
+        if not path.is_relative_to(root):
+            raise ValueError(f"图片存储键越出图片根目录: {storage_key}")
+        async with aiofiles.open(path, mode="rb") as source:
+            return await source.read()
+
     async def _publish_atomically(
         self,
         *,
@@ -184,16 +269,112 @@ class ImageStore:
                 await target.flush()
             await asyncio.to_thread(os.replace, temporary, destination)
         finally:
+            await self._remove_temporary(temporary=temporary)
+
+    def _incoming_path(self) -> Path:
+        """在图片根目录生成与最终路径同文件系统的临时文件名。"""
+        return self.root / f".incoming.{secrets.token_hex(8)}.tmp"
+
+    def _publish_file(self, *, temporary: Path, storage_path: Path) -> None:
+        """把已校验的临时文件改名到存储路径，内容已存在时保留原文件。"""
+        destination = self.root / storage_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        if not destination.is_file():
+            os.replace(temporary, destination)
+
+    def _store_local_file(
+        self, *, source: Path
+    ) -> tuple[StoredImage, LocalIngestMethod]:
+        """在工作线程中完成本地文件的放置、校验、发布和临时文件清理。"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        temporary = self._incoming_path()
+        try:
+            method = self._ingest_local_file(source=source, temporary=temporary)
+            image_size, detected, digest = self._inspect_file(path=temporary)
+            storage_path = self._storage_path(digest=digest, detected=detected)
+            self._publish_file(temporary=temporary, storage_path=storage_path)
+        finally:
+            self._unlink_temporary(temporary=temporary)
+        stored = StoredImage(
+            storage_key=storage_path.as_posix(),
+            mime_type=detected.mime,
+            size_bytes=image_size,
+        )
+        return stored, method
+
+    def _ingest_local_file(self, *, source: Path, temporary: Path) -> LocalIngestMethod:
+        """把本地文件放到临时路径，返回实际使用的方式；超限文件不复制。"""
+        self._check_size(size_bytes=source.stat().st_size)
+        if self.hardlink_local_files:
             try:
-                await asyncio.to_thread(temporary.unlink, missing_ok=True)
-            except OSError as exc:
-                log_exception(
-                    event="napcat.image_archive.temp_cleanup_failed",
-                    category="napcat_tools",
-                    message="清理图片归档临时文件失败",
-                    exc=exc,
-                    path=str(temporary),
-                )
+                os.link(source, temporary)
+            except OSError:
+                pass
+            else:
+                return "hardlink"
+        try:
+            _clone_file(source=source, target=temporary)
+        except OSError:
+            temporary.unlink(missing_ok=True)
+        else:
+            return "reflink"
+        # Linux 上 copyfile 使用 sendfile，数据不经过用户态缓冲区。
+        _ = shutil.copyfile(source, temporary)
+        return "copy"
+
+    def _inspect_file(self, *, path: Path) -> tuple[int, _DetectedFileType, str]:
+        """检查文件大小和开头的图片类型，通过后计算整份文件的 SHA-256。"""
+        with path.open("rb") as file:
+            image_size = os.fstat(file.fileno()).st_size
+            self._check_size(size_bytes=image_size)
+            detected = self._detect(head=file.read(_SNIFF_BYTES))
+            _ = file.seek(0)
+            digest = hashlib.file_digest(file, "sha256").hexdigest()
+        return image_size, detected, digest
+
+    async def _remove_temporary(self, *, temporary: Path) -> None:
+        """在工作线程中删除未发布或已去重的临时文件。"""
+        await asyncio.to_thread(self._unlink_temporary, temporary=temporary)
+
+    def _unlink_temporary(self, *, temporary: Path) -> None:
+        """删除未发布或已去重的临时文件，失败只记录日志。"""
+        try:
+            temporary.unlink(missing_ok=True)
+        except OSError as exc:
+            log_exception(
+                event="napcat.image_archive.temp_cleanup_failed",
+                category="napcat_tools",
+                message="清理图片归档临时文件失败",
+                exc=exc,
+                path=str(temporary),
+            )
+
+    def _check_size(self, *, size_bytes: int) -> None:
+        """拒绝超过单文件大小上限的图片。"""
+        if size_bytes > self.max_image_bytes:
+            raise ImageTooLargeError(
+                f"图片大小 {size_bytes} 字节超过上限 "
+                f"{self.max_image_bytes} 字节"
+            )
+
+    def _detect(self, *, head: bytes) -> _DetectedFileType:
+        """按文件开头的实际内容识别图片类型。"""
+        guess_file_type = cast(
+            Callable[[bytes], _DetectedFileType | None],
+            filetype.guess,
+        )
+        detected = guess_file_type(head)
+        if detected is None or not detected.mime.startswith("image/"):
+            raise InvalidImageContentError("文件内容无法识别为图片")
+        return detected
+
+    def _storage_path(self, *, digest: str, detected: _DetectedFileType) -> Path:
+        """按 SHA-256 摘要分两级目录生成相对存储路径。"""
+        return Path(
+            digest[:2],
+            digest[2:4],
+            f"{digest}.{detected.extension.lower()}",
+        )
 
 
 @dataclass(frozen=True, slots=True)
@@ -385,9 +566,13 @@ class ImageArchiveWorker:
     async def _process_task(self, *, task: ImageArchiveTask) -> None:
         """执行一次读取和存储，任何可恢复失败都转为任务状态。"""
         try:
+            # 图片边下载边写入存储，内存占用受分块大小和并发数约束；
+            # 本地路径来源直接链接或复制文件，不经过分块读取。
             async with asyncio.timeout(self.read_timeout_seconds):
-                read_result = await self.reader.read(
-                    resource=self._resource_for_task(task=task)
+                read_result = await self.reader.read_into(
+                    resource=self._resource_for_task(task=task),
+                    consume=lambda chunks: self.store.store_stream(chunks=chunks),
+                    consume_path=lambda path: self.store.store_file(path=path),
                 )
             if not read_result.ok:
                 await self._record_failure(
@@ -396,14 +581,14 @@ class ImageArchiveWorker:
                     error=read_result.error or "图片没有可读取内容",
                 )
                 return
-            if read_result.source is None or read_result.image_bytes is None:
+            stored = read_result.value
+            if read_result.source is None or stored is None:
                 await self._record_failure(
                     task=task,
                     error_type="ImageReaderProtocolError",
-                    error="图片读取成功结果缺少来源或字节内容",
+                    error="图片读取成功结果缺少来源或存储结果",
                 )
                 return
-            stored = await self.store.store(image_bytes=read_result.image_bytes)
         except Exception as exc:
             await self._record_failure(
                 task=task,
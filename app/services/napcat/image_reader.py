@@ -3,9 +3,11 @@
 import asyncio
 import base64
 import binascii
+from collections.abc import AsyncGenerator, AsyncIterator, Awaitable, Callable
+from contextlib import aclosing
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Literal, Protocol
+from typing import Final, Literal, Protocol
 
 import aiofiles
 import httpx
@@ -15,6 +17,13 @@ from app.utils.log import log_event
 
 
 type ImageReadSource = Literal["direct_path", "direct_url", "napcat_refresh"]
+# 消费方从图片块流中读取结果，例如拼接为字节或边收边写入磁盘。
+type ImageChunkConsumer[T] = Callable[[AsyncIterator[bytes]], Awaitable[T]]
+# 消费方直接处理本地图片文件，例如以硬链接或 reflink 纳入存储而不逐块复制。
+type ImagePathConsumer[T] = Callable[[Path], Awaitable[T]]
+
+# 本地文件和 URL 下载的分块大小，决定流式消费时单张图片占用的内存。
+READ_CHUNK_BYTES: Final[int] = 64 * 1024
 
 
 class ImageReadTooLargeError(ValueError):
@@ -58,6 +67,33 @@ class NapCatImageReadResult:
         return self.image_bytes is not None
 
 
+@dataclass(frozen=True)
+class NapCatImageStreamResult[T]:
+    """描述单张图片交给消费方处理后的结果。"""
+
+    resource: NapCatImageResource
+    value: T | None
+    source: ImageReadSource | None
+    size_bytes: int
+    error_type: str | None
+    error: str | None
+
+    @property
+    def ok(self) -> bool:
+        """图片是否读取并消费成功。"""
+        return self.value is not None
+
+
+async def _join_chunks(chunks: AsyncIterator[bytes]) -> bytes:
+    """把图片块拼接为完整字节。"""
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def _single_chunk(image_bytes: bytes) -> AsyncGenerator[bytes]:
+    """把已在内存中的图片作为单块产出。"""
+    yield image_bytes
+
+
 class NapCatImageReader:
     """按本地路径、现有 URL、NapCat 刷新的顺序读取图片。"""
 
@@ -96,20 +132,45 @@ class NapCatImageReader:
         return list(await asyncio.gather(*(read_one(item) for item in resources)))
 
     async def read(self, *, resource: NapCatImageResource) -> NapCatImageReadResult:
-        """读取单张图片，直接来源失败后再尝试 NapCat 刷新。"""
+        """读取单张图片的完整字节，直接来源失败后再尝试 NapCat 刷新。"""
+        result = await self.read_into(resource=resource, consume=_join_chunks)
+        return NapCatImageReadResult(
+            resource=resource,
+            image_bytes=result.value,
+            source=result.source,
+            error_type=result.error_type,
+            error=result.error,
+        )
+
+    async def read_into[T](
+        self,
+        *,
+        resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None = None,
+    ) -> NapCatImageStreamResult[T]:
+        """按读取顺序把图片块流交给 ``consume``，不在内存中拼接整张图片。
+
+        提供 ``consume_path`` 时，本地路径来源在检查大小后直接交给它处理，
+        不再分块读取。某个来源读取或消费失败时尝试下一个来源，每个来源都
+        重新调用一次消费方；消费方需要自行清理失败尝试留下的中间状态。
+        """
         failures: list[str] = []
         failure_types: list[str] = []
         error_type = "ImageContentUnavailable"
         direct_result = await self._read_direct(
             resource=resource,
+            consume=consume,
+            consume_path=consume_path,
             failures=failures,
             failure_types=failure_types,
         )
         if direct_result is not None:
             return self._finish_success(
                 resource=resource,
-                image_bytes=direct_result[0],
-                source=direct_result[1],
+                value=direct_result[0],
+                size_bytes=direct_result[1],
+                source=direct_result[2],
             )
         if failure_types:
             error_type = failure_types[-1]
@@ -127,18 +188,21 @@ class NapCatImageReader:
                     failures.append(f"NapCat 刷新图片信息失败: {detail}")
                 else:
                     try:
-                        image_bytes = await self._read_refreshed_response(
+                        refreshed = await self._read_refreshed_response(
                             response=response,
+                            consume=consume,
+                            consume_path=consume_path,
                             failures=failures,
                         )
                     except Exception as exc:
                         error_type = type(exc).__name__
                         failures.append(f"读取 NapCat 刷新结果失败: {exc}")
-                        image_bytes = None
-                    if image_bytes is not None:
+                        refreshed = None
+                    if refreshed is not None:
                         return self._finish_success(
                             resource=resource,
-                            image_bytes=image_bytes,
+                            value=refreshed[0],
+                            size_bytes=refreshed[1],
                             source="napcat_refresh",
                         )
         else:
@@ -153,19 +217,24 @@ class NapCatImageReader:
             error=error,
         )
 
-    async def _read_direct(
+    async def _read_direct[T](
         self,
         *,
         resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None,
         failures: list[str],
         failure_types: list[str],
-    ) -> tuple[bytes, ImageReadSource] | None:
+    ) -> tuple[T, int, ImageReadSource] | None:
         """优先读取消息段已有的本地路径和 URL。"""
         if self._has_text(resource.path):
             path = Path(resource.path or "")
             if path.is_file():
                 try:
-                    return await self._read_path(path=path), "direct_path"
+                    value, size_bytes = await self._consume_local(
+                        path=path, consume=consume, consume_path=consume_path
+                    )
+                    return value, size_bytes, "direct_path"
                 except Exception as exc:
                     failure_types.append(type(exc).__name__)
                     failures.append(f"读取本地路径失败: {exc}")
@@ -174,7 +243,11 @@ class NapCatImageReader:
                 failures.append(f"本地路径不存在: {path}")
         if self._has_text(resource.url):
             try:
-                return await self._download_url(url=resource.url or ""), "direct_url"
+                value, size_bytes = await self._consume(
+                    chunks=self._download_url(url=resource.url or ""),
+                    consume=consume,
+                )
+                return value, size_bytes, "direct_url"
             except Exception as exc:
                 failure_types.append(type(exc).__name__)
                 failures.append(f"下载现有 URL 失败: {exc}")
@@ -186,9 +259,14 @@ class NapCatImageReader:
             return await self.bot.get_image(file=resource.file)
         return await self.bot.get_image(file_id=resource.file_id)
 
-    async def _read_refreshed_response(
-        self, *, response: Response, failures: list[str]
-    ) -> bytes | None:
+    async def _read_refreshed_response[T](
+        self,
+        *,
+        response: Response,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None,
+        failures: list[str],
+    ) -> tuple[T, int] | None:
         """读取 NapCat 响应中的 base64、本地路径或 URL。"""
         data = response.data if isinstance(response.data, dict) else {}
         raw_base64 = data.get("base64")
@@ -201,9 +279,12 @@ class NapCatImageReader:
                     )
                     image_bytes = base64.b64decode(encoded_image, validate=True)
                     self._validate_size(image_bytes=image_bytes)
-                    return image_bytes
                 except binascii.Error as exc:
                     failures.append(f"NapCat 返回的 base64 无效: {exc}")
+                else:
+                    return await self._consume(
+                        chunks=_single_chunk(image_bytes), consume=consume
+                    )
         for key in ("path", "file"):
             value = data.get(key)
             if not isinstance(value, str) or value.strip() == "":
@@ -213,7 +294,9 @@ class NapCatImageReader:
                 failures.append(f"NapCat 返回的本地路径不存在: {path}")
                 continue
             try:
-                return await self._read_path(path=path)
+                return await self._consume_local(
+                    path=path, consume=consume, consume_path=consume_path
+                )
             except ImageReadTooLargeError:
                 raise
             except Exception as exc:
@@ -221,15 +304,36 @@ class NapCatImageReader:
         url = data.get("url")
         if isinstance(url, str) and url.strip() != "":
             try:
-                return await self._download_url(url=url)
+                return await self._consume(
+                    chunks=self._download_url(url=url), consume=consume
+                )
             except ImageReadTooLargeError:
                 raise
             except Exception as exc:
                 failures.append(f"下载 NapCat 刷新 URL 失败: {exc}")
         return None
 
-    async def _download_url(self, *, url: str) -> bytes:
-        """通过 MyBot 本地 HTTP 客户端下载图片。"""
+    async def _consume[T](
+        self, *, chunks: AsyncGenerator[bytes], consume: ImageChunkConsumer[T]
+    ) -> tuple[T, int]:
+        """把一个来源的图片块交给消费方，返回消费结果和实际读取的字节数。
+
+        消费方提前结束时关闭来源，及时释放 HTTP 连接或文件句柄。
+        """
+        size_bytes = 0
+
+        async def counted() -> AsyncGenerator[bytes]:
+            nonlocal size_bytes
+            async for chunk in chunks:
+                size_bytes += len(chunk)
+                yield chunk
+
+        async with aclosing(chunks), aclosing(counted()) as counted_chunks:
+            value = await consume(counted_chunks)
+        return value, size_bytes
+
+    async def _download_url(self, *, url: str) -> AsyncGenerator[bytes]:
+        """通过 MyBot 本地 HTTP 客户端分块下载图片。"""
         if self.http_client is None:
             raise RuntimeError("图片 URL 下载需要配置 HTTP 客户端")
         if self.max_image_bytes is not None:
@@ -253,38 +357,57 @@ class NapCatImageReader:
                             self._size_error(size_bytes=declared_size_value)
                         )
 
-                chunks: list[bytes] = []
                 size_bytes = 0
-                async for chunk in response.aiter_bytes():
+                async for chunk in response.aiter_bytes(chunk_size=READ_CHUNK_BYTES):
                     size_bytes += len(chunk)
                     if size_bytes > self.max_image_bytes:
                         raise ImageReadTooLargeError(
                             self._size_error(size_bytes=size_bytes)
                         )
-                    chunks.append(chunk)
-                return b"".join(chunks)
+                    yield chunk
+                return
         response = await self.http_client.get(
             url,
             timeout=self.download_timeout_seconds,
         )
         response.raise_for_status()
-        return response.content
+        yield response.content
 
-    async def _read_path(self, *, path: Path) -> bytes:
-        """在读取前后检查本地图片大小，避免文件变更绕过限制。"""
+    async def _consume_local[T](
+        self,
+        *,
+        path: Path,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None,
+    ) -> tuple[T, int]:
+        """本地文件优先交给 ``consume_path``，否则分块读取后交给 ``consume``。"""
+        if consume_path is None:
+            return await self._consume(
+                chunks=self._read_path(path=path), consume=consume
+            )
+        size_bytes = await self._checked_file_size(path=path)
+        return await consume_path(path), size_bytes
+
+    async def _checked_file_size(self, *, path: Path) -> int:
+        """读取本地文件大小，超过上限时在打开文件前拒绝。"""
+        size_bytes = (await asyncio.to_thread(path.stat)).st_size
+        if self.max_image_bytes is not None and size_bytes > self.max_image_bytes:
+            raise ImageReadTooLargeError(self._size_error(size_bytes=size_bytes))
+        return size_bytes
+
+    async def _read_path(self, *, path: Path) -> AsyncGenerator[bytes]:
+        """分块读取本地图片，读取前后都检查大小，避免文件变更绕过限制。"""
         if self.max_image_bytes is not None:
-            stat_result = await asyncio.to_thread(path.stat)
-            if stat_result.st_size > self.max_image_bytes:
-                raise ImageReadTooLargeError(
-                    self._size_error(size_bytes=stat_result.st_size)
-                )
+            _ = await self._checked_file_size(path=path)
+        size_bytes = 0
         async with aiofiles.open(path, mode="rb") as file:
-            if self.max_image_bytes is None:
-                image_bytes = await file.read()
-            else:
-                image_bytes = await file.read(self.max_image_bytes + 1)
-        self._validate_size(image_bytes=image_bytes)
-        return image_bytes
+            while chunk := await file.read(READ_CHUNK_BYTES):
+                size_bytes += len(chunk)
+                if self.max_image_bytes is not None and size_bytes > self.max_image_bytes:
+                    raise ImageReadTooLargeError(
+                        self._size_error(size_bytes=size_bytes)
+                    )
+                yield chunk
 
     def _validate_size(self, *, image_bytes: bytes) -> None:
         """检查已解码或读取的图片字节数。"""
@@ -314,43 +437,46 @@ class NapCatImageReader:
             f"{self.max_image_bytes} 字节"
         )
 
-    def _finish_success(
+    def _finish_success[T](
         self,
         *,
         resource: NapCatImageResource,
-        image_bytes: bytes,
+        value: T,
+        size_bytes: int,
         source: ImageReadSource,
-    ) -> NapCatImageReadResult:
+    ) -> NapCatImageStreamResult[T]:
         """记录并返回成功结果。"""
-        result = NapCatImageReadResult(
+        result = NapCatImageStreamResult(
             resource=resource,
-            image_bytes=image_bytes,
+            value=value,
             source=source,
+            size_bytes=size_bytes,
             error_type=None,
             error=None,
         )
         self._log_result(result=result)
         return result
 
-    def _finish_error(
+    def _finish_error[T](
         self,
         *,
         resource: NapCatImageResource,
         error_type: str,
         error: str,
-    ) -> NapCatImageReadResult:
+    ) -> NapCatImageStreamResult[T]:
         """记录并返回失败结果。"""
-        result = NapCatImageReadResult(
+        result: NapCatImageStreamResult[T] = NapCatImageStreamResult(
             resource=resource,
-            image_bytes=None,
+            value=None,
             source=None,
+            size_bytes=0,
             error_type=error_type,
             error=error,
         )
         self._log_result(result=result)
         return result
 
-    def _log_result(self, *, result: NapCatImageReadResult) -> None:
+    def _log_result[T](self, *, result: NapCatImageStreamResult[T]) -> None:
         """记录资源字段、最终来源和失败原因。"""
         resource = result.resource
         log_event(
@@ -366,7 +492,7 @@ class NapCatImageReader:
             file_id=resource.file_id,
             source=result.source,
             ok=result.ok,
-            bytes_count=len(result.image_bytes or b""),
+            bytes_count=result.size_bytes,
             error_type=result.error_type,
             error=result.error,
         )
@@ -40,18 +40,14 @@ JSON_TEXT_LIMIT = 600
 MARKDOWN_TEXT_LIMIT = 800
 FORWARD_MAX_ITEMS = 8
 FORWARD_MAX_DEPTH = 2
+# TypeAdapter 构建消息段联合类型的校验器开销较大，模块内共享一份。
+_SEGMENT_ADAPTER: TypeAdapter[MessageSegment] = TypeAdapter(MessageSegment)
+_SEGMENTS_ADAPTER: TypeAdapter[list[MessageSegment]] = TypeAdapter(list[MessageSegment])
 
 
 class NapCatMessageTextFormatter:
     """把 NapCat 消息段转换为适合模型阅读的中文摘要。"""
 
-    def __init__(self) -> None:
-        """初始化消息段解析器。"""
-        self.segment_adapter: TypeAdapter[MessageSegment] = TypeAdapter(MessageSegment)
-        self.segments_adapter: TypeAdapter[list[MessageSegment]] = TypeAdapter(
-            list[MessageSegment]
-        )
-
     def format_segments(
         self,
         *,
@@ -567,7 +563,7 @@ class NapCatMessageTextFormatter:
         if not isinstance(value, list):
             return None
         try:
-            return self.segments_adapter.validate_python(value)
+            return _SEGMENTS_ADAPTER.validate_python(value)
         except ValidationError:
             return None
 
@@ -576,7 +572,7 @@ class NapCatMessageTextFormatter:
         if not isinstance(value, dict) or "type" not in value:
             return None
         try:
-            return self.segment_adapter.validate_python(value)
+            return _SEGMENT_ADAPTER.validate_python(value)
         except ValidationError:
             return None
 
@@ -0,0 +1,293 @@
+"""按网络配置调优的共享 HTTP 连接池及其计数。"""
+
+import ipaddress
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, replace
+from importlib.util import find_spec
+from urllib.request import getproxies
+
+import httpcore
+import httpx
+
+from app.config.schemas import NetworkConfig
+from app.utils.log import log_event
+
+
+@dataclass(frozen=True, slots=True)
+class HttpPoolStats:
+    """单个 HTTP 客户端的请求数、在途请求、连接和排队计数。
+
+    读不到底层连接池时 ``connections`` 和 ``idle_connections`` 为 None，
+    排队计数也不再增加。
+    """
+
+    name: str
+    http2: bool
+    requests: int
+    active: int
+    peak_active: int
+    connections: int | None
+    idle_connections: int | None
+    waits: int
+
+
+def _pool_connections(
+    transport: httpx.AsyncBaseTransport,
+) -> list[httpcore.AsyncConnectionInterface] | None:
+    """读取 httpx 传输层底层连接池的连接列表，读不到时返回 None。
+
+    httpx 没有公开连接池对象，只有这里按内部属性读取；httpx 升级改变结构
+    或传输层不是 httpx 连接池时只缺少连接指标，不影响请求。
+    """
+    try:
+        pool: object = getattr(transport, "_pool", None)
+        if not isinstance(pool, httpcore.AsyncConnectionPool):
+            return None
+        return pool.connections
+    except Exception:
+        return None
+
+
+def _sum_available(values: list[int | None]) -> int | None:
+    """合计各传输层的连接指标，任一不可用时整体不可用。"""
+    total = 0
+    for value in values:
+        if value is None:
+            return None
+        total += value
+    return total
+
+def _environment_proxy_mounts() -> dict[str, str | None]:
+    """按 ``HTTP(S)_PROXY``、``ALL_PROXY`` 和 ``NO_PROXY`` 生成代理挂载点。
+
+    规则与 ``AsyncClient(trust_env=True)`` 相同：值为 None 的挂载点来自
+    ``NO_PROXY``，对应主机直连；``NO_PROXY=*`` 时全部直连。
+    """
+    proxies = getproxies()
+    mounts: dict[str, str | None] = {}
+    for scheme in ("http", "https", "all"):
+        proxy_url = proxies.get(scheme)
+        if proxy_url:
+            mounts[f"{scheme}://"] = (
+                proxy_url if "://" in proxy_url else f"http://{proxy_url}"
+            )
+    for host in (item.strip() for item in proxies.get("no", "").split(",")):
+        if host == "*":
+            return {}
+        if not host:
+            continue
+        if "://" in host:
+            mounts[host] = None
+            continue
+        try:
+            address = ipaddress.ip_address(host.split("/")[0])
+        except ValueError:
+            address = None
+        if isinstance(address, ipaddress.IPv6Address):
+            mounts[f"all://[{host}]"] = None
+        elif address is not None or host.lower() == "localhost":
+            mounts[f"all://{host}"] = None
+        else:
+            mounts[f"all://*{host}"] = None
+    return mounts
+
+
+class _MeteredStream(httpx.AsyncByteStream):
+    """响应体关闭时归还在途计数。"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]) -> None:
+        """保存底层响应体和关闭回调。"""
+        self._stream: httpx.AsyncByteStream = stream
+        self._on_close: Callable[[], None] = on_close
+        self._closed: bool = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """逐块转发底层响应体。"""
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        """关闭底层响应体，只归还一次计数。"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self._stream.aclose()
+        finally:
+            self._on_close()
+
+
+@dataclass(slots=True)
+class _RequestCounters:
+    """同一客户端所有传输层共享的请求、在途和排队计数。"""
+
+    requests: int = 0
+    active: int = 0
+    peak_active: int = 0
+    waits: int = 0
+
+    def start(self, *, waiting: bool) -> None:
+        """记录一个新请求进入在途状态。"""
+        self.requests += 1
+        if waiting:
+            self.waits += 1
+        self.active += 1
+        self.peak_active = max(self.peak_active, self.active)
+
+    def release(self) -> None:
+        """归还一个在途计数。"""
+        self.active -= 1
+
+
+class MeteredTransport(httpx.AsyncBaseTransport):
+    """统计在途请求和连接池占用的传输层。
+
+    请求从发出到响应体关闭都算在途；流式响应会一直占用连接，直到调用方
+    读完或关闭。发出请求时连接数已达上限且没有可用连接，记为一次排队等待。
+    同一客户端的直连和代理传输层可以共享一组请求计数。
+    """
+
+    def __init__(
+        self,
+        *,
+        name: str,
+        transport: httpx.AsyncBaseTransport,
+        max_connections: int,
+        http2: bool = False,
+        counters: _RequestCounters | None = None,
+    ) -> None:
+        """包装底层传输层；底层是 httpx 连接池时同时统计连接数。"""
+        self.name: str = name
+        self.http2: bool = http2
+        self._max_connections: int = max_connections
+        self._transport: httpx.AsyncBaseTransport = transport
+        self._counters: _RequestCounters = counters or _RequestCounters()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """转发请求，响应体关闭前保持在途计数。"""
+        self._counters.start(waiting=self._pool_exhausted())
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._counters.release()
+            raise
+        if not isinstance(response.stream, httpx.AsyncByteStream):
+            self._counters.release()
+            return response
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_MeteredStream(response.stream, self._counters.release),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """关闭底层传输层。"""
+        await self._transport.aclose()
+
+    def stats(self) -> HttpPoolStats:
+        """返回当前在途请求、连接数和累计计数。"""
+        connections = _pool_connections(self._transport)
+        return HttpPoolStats(
+            name=self.name,
+            http2=self.http2,
+            requests=self._counters.requests,
+            active=self._counters.active,
+            peak_active=self._counters.peak_active,
+            connections=None if connections is None else len(connections),
+            idle_connections=(
+                None
+                if connections is None
+                else sum(connection.is_idle() for connection in connections)
+            ),
+            waits=self._counters.waits,
+        )
+
+    def _pool_exhausted(self) -> bool:
+        """判断新请求是否需要等待连接池腾出连接。"""
+        connections = _pool_connections(self._transport)
+        if connections is None:
+            return False
+        return len(connections) >= self._max_connections and not any(
+            connection.is_available() for connection in connections
+        )
+
+
+class MeteredAsyncClient(httpx.AsyncClient):
+    """按 ``NetworkConfig`` 设置连接池上限、keepalive 和 HTTP/2 的客户端。
+
+    显式传入传输层会让 httpx 跳过 ``HTTP(S)_PROXY``、``ALL_PROXY`` 和
+    ``NO_PROXY`` 环境变量；未指定 ``proxy`` 时这里按 httpx 的同一规则
+    自行挂载带计数的代理传输层，与默认 ``AsyncClient`` 的代理行为一致。
+    读不到 httpx 连接池时记录一次警告，连接数指标显示为不可用。
+    """
+
+    def __init__(
+        self, *, name: str, network: NetworkConfig, proxy: str | None = None
+    ) -> None:
+        """创建带计数的连接池；未安装 h2 时 HTTP/2 回退到 HTTP/1.1。"""
+        http2 = network.http2
+        if http2 and find_spec("h2") is None:
+            http2 = False
+            log_event(
+                level="WARNING",
+                event="network.http2_unavailable",
+                category="config",
+                message="未安装 h2，HTTP 客户端回退到 HTTP/1.1",
+                client=name,
+            )
+        counters = _RequestCounters()
+        limits = httpx.Limits(
+            max_connections=network.max_connections,
+            max_keepalive_connections=network.max_keepalive_connections,
+            keepalive_expiry=network.keepalive_expiry_seconds,
+        )
+
+        def metered(proxy_url: str | None) -> MeteredTransport:
+            return MeteredTransport(
+                name=name,
+                http2=http2,
+                max_connections=network.max_connections,
+                counters=counters,
+                transport=httpx.AsyncHTTPTransport(
+                    http2=http2, proxy=proxy_url, limits=limits
+                ),
+            )
+
+        self.transport_meter: MeteredTransport = metered(proxy)
+        if self.transport_meter.stats().connections is None:
+            log_event(
+                level="WARNING",
+                event="network.http_pool.metrics_unavailable",
+                category="runtime",
+                message="无法读取 httpx 连接池，连接数和排队计数不可用",
+                client=name,
+            )
+        environment_proxies = _environment_proxy_mounts() if proxy is None else {}
+        # 值为 None 的挂载点来自 NO_PROXY，httpx 对其使用默认的直连传输层。
+        self.proxy_meters: dict[str, MeteredTransport] = {
+            pattern: metered(proxy_url)
+            for pattern, proxy_url in environment_proxies.items()
+            if proxy_url is not None
+        }
+        super().__init__(
+            transport=self.transport_meter,
+            mounts={
+                pattern: self.proxy_meters.get(pattern)
+                for pattern in environment_proxies
+            },
+            timeout=network.timeout_seconds,
+        )
+
+    def pool_stats(self) -> HttpPoolStats:
+        """返回直连和环境变量代理传输层合计的连接池计数。"""
+        stats = self.transport_meter.stats()
+        all_stats = [stats, *(meter.stats() for meter in self.proxy_meters.values())]
+        connections = [item.connections for item in all_stats]
+        idle_connections = [item.idle_connections for item in all_stats]
+        return replace(
+            stats,
+            connections=_sum_available(connections),
+            idle_connections=_sum_available(idle_connections),
+        )
+
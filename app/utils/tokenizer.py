@@ -0,0 +1,94 @@
+"""本地字节级 BPE 分词器，按磁盘上的词表统计 token 数，不访问网络。"""
+
+import base64
+import binascii
+import re
+from pathlib import Path
+from typing import Final
+
+# 近似 cl100k/o200k 的预切分规则；标准库 re 不支持 \p{L}，用 [^\W\d_] 表示字母。
+# 每个字符都会落入某个分支，切分结果拼接后与原文一致。
+_PRETOKENIZE_PATTERN: Final[re.Pattern[str]] = re.compile(
+    r"'(?i:[sdmt]|ll|ve|re)"
+    r"| ?[^\W\d_]+"
+    r"| ?\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+# 过长的片段（如整段不含空格的中文）按字节分块合并，避免 BPE 合并退化为平方复杂度。
+_MAX_PIECE_BYTES: Final[int] = 256
+# 片段计数缓存上限；群聊高频词重复出现，超限时整体清空即可。
+_PIECE_CACHE_SIZE: Final[int] = 65536
+
+
+class BPETokenizer:
+    """读取 tiktoken 格式词表（每行 ``base64 token`` 与 ``rank``）的 BPE 分词器。
+
+    只用于估算 prompt token，不产出 token ID；预切分规则与官方实现略有
+    差异，误差由调用方按 API 返回的 ``usage.prompt_tokens`` 校准。
+    """
+
+    def __init__(self, *, ranks: dict[bytes, int], name: str) -> None:
+        """保存合并优先级表。"""
+        if not ranks:
+            raise ValueError("BPE 词表不能为空")
+        self.name: str = name
+        self._ranks: dict[bytes, int] = ranks
+        self._piece_tokens: dict[bytes, int] = {}
+
+    @classmethod
+    def from_file(cls, path: Path) -> "BPETokenizer":
+        """从本地词表文件加载分词器。"""
+        ranks: dict[bytes, int] = {}
+        with path.open("rb") as file:
+            for line_number, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    token, rank = line.split()
+                    ranks[base64.b64decode(token, validate=True)] = int(rank)
+                except (ValueError, binascii.Error) as exc:
+                    raise ValueError(
+                        f"BPE 词表第 {line_number} 行格式错误，应为 base64 token 和 rank"
+                    ) from exc
+        return cls(ranks=ranks, name=path.name)
+
+    def count(self, text: str) -> int:
+        """返回文本的 BPE token 数。"""
+        tokens = 0
+        for piece in _PRETOKENIZE_PATTERN.findall(text):
+            encoded = piece.encode("utf-8")
+            for start in range(0, len(encoded), _MAX_PIECE_BYTES):
+                tokens += self._count_piece(encoded[start : start + _MAX_PIECE_BYTES])
+        return tokens
+
+    def _count_piece(self, piece: bytes) -> int:
+        """按 rank 从小到大合并相邻字节对，返回合并后的片段数。"""
+        cached = self._piece_tokens.get(piece)
+        if cached is not None:
+            return cached
+        ranks = self._ranks
+        if piece in ranks:
+            tokens = 1
+        else:
+            parts = [piece[index : index + 1] for index in range(len(piece))]
+            while len(parts) > 1:
+                best_rank: int | None = None
+                best_index = -1
+                for index in range(len(parts) - 1):
+                    rank = ranks.get(parts[index] + parts[index + 1])
+                    if rank is not None and (best_rank is None or rank < best_rank):
+                        best_rank = rank
+                        best_index = index
+                if best_index < 0:
+                    break
+                parts[best_index : best_index + 2] = [
+                    parts[best_index] + parts[best_index + 1]
+                ]
+            tokens = len(parts)
+        if len(self._piece_tokens) >= _PIECE_CACHE_SIZE:
+            self._piece_tokens.clear()
+        self._piece_tokens[piece] = tokens
+        return tokens
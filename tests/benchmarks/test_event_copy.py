@@ -0,0 +1,52 @@
+"""事件分发前深拷贝的开销基准。
+
+冻结协议模型后分发不再执行 ``copy.deepcopy``；本基准保留被移除的拷贝
+成本作为对照，默认测试只执行一次。
+"""
+
+import copy
+import json
+from pathlib import Path
+from typing import cast
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from app.core.event_parser import EventTypeChecker
+from app.models import AllEvent
+
+NAPCAT_FRAMES_PATH = Path("tests/fixtures/napcat/frames.jsonl")
+
+
+def _load_message_events() -> dict[str, AllEvent]:
+    """解析录制语料中的消息事件，以消息段数量命名。"""
+    checker = EventTypeChecker()
+    events: dict[str, AllEvent] = {}
+    for line in NAPCAT_FRAMES_PATH.read_text(encoding="utf-8").splitlines():
+        frame = cast(dict[str, object], json.loads(line))
+        if "message_type" not in frame:
+            continue
+        event = checker.get_event(frame)
+        assert event is not None
+        segments = cast(list[object], frame["message"])
+        events[f"{frame['message_id']}-{len(segments)}segments"] = event
+    return events
+
+
+MESSAGE_EVENTS = _load_message_events()
+
+
+@pytest.mark.parametrize("event_name", sorted(MESSAGE_EVENTS))
+def test_deepcopy_before_dispatch(benchmark: BenchmarkFixture, event_name: str) -> None:
+    """移除前：每次分发都深拷贝整棵事件模型。"""
+    event = MESSAGE_EVENTS[event_name]
+    copied = cast(AllEvent, benchmark(copy.deepcopy, event))
+    assert copied == event
+
+
+@pytest.mark.parametrize("event_name", sorted(MESSAGE_EVENTS))
+def test_shared_frozen_event(benchmark: BenchmarkFixture, event_name: str) -> None:
+    """移除后：插件共享同一个冻结实例。"""
+    event = MESSAGE_EVENTS[event_name]
+    shared = cast(AllEvent, benchmark(lambda: event))
+    assert shared is event
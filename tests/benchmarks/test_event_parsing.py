@@ -0,0 +1,149 @@
+"""NapCat 事件解析基准：完整联合类型与判别字段快路径逐类型对比。
+
+默认测试只把每个基准执行一次；需要测量时运行::
+
+    pytest tests/benchmarks --benchmark-enable --benchmark-group-by=param:frame_name
+"""
+
+import json
+from pathlib import Path
+from typing import cast
+
+import pytest
+from pydantic import TypeAdapter
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from app.core.event_parser import EventTypeChecker
+from app.models import (
+    AllEvent,
+    At,
+    Contact,
+    Dice,
+    Face,
+    File,
+    Forward,
+    Image,
+    Json,
+    LightApp,
+    Location,
+    Markdown,
+    MessageSegment,
+    MFace,
+    MiniApp,
+    Music,
+    Node,
+    Poke,
+    Record,
+    Reply,
+    Rps,
+    Share,
+    Text,
+    UnknownSegment,
+    Video,
+    Xml,
+)
+
+NAPCAT_FRAMES_PATH = Path("tests/fixtures/napcat/frames.jsonl")
+
+
+def _frame_name(frame: dict[str, object]) -> str:
+    """用 post_type 和二级判别字段命名一帧。"""
+    post_type = frame.get("post_type", "response")
+    for field in ("message_type", "meta_event_type", "notice_type", "request_type"):
+        if field in frame:
+            return f"{post_type}.{frame[field]}"
+    return f"{post_type}.{frame.get('echo', '')}".split("-")[0]
+
+
+def _load_frames() -> dict[str, dict[str, object]]:
+    """读取录制语料，同名帧追加序号。"""
+    frames: dict[str, dict[str, object]] = {}
+    for line in NAPCAT_FRAMES_PATH.read_text(encoding="utf-8").splitlines():
+        frame = cast(dict[str, object], json.loads(line))
+        name = _frame_name(frame)
+        index = 1
+        while name in frames:
+            index += 1
+            name = f"{_frame_name(frame)}#{index}"
+        frames[name] = frame
+    return frames
+
+
+FRAMES = _load_frames()
+CHECKER = EventTypeChecker()
+
+# 预分类前的消息段定义：不带判别器的 smart 联合类型，逐个尝试全部模型。
+type _UntaggedSegment = (
+    Text
+    | At
+    | Image
+    | Face
+    | Reply
+    | Dice
+    | Rps
+    | Record
+    | Video
+    | File
+    | Json
+    | Share
+    | Forward
+    | Node
+    | Music
+    | MFace
+    | Markdown
+    | Contact
+    | Poke
+    | Location
+    | Xml
+    | MiniApp
+    | LightApp
+    | UnknownSegment
+)
+
+UNTAGGED_SEGMENTS: TypeAdapter[list[_UntaggedSegment]] = TypeAdapter(
+    list[_UntaggedSegment]
+)
+TAGGED_SEGMENTS: TypeAdapter[list[MessageSegment]] = TypeAdapter(list[MessageSegment])
+MESSAGE_FRAMES = {
+    name: frame for name, frame in FRAMES.items() if "message_type" in frame
+}
+
+
+@pytest.mark.parametrize("frame_name", sorted(FRAMES))
+def test_full_union_validation(benchmark: BenchmarkFixture, frame_name: str) -> None:
+    """基线：每帧都交给完整 AllEvent 联合类型。"""
+    frame = FRAMES[frame_name]
+    event = cast(AllEvent, benchmark(CHECKER.adapter.validate_python, frame))
+    assert event is not None
+
+
+@pytest.mark.parametrize("frame_name", sorted(FRAMES))
+def test_fast_path_validation(benchmark: BenchmarkFixture, frame_name: str) -> None:
+    """快路径：按判别字段直接校验具体模型。"""
+    frame = FRAMES[frame_name]
+    event = cast(AllEvent | None, benchmark(CHECKER.get_event, frame))
+    assert event == CHECKER.adapter.validate_python(frame)
+
+
+@pytest.mark.parametrize("frame_name", sorted(MESSAGE_FRAMES))
+def test_untagged_segment_validation(
+    benchmark: BenchmarkFixture, frame_name: str
+) -> None:
+    """基线：消息段逐个尝试联合类型成员。"""
+    segments = MESSAGE_FRAMES[frame_name]["message"]
+    parsed = cast(
+        list[MessageSegment], benchmark(UNTAGGED_SEGMENTS.validate_python, segments)
+    )
+    assert parsed
+
+
+@pytest.mark.parametrize("frame_name", sorted(MESSAGE_FRAMES))
+def test_tagged_segment_validation(
+    benchmark: BenchmarkFixture, frame_name: str
+) -> None:
+    """快路径：按 type 直达具体消息段模型。"""
+    segments = MESSAGE_FRAMES[frame_name]["message"]
+    parsed = cast(
+        list[MessageSegment], benchmark(TAGGED_SEGMENTS.validate_python, segments)
+    )
+    assert parsed == UNTAGGED_SEGMENTS.validate_python(segments)
@@ -0,0 +1,55 @@
+"""入站帧解码基准：标准库 json、pydantic-core 解码与直接 validate_json 对比。
+
+``validate_json`` 一栏只作参考：在 JSON 模式下走完整 ``AllEvent`` 联合类型，
+回包的 ``data`` 还会逐层校验，整体慢于“pydantic-core 解码 + 预分类”。
+"""
+
+import json
+from pathlib import Path
+from typing import cast
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from app.core.codec import FRAME_DECODERS, FrameDecoder
+from app.core.event_parser import EventTypeChecker
+from app.models import AllEvent
+
+NAPCAT_FRAMES_PATH = Path("tests/fixtures/napcat/frames.jsonl")
+FRAMES = NAPCAT_FRAMES_PATH.read_text(encoding="utf-8").splitlines()
+CHECKER = EventTypeChecker()
+
+
+def _frame_id(frame: str) -> str:
+    """用判别字段和帧长度命名一帧。"""
+    data = cast(dict[str, object], json.loads(frame))
+    post_type = data.get("post_type", "response")
+    for field in ("message_type", "meta_event_type", "notice_type", "request_type"):
+        if field in data:
+            return f"{post_type}.{data[field]}-{len(frame)}B"
+    return f"{post_type}-{len(frame)}B"
+
+
+def _decode_and_parse(decode: FrameDecoder, frame: str) -> AllEvent | None:
+    """复现读帧阶段的解码与解析阶段的校验。"""
+    data = decode(frame)
+    assert isinstance(data, dict)
+    return CHECKER.get_event(cast(dict[str, object], data))
+
+
+@pytest.mark.parametrize(
+    "decode", FRAME_DECODERS.values(), ids=list(FRAME_DECODERS)
+)
+@pytest.mark.parametrize("frame", FRAMES, ids=_frame_id)
+def test_decode_and_parse(
+    benchmark: BenchmarkFixture, decode: FrameDecoder, frame: str
+) -> None:
+    """按配置的解码器把一帧转换为事件模型。"""
+    _ = cast(object, benchmark(_decode_and_parse, decode, frame))
+    assert _decode_and_parse(decode, frame) == CHECKER.get_event(json.loads(frame))
+
+
+@pytest.mark.parametrize("frame", FRAMES, ids=_frame_id)
+def test_validate_json_reference(benchmark: BenchmarkFixture, frame: str) -> None:
+    """参考：直接用联合类型的 validate_json 解析原始帧。"""
+    _ = cast(object, benchmark(CHECKER.adapter.validate_json, frame))
@@ -0,0 +1,67 @@
+"""上下文预算估算基准：每轮完整重估与 ContextHandler 累计计数对比。"""
+
+from typing import cast
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from app.plugins.ai_group_chat.token_budget import ConservativeTokenEstimator
+from app.services import ChatMessage, ContextHandler
+from app.services.llm.schemas import LLMToolDefinition
+
+ESTIMATOR = ConservativeTokenEstimator(safety_factor=1.05)
+HISTORY = [
+    ChatMessage(
+        role="user" if index % 2 == 0 else "assistant",
+        text=f"第 {index} 条群聊消息，mixed 中英文内容。" * 20,
+    )
+    for index in range(400)
+]
+TOOLS = [
+    LLMToolDefinition(
+        name=f"tool_{index}",
+        description="读取群聊历史消息并返回结构化结果。" * 4,
+        parameters={
+            "type": "object",
+            "properties": {"limit": {"type": "integer", "description": "条数"}},
+        },
+    )
+    for index in range(12)
+]
+TURN = [ChatMessage(role="user", text="这一轮的新问题")]
+
+
+def _full_estimate() -> int:
+    """每轮重新估算全部历史和工具定义。"""
+    return ESTIMATOR.estimate_request(messages=[*HISTORY, *TURN], tools=TOOLS)
+
+
+@pytest.fixture
+def handler() -> ContextHandler:
+    """已经累计好历史 token 的上下文。"""
+    context = ContextHandler(system_prompt="角色设定", max_context_tokens=1_000_000)
+    context.set_token_counter(ESTIMATOR.estimate_message)
+    context.build_chatmessage(message_lst=HISTORY)
+    return context
+
+
+def test_full_reestimate(benchmark: BenchmarkFixture) -> None:
+    """参考：逐条重估完整历史。"""
+    _ = cast(int, benchmark(_full_estimate))
+
+
+def test_incremental_estimate(
+    benchmark: BenchmarkFixture, handler: ContextHandler
+) -> None:
+    """只估算本轮新消息，历史取累计值，工具集合命中缓存。"""
+
+    def estimate() -> int:
+        """复现 _prepare_turn_context 的预算检查。"""
+        return ESTIMATOR.estimate_request(
+            messages=TURN, tools=TOOLS, counted_tokens=handler.token_count
+        )
+
+    incremental = cast(int, benchmark(estimate))
+    assert incremental == ESTIMATOR.estimate_request(
+        messages=[*handler.messages_lst, *TURN], tools=TOOLS
+    )
@@ -0,0 +1,243 @@
+"""AI 群聊长期上下文持久化测试。"""
+
+import tempfile
+import unittest
+from collections.abc import Sequence
+from pathlib import Path
+
+from app.plugins.ai_group_chat.context_store import (
+    GroupContextLoadError,
+    GroupContextStore,
+    StoredContextMessage,
+    StoredGroupContext,
+    system_prompt_digest,
+)
+from app.services import ChatMessage, ContextHandler
+from app.services.llm.schemas import LLMToolCall
+from app.services.napcat import ImageStore
+
+PNG_BYTES = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01"
+    b"\x08\x06\x00\x00\x00\x1f\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\xff"
+    b"\xff?\x00\x05\xfe\x02\xfe\xa7\x35\x81\x84\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+class MemoryGroupContextRepository:
+    """用字典模拟群上下文表，并记录每次写入方式。"""
+
+    def __init__(self) -> None:
+        """初始化空表。"""
+        self.contexts: dict[str, StoredGroupContext] = {}
+        self.writes: list[tuple[str, int]] = []
+        self.failure: Exception | None = None
+        self.load_failure: Exception | None = None
+
+    async def load(self, *, group_id: str) -> StoredGroupContext | None:
+        """返回已保存上下文。"""
+        if self.failure is not None:
+            raise self.failure
+        if self.load_failure is not None:
+            raise self.load_failure
+        return self.contexts.get(group_id)
+
+    async def replace(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        messages: Sequence[StoredContextMessage],
+    ) -> None:
+        """整体覆盖。"""
+        if self.failure is not None:
+            raise self.failure
+        self.writes.append(("replace", len(messages)))
+        self.contexts[group_id] = StoredGroupContext(
+            system_prompt_digest=system_prompt_digest, messages=list(messages)
+        )
+
+    async def append(
+        self,
+        *,
+        group_id: str,
+        system_prompt_digest: str,
+        start: int,
+        messages: Sequence[StoredContextMessage],
+    ) -> bool:
+        """已保存条数一致时追加。"""
+        if self.failure is not None:
+            raise self.failure
+        stored = self.contexts.get(group_id)
+        if (
+            stored is None
+            or stored.system_prompt_digest != system_prompt_digest
+            or len(stored.messages) != start
+        ):
+            return False
+        self.writes.append(("append", len(messages)))
+        stored.messages.extend(messages)
+        return True
+
+
+def _turn(index: int) -> list[ChatMessage]:
+    """构造一轮用户输入和助手回复。"""
+    return [
+        ChatMessage(role="user", text=f"问题 {index}"),
+        ChatMessage(role="assistant", text=f"回答 {index}"),
+    ]
+
+
+class GroupContextStoreTest(unittest.IsolatedAsyncioTestCase):
+    """验证增量追加、整体覆盖、懒加载恢复和图片存储键。"""
+
+    async def asyncSetUp(self) -> None:
+        """创建空的持久层。"""
+        self.repository = MemoryGroupContextRepository()
+        self.store = GroupContextStore(repository=self.repository, image_store=None)
+
+    async def test_turns_are_appended_incrementally(self) -> None:
+        """首次保存整体写入，之后每轮只追加新增消息。"""
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        for index in range(3):
+            handler.build_chatmessage(message_lst=_turn(index))
+            await self.store.save(group_id="40000", handler=handler)
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.assertEqual(
+            self.repository.writes, [("replace", 2), ("append", 2), ("append", 2)]
+        )
+        restored = await self.store.load(group_id="40000", system_prompt="角色")
+        self.assertEqual(restored, handler.messages_lst[1:])
+
+    async def test_rewritten_history_replaces_stored_context(self) -> None:
+        """压缩替换历史后整体覆盖，恢复出的历史与内存一致。"""
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        handler.build_chatmessage(message_lst=[*_turn(0), *_turn(1)])
+        await self.store.save(group_id="40000", handler=handler)
+
+        handler.replace_history(messages=[ChatMessage(role="user", text="摘要")])
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.assertEqual(self.repository.writes, [("replace", 4), ("replace", 1)])
+        restored = await self.store.load(group_id="40000", system_prompt="角色")
+        self.assertEqual(restored, [ChatMessage(role="user", text="摘要")])
+
+    async def test_restored_handler_appends_after_saved_history(self) -> None:
+        """恢复出的历史视为已保存，重启后的下一轮只追加。"""
+        first = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        first.build_chatmessage(message_lst=_turn(0))
+        await self.store.save(group_id="40000", handler=first)
+
+        history = await self.store.load(group_id="40000", system_prompt="角色")
+        second = ContextHandler(
+            system_prompt="角色", max_context_tokens=1000, history=history
+        )
+        self.assertIsNone(second.pending_changes())
+        second.build_chatmessage(message_lst=_turn(1))
+        await self.store.save(group_id="40000", handler=second)
+
+        self.assertEqual(self.repository.writes, [("replace", 2), ("append", 2)])
+
+    async def test_changed_prompt_discards_stored_history(self) -> None:
+        """提示词变化后不恢复旧历史。"""
+        handler = ContextHandler(system_prompt="旧角色", max_context_tokens=1000)
+        handler.build_chatmessage(message_lst=_turn(0))
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.assertIsNone(
+            await self.store.load(group_id="40000", system_prompt="新角色")
+        )
+        self.assertEqual(
+            self.repository.contexts["40000"].system_prompt_digest,
+            system_prompt_digest("旧角色"),
+        )
+
+    async def test_save_failure_is_retried_on_next_save(self) -> None:
+        """写入失败时不标记已保存，下次保存补写全部变化。"""
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        handler.build_chatmessage(message_lst=_turn(0))
+        self.repository.failure = ConnectionError("数据库不可用")
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.repository.failure = None
+        handler.build_chatmessage(message_lst=_turn(1))
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.assertEqual(self.repository.writes, [("replace", 4)])
+
+    async def test_load_failure_blocks_saving_until_next_successful_load(
+        self,
+    ) -> None:
+        """读取失败不等同于没有历史，下次读取成功前不会覆盖已保存的历史。"""
+        saved = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        saved.build_chatmessage(message_lst=_turn(0))
+        await self.store.save(group_id="40000", handler=saved)
+
+        self.repository.load_failure = ConnectionError("数据库暂时不可用")
+        with self.assertRaises(GroupContextLoadError):
+            _ = await self.store.load(group_id="40000", system_prompt="角色")
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        handler.build_chatmessage(message_lst=_turn(1))
+        await self.store.save(group_id="40000", handler=handler)
+
+        self.assertEqual(self.repository.writes, [("replace", 2)])
+        self.repository.load_failure = None
+        restored = await self.store.load(group_id="40000", system_prompt="角色")
+        self.assertEqual(restored, _turn(0))
+
+    async def test_tool_calls_survive_round_trip(self) -> None:
+        """工具调用消息序列化后可以原样恢复。"""
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        handler.build_chatmessage(
+            message_lst=[
+                ChatMessage(
+                    role="assistant",
+                    tool_calls=[
+                        LLMToolCall(id="call-1", name="lookup", arguments={"q": "a"})
+                    ],
+                ),
+                ChatMessage(role="tool", tool_call_id="call-1", text="结果"),
+            ]
+        )
+        await self.store.save(group_id="40000", handler=handler)
+
+        restored = await self.store.load(group_id="40000", system_prompt="角色")
+
+        self.assertEqual(restored, handler.messages_lst[1:])
+
+    async def test_images_are_stored_as_storage_keys(self) -> None:
+        """图片字节写入图片存储，表中只保存存储键，恢复时读回原图。"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = GroupContextStore(
+                repository=self.repository,
+                image_store=ImageStore(root=Path(directory)),
+            )
+            handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+            handler.build_chatmessage(role="user", image=[PNG_BYTES])
+            await store.save(group_id="40000", handler=handler)
+
+            saved = self.repository.contexts["40000"].messages[0]
+            self.assertNotIn("image", saved.message)
+            self.assertEqual(len(saved.image_keys), 1)
+            self.assertTrue(saved.image_keys[0].endswith(".png"))
+            restored = await store.load(group_id="40000", system_prompt="角色")
+
+        self.assertEqual(restored, [ChatMessage(role="user", image=[PNG_BYTES])])
+
+    async def test_missing_image_keeps_message_with_notice(self) -> None:
+        """没有图片存储时只有图片的消息恢复为说明文字。"""
+        handler = ContextHandler(system_prompt="角色", max_context_tokens=1000)
+        handler.build_chatmessage(role="user", image=[PNG_BYTES])
+        await self.store.save(group_id="40000", handler=handler)
+
+        restored = await self.store.load(group_id="40000", system_prompt="角色")
+
+        self.assertIsNotNone(restored)
+        if restored is None:
+            raise AssertionError("应恢复历史")
+        self.assertIsNone(restored[0].image)
+        self.assertIn("历史图片已不可用", restored[0].text or "")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,9 +27,11 @@ from app.models import (
     Text,
 )
 from app.plugins.ai_group_chat.ai_group_chat import AIGroupChatPlugin
+from app.plugins.ai_group_chat.vision_cache import VisionDescriptionRepository
 from app.plugins.base import Context
 from app.services import ChatMessage
 from app.services.llm.schemas import LLMResponse, LLMToolChoice, LLMToolDefinition
+from tests.test_ai_group_chat_context_store import MemoryGroupContextRepository
 
 
 class SmokeBot:
@@ -54,10 +56,11 @@ class SmokeBot:
         self,
         *,
         group_id: str,
+        at: str | None = None,
         text: str | None = None,
         message_segment: list[MessageSegment] | None = None,
     ) -> Response:
-        _ = group_id
+        _ = (group_id, at)
         if text is not None:
             self.sent_texts.append(text)
         if message_segment is not None:
@@ -109,6 +112,8 @@ class SmokeLLM:
         self.formal_release: asyncio.Event | None = None
         self.active_formal_requests = 0
         self.max_active_formal_requests = 0
+        self.compression_prompts: list[str] = []
+        self.compression_release: asyncio.Event | None = None
 
     async def get_ai_text_response(
         self,
@@ -117,11 +122,18 @@ class SmokeLLM:
         model_name: str,
         max_attempts: int | None = None,
         retry_delay_seconds: float | None = None,
+        cacheable: bool = False,
     ) -> str:
         _ = (max_attempts, retry_delay_seconds)
-        self.vision_models.append((provider, model_name))
         if [message.role for message in messages] != ["system", "user"]:
-            raise AssertionError("视觉请求不应携带群聊历史")
+            raise AssertionError("视觉和压缩请求不应携带群聊历史")
+        prompt = messages[1].text or ""
+        if prompt.startswith("# 上下文压缩任务"):
+            self.compression_prompts.append(prompt)
+            if self.compression_release is not None:
+                await self.compression_release.wait()
+            return f"第 {len(self.compression_prompts)} 次滚动摘要"
+        self.vision_models.append((provider, model_name))
         return "图片中写着“测试成功”。"
 
     async def get_ai_response_with_tools(
@@ -153,6 +165,23 @@ class SmokeLLM:
             self.active_formal_requests -= 1
 
 
+class EmptyVisionStore:
+    """始终未命中的视觉描述缓存表。"""
+
+    async def get(self, *, key: object, now: object) -> None:
+        """没有持久化描述。"""
+        _ = (key, now)
+
+    async def put(self, **values: object) -> None:
+        """丢弃写入。"""
+        _ = values
+
+    async def delete_expired(self, *, now: object) -> int:
+        """没有可清理的描述。"""
+        _ = now
+        return 0
+
+
 class SmokeContext:
     """组合烟测依赖。"""
 
@@ -162,6 +191,16 @@ class SmokeContext:
         self.direct_httpx = cast(httpx.AsyncClient, object())
         self.llm = SmokeLLM()
         self.mcp_tool_manager = EmptyToolManager()
+        self.image_store = None
+        self.group_contexts = MemoryGroupContextRepository()
+
+    def create_repository(
+        self, repository_type: object
+    ) -> EmptyVisionStore | MemoryGroupContextRepository:
+        """视觉描述缓存始终未命中，群上下文保存在内存表中。"""
+        if repository_type is VisionDescriptionRepository:
+            return EmptyVisionStore()
+        return self.group_contexts
 
 
 class FakeConfigManager:
@@ -186,6 +225,8 @@ def build_snapshot(
     max_context_tokens: int = 1_000_000,
     model_name: str = "main-model",
     include_second_group: bool = False,
+    queue: dict[str, object] | None = None,
+    compression_watermark: float = 0.7,
 ) -> PluginConfigSnapshot:
     """构造已经读取提示词文件的 AI 配置快照。"""
     group = AIGroupConfig(
@@ -216,6 +257,8 @@ def build_snapshot(
             "retain_descriptions": True,
         },
             "show_reasoning": False,
+            "queue": queue or {},
+            "compression_watermark": compression_watermark,
             "groups": group_configs,
         }
     )
@@ -229,7 +272,7 @@ def build_snapshot(
             for group_config in group_configs
         ),
         vision_system_prompt="只描述可见事实。",
-        vision_user_prompt="结合当前问题描述图片。",
+        vision_user_prompt="按编号描述图片。",
     )
     return PluginConfigSnapshot(
         revision=revision,
@@ -354,6 +397,44 @@ class AIGroupChatPluginSmokeTest(unittest.IsolatedAsyncioTestCase):
 
         self.assertEqual(smoke_context.llm.max_active_formal_requests, 2)
 
+    async def test_overloaded_group_keeps_latest_mention(self) -> None:
+        """排队超限时同群旧消息被新消息替换，并向发送者回复忙碌提示。"""
+        smoke_context = SmokeContext()
+        smoke_context.llm.formal_release = asyncio.Event()
+        plugin = AIGroupChatPlugin(
+            context=cast(Context, smoke_context),
+            plugin_config=ai_plugin_config(
+                FakeConfigManager(
+                    build_snapshot(
+                        queue={
+                            "max_depth": 1,
+                            "overload_policy": "coalesce",
+                            "busy_notice": "正在忙",
+                        }
+                    )
+                )
+            ),
+        )
+        first = asyncio.create_task(plugin.add_to_queue(build_event("30011")))
+        try:
+            await asyncio.wait_for(smoke_context.llm.formal_entered.wait(), timeout=1)
+            second = asyncio.create_task(plugin.add_to_queue(build_event("30012")))
+            await asyncio.sleep(0)
+            third = asyncio.create_task(plugin.add_to_queue(build_event("30013")))
+
+            self.assertFalse(await asyncio.wait_for(second, timeout=1))
+            await asyncio.sleep(0)
+            self.assertIn("正在忙", smoke_context.bot.sent_texts)
+
+            smoke_context.llm.formal_release.set()
+            self.assertEqual(await asyncio.gather(first, third), [True, True])
+        finally:
+            smoke_context.llm.formal_release.set()
+            await plugin.stop_consumers()
+
+        self.assertEqual(len(smoke_context.llm.formal_models), 2)
+        self.assertEqual(plugin.queue_stats().shed, 1)
+
     async def test_prompt_change_resets_only_affected_group_context(self) -> None:
         """提示词变化替换上下文，普通 token 预算变化保留既有历史。"""
         manager = FakeConfigManager(build_snapshot())
@@ -365,7 +446,7 @@ class AIGroupChatPluginSmokeTest(unittest.IsolatedAsyncioTestCase):
             first_runtime = plugin._current_runtime()  # pyright: ignore[reportPrivateUsage]
             self.assertIsNotNone(first_runtime)
             assert first_runtime is not None
-            first_context = plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
+            first_context = await plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
                 runtime=first_runtime,
                 group=first_runtime.groups["40000"],
             )
@@ -377,7 +458,7 @@ class AIGroupChatPluginSmokeTest(unittest.IsolatedAsyncioTestCase):
             )
             budget_runtime = plugin._current_runtime()  # pyright: ignore[reportPrivateUsage]
             assert budget_runtime is not None
-            budget_context = plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
+            budget_context = await plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
                 runtime=budget_runtime,
                 group=budget_runtime.groups["40000"],
             )
@@ -392,7 +473,7 @@ class AIGroupChatPluginSmokeTest(unittest.IsolatedAsyncioTestCase):
             )
             prompt_runtime = plugin._current_runtime()  # pyright: ignore[reportPrivateUsage]
             assert prompt_runtime is not None
-            prompt_context = plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
+            prompt_context = await plugin._get_group_context(  # pyright: ignore[reportPrivateUsage]
                 runtime=prompt_runtime,
                 group=prompt_runtime.groups["40000"],
             )
@@ -445,6 +526,109 @@ class AIGroupChatPluginSmokeTest(unittest.IsolatedAsyncioTestCase):
             ],
         )
 
+    async def test_restart_restores_group_context_from_store(self) -> None:
+        """重建插件后首次处理本群消息时恢复已保存的历史。"""
+        smoke_context = SmokeContext()
+        for message_id in ("30021", "30022"):
+            plugin = AIGroupChatPlugin(
+                context=cast(Context, smoke_context),
+                plugin_config=ai_plugin_config(FakeConfigManager(build_snapshot())),
+            )
+            try:
+                self.assertTrue(await plugin.run(build_event(message_id)))
+            finally:
+                await plugin.stop_consumers()
+
+        restored_replies = [
+            message.text
+            for message in smoke_context.llm.formal_messages[1]
+            if message.role == "assistant"
+        ]
+        self.assertEqual(restored_replies, ["图片里写着测试成功。"])
+        self.assertEqual(
+            [write[0] for write in smoke_context.group_contexts.writes],
+            ["replace", "append"],
+        )
+
+    async def test_failed_restore_does_not_overwrite_saved_context(self) -> None:
+        """重启后读取失败的一轮不保存，下一轮读取成功后追加两轮新消息。"""
+        smoke_context = SmokeContext()
+        plugin = AIGroupChatPlugin(
+            context=cast(Context, smoke_context),
+            plugin_config=ai_plugin_config(FakeConfigManager(build_snapshot())),
+        )
+        try:
+            self.assertTrue(await plugin.run(build_event("30041")))
+        finally:
+            await plugin.stop_consumers()
+
+        plugin = AIGroupChatPlugin(
+            context=cast(Context, smoke_context),
+            plugin_config=ai_plugin_config(FakeConfigManager(build_snapshot())),
+        )
+        try:
+            smoke_context.group_contexts.load_failure = ConnectionError("数据库暂时不可用")
+            self.assertTrue(await plugin.run(build_event("30042")))
+            self.assertEqual(
+                [write[0] for write in smoke_context.group_contexts.writes],
+                ["replace"],
+            )
+
+            smoke_context.group_contexts.load_failure = None
+            self.assertTrue(await plugin.run(build_event("30043")))
+        finally:
+            await plugin.stop_consumers()
+
+        writes = smoke_context.group_contexts.writes
+        self.assertEqual([write[0] for write in writes], ["replace", "append"])
+        self.assertEqual(writes[1][1], 2 * writes[0][1])
+        restored_replies = [
+            message.text
+            for message in smoke_context.llm.formal_messages[2]
+            if message.role == "assistant"
+        ]
+        self.assertEqual(restored_replies, ["图片里写着测试成功。"] * 2)
+
+    async def test_background_compression_swaps_summary_without_blocking(
+        self,
+    ) -> None:
+        """到达水位后后台压缩，压缩期间的新一轮照常回复，结果替换旧前缀。"""
+        smoke_context = SmokeContext()
+        smoke_context.llm.compression_release = asyncio.Event()
+        plugin = AIGroupChatPlugin(
+            context=cast(Context, smoke_context),
+            plugin_config=ai_plugin_config(
+                FakeConfigManager(build_snapshot(compression_watermark=0.001))
+            ),
+        )
+        try:
+            self.assertTrue(await plugin.run(build_event("30031")))
+            self.assertTrue(await plugin.run(build_event("30032")))
+            self.assertEqual(len(smoke_context.llm.compression_prompts), 1)
+            self.assertNotIn("整理一下记忆", "".join(smoke_context.bot.sent_texts))
+
+            smoke_context.llm.compression_release.set()
+            _ = await asyncio.gather(
+                *plugin._compression_tasks.values()  # pyright: ignore[reportPrivateUsage]
+            )
+            history = plugin._group_contexts["40000"].handler.messages_lst[1:]  # pyright: ignore[reportPrivateUsage]
+            self.assertTrue((history[0].text or "").endswith("第 1 次滚动摘要"))
+            self.assertEqual(
+                [message.role for message in history[1:]],
+                ["user", "user", "assistant"],
+            )
+            self.assertEqual(smoke_context.group_contexts.writes[-1][0], "replace")
+
+            self.assertTrue(await plugin.run(build_event("30033")))
+            _ = await asyncio.gather(
+                *plugin._compression_tasks.values()  # pyright: ignore[reportPrivateUsage]
+            )
+        finally:
+            await plugin.stop_consumers()
+
+        second_prompt = smoke_context.llm.compression_prompts[1]
+        self.assertIn("## 已有摘要\n\n第 1 次滚动摘要", second_prompt)
+
 
 if __name__ == "__main__":
     unittest.main()
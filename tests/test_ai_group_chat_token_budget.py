@@ -0,0 +1,212 @@
+"""AI 群聊 token 预算估算测试。"""
+
+import base64
+import tempfile
+import unittest
+from pathlib import Path
+
+from app.plugins.ai_group_chat.token_budget import (
+    CharacterTokenizer,
+    ConservativeTokenEstimator,
+    TokenCalibration,
+)
+from app.services import ChatMessage, ContextHandler
+from app.services.llm.schemas import LLMToolCall, LLMToolDefinition
+from app.utils.tokenizer import BPETokenizer
+
+TOOLS = [
+    LLMToolDefinition(
+        name="lookup",
+        description="查询群聊历史。",
+        parameters={"type": "object", "properties": {"q": {"type": "string"}}},
+    ),
+    LLMToolDefinition(
+        name="send",
+        description="send a message",
+        parameters={"type": "object", "properties": {}},
+    ),
+]
+
+
+def _history() -> list[ChatMessage]:
+    """构造包含中英文、思维链、图片和工具调用的历史。"""
+    return [
+        ChatMessage(role="user", text="早上好 good morning 😀"),
+        ChatMessage(
+            role="assistant",
+            reasoning_content="先查一下",
+            tool_calls=[LLMToolCall(id="call-1", name="lookup", arguments={"q": "早"})],
+        ),
+        ChatMessage(role="tool", tool_call_id="call-1", text='{"ok": true}'),
+        ChatMessage(role="user", text="看图", image=[b"png"]),
+        ChatMessage(role="assistant", text="plain ascii reply"),
+    ]
+
+
+class TokenEstimatorTest(unittest.TestCase):
+    """验证快速文本估算和工具集合缓存与逐字符估算一致。"""
+
+    def test_text_estimate_matches_character_rule(self) -> None:
+        """ASCII 计 1，非 ASCII（含 emoji）计 2。"""
+        tokenizer = CharacterTokenizer()
+        for text in ("", "ascii only", "中文", "混合 mixed 😀\n"):
+            with self.subTest(text=text):
+                expected = sum(1 if char.isascii() else 2 for char in text)
+                self.assertEqual(tokenizer.count(text), expected)
+
+    def test_calibration_scales_estimate_towards_prompt_tokens(self) -> None:
+        """首个样本直接采用，之后按滑动平均收敛，极端比例被截断。"""
+        calibration = TokenCalibration()
+        estimator = ConservativeTokenEstimator(
+            safety_factor=1.0, calibration=calibration
+        )
+        message = [ChatMessage(role="user", text="中文" * 100)]
+        raw_tokens = estimator.estimate_raw_request(messages=message, tools=[])
+
+        calibration.observe(raw_tokens=raw_tokens, prompt_tokens=raw_tokens // 2)
+        self.assertEqual(
+            estimator.estimate_request(messages=message, tools=[]),
+            raw_tokens // 2,
+        )
+        calibration.observe(raw_tokens=raw_tokens, prompt_tokens=raw_tokens)
+        self.assertAlmostEqual(calibration.ratio, 0.6)
+        calibration.observe(raw_tokens=100, prompt_tokens=100_000)
+        self.assertAlmostEqual(calibration.ratio, 0.6 + 0.2 * (4.0 - 0.6))
+        self.assertEqual(calibration.samples, 3)
+
+    def test_tool_set_estimate_is_cached_by_content(self) -> None:
+        """内容相同的新工具对象复用缓存，描述变化后重新估算。"""
+        estimator = ConservativeTokenEstimator(safety_factor=1.0)
+        first = estimator.estimate_tools(TOOLS)
+        rebuilt = [tool.model_copy() for tool in TOOLS]
+        changed = [TOOLS[0].model_copy(update={"description": "更长的查询群聊历史说明"})]
+
+        self.assertEqual(estimator.estimate_tools(rebuilt), first)
+        self.assertGreater(
+            estimator.estimate_tools(changed), estimator.estimate_tools(TOOLS[:1])
+        )
+
+
+class BPETokenizerTest(unittest.TestCase):
+    """验证本地 BPE 词表加载和按 rank 合并。"""
+
+    def setUp(self) -> None:
+        """写入一个小型 tiktoken 格式词表。"""
+        tokens = [bytes([value]) for value in range(256)]
+        chinese, text = "中".encode(), "文".encode()
+        tokens += [b"ab", b" ab", chinese[:2], chinese, text[:2], text]
+        tokens.append(chinese + text)
+        lines = [
+            f"{base64.b64encode(token).decode()} {rank}"
+            for rank, token in enumerate(tokens)
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "tiny.tiktoken"
+        _ = self.path.write_text("\n".join(lines) + "\n", encoding="ascii")
+
+    def tearDown(self) -> None:
+        """删除临时词表。"""
+        self.directory.cleanup()
+
+    def test_merges_by_rank_within_pretokenized_pieces(self) -> None:
+        """相邻字节按 rank 合并，预切分片段之间不合并。"""
+        tokenizer = BPETokenizer.from_file(self.path)
+
+        self.assertEqual(tokenizer.name, "tiny.tiktoken")
+        self.assertEqual(tokenizer.count("ab ab"), 2)
+        self.assertEqual(tokenizer.count("abc"), 2)
+        self.assertEqual(tokenizer.count("中文中文"), 2)
+        self.assertEqual(tokenizer.count("中国"), 4)
+        self.assertEqual(tokenizer.count("a_b!\n"), 5)
+
+    def test_rejects_malformed_vocabulary(self) -> None:
+        """格式错误的词表行给出行号。"""
+        _ = self.path.write_text("YQ== 0\nnot-base64!\n", encoding="ascii")
+
+        with self.assertRaisesRegex(ValueError, "第 2 行"):
+            _ = BPETokenizer.from_file(self.path)
+
+    def test_estimator_uses_configured_tokenizer(self) -> None:
+        """估算器用词表统计文本，中文不再按每字两个 token 估算。"""
+        estimator = ConservativeTokenEstimator(
+            safety_factor=1.0, tokenizer=BPETokenizer.from_file(self.path)
+        )
+        fallback = ConservativeTokenEstimator(safety_factor=1.0)
+        message = ChatMessage(role="user", text="中文" * 50)
+
+        self.assertLess(
+            estimator.estimate_message(message), fallback.estimate_message(message)
+        )
+
+
+class ContextHandlerTokenCountTest(unittest.TestCase):
+    """验证 ContextHandler 的累计 token 与完整估算一致。"""
+
+    def setUp(self) -> None:
+        """创建已设置计数器的上下文。"""
+        self.estimator = ConservativeTokenEstimator(safety_factor=1.05)
+        self.handler = ContextHandler(system_prompt="角色设定", max_context_tokens=1000)
+        self.handler.set_token_counter(self.estimator.estimate_message)
+
+    def assert_incremental_matches_full(self) -> None:
+        """累计历史加本轮新消息的估算等于完整重新估算。"""
+        turn = [ChatMessage(role="user", text="新问题")]
+        incremental = self.estimator.estimate_request(
+            messages=turn, tools=TOOLS, counted_tokens=self.handler.token_count
+        )
+        full = self.estimator.estimate_request(
+            messages=[*self.handler.messages_lst, *turn], tools=TOOLS
+        )
+        self.assertEqual(incremental, full)
+
+    def test_running_total_follows_every_mutation(self) -> None:
+        """追加、替换、删除和改写系统提示词后累计值始终准确。"""
+        self.handler.build_chatmessage(message_lst=_history())
+        self.assert_incremental_matches_full()
+        self.handler.add_msg(ChatMessage(role="assistant", text="再来一条"))
+        self.assert_incremental_matches_full()
+        self.handler.del_chatmessage(1)
+        self.assert_incremental_matches_full()
+        self.handler.build_chatmessage(role="system", text="新的更长的角色设定")
+        self.assert_incremental_matches_full()
+        self.handler.replace_history(messages=[ChatMessage(role="user", text="摘要")])
+        self.assert_incremental_matches_full()
+
+    def test_restored_history_is_counted_when_counter_is_set(self) -> None:
+        """恢复的历史在设置计数器时统计，相同计数器不重复统计。"""
+        handler = ContextHandler(
+            system_prompt="角色设定", max_context_tokens=1000, history=_history()
+        )
+        self.assertEqual(handler.token_count, 0)
+
+        handler.set_token_counter(self.estimator.estimate_message)
+        handler.set_token_counter(self.estimator.estimate_message)
+
+        self.assertEqual(
+            handler.token_count,
+            sum(self.estimator.estimate_message(m) for m in handler.messages_lst),
+        )
+
+    def test_prompt_prefix_tracks_rewrites_after_mark(self) -> None:
+        """追加不影响已发送前缀，删除、替换历史和改写提示词从改写位置截断。"""
+        self.handler.build_chatmessage(message_lst=_history())
+        self.handler.mark_prompt_prefix()
+        self.handler.add_msg(ChatMessage(role="user", text="新消息"))
+        self.assertEqual(self.handler.stable_prefix_count, 6)
+        self.assertEqual(self.handler.marked_prefix_count, 6)
+
+        self.handler.replace_history(messages=self.handler.messages_lst[1:])
+        self.assertEqual(self.handler.stable_prefix_count, 6)
+        self.handler.replace_history(messages=[*_history()[:3], *_history()[4:]])
+        self.assertEqual(self.handler.stable_prefix_count, 4)
+        self.handler.del_chatmessage(-2)
+        self.assertEqual(self.handler.stable_prefix_count, 3)
+        self.handler.build_chatmessage(role="system", text="新的角色设定")
+        self.assertEqual(self.handler.stable_prefix_count, 0)
+
+        self.handler.mark_prompt_prefix()
+        self.assertEqual(self.handler.stable_prefix_count, len(self.handler.messages_lst))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 """AI 群聊工具循环与视觉工具集成测试。"""
 
+import asyncio
 import unittest
+from collections.abc import AsyncIterator, Callable
 from datetime import UTC, datetime
 from typing import Protocol, cast
 
@@ -28,10 +30,15 @@ from app.plugins.ai_group_chat.vision_tool import (
 from app.plugins.base import Context
 from app.services import ChatMessage, ContextHandler
 from app.services.llm.schemas import (
+    LLMContentDelta,
     LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
     LLMToolCall,
+    LLMToolCallReady,
     LLMToolChoice,
     LLMToolDefinition,
+    LLMUsage,
 )
 from app.services.llm.tools import (
     LLMImageArtifact,
@@ -54,6 +61,7 @@ class FakeLLMProtocol(Protocol):
         model_name: str,
         max_attempts: int | None = None,
         retry_delay_seconds: float | None = None,
+        cacheable: bool = False,
     ) -> str:
         """返回纯文本响应。"""
         ...
@@ -70,6 +78,18 @@ class FakeLLMProtocol(Protocol):
         """返回带可选工具调用的结构化响应。"""
         ...
 
+    def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        provider: str,
+        model_name: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """以增量事件返回结构化响应。"""
+        ...
+
 
 class RecordingLLM:
     """按队列返回正式响应，并记录正式请求和独立文本请求。"""
@@ -85,8 +105,10 @@ class RecordingLLM:
         self.text_response: str = text_response
         self.formal_requests: list[list[ChatMessage]] = []
         self.formal_models: list[tuple[str, str]] = []
+        self.formal_tools: list[list[LLMToolDefinition]] = []
         self.text_requests: list[list[ChatMessage]] = []
         self.text_models: list[tuple[str, str]] = []
+        self.stream_observer: Callable[[LLMStreamEvent], None] | None = None
 
     async def get_ai_text_response(
         self,
@@ -95,6 +117,7 @@ class RecordingLLM:
         model_name: str,
         max_attempts: int | None = None,
         retry_delay_seconds: float | None = None,
+        cacheable: bool = False,
     ) -> str:
         """记录视觉或压缩请求并返回固定文本。"""
         _ = (max_attempts, retry_delay_seconds)
@@ -112,13 +135,47 @@ class RecordingLLM:
         parallel_tool_calls: bool = True,
     ) -> LLMResponse:
         """记录正式请求并弹出下一条响应。"""
-        _ = (tools, tool_choice, parallel_tool_calls)
+        _ = (tool_choice, parallel_tool_calls)
         self.formal_requests.append(messages[:])
         self.formal_models.append((provider, model_name))
+        self.formal_tools.append(tools)
         if not self.responses:
             raise AssertionError("正式响应队列已耗尽")
         return self.responses.pop(0)
 
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        provider: str,
+        model_name: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncIterator[LLMStreamEvent]:
+        """按行回放下一条响应的正文，再产出工具调用和结束事件。"""
+        response = await self.get_ai_response_with_tools(
+            messages=messages,
+            provider=provider,
+            model_name=model_name,
+            tools=tools,
+            tool_choice=tool_choice,
+            parallel_tool_calls=parallel_tool_calls,
+        )
+        events: list[LLMStreamEvent] = [
+            LLMContentDelta(text=line)
+            for line in (response.content or "").splitlines(keepends=True)
+        ]
+        events.extend(
+            LLMToolCallReady(tool_call=tool_call) for tool_call in response.tool_calls
+        )
+        events.append(LLMStreamCompleted(response=response))
+        for event in events:
+            # 让出一次事件循环，使已提前启动的工具任务有机会运行。
+            await asyncio.sleep(0)
+            if self.stream_observer is not None:
+                self.stream_observer(event)
+            yield event
+
 
 class FakeToolManager:
     """暴露一个可返回内部图片附件的信息工具。"""
@@ -148,6 +205,7 @@ class FakeToolManager:
                     "required": [],
                     "additionalProperties": False,
                 },
+                read_only=True,
             )
         ]
 
@@ -318,6 +376,7 @@ def build_config(
     model_name: str = "main-model",
     provider: str = "main-vendor",
     show_reasoning: bool = False,
+    stream_replies: bool = False,
     retain_reasoning: bool = False,
     retain_vision_descriptions: bool = True,
     max_reply_chars: int = 100,
@@ -331,6 +390,7 @@ def build_config(
             "supports_images": supports_images,
         },
         "show_reasoning": show_reasoning,
+        "stream_replies": stream_replies,
         "retain_reasoning": retain_reasoning,
         "max_reply_chars": max_reply_chars,
         "context_compression_notice": context_compression_notice,
@@ -385,7 +445,7 @@ def materialize_config(config: AIGroupChatConfig) -> MaterializedAIGroupChatConf
             "只描述可见事实。" if config.vision is not None else None
         ),
         vision_user_prompt=(
-            "结合当前问题描述图片。" if config.vision is not None else None
+            "按编号描述图片。" if config.vision is not None else None
         ),
     )
 
@@ -541,6 +601,70 @@ class GroupChatToolLoopTest(unittest.IsolatedAsyncioTestCase):
             all(message.image is None for message in chat_handler.messages_lst)
         )
 
+    async def test_usage_calibrates_estimate_for_each_request(self) -> None:
+        """每次正式请求的原始估算都与接口返回的 prompt token 对比校准。"""
+        llm = RecordingLLM(
+            responses=[
+                LLMResponse(
+                    tool_calls=[build_tool_call()],
+                    usage=LLMUsage(prompt_tokens=10000),
+                ),
+                LLMResponse(content="查到了", usage=LLMUsage(prompt_tokens=15000)),
+            ]
+        )
+        loop = build_loop(config=build_config(), context=FakeContext(llm=llm))
+        chat_handler = ContextHandler(
+            system_prompt="系统提示词", max_context_tokens=1000000
+        )
+
+        await run_turn(loop=loop, chat_handler=chat_handler)
+
+        estimator = loop.token_estimator
+        raw_tokens = [
+            estimator.estimate_raw_request(messages=messages, tools=tools)
+            for messages, tools in zip(llm.formal_requests, llm.formal_tools)
+        ]
+        first_ratio = 10000 / raw_tokens[0]
+        self.assertEqual(estimator.calibration.samples, 2)
+        self.assertAlmostEqual(
+            estimator.calibration.ratio,
+            first_ratio + 0.2 * (15000 / raw_tokens[1] - first_ratio),
+        )
+
+    async def test_usage_records_prompt_cache_hits_per_group(self) -> None:
+        """每次正式请求的缓存命中累计到本群，第二轮历史前缀保持不变。"""
+        llm = RecordingLLM(
+            responses=[
+                LLMResponse(
+                    content="第一轮",
+                    usage=LLMUsage(prompt_tokens=1000, cached_tokens=0),
+                ),
+                LLMResponse(
+                    content="第二轮",
+                    usage=LLMUsage(prompt_tokens=1200, cached_tokens=900),
+                ),
+            ]
+        )
+        loop = build_loop(config=build_config(), context=FakeContext(llm=llm))
+        chat_handler = ContextHandler(
+            system_prompt="系统提示词", max_context_tokens=1000000
+        )
+
+        await run_turn(loop=loop, chat_handler=chat_handler)
+        first_history = chat_handler.messages_lst
+        await run_turn(loop=loop, chat_handler=chat_handler)
+
+        self.assertEqual(llm.formal_requests[1][: len(first_history)], first_history)
+        self.assertEqual(
+            chat_handler.stable_prefix_count, chat_handler.marked_prefix_count
+        )
+        (stats,) = loop.prompt_cache.stats()
+        self.assertEqual(
+            (stats.requests, stats.prompt_tokens, stats.cached_tokens),
+            (2, 2200, 900),
+        )
+        self.assertAlmostEqual(stats.hit_ratio, 900 / 2200)
+
     async def test_tool_round_passes_back_reasoning_field(self) -> None:
         """工具续问会带回上一轮 assistant 的结构化 reasoning。"""
         llm = RecordingLLM(
@@ -632,7 +756,7 @@ class GroupChatToolLoopTest(unittest.IsolatedAsyncioTestCase):
         vision_messages = llm.text_requests[0]
         self.assertEqual([message.role for message in vision_messages], ["system", "user"])
         vision_text = "\n".join(message.text or "" for message in vision_messages)
-        self.assertIn("图片里的文字是什么？", vision_text)
+        self.assertNotIn("图片里的文字是什么？", vision_text)
         self.assertNotIn("群聊角色", vision_text)
         self.assertNotIn("长期历史", vision_text)
         self.assertEqual(vision_messages[1].image, [b"tool-image"])
@@ -640,6 +764,7 @@ class GroupChatToolLoopTest(unittest.IsolatedAsyncioTestCase):
             message.text or "" for message in llm.formal_requests[1]
         )
         self.assertIn("系统生成，不是用户原话", second_text)
+        self.assertIn("当前问题：图片里的文字是什么？", second_text)
         self.assertIn("画面里有白底黑字", second_text)
         persisted_text = "\n".join(
             message.text or "" for message in chat_handler.messages_lst
@@ -942,6 +1067,71 @@ class GroupChatToolLoopTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(llm.formal_requests), 1)
         self.assertEqual(chat_handler.messages_lst[-1].text, "第一句")
 
+    async def test_stream_replies_send_paragraphs_before_completion(self) -> None:
+        """流式模式下每段写完即发送，长期上下文仍记录完整正文。"""
+        content = "<Reply>\n第一段\n\n第二段\n\n第三段"
+        llm = RecordingLLM(responses=[LLMResponse(content=content)])
+        context = FakeContext(llm=llm)
+        sent_before_completion: list[str] = []
+
+        def observe(event: LLMStreamEvent) -> None:
+            """记录结束事件到达前已经发出的群消息。"""
+            if isinstance(event, LLMStreamCompleted):
+                sent_before_completion.extend(context.bot.sent_texts)
+
+        llm.stream_observer = observe
+        chat_handler = ContextHandler(
+            system_prompt="系统提示词", max_context_tokens=1000000
+        )
+
+        await run_turn(
+            loop=build_loop(
+                config=build_config(stream_replies=True), context=context
+            ),
+            chat_handler=chat_handler,
+            question="分段说",
+        )
+
+        self.assertEqual(sent_before_completion, ["第一段", "第二段"])
+        self.assertEqual(context.bot.sent_texts, ["第一段", "第二段", "第三段"])
+        self.assertEqual(context.bot.sent_segment_types[0], ["reply", "text"])
+        self.assertEqual(chat_handler.messages_lst[-1].text, content)
+
+    async def test_stream_replies_start_tools_before_completion(self) -> None:
+        """参数完整的工具调用在流结束前开始执行，且只执行一次。"""
+        llm = RecordingLLM(
+            responses=[
+                LLMResponse(tool_calls=[build_tool_call()]),
+                LLMResponse(content="查到了"),
+            ]
+        )
+        tool_manager = FakeToolManager()
+        context = FakeContext(llm=llm, tool_manager=tool_manager)
+        calls_before_completion: list[int] = []
+
+        def observe(event: LLMStreamEvent) -> None:
+            """记录首个结束事件到达前已开始的工具调用数。"""
+            if isinstance(event, LLMStreamCompleted) and not calls_before_completion:
+                calls_before_completion.append(len(tool_manager.calls))
+
+        llm.stream_observer = observe
+        chat_handler = ContextHandler(
+            system_prompt="系统提示词", max_context_tokens=1000000
+        )
+
+        await run_turn(
+            loop=build_loop(
+                config=build_config(stream_replies=True), context=context
+            ),
+            chat_handler=chat_handler,
+            question="帮我查",
+        )
+
+        self.assertEqual(calls_before_completion, [1])
+        self.assertEqual(len(tool_manager.calls), 1)
+        self.assertEqual(llm.formal_requests[1][-1].role, "tool")
+        self.assertEqual(context.bot.sent_texts, ["查到了"])
+
     async def test_send_failure_persists_status_without_assistant_content(
         self,
     ) -> None:
@@ -1070,6 +1260,79 @@ class GroupChatToolLoopTest(unittest.IsolatedAsyncioTestCase):
             ["我先整理一下记忆", "压缩后回复"],
         )
 
+    async def test_background_summary_folds_only_messages_after_summary(
+        self,
+    ) -> None:
+        """滚动压缩把已有摘要和其后的新消息交给模型，不重放已摘要的历史。"""
+        llm = RecordingLLM(responses=[], text_response="合并后的摘要")
+        loop = build_loop(config=build_config(), context=FakeContext(llm=llm))
+        compressor = loop.context_compressor
+        history = [
+            compressor.build_summary_message(summary="旧摘要：群主喜欢猫"),
+            ChatMessage(role="user", text="新消息：换成喜欢狗了"),
+            ChatMessage(role="assistant", text="记住了"),
+        ]
+
+        summary_message = await loop.summarize_history(
+            group_id="40000",
+            system_prompt=ChatMessage(role="system", text="系统提示词"),
+            history_messages=history,
+        )
+
+        prompt = llm.text_requests[0][1].text or ""
+        self.assertIn("## 已有摘要\n\n旧摘要：群主喜欢猫", prompt)
+        self.assertIn("### message 1: user\n\n新消息：换成喜欢狗了", prompt)
+        self.assertNotIn("### message 3", prompt)
+        self.assertEqual(
+            compressor.split_summary(history_messages=[summary_message]),
+            ("合并后的摘要", []),
+        )
+
+    def test_swap_keeps_messages_added_during_compression(self) -> None:
+        """前缀与快照一致（仅图片被剥离）时替换为摘要，保留之后新增的消息。"""
+        loop = build_loop(
+            config=build_config(), context=FakeContext(llm=RecordingLLM(responses=[]))
+        )
+        chat_handler = ContextHandler(
+            system_prompt="系统提示词", max_context_tokens=1000000
+        )
+        chat_handler.build_chatmessage(
+            message_lst=[
+                ChatMessage(role="user", text="看图", image=[b"png"]),
+                ChatMessage(role="assistant", text="看到了"),
+            ]
+        )
+        snapshot = chat_handler.messages_lst[1:]
+        chat_handler.replace_history(
+            messages=[
+                ChatMessage(role="user", text="看图"),
+                ChatMessage(role="assistant", text="看到了"),
+                ChatMessage(role="user", text="压缩期间的新消息"),
+            ]
+        )
+        summary = loop.context_compressor.build_summary_message(summary="摘要")
+
+        swapped = loop.swap_compressed_history(
+            group_id="40000",
+            chat_handler=chat_handler,
+            history_messages=snapshot,
+            summary_message=summary,
+        )
+
+        self.assertTrue(swapped)
+        self.assertEqual(
+            chat_handler.messages_lst[1:],
+            [summary, ChatMessage(role="user", text="压缩期间的新消息")],
+        )
+        self.assertFalse(
+            loop.swap_compressed_history(
+                group_id="40000",
+                chat_handler=chat_handler,
+                history_messages=snapshot,
+                summary_message=summary,
+            )
+        )
+
     async def test_long_reply_still_uses_group_forward_sender(self) -> None:
         """超过普通发送阈值的 content 仍通过单节点合并转发发送。"""
         llm = RecordingLLM(
@@ -1,9 +1,16 @@
 """AI 群聊内部视觉描述工具测试。"""
 
 import unittest
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
 from typing import cast
 
 from app.config import AIGroupChatConfig, MaterializedAIGroupChatConfig
+from app.plugins.ai_group_chat.vision_cache import (
+    VisionCacheKey,
+    VisionDescriptionCache,
+    build_image_digest,
+)
 from app.plugins.ai_group_chat.vision_tool import (
     VisionDescriptionTool,
     VisionTurnState,
@@ -25,6 +32,7 @@ class RecordingVisionLLM:
         self.requests: list[list[ChatMessage]] = []
         self.models: list[tuple[str, str]] = []
         self.retry_settings: list[tuple[int | None, float | None]] = []
+        self.cacheable: list[bool] = []
 
     async def get_ai_text_response(
         self,
@@ -33,16 +41,81 @@ class RecordingVisionLLM:
         model_name: str,
         max_attempts: int | None = None,
         retry_delay_seconds: float | None = None,
+        cacheable: bool = False,
     ) -> str:
         """记录隔离请求并返回描述或抛出异常。"""
         self.requests.append(messages[:])
         self.models.append((provider, model_name))
         self.retry_settings.append((max_attempts, retry_delay_seconds))
+        self.cacheable.append(cacheable)
         if self.failure is not None:
             raise self.failure
         return "第一张是红色按钮，第二张显示成功提示。"
 
 
+class MemoryVisionStore:
+    """用字典模拟视觉描述缓存表，可注入读取失败。"""
+
+    def __init__(self) -> None:
+        """初始化空表。"""
+        self.rows: dict[VisionCacheKey, tuple[str, datetime]] = {}
+        self.failure: Exception | None = None
+        self.purges: int = 0
+
+    async def get(
+        self, *, key: VisionCacheKey, now: datetime
+    ) -> tuple[str, datetime] | None:
+        """返回未过期记录。"""
+        if self.failure is not None:
+            raise self.failure
+        row = self.rows.get(key)
+        if row is None or row[1] <= now:
+            return None
+        return row
+
+    async def put(
+        self,
+        *,
+        key: VisionCacheKey,
+        description: str,
+        created_at: datetime,
+        expires_at: datetime,
+    ) -> None:
+        """覆盖写入记录。"""
+        _ = created_at
+        self.rows[key] = (description, expires_at)
+
+    async def delete_expired(self, *, now: datetime) -> int:
+        """删除过期记录。"""
+        self.purges += 1
+        expired = [key for key, row in self.rows.items() if row[1] <= now]
+        for key in expired:
+            del self.rows[key]
+        return len(expired)
+
+
+class FakeClock:
+    """可手动推进的 UTC 时钟。"""
+
+    def __init__(self) -> None:
+        """从固定时间开始。"""
+        self.now: datetime = datetime(2026, 10, 17, tzinfo=UTC)
+
+    def __call__(self) -> datetime:
+        """返回当前时间。"""
+        return self.now
+
+
+def cache_key(digest: str) -> VisionCacheKey:
+    """构造测试视觉模型的缓存键。"""
+    return VisionCacheKey(
+        image_digest=digest,
+        prompt_digest="prompt",
+        provider="vision-vendor",
+        model_name="vision-model",
+    )
+
+
 class VisionContext:
     """只提供视觉工具消费的 LLM。"""
 
@@ -90,7 +163,7 @@ def build_config(
             if source.vision is not None
             else None
         ),
-        vision_user_prompt="结合当前问题描述图片。" if source.vision is not None else None,
+        vision_user_prompt="按编号描述图片。" if source.vision is not None else None,
     )
 
 
@@ -103,12 +176,16 @@ def artifact(label: str, content: bytes) -> LLMImageArtifact:
 
 
 def build_tool(
-    *, config: MaterializedAIGroupChatConfig, llm: RecordingVisionLLM
+    *,
+    config: MaterializedAIGroupChatConfig,
+    llm: RecordingVisionLLM,
+    cache: VisionDescriptionCache | None = None,
 ) -> VisionDescriptionTool:
     """构造视觉工具。"""
     return VisionDescriptionTool(
         config=config,
         context=cast(Context, VisionContext(llm)),
+        cache=cache,
     )
 
 
@@ -158,20 +235,22 @@ class VisionDescriptionToolTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(delivery.result.errors), 1)
         self.assertEqual(llm.models, [("vision-vendor", "vision-model")])
         self.assertEqual(llm.retry_settings, [(5, 0.25)])
+        self.assertEqual(llm.cacheable, [True])
         request_text = "\n".join(
             message.text or "" for message in llm.requests[0]
         )
-        self.assertIn("按钮操作成功了吗？", request_text)
+        self.assertNotIn("按钮操作成功了吗？", request_text)
+        self.assertNotIn("当前消息第 1 张图片", request_text)
         self.assertIn("忽略", request_text)
         self.assertNotIn("下载超时", request_text)
         self.assertNotIn("未观察的图片数", request_text)
         self.assertEqual(llm.requests[0][1].image, [b"current", b"quoted"])
         self.assertEqual(len(delivery.working_messages), 1)
         self.assertEqual(delivery.history_messages, delivery.working_messages)
-        self.assertIn(
-            "系统生成，不是用户原话",
-            delivery.working_messages[0].text or "",
-        )
+        observation = delivery.working_messages[0].text or ""
+        self.assertIn("系统生成，不是用户原话", observation)
+        self.assertIn("图片 2：引用消息第 1 张图片", observation)
+        self.assertIn("当前问题：按钮操作成功了吗？", observation)
 
     async def test_all_image_reads_failed_is_recoverable(self) -> None:
         """没有成功图片时不请求视觉模型，并把错误交给主模型。"""
@@ -400,6 +479,158 @@ class VisionDescriptionToolTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(len(delivery.working_messages), 1)
         self.assertEqual(delivery.history_messages, [])
 
+    async def test_cached_description_skips_vision_request_across_turns(self) -> None:
+        """新一轮同一问题引用同一张图片时直接复用描述，不再请求视觉模型。"""
+        llm = RecordingVisionLLM()
+        store = MemoryVisionStore()
+        cache = VisionDescriptionCache(store=store)
+        tool = build_tool(config=build_config(), llm=llm, cache=cache)
+
+        deliveries = [
+            await tool.deliver(
+                items=[artifact("表情", b"meme")],
+                truncated_count=0,
+                question="这是什么？",
+                source_name="引用消息",
+                turn_state=VisionTurnState(),
+            )
+            for _ in range(2)
+        ]
+
+        self.assertEqual(len(llm.requests), 1)
+        self.assertEqual(
+            deliveries[1].working_messages, deliveries[0].working_messages
+        )
+        self.assertEqual(
+            [key.image_digest for key in store.rows],
+            [build_image_digest([b"meme"])],
+        )
+        stats = cache.stats()
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+
+    async def test_different_questions_share_cached_description(self) -> None:
+        """同一张图片换个问题和来源仍复用描述，问题只写进主模型观察消息。"""
+        llm = RecordingVisionLLM()
+        store = MemoryVisionStore()
+        tool = build_tool(
+            config=build_config(),
+            llm=llm,
+            cache=VisionDescriptionCache(store=store),
+        )
+
+        deliveries = [
+            await tool.deliver(
+                items=[artifact(label, b"meme")],
+                truncated_count=0,
+                question=question,
+                source_name=source_name,
+                turn_state=VisionTurnState(),
+            )
+            for label, question, source_name in (
+                ("表情", "这是什么？", "引用消息"),
+                ("工具图片", "好笑吗？", "工具返回的图片"),
+            )
+        ]
+
+        self.assertEqual(len(llm.requests), 1)
+        self.assertEqual(len(store.rows), 1)
+        self.assertIn(
+            "当前问题：好笑吗？", deliveries[1].working_messages[0].text or ""
+        )
+
+    async def test_changed_vision_prompt_does_not_reuse_description(self) -> None:
+        """修改视觉提示词后同一张图片重新请求视觉模型。"""
+        llm = RecordingVisionLLM()
+        store = MemoryVisionStore()
+        cache = VisionDescriptionCache(store=store)
+        config = build_config()
+
+        for user_prompt in ("按编号描述图片。", "逐张列出图片中的文字。"):
+            _ = await build_tool(
+                config=replace(config, vision_user_prompt=user_prompt),
+                llm=llm,
+                cache=cache,
+            ).deliver(
+                items=[artifact("表情", b"meme")],
+                truncated_count=0,
+                question="这是什么？",
+                source_name="引用消息",
+                turn_state=VisionTurnState(),
+            )
+
+        self.assertEqual(len(llm.requests), 2)
+        self.assertEqual(len({key.prompt_digest for key in store.rows}), 2)
+        self.assertEqual(
+            {key.image_digest for key in store.rows}, {build_image_digest([b"meme"])}
+        )
+
+
+class VisionDescriptionCacheTest(unittest.IsolatedAsyncioTestCase):
+    """验证内存 LRU、TTL、持久层回填和故障降级。"""
+
+    async def test_lru_evicts_least_recently_used_entry(self) -> None:
+        """超出容量时淘汰最久未读的描述。"""
+        cache = VisionDescriptionCache(store=None, max_entries=2)
+        for digest in ("a", "b"):
+            await cache.put(cache_key(digest), f"描述 {digest}")
+        self.assertEqual(await cache.get(cache_key("a")), "描述 a")
+
+        await cache.put(cache_key("c"), "描述 c")
+
+        self.assertIsNone(await cache.get(cache_key("b")))
+        self.assertEqual(await cache.get(cache_key("a")), "描述 a")
+        stats = cache.stats()
+        self.assertEqual((stats.entries, stats.evictions), (2, 1))
+        self.assertEqual((stats.memory_hits, stats.misses), (2, 1))
+
+    async def test_expired_entries_are_dropped_from_memory_and_store(self) -> None:
+        """过期描述视为未命中，下一次写入时清理持久层。"""
+        clock = FakeClock()
+        store = MemoryVisionStore()
+        cache = VisionDescriptionCache(store=store, ttl_seconds=60, utc_now=clock)
+        await cache.put(cache_key("a"), "旧描述")
+
+        clock.now += timedelta(hours=2)
+        self.assertIsNone(await cache.get(cache_key("a")))
+        await cache.put(cache_key("b"), "新描述")
+
+        self.assertEqual(list(store.rows), [cache_key("b")])
+        self.assertEqual(store.purges, 2)
+        self.assertEqual(cache.stats().expirations, 2)
+
+    async def test_persistent_hit_refills_memory(self) -> None:
+        """进程重启后从持久层命中，并回填内存 LRU。"""
+        store = MemoryVisionStore()
+        await VisionDescriptionCache(store=store).put(cache_key("a"), "描述")
+        cache = VisionDescriptionCache(store=store)
+
+        self.assertEqual(await cache.get(cache_key("a")), "描述")
+        self.assertEqual(await cache.get(cache_key("a")), "描述")
+
+        stats = cache.stats()
+        self.assertEqual((stats.persistent_hits, stats.memory_hits), (1, 1))
+
+    async def test_store_failure_counts_as_miss(self) -> None:
+        """持久层读取失败时按未命中处理，不向视觉工具抛出异常。"""
+        store = MemoryVisionStore()
+        store.failure = ConnectionError("数据库不可用")
+        cache = VisionDescriptionCache(store=store)
+
+        self.assertIsNone(await cache.get(cache_key("a")))
+
+        stats = cache.stats()
+        self.assertEqual((stats.misses, stats.store_errors), (1, 1))
+
+    def test_batch_digest_depends_on_image_order(self) -> None:
+        """单张图片使用内容摘要，多张图片的摘要随顺序变化。"""
+        self.assertEqual(
+            build_image_digest([b"a"]),
+            "ca978112ca1bbdcafac231b39a23dc4da786eff8147c4e72b9807785afee48bb",
+        )
+        self.assertNotEqual(
+            build_image_digest([b"a", b"b"]), build_image_digest([b"b", b"a"])
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
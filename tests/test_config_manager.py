@@ -102,6 +102,33 @@ class ConfigManagerTest(unittest.IsolatedAsyncioTestCase):
         )
         self.assertEqual(len(loaded.plugins.referenced_files), 6)
 
+    def test_materializes_local_tokenizer_vocabulary(self) -> None:
+        """主模型引用的 BPE 词表在加载配置时解析，格式错误时拒绝。"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            config_file = root / "mybot.toml"
+            write_ai_files(root)
+            vocabulary = root / "ai/vocab.tiktoken"
+            vocabulary.write_bytes(b"YQ== 0\nYg== 1\nYWI= 2\n")
+            config_file.write_text(
+                ai_config().replace(
+                    "supports_images = false }",
+                    'supports_images = false, tokenizer_file = "ai/vocab.tiktoken" }',
+                ),
+                encoding="utf-8",
+            )
+
+            loaded = load_config(config_file=config_file)
+            vocabulary.write_bytes(b"not-a-rank-line\n")
+            with self.assertRaises(ConfigLoadError) as caught:
+                _ = load_config(config_file=config_file)
+
+        ai = loaded.plugins.ai_group_chat
+        assert ai is not None and ai.tokenizer is not None
+        self.assertEqual(ai.tokenizer.count("abab"), 2)
+        self.assertEqual(len(loaded.plugins.referenced_files), 7)
+        self.assertIn("tokenizer_file", str(caught.exception))
+
     def test_rejects_file_outside_config_directory(self) -> None:
         """prompt 不能通过父目录逃出统一配置目录。"""
         with tempfile.TemporaryDirectory() as temp_dir:
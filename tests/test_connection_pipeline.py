@@ -0,0 +1,283 @@
+"""NapCat 单连接分阶段接收流水线测试。"""
+
+import asyncio
+import json
+import unittest
+from pathlib import Path
+from typing import cast
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.api import BOTClient
+from app.core.codec import FrameDecoder, decode_pydantic, decode_stdlib
+from app.core.event_parser import EventTypeChecker
+from app.core.pipeline import ConnectionPipeline
+from app.core.server import EventPersistenceError
+from app.database import IncomingMessageWriter
+from app.models import (
+    AllEvent,
+    GroupMessage,
+    GroupRecallNoticeEvent,
+    Response,
+    Sender,
+    Text,
+)
+
+NAPCAT_FRAMES_PATH = Path("tests/fixtures/napcat/frames.jsonl")
+
+
+class FakeWebSocket:
+    """按顺序吐出文本帧，收到 None 时模拟客户端断开。"""
+
+    def __init__(self) -> None:
+        """初始化帧队列。"""
+        self.frames: asyncio.Queue[str | None] = asyncio.Queue()
+        self.close_code: int | None = None
+
+    async def receive_text(self) -> str:
+        """返回下一帧。"""
+        frame = await self.frames.get()
+        if frame is None:
+            raise WebSocketDisconnect(code=1000)
+        return frame
+
+    async def close(self, *, code: int, reason: str = "") -> None:
+        """记录关闭码。"""
+        _ = reason
+        self.close_code = code
+
+
+class FakeBot:
+    """只实现流水线用到的身份与回包接口。"""
+
+    def __init__(self) -> None:
+        """初始化为未识别身份。"""
+        self.boot_id: str = ""
+        self.responses: list[Response] = []
+
+    async def receive_data(self, response: Response) -> None:
+        """记录收到的回包。"""
+        self.responses.append(response)
+
+    def get_self_qq_id(self, msg: AllEvent) -> None:
+        """记录机器人身份。"""
+        if not isinstance(msg, Response):
+            self.boot_id = msg.self_id
+
+
+class FakeIncomingWriter:
+    """只用于切换到 group_commit 模式的占位写入器。"""
+
+    async def save_incoming(self, message: GroupMessage) -> None:
+        """流水线不直接调用写入器。"""
+        _ = message
+
+
+class RecordingPersister:
+    """记录持久化顺序，群消息写入可被测试手动放行。"""
+
+    def __init__(self) -> None:
+        """初始化放行闸门。"""
+        self.release = asyncio.Event()
+        self.calls: list[str] = []
+        self.error: Exception | None = None
+
+    async def __call__(
+        self,
+        *,
+        event: GroupMessage | GroupRecallNoticeEvent,
+        incoming_writer: IncomingMessageWriter | None,
+    ) -> None:
+        """群消息等待闸门，撤回立即完成。"""
+        _ = incoming_writer
+        if isinstance(event, GroupMessage):
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        self.calls.append(type(event).__name__)
+
+
+def _group_frame(message_id: str) -> str:
+    """创建一条群消息帧。"""
+    message = GroupMessage(
+        time=1_777_132_901,
+        self_id="10000",
+        post_type="message",
+        message_type="group",
+        user_id="20000",
+        message_id=message_id,
+        group_id="40000",
+        message=[Text.new(message_id)],
+        sender=Sender(user_id="20000", nickname="测试成员"),
+    )
+    return message.model_dump_json()
+
+
+def _recall_frame(message_id: str) -> str:
+    """创建一条群撤回通知帧。"""
+    return json.dumps(
+        {
+            "time": 1_777_132_999,
+            "self_id": "10000",
+            "post_type": "notice",
+            "notice_type": "group_recall",
+            "group_id": "40000",
+            "user_id": "20000",
+            "operator_id": "20000",
+            "message_id": message_id,
+        }
+    )
+
+
+def _response_frame() -> str:
+    """创建一条 Action 回包帧。"""
+    return json.dumps({"status": "ok", "retcode": 0, "data": {}, "echo": "e-1"})
+
+
+class PipelineFixture:
+    """组装流水线与其协作 fake。"""
+
+    def __init__(
+        self,
+        *,
+        incoming_writer: IncomingMessageWriter | None = None,
+        queue_size: int = 8,
+        decode_frame: FrameDecoder = decode_stdlib,
+    ) -> None:
+        """创建流水线。"""
+        self.websocket = FakeWebSocket()
+        self.bot = FakeBot()
+        self.persister = RecordingPersister()
+        self.dispatched: list[str] = []
+        self.identified: list[str] = []
+        self.pipeline = ConnectionPipeline(
+            websocket=cast(WebSocket, cast(object, self.websocket)),
+            client_id="test",
+            checker=EventTypeChecker(),
+            bot=cast(BOTClient, cast(object, self.bot)),
+            persist=self.persister,
+            dispatch=lambda event: self.dispatched.append(type(event).__name__),
+            on_bot_identified=self.identified.append,
+            incoming_writer=incoming_writer,
+            queue_size=queue_size,
+            decode_frame=decode_frame,
+        )
+
+
+class ConnectionPipelineTest(unittest.IsolatedAsyncioTestCase):
+    """验证回包快路径、有序分发、失败传播和背压指标。"""
+
+    async def test_response_is_not_blocked_by_pending_persistence(self) -> None:
+        """群消息仍在落库时，后续回包已交给 BOTClient。"""
+        fixture = PipelineFixture()
+        fixture.websocket.frames.put_nowait(_group_frame("1"))
+        fixture.websocket.frames.put_nowait(_response_frame())
+        running = asyncio.create_task(fixture.pipeline.run())
+
+        await asyncio.sleep(0.01)
+        self.assertEqual([item.echo for item in fixture.bot.responses], ["e-1"])
+        self.assertEqual(fixture.dispatched, [])
+
+        fixture.persister.release.set()
+        fixture.websocket.frames.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await running
+
+        self.assertEqual(fixture.dispatched, ["GroupMessage"])
+        self.assertEqual(fixture.identified, ["10000"])
+
+    async def test_group_commit_keeps_persist_before_dispatch_order(self) -> None:
+        """group_commit 模式下撤回等待前序提交，分发顺序与接收顺序一致。"""
+        fixture = PipelineFixture(incoming_writer=FakeIncomingWriter())
+        for frame in (_group_frame("1"), _group_frame("2"), _recall_frame("1")):
+            fixture.websocket.frames.put_nowait(frame)
+        running = asyncio.create_task(fixture.pipeline.run())
+
+        await asyncio.sleep(0.01)
+        self.assertEqual(fixture.persister.calls, [])
+        self.assertEqual(fixture.dispatched, [])
+
+        fixture.persister.release.set()
+        fixture.websocket.frames.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await running
+
+        self.assertEqual(
+            fixture.persister.calls,
+            ["GroupMessage", "GroupMessage", "GroupRecallNoticeEvent"],
+        )
+        self.assertEqual(
+            fixture.dispatched,
+            ["GroupMessage", "GroupMessage", "GroupRecallNoticeEvent"],
+        )
+
+    async def test_persistence_failure_stops_dispatch(self) -> None:
+        """落库连续失败时异常抛给连接入口，失败事件及其后续都不分发。"""
+        fixture = PipelineFixture(incoming_writer=FakeIncomingWriter())
+        fixture.persister.error = EventPersistenceError("持久化连续失败")
+        fixture.persister.release.set()
+        fixture.websocket.frames.put_nowait(_group_frame("1"))
+        fixture.websocket.frames.put_nowait(_group_frame("2"))
+
+        with self.assertRaises(EventPersistenceError):
+            await asyncio.wait_for(fixture.pipeline.run(), timeout=1)
+
+        self.assertEqual(fixture.dispatched, [])
+
+    async def test_full_stage_queue_records_backpressure(self) -> None:
+        """下游阻塞时上游阶段等待，并计入背压次数。"""
+        fixture = PipelineFixture(queue_size=1)
+        for index in range(6):
+            fixture.websocket.frames.put_nowait(_group_frame(str(index)))
+        running = asyncio.create_task(fixture.pipeline.run())
+
+        await asyncio.sleep(0.01)
+        stats = {item.stage: item for item in fixture.pipeline.stats()}
+        self.assertEqual(set(stats), {"parse", "persist", "dispatch"})
+        self.assertGreater(stats["parse"].blocked_puts, 0)
+        self.assertEqual(stats["parse"].capacity, 1)
+
+        fixture.persister.release.set()
+        fixture.websocket.frames.put_nowait(None)
+        with self.assertRaises(WebSocketDisconnect):
+            await running
+        self.assertEqual(len(fixture.dispatched), 6)
+
+    async def test_pydantic_codec_feeds_same_pipeline(self) -> None:
+        """pydantic 解码器与标准库解码器得到相同的回包和分发结果。"""
+        fixture = PipelineFixture(decode_frame=decode_pydantic)
+        fixture.persister.release.set()
+        for frame in ("[1, 2]", _group_frame("1"), _response_frame()):
+            fixture.websocket.frames.put_nowait(frame)
+        fixture.websocket.frames.put_nowait(None)
+
+        with self.assertRaises(WebSocketDisconnect):
+            await asyncio.wait_for(fixture.pipeline.run(), timeout=1)
+
+        self.assertEqual([item.echo for item in fixture.bot.responses], ["e-1"])
+        self.assertEqual(fixture.dispatched, ["GroupMessage"])
+
+
+class FrameCodecTest(unittest.TestCase):
+    """验证两种入站帧解码器行为一致。"""
+
+    def test_decoders_agree_on_recorded_frames(self) -> None:
+        """录制语料中的每一帧解码结果相同。"""
+        lines = NAPCAT_FRAMES_PATH.read_text(encoding="utf-8").splitlines()
+        for line in lines:
+            with self.subTest(frame=line[:60]):
+                self.assertEqual(decode_pydantic(line), decode_stdlib(line))
+                self.assertEqual(
+                    decode_pydantic(line.encode()), decode_stdlib(line.encode())
+                )
+
+    def test_invalid_json_raises_value_error(self) -> None:
+        """两种解码器都把非法 JSON 报告为 ValueError。"""
+        for decode in (decode_stdlib, decode_pydantic):
+            with self.subTest(decoder=decode.__name__):
+                with self.assertRaises(ValueError):
+                    _ = decode('{"post_type": ')
+
+
+if __name__ == "__main__":
+    unittest.main()
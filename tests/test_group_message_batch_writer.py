@@ -0,0 +1,167 @@
+"""入站群消息 group-commit 写入器测试。"""
+
+import asyncio
+import unittest
+from collections.abc import Sequence
+
+from app.database import GroupMessageBatchWriter
+from app.models import GroupMessage, Sender, Text
+
+
+class FakeBatchRepository:
+    """记录批量与逐条写入，并可注入失败。"""
+
+    def __init__(self) -> None:
+        """初始化调用记录。"""
+        self.batches: list[list[str]] = []
+        self.single_writes: list[str] = []
+        self.batch_failures: list[Exception] = []
+        self.bad_message_ids: set[str] = set()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def save_incoming_batch(self, messages: Sequence[GroupMessage]) -> None:
+        """记录一个批次的消息 ID。"""
+        await self.release.wait()
+        self.batches.append([message.message_id for message in messages])
+        if self.batch_failures:
+            raise self.batch_failures.pop(0)
+
+    async def save_incoming(self, message: GroupMessage) -> None:
+        """记录逐条降级写入。"""
+        self.single_writes.append(message.message_id)
+        if message.message_id in self.bad_message_ids:
+            raise ValueError(f"坏消息 {message.message_id}")
+
+
+def _message(message_id: str) -> GroupMessage:
+    """创建一条最小群消息。"""
+    return GroupMessage(
+        time=1_777_132_901,
+        self_id="10000",
+        post_type="message",
+        message_type="group",
+        user_id="20000",
+        message_id=message_id,
+        group_id="40000",
+        message=[Text.new(message_id)],
+        sender=Sender(user_id="20000", nickname="测试成员"),
+    )
+
+
+class GroupMessageBatchWriterTest(unittest.IsolatedAsyncioTestCase):
+    """验证合并窗口、批次上限、失败隔离和关闭时提交。"""
+
+    async def test_messages_in_window_share_one_transaction(self) -> None:
+        """同一窗口到达的消息一起提交，且每个调用方都在提交后返回。"""
+        repository = FakeBatchRepository()
+        writer = GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=0.05,
+            max_batch_size=10,
+        )
+
+        _ = await asyncio.gather(
+            *(writer.save_incoming(_message(str(index))) for index in range(3))
+        )
+        await writer.close()
+
+        self.assertEqual(repository.batches, [["0", "1", "2"]])
+        self.assertEqual(repository.single_writes, [])
+
+    async def test_full_batch_is_committed_without_waiting_for_window(self) -> None:
+        """批次装满后立即提交，剩余消息进入下一批。"""
+        repository = FakeBatchRepository()
+        writer = GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=30,
+            max_batch_size=2,
+        )
+
+        _ = await asyncio.wait_for(
+            asyncio.gather(
+                writer.save_incoming(_message("a")),
+                writer.save_incoming(_message("b")),
+            ),
+            timeout=1,
+        )
+        pending = asyncio.create_task(writer.save_incoming(_message("c")))
+        await asyncio.sleep(0)
+        await writer.close()
+        await pending
+
+        self.assertEqual(repository.batches, [["a", "b"], ["c"]])
+
+    async def test_batch_failure_falls_back_to_single_writes(self) -> None:
+        """整批失败后逐条重写，只有真正失败的消息把异常交给调用方。"""
+        repository = FakeBatchRepository()
+        repository.batch_failures.append(RuntimeError("批量失败"))
+        repository.bad_message_ids.add("bad")
+        writer = GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=0.05,
+            max_batch_size=10,
+        )
+
+        results = await asyncio.gather(
+            writer.save_incoming(_message("good")),
+            writer.save_incoming(_message("bad")),
+            return_exceptions=True,
+        )
+        await writer.close()
+
+        self.assertIsNone(results[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(repository.single_writes, ["good", "bad"])
+
+    async def test_close_commits_queued_messages_and_rejects_new_ones(self) -> None:
+        """关闭前已排队的消息仍会提交，关闭后拒绝新写入。"""
+        repository = FakeBatchRepository()
+        repository.release.clear()
+        writer = GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=0.01,
+            max_batch_size=1,
+        )
+        first = asyncio.create_task(writer.save_incoming(_message("first")))
+        second = asyncio.create_task(writer.save_incoming(_message("second")))
+        await asyncio.sleep(0.02)
+
+        closing = asyncio.create_task(writer.close())
+        await asyncio.sleep(0)
+        repository.release.set()
+        await closing
+        _ = await asyncio.gather(first, second)
+
+        self.assertEqual(repository.batches, [["first"], ["second"]])
+        with self.assertRaisesRegex(RuntimeError, "已关闭"):
+            await writer.save_incoming(_message("late"))
+
+
+    async def test_cancelled_flush_task_releases_all_waiters(self) -> None:
+        """flush 任务在写入中途被取消时，进行中和排队的调用方都不会挂起。"""
+        repository = FakeBatchRepository()
+        repository.release.clear()
+        writer = GroupMessageBatchWriter(
+            repository=repository,
+            max_delay_seconds=0.01,
+            max_batch_size=1,
+        )
+        in_flight = asyncio.create_task(writer.save_incoming(_message("first")))
+        queued = asyncio.create_task(writer.save_incoming(_message("second")))
+        await asyncio.sleep(0.02)
+
+        flush_task = writer._flush_task  # pyright: ignore[reportPrivateUsage]
+        assert flush_task is not None
+        _ = flush_task.cancel()
+        results = await asyncio.wait_for(
+            asyncio.gather(in_flight, queued, return_exceptions=True), timeout=1
+        )
+
+        self.assertTrue(
+            all(isinstance(result, asyncio.CancelledError) for result in results)
+        )
+        self.assertEqual(repository.batches, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""共享 HTTP 连接池计数测试。"""
+
+import asyncio
+import os
+import unittest
+from importlib.util import find_spec
+from unittest.mock import patch
+
+import httpx
+
+from app.config.schemas import NetworkConfig
+from app.utils.http_pool import (
+    MeteredAsyncClient,
+    MeteredTransport,
+    _environment_proxy_mounts,  # pyright: ignore[reportPrivateUsage]
+)
+
+
+async def _serve_keepalive(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    """在同一连接上循环应答 keep-alive 请求。"""
+    try:
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\nConnection: keep-alive\r\n\r\nok"
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+class MeteredAsyncClientTest(unittest.IsolatedAsyncioTestCase):
+    """验证在途请求、连接复用和排队等待计数。"""
+
+    async def asyncSetUp(self) -> None:
+        """启动本地 keep-alive HTTP 服务。"""
+        self.server = await asyncio.start_server(_serve_keepalive, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/image"
+
+    async def asyncTearDown(self) -> None:
+        """关闭本地服务。"""
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_connections_are_reused_and_waits_are_counted(self) -> None:
+        """流式响应关闭前占用唯一连接，后续请求排队后复用同一连接。"""
+        client = MeteredAsyncClient(
+            name="direct", network=NetworkConfig(max_connections=1)
+        )
+        async with client:
+            async with client.stream("GET", self.url) as response:
+                self.assertEqual(client.pool_stats().active, 1)
+                waiting = asyncio.create_task(client.get(self.url))
+                await asyncio.sleep(0.05)
+                self.assertFalse(waiting.done())
+                _ = await response.aread()
+            self.assertEqual((await waiting).text, "ok")
+            _ = await client.get(self.url)
+
+            stats = client.pool_stats()
+            self.assertEqual(
+                (stats.requests, stats.active, stats.peak_active, stats.waits),
+                (3, 0, 2, 1),
+            )
+            self.assertEqual((stats.connections, stats.idle_connections), (1, 1))
+
+    async def test_environment_proxy_is_honoured(self) -> None:
+        """未显式配置代理时沿用 HTTP_PROXY 环境变量，NO_PROXY 中的主机直连。"""
+        request_lines: list[bytes] = []
+
+        async def proxy(
+            reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+            request_lines.append((await reader.readline()).strip())
+            await _serve_keepalive(reader, writer)
+
+        proxy_server = await asyncio.start_server(proxy, "127.0.0.1", 0)
+        proxy_port = proxy_server.sockets[0].getsockname()[1]
+        environment = {
+            key: value
+            for key, value in os.environ.items()
+            if not key.lower().endswith("_proxy")
+        }
+        environment["HTTP_PROXY"] = f"http://127.0.0.1:{proxy_port}"
+        environment["NO_PROXY"] = "127.0.0.1"
+        try:
+            with patch.dict(os.environ, environment, clear=True):
+                client = MeteredAsyncClient(name="direct", network=NetworkConfig())
+            async with client:
+                proxied = await client.get("http://llm.example.invalid/v1/models")
+                direct = await client.get(self.url)
+                stats = client.pool_stats()
+        finally:
+            proxy_server.close()
+            await proxy_server.wait_closed()
+
+        self.assertEqual((proxied.text, direct.text), ("ok", "ok"))
+        self.assertEqual(
+            request_lines, [b"GET http://llm.example.invalid/v1/models HTTP/1.1"]
+        )
+        self.assertEqual((stats.requests, stats.connections), (2, 2))
+
+    def test_environment_proxy_mounts_follow_no_proxy_rules(self) -> None:
+        """NO_PROXY 按 IP、IPv6、localhost、域名后缀和带协议的写法生成直连挂载点。"""
+        environment = {
+            key: value
+            for key, value in os.environ.items()
+            if not key.lower().endswith("_proxy")
+        }
+        environment["HTTPS_PROXY"] = "proxy.internal:3128"
+        environment["NO_PROXY"] = (
+            "10.0.0.0/8, ::1, localhost, .example.com, http://plain.test"
+        )
+        with patch.dict(os.environ, environment, clear=True):
+            mounts = _environment_proxy_mounts()
+            environment["NO_PROXY"] = "*"
+            with patch.dict(os.environ, environment):
+                everything_direct = _environment_proxy_mounts()
+
+        self.assertEqual(
+            mounts,
+            {
+                "https://": "http://proxy.internal:3128",
+                "all://10.0.0.0/8": None,
+                "all://[::1]": None,
+                "all://localhost": None,
+                "all://*.example.com": None,
+                "http://plain.test": None,
+            },
+        )
+        self.assertEqual(everything_direct, {})
+
+    async def test_unreadable_pool_reports_metrics_unavailable(self) -> None:
+        """底层不是 httpx 连接池时照常转发请求，连接指标显示为不可用。"""
+        transport = MeteredTransport(
+            name="mock",
+            transport=httpx.MockTransport(lambda _: httpx.Response(200, text="ok")),
+            max_connections=1,
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("http://mock.invalid/")
+
+        stats = transport.stats()
+        self.assertEqual(response.text, "ok")
+        self.assertEqual((stats.requests, stats.active, stats.waits), (1, 0, 0))
+        self.assertEqual((stats.connections, stats.idle_connections), (None, None))
+
+    @unittest.skipIf(find_spec("h2") is not None, "已安装 h2")
+    def test_http2_falls_back_without_h2(self) -> None:
+        """未安装 h2 时开启 HTTP/2 不报错，回退到 HTTP/1.1。"""
+        client = MeteredAsyncClient(name="direct", network=NetworkConfig(http2=True))
+
+        self.assertFalse(client.pool_stats().http2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,205 @@
+"""LLM 相同请求合并与响应缓存测试。"""
+
+import asyncio
+import unittest
+from typing import override
+
+from app.services.llm.base import LLMProvider
+from app.services.llm.coalescing import LLMRequestCoalescer, chat_request_key
+from app.services.llm.handler import LLMHandler
+from app.services.llm.schemas import ChatMessage, LLMProviderWrapper
+
+
+class GatedTextProvider(LLMProvider):
+    """记录请求，并等待测试放行后返回固定文本。"""
+
+    def __init__(self) -> None:
+        """初始化放行事件和调用计数。"""
+        self.release: asyncio.Event = asyncio.Event()
+        self.calls: list[list[ChatMessage]] = []
+        self.cancelled: int = 0
+        self.failure: Exception | None = None
+
+    @override
+    async def get_ai_response(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        max_attempts: int | None = None,
+        retry_delay_seconds: float | None = None,
+    ) -> str:
+        """等待放行后返回描述。"""
+        _ = (model, max_attempts, retry_delay_seconds)
+        self.calls.append(messages)
+        try:
+            _ = await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.failure is not None:
+            raise self.failure
+        return f"描述 {len(self.calls)}"
+
+
+def _handler(provider: GatedTextProvider, *, ttl_seconds: float = 0) -> LLMHandler:
+    """用单个 provider 构造 LLMHandler。"""
+    return LLMHandler(
+        services={
+            "vision-vendor": LLMProviderWrapper(
+                provider_id="vision-vendor", provider=provider
+            )
+        },
+        coalescers={
+            "vision-vendor": LLMRequestCoalescer(
+                provider="vision-vendor", ttl_seconds=ttl_seconds
+            )
+        },
+    )
+
+
+def _messages(image: bytes = b"image") -> list[ChatMessage]:
+    """构造带图片的视觉请求。"""
+    return [
+        ChatMessage(role="system", text="描述图片"),
+        ChatMessage(role="user", text="看图", image=[image]),
+    ]
+
+
+class LLMRequestCoalescingTest(unittest.IsolatedAsyncioTestCase):
+    """验证并发合并、取消、失败和 TTL 缓存。"""
+
+    async def _ask(
+        self, handler: LLMHandler, image: bytes = b"image", *, cacheable: bool = True
+    ) -> str:
+        """发起一次视觉文本请求，默认像视觉描述一样声明可缓存。"""
+        return await handler.get_ai_text_response(
+            messages=_messages(image),
+            provider="vision-vendor",
+            model_name="vision-model",
+            cacheable=cacheable,
+        )
+
+    async def test_concurrent_identical_requests_share_one_call(self) -> None:
+        """内容相同的新消息对象合并，图片不同的请求单独调用。"""
+        provider = GatedTextProvider()
+        handler = _handler(provider)
+
+        tasks = [
+            asyncio.create_task(self._ask(handler)),
+            asyncio.create_task(self._ask(handler)),
+            asyncio.create_task(self._ask(handler, image=b"other")),
+        ]
+        await asyncio.sleep(0)
+        provider.release.set()
+        results = await asyncio.gather(*tasks)
+
+        self.assertEqual(len(provider.calls), 2)
+        self.assertEqual(results[0], results[1])
+        self.assertNotEqual(results[0], results[2])
+        (stats,) = handler.coalescing_stats()
+        self.assertEqual(
+            (stats.requests, stats.upstream_calls, stats.coalesced, stats.cache_hits),
+            (3, 2, 1, 0),
+        )
+        # 未开启 TTL 时，已完成的请求不会被后续请求复用。
+        self.assertEqual(await self._ask(handler), "描述 3")
+
+    async def test_ttl_cache_serves_completed_response_until_expiry(self) -> None:
+        """开启 TTL 后完成的响应直接命中，过期后重新请求。"""
+        now = [0.0]
+        provider = GatedTextProvider()
+        provider.release.set()
+        handler = LLMHandler(
+            services={
+                "vision-vendor": LLMProviderWrapper(
+                    provider_id="vision-vendor", provider=provider
+                )
+            },
+            coalescers={
+                "vision-vendor": LLMRequestCoalescer(
+                    provider="vision-vendor", ttl_seconds=60, clock=lambda: now[0]
+                )
+            },
+        )
+
+        first = await self._ask(handler)
+        now[0] = 59
+        cached = await self._ask(handler)
+        now[0] = 61
+        refreshed = await self._ask(handler)
+
+        self.assertEqual(cached, first)
+        self.assertNotEqual(refreshed, first)
+        (stats,) = handler.coalescing_stats()
+        self.assertEqual((stats.upstream_calls, stats.cache_hits), (2, 1))
+
+    async def test_uncacheable_requests_bypass_ttl_cache(self) -> None:
+        """未声明可缓存的请求仍会合并，但不读写响应缓存。"""
+        provider = GatedTextProvider()
+        provider.release.set()
+        handler = _handler(provider, ttl_seconds=60)
+
+        first = await self._ask(handler, cacheable=False)
+        second = await self._ask(handler, cacheable=False)
+        cached = await self._ask(handler)
+
+        self.assertEqual((first, second, cached), ("描述 1", "描述 2", "描述 3"))
+        self.assertEqual(await self._ask(handler, cacheable=False), "描述 4")
+        self.assertEqual(await self._ask(handler), "描述 3")
+        (stats,) = handler.coalescing_stats()
+        self.assertEqual((stats.upstream_calls, stats.cache_hits), (4, 1))
+
+    async def test_cancelling_one_waiter_keeps_shared_call(self) -> None:
+        """一个调用方取消不影响其他等待者，最后一个等待者取消时取消上游。"""
+        provider = GatedTextProvider()
+        handler = _handler(provider)
+
+        first = asyncio.create_task(self._ask(handler))
+        second = asyncio.create_task(self._ask(handler))
+        await asyncio.sleep(0)
+        _ = first.cancel()
+        await asyncio.sleep(0)
+        provider.release.set()
+
+        self.assertEqual(await second, "描述 1")
+        with self.assertRaises(asyncio.CancelledError):
+            await first
+
+        provider.release.clear()
+        lone = asyncio.create_task(self._ask(handler, image=b"lone"))
+        await asyncio.sleep(0)
+        _ = lone.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await lone
+        await asyncio.sleep(0)
+        self.assertEqual(provider.cancelled, 1)
+
+    async def test_failure_reaches_every_waiter_and_is_not_cached(self) -> None:
+        """上游失败时所有等待者收到同一异常，之后的请求重新调用。"""
+        provider = GatedTextProvider()
+        provider.failure = RuntimeError("视觉服务不可用")
+        handler = _handler(provider, ttl_seconds=60)
+
+        tasks = [asyncio.create_task(self._ask(handler)) for _ in range(2)]
+        await asyncio.sleep(0)
+        provider.release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        provider.failure = None
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+        self.assertEqual(await self._ask(handler), "描述 2")
+
+    def test_request_key_ignores_message_identity(self) -> None:
+        """请求摘要只取决于模型和消息内容。"""
+        self.assertEqual(
+            chat_request_key(model="m", messages=_messages()),
+            chat_request_key(model="m", messages=_messages()),
+        )
+        self.assertNotEqual(
+            chat_request_key(model="m", messages=_messages()),
+            chat_request_key(model="n", messages=_messages()),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+"""多端点 provider 路由与对冲请求测试。"""
+
+import asyncio
+import unittest
+from collections.abc import AsyncGenerator
+from typing import override
+
+from app.config import LLMProviderConfig
+from app.services.llm.base import LLMProvider
+from app.services.llm.endpoint_pool import EndpointPoolProvider
+from app.services.llm.schemas import (
+    ChatMessage,
+    LLMContentDelta,
+    LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
+    LLMToolChoice,
+    LLMToolDefinition,
+)
+from app.services.llm.wrapper import ResilientLLMProvider
+
+MESSAGES = [ChatMessage(role="user", text="你好")]
+
+
+class HangState:
+    """多个端点共享：为 True 时下一个到达的请求一直挂起。"""
+
+    def __init__(self) -> None:
+        """默认不挂起。"""
+        self.hang_next: bool = False
+
+
+class FakeEndpoint(LLMProvider):
+    """按设定耗时推进假时钟的端点，可按计划失败或挂起。"""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        clock: list[float],
+        latency: float = 0.0,
+        hang: HangState | None = None,
+    ) -> None:
+        """保存名称、耗时和共享挂起状态。"""
+        self.name: str = name
+        self.clock: list[float] = clock
+        self.latency: float = latency
+        self.hang: HangState = hang or HangState()
+        self.failing: bool = False
+        self.calls: int = 0
+        self.cancelled: int = 0
+        self.closed_streams: int = 0
+
+    async def _arrive(self) -> None:
+        """记录调用，按计划挂起、失败或推进时钟。"""
+        self.calls += 1
+        if self.hang.hang_next:
+            self.hang.hang_next = False
+            try:
+                _ = await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+        if self.failing:
+            raise ValueError(f"{self.name} 不可用")
+        self.clock[0] += self.latency
+
+    @override
+    async def get_ai_response(self, messages: list[ChatMessage], model: str) -> str:
+        """返回端点名称。"""
+        _ = (messages, model)
+        await self._arrive()
+        return self.name
+
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """首个事件前按计划挂起，之后产出端点名称。"""
+        _ = (messages, model, tools, tool_choice, parallel_tool_calls)
+        try:
+            await self._arrive()
+            yield LLMContentDelta(text=self.name)
+            yield LLMStreamCompleted(response=LLMResponse(content=self.name))
+        finally:
+            self.closed_streams += 1
+
+
+def _pool(
+    *endpoints: FakeEndpoint, clock: list[float], hedge: bool = False
+) -> EndpointPoolProvider:
+    """用假端点和假时钟构造端点池。"""
+    return EndpointPoolProvider(
+        provider="gateway",
+        endpoints=[(endpoint.name, endpoint) for endpoint in endpoints],
+        hedge_requests=hedge,
+        hedge_min_delay_seconds=0.01,
+        clock=lambda: clock[0],
+    )
+
+
+class EndpointPoolRoutingTest(unittest.IsolatedAsyncioTestCase):
+    """验证按延迟和错误率路由。"""
+
+    async def test_routes_to_lowest_latency_after_probing(self) -> None:
+        """未采样的端点先被探测，之后请求集中到延迟最低的端点。"""
+        clock = [0.0]
+        slow = FakeEndpoint("slow", clock=clock, latency=2.0)
+        fast = FakeEndpoint("fast", clock=clock, latency=0.5)
+        pool = _pool(slow, fast, clock=clock)
+
+        results = [await pool.get_ai_response(MESSAGES, "m") for _ in range(5)]
+
+        self.assertEqual(results, ["slow", "fast", "fast", "fast", "fast"])
+        slow_stats, fast_stats = pool.stats()
+        self.assertEqual(slow_stats.latency_ewma_seconds, {"text": 2.0})
+        self.assertEqual(fast_stats.requests, 4)
+
+    async def test_failures_shift_traffic_until_error_rate_decays(self) -> None:
+        """失败端点的请求由重试层切到次优端点，错误率衰减后重新得到流量。"""
+        clock = [0.0]
+        primary = FakeEndpoint("primary", clock=clock, latency=0.1)
+        backup = FakeEndpoint("backup", clock=clock, latency=1.0)
+        pool = _pool(primary, backup, clock=clock)
+        provider = ResilientLLMProvider(
+            inner_provider=pool, provider_config=LLMProviderConfig(max_attempts=2)
+        )
+        for _ in range(2):
+            _ = await provider.get_ai_response(MESSAGES, "m")
+
+        primary.failing = True
+        self.assertEqual(await provider.get_ai_response(MESSAGES, "m"), "backup")
+        primary.failing = False
+        self.assertEqual(await provider.get_ai_response(MESSAGES, "m"), "backup")
+
+        clock[0] += 600
+        self.assertEqual(await provider.get_ai_response(MESSAGES, "m"), "primary")
+        self.assertEqual(pool.stats()[0].failures, 1)
+
+
+class EndpointPoolHedgingTest(unittest.IsolatedAsyncioTestCase):
+    """验证超过 p95 后的对冲请求。"""
+
+    async def _warm_up(self, pool: EndpointPoolProvider) -> None:
+        """让两个端点都积累足够的文本和流式延迟样本。"""
+        for _ in range(40):
+            _ = await pool.get_ai_response(MESSAGES, "m")
+            async for _event in pool.stream_ai_response_with_tools(MESSAGES, "m", []):
+                pass
+
+    async def test_slow_primary_is_hedged_and_cancelled(self) -> None:
+        """首选端点挂起时次优端点补发并胜出，首选请求被取消。"""
+        clock = [0.0]
+        hang = HangState()
+        first = FakeEndpoint("first", clock=clock, hang=hang)
+        second = FakeEndpoint("second", clock=clock, hang=hang)
+        pool = _pool(first, second, clock=clock, hedge=True)
+        await self._warm_up(pool)
+
+        hang.hang_next = True
+        winner = await pool.get_ai_response(MESSAGES, "m")
+
+        self.assertEqual(first.cancelled + second.cancelled, 1)
+        stats = pool.stats()
+        self.assertEqual(sum(item.hedged for item in stats), 1)
+        self.assertEqual(sum(item.hedge_wins for item in stats), 1)
+        self.assertEqual(
+            next(item for item in stats if item.hedge_wins).base_url, winner
+        )
+
+    async def test_hedged_stream_closes_the_losing_stream(self) -> None:
+        """流式请求按首个事件对冲，落败端点的流被关闭。"""
+        clock = [0.0]
+        hang = HangState()
+        first = FakeEndpoint("first", clock=clock, hang=hang)
+        second = FakeEndpoint("second", clock=clock, hang=hang)
+        pool = _pool(first, second, clock=clock, hedge=True)
+        await self._warm_up(pool)
+        opened = first.closed_streams + second.closed_streams
+
+        hang.hang_next = True
+        events = [
+            event
+            async for event in pool.stream_ai_response_with_tools(MESSAGES, "m", [])
+        ]
+
+        self.assertIsInstance(events[-1], LLMStreamCompleted)
+        self.assertEqual(first.cancelled + second.cancelled, 1)
+        self.assertEqual(first.closed_streams + second.closed_streams, opened + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
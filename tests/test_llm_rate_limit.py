@@ -0,0 +1,265 @@
+"""LLM provider 并发与速率限制测试。"""
+
+import asyncio
+import unittest
+from collections.abc import AsyncGenerator
+from typing import override
+
+import httpx
+from openai import RateLimitError
+
+from app.config import LLMProviderConfig
+from app.services.llm.base import LLMProvider
+from app.services.llm.rate_limit import (
+    ProviderRateLimiter,
+    estimate_request_tokens,
+    retry_after_seconds,
+)
+from app.services.llm.schemas import (
+    ChatMessage,
+    LLMContentDelta,
+    LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
+    LLMToolChoice,
+    LLMToolDefinition,
+    LLMUsage,
+)
+from app.services.llm.wrapper import ResilientLLMProvider
+
+
+class FakeClock:
+    """手动推进的时钟，``sleep`` 直接把时间拨到结束时刻。"""
+
+    def __init__(self) -> None:
+        """从 0 秒开始，记录每次睡眠时长。"""
+        self.now: float = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        """返回当前时间。"""
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        """记录并推进时间。"""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _rate_limit_error(headers: dict[str, str]) -> RateLimitError:
+    """构造带响应头的 429 错误。"""
+    request = httpx.Request("POST", "https://llm.example/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+class ThrottledProvider(LLMProvider):
+    """先按计划返回 429，再返回文本，并记录同时在途的请求数。"""
+
+    def __init__(self, *, rate_limited_calls: int) -> None:
+        """保存 429 次数。"""
+        self.rate_limited_calls: int = rate_limited_calls
+        self.calls: int = 0
+        self.in_flight: int = 0
+        self.peak_in_flight: int = 0
+        self.release: asyncio.Event = asyncio.Event()
+        self.release.set()
+
+    @override
+    async def get_ai_response(self, messages: list[ChatMessage], model: str) -> str:
+        """等待放行后按计划失败或返回文本。"""
+        _ = (messages, model)
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            _ = await self.release.wait()
+        finally:
+            self.in_flight -= 1
+        if self.calls <= self.rate_limited_calls:
+            raise _rate_limit_error({"retry-after": "7"})
+        return "ok"
+
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """产出一段正文和带用量的完成事件。"""
+        _ = (messages, model, tools, tool_choice, parallel_tool_calls)
+        self.in_flight += 1
+        try:
+            yield LLMContentDelta(text="你好")
+            yield LLMStreamCompleted(
+                response=LLMResponse(
+                    content="你好",
+                    usage=LLMUsage(prompt_tokens=90, completion_tokens=10),
+                )
+            )
+        finally:
+            self.in_flight -= 1
+
+
+class ProviderRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    """验证并发上限、AIMD 调整和令牌桶等待。"""
+
+    async def test_concurrency_is_capped_and_halved_on_rate_limit(self) -> None:
+        """超出上限的请求排队，429 后上限减半，成功后逐步恢复。"""
+        limiter = ProviderRateLimiter(provider="p", max_concurrency=4)
+        for _ in range(4):
+            await limiter.acquire(estimated_tokens=0)
+        waiter = asyncio.create_task(limiter.acquire(estimated_tokens=0))
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+
+        limiter.release(succeeded=True)
+        await waiter
+        self.assertEqual(limiter.stats().in_flight, 4)
+
+        limiter.record_rate_limited(retry_after=None)
+        self.assertEqual(limiter.concurrency_limit, 2)
+        for _ in range(4):
+            limiter.release(succeeded=True)
+        stats = limiter.stats()
+        self.assertEqual((stats.in_flight, stats.throttled, stats.acquired), (0, 1, 5))
+        self.assertEqual(stats.concurrency_limit, 3)
+
+    async def test_buckets_and_retry_after_delay_new_requests(self) -> None:
+        """每分钟请求数用完后按补充速度等待，Retry-After 期间不发新请求。"""
+        clock = FakeClock()
+        limiter = ProviderRateLimiter(
+            provider="p",
+            max_concurrency=10,
+            requests_per_minute=2,
+            tokens_per_minute=600,
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        for _ in range(2):
+            await limiter.acquire(estimated_tokens=100)
+            limiter.release(succeeded=True)
+        self.assertEqual(clock.sleeps, [])
+
+        await limiter.acquire(estimated_tokens=100)
+        limiter.release(succeeded=True)
+        self.assertEqual(clock.sleeps, [30.0])
+
+        limiter.record_rate_limited(retry_after=45)
+        await limiter.acquire(estimated_tokens=0)
+        self.assertEqual(clock.now, 75.0)
+
+        # 实际用量远超预估时欠下的 token 额度由后续请求等待补齐。
+        limiter.record_usage(estimated_tokens=0, actual_tokens=1500)
+        limiter.release(succeeded=True)
+        await limiter.acquire(estimated_tokens=100)
+        self.assertGreater(clock.now, 75.0 + 60)
+        self.assertGreater(limiter.stats().max_wait_seconds, 60)
+
+    def test_retry_after_header_forms(self) -> None:
+        """支持毫秒、秒数和 HTTP 日期，过大的值被截断。"""
+        self.assertEqual(retry_after_seconds({"retry-after-ms": "1500"}), 1.5)
+        self.assertEqual(retry_after_seconds({"retry-after": "3"}), 3.0)
+        self.assertEqual(retry_after_seconds({"retry-after": "86400"}), 120.0)
+        self.assertEqual(
+            retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"}), 0.0
+        )
+        self.assertIsNone(retry_after_seconds({"retry-after": "soon"}))
+        self.assertIsNone(retry_after_seconds({}))
+
+    def test_estimate_counts_text_bytes_and_images(self) -> None:
+        """文本按 UTF-8 字节数粗估，每张图片计固定开销。"""
+        self.assertEqual(
+            estimate_request_tokens(
+                [ChatMessage(role="user", text="中文", image=[b"png"])]
+            ),
+            2 + 765,
+        )
+
+
+class ResilientProviderRateLimitTest(unittest.IsolatedAsyncioTestCase):
+    """验证 ResilientLLMProvider 与限制器的衔接。"""
+
+    async def test_rate_limited_attempt_lowers_limit_and_waits(self) -> None:
+        """429 降低并发上限并按 Retry-After 暂停，重试成功后归还槽位。"""
+        clock = FakeClock()
+        limiter = ProviderRateLimiter(
+            provider="p", max_concurrency=4, clock=clock, sleep=clock.sleep
+        )
+        inner = ThrottledProvider(rate_limited_calls=1)
+        provider = ResilientLLMProvider(
+            inner_provider=inner,
+            provider_config=LLMProviderConfig(max_attempts=2),
+            rate_limiter=limiter,
+        )
+
+        result = await provider.get_ai_response(
+            messages=[ChatMessage(role="user", text="hi")], model="m"
+        )
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(clock.sleeps, [7.0])
+        stats = limiter.stats()
+        self.assertEqual((stats.throttled, stats.in_flight, stats.acquired), (1, 0, 2))
+        self.assertEqual(stats.concurrency_limit, 2)
+
+    async def test_concurrent_callers_share_the_cap(self) -> None:
+        """同一限制器下同时在途的上游请求不超过上限。"""
+        limiter = ProviderRateLimiter(provider="p", max_concurrency=2)
+        inner = ThrottledProvider(rate_limited_calls=0)
+        inner.release.clear()
+        provider = ResilientLLMProvider(
+            inner_provider=inner,
+            provider_config=LLMProviderConfig(),
+            rate_limiter=limiter,
+        )
+        tasks = [
+            asyncio.create_task(
+                provider.get_ai_response(
+                    messages=[ChatMessage(role="user", text=str(index))], model="m"
+                )
+            )
+            for index in range(5)
+        ]
+        await asyncio.sleep(0)
+        inner.release.set()
+        _ = await asyncio.gather(*tasks)
+
+        self.assertEqual(inner.peak_in_flight, 2)
+        self.assertEqual(limiter.stats().acquired, 5)
+
+    async def test_stream_holds_slot_until_closed_and_settles_usage(self) -> None:
+        """流式请求到流结束才归还槽位，完成事件的用量结算预扣额度。"""
+        clock = FakeClock()
+        limiter = ProviderRateLimiter(
+            provider="p",
+            max_concurrency=1,
+            tokens_per_minute=600,
+            clock=clock,
+            sleep=clock.sleep,
+        )
+        provider = ResilientLLMProvider(
+            inner_provider=ThrottledProvider(rate_limited_calls=0),
+            provider_config=LLMProviderConfig(),
+            rate_limiter=limiter,
+        )
+        stream = provider.stream_ai_response_with_tools(
+            messages=[ChatMessage(role="user", text="x" * 30)], model="m", tools=[]
+        )
+
+        _ = await anext(stream)
+        self.assertEqual(limiter.stats().in_flight, 1)
+        events = [event async for event in stream]
+
+        self.assertIsInstance(events[-1], LLMStreamCompleted)
+        self.assertEqual(limiter.stats().in_flight, 0)
+        # 预扣 10 个 token，按实际 100 个结算后桶里剩 500，请求 600 需要等 10 秒。
+        await limiter.acquire(estimated_tokens=600)
+        self.assertEqual(clock.sleeps, [10.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
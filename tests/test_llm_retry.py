@@ -1,13 +1,26 @@
 """LLM 单次请求重试覆盖测试。"""
 
 import unittest
+from collections.abc import AsyncGenerator
 from typing import override
 from unittest.mock import AsyncMock, call, patch
 
+import httpx
+from openai import DEFAULT_TIMEOUT
+
 from app.config import LLMProviderConfig
 from app.services.llm.base import LLMProvider
 from app.services.llm.handler import LLMHandler
-from app.services.llm.schemas import ChatMessage, LLMProviderWrapper
+from app.services.llm.schemas import (
+    ChatMessage,
+    LLMContentDelta,
+    LLMProviderWrapper,
+    LLMResponse,
+    LLMStreamCompleted,
+    LLMStreamEvent,
+    LLMToolChoice,
+    LLMToolDefinition,
+)
 from app.services.llm.wrapper import ResilientLLMProvider
 
 
@@ -33,6 +46,55 @@ class FlakyTextProvider(LLMProvider):
         return "视觉描述成功"
 
 
+class FlakyStreamProvider(LLMProvider):
+    """首个事件前按计划失败，之后可以在流中途再失败一次。"""
+
+    def __init__(self, *, failures_before_first_event: int, fail_midway: bool) -> None:
+        """保存失败计划。"""
+        self.failures_before_first_event = failures_before_first_event
+        self.fail_midway = fail_midway
+        self.call_count = 0
+
+    @override
+    async def get_ai_response(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+    ) -> str:
+        """流式测试不使用文本接口。"""
+        _ = (messages, model)
+        raise NotImplementedError
+
+    @override
+    async def stream_ai_response_with_tools(
+        self,
+        messages: list[ChatMessage],
+        model: str,
+        tools: list[LLMToolDefinition],
+        tool_choice: LLMToolChoice = "auto",
+        parallel_tool_calls: bool = True,
+    ) -> AsyncGenerator[LLMStreamEvent]:
+        """记录请求，按计划失败或产出两段正文。"""
+        _ = (messages, model, tools, tool_choice, parallel_tool_calls)
+        self.call_count += 1
+        if self.call_count <= self.failures_before_first_event:
+            raise ValueError("临时流式响应错误")
+        yield LLMContentDelta(text="第一段")
+        if self.fail_midway:
+            raise ValueError("流中途断开")
+        yield LLMStreamCompleted(response=LLMResponse(content="第一段"))
+
+
+def _stream_provider(inner_provider: LLMProvider) -> ResilientLLMProvider:
+    """包装为零延迟、最多三次尝试的服务商。"""
+    return ResilientLLMProvider(
+        inner_provider=inner_provider,
+        provider_config=LLMProviderConfig.model_validate(
+            {"api_key": "test-key", "max_attempts": 3, "retry_delay_seconds": 0}
+        ),
+    )
+
+
 class LLMRequestRetryTest(unittest.IsolatedAsyncioTestCase):
     """验证当前请求可以替换供应商默认重试参数。"""
 
@@ -51,6 +113,28 @@ class LLMRequestRetryTest(unittest.IsolatedAsyncioTestCase):
         )
         self.assertIn("local", handler.services)
 
+    async def test_register_instance_shares_http_client_with_sdk_timeout(
+        self,
+    ) -> None:
+        """共享连接池的客户端不继承通用网络超时，仍使用 SDK 默认超时。"""
+        provider_config = LLMProviderConfig.model_validate(
+            {"base_url": "http://model.internal/v1"}
+        )
+        shared = httpx.AsyncClient(timeout=15)
+
+        with patch("app.services.llm.handler.AsyncOpenAI") as client_type:
+            _ = LLMHandler.register_instance(
+                {"local": provider_config}, http_client=shared
+            )
+        await shared.aclose()
+
+        client_type.assert_called_once_with(
+            api_key="",
+            base_url="http://model.internal/v1",
+            http_client=shared,
+            timeout=DEFAULT_TIMEOUT,
+        )
+
     async def test_request_override_retries_three_attempts_with_backoff(
         self,
     ) -> None:
@@ -122,5 +206,42 @@ class LLMRequestRetryTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(sleep.await_args_list, [call(0.0), call(0.0)])
 
 
+    async def test_stream_retries_only_before_first_event(self) -> None:
+        """首个事件前的错误会重试，流中途的错误直接抛给调用方。"""
+        inner_provider = FlakyStreamProvider(
+            failures_before_first_event=2, fail_midway=False
+        )
+        events = [
+            event
+            async for event in _stream_provider(
+                inner_provider
+            ).stream_ai_response_with_tools(
+                messages=[ChatMessage(role="user", text="说两句")],
+                model="main-model",
+                tools=[],
+            )
+        ]
+
+        self.assertEqual(inner_provider.call_count, 3)
+        self.assertEqual(events[0], LLMContentDelta(text="第一段"))
+        self.assertIsInstance(events[-1], LLMStreamCompleted)
+
+        midway_provider = FlakyStreamProvider(
+            failures_before_first_event=0, fail_midway=True
+        )
+        received: list[LLMStreamEvent] = []
+        with self.assertRaises(ValueError):
+            async for event in _stream_provider(
+                midway_provider
+            ).stream_ai_response_with_tools(
+                messages=[ChatMessage(role="user", text="说两句")],
+                model="main-model",
+                tools=[],
+            ):
+                received.append(event)
+        self.assertEqual(midway_provider.call_count, 1)
+        self.assertEqual(received, [LLMContentDelta(text="第一段")])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,15 +1,19 @@
 """LLM 工具注册表测试。"""
 
+import asyncio
 import unittest
 from typing import cast
 
 from pydantic import Field
 
 from app.models import JsonObject, JsonValue, StrictModel
+from app.services.llm.schemas import LLMToolCall, LLMToolDefinition
 from app.services.llm.tools import (
+    CompositeToolExecutor,
     LLMToolExecutionResult,
     LLMImageArtifact,
     LLMToolRegistry,
+    run_tool_calls,
     tool_result_to_text,
 )
 
@@ -112,3 +116,165 @@ class LLMToolRegistryTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result.result, {"ok": True, "returned_count": 1})
         self.assertEqual(len(result.image_artifacts), 1)
         self.assertEqual(result.image_artifacts[0].image_bytes, b"image-bytes")
+
+    def test_same_declaration_reuses_compiled_definition(self) -> None:
+        """每轮新建的注册表复用已编译定义，声明不同则重新编译。"""
+
+        async def handler(arguments: JsonObject) -> JsonValue:
+            """回显工具参数。"""
+            return arguments
+
+        definitions: list[LLMToolDefinition] = []
+        for description in ("测试工具", "测试工具", "另一段说明"):
+            registry = LLMToolRegistry()
+            registry.register_tool(
+                name="compiled_tool",
+                description=description,
+                parameters_model=DemoToolArgs,
+                handler=handler,
+            )
+            definitions.append(registry.list_tools()[0])
+
+        self.assertIs(definitions[0], definitions[1])
+        self.assertIsNot(definitions[0], definitions[2])
+        self.assertEqual(definitions[0].parameters, definitions[2].parameters)
+
+    async def test_composite_executor_dispatches_by_name_index(self) -> None:
+        """组合执行器按工具名索引调用，执行器新增工具后也能找到。"""
+        first, second = LLMToolRegistry(), LLMToolRegistry()
+
+        async def handler(arguments: JsonObject) -> JsonValue:
+            """返回固定结果。"""
+            _ = arguments
+            return "first"
+
+        async def late_handler(arguments: JsonObject) -> JsonValue:
+            """返回固定结果。"""
+            _ = arguments
+            return "late"
+
+        first.register_tool(
+            name="first_tool",
+            description="第一个工具。",
+            parameters_model=EmptyToolArgs,
+            handler=handler,
+        )
+        executor = CompositeToolExecutor([first, second])
+        self.assertEqual([tool.name for tool in executor.list_tools()], ["first_tool"])
+        second.register_tool(
+            name="late_tool",
+            description="后注册的工具。",
+            parameters_model=EmptyToolArgs,
+            handler=late_handler,
+        )
+
+        self.assertEqual(await executor.call_tool("first_tool", {}), "first")
+        self.assertEqual(await executor.call_tool("late_tool", {}), "late")
+        with self.assertRaises(KeyError):
+            _ = await executor.call_tool("missing_tool", {})
+
+
+class RunToolCallsTest(unittest.IsolatedAsyncioTestCase):
+    """验证只读调用并发、副作用调用独占执行和结果顺序。"""
+
+    async def test_read_only_calls_overlap_within_cap_and_keep_order(self) -> None:
+        """只读调用在上限内并发，副作用调用前后的调用不会与它重叠。"""
+        running: set[str] = set()
+        overlaps: list[frozenset[str]] = []
+
+        async def call(tool_call: LLMToolCall) -> str:
+            """记录执行期间同时运行的调用。"""
+            running.add(tool_call.id)
+            overlaps.append(frozenset(running))
+            await asyncio.sleep(0.01 if tool_call.id == "r1" else 0)
+            running.discard(tool_call.id)
+            return f"result-{tool_call.id}"
+
+        tool_calls = [
+            LLMToolCall(id=call_id, name=name)
+            for call_id, name in (
+                ("r1", "read"),
+                ("r2", "read"),
+                ("r3", "read"),
+                ("w1", "write"),
+                ("r4", "read"),
+            )
+        ]
+
+        results = await run_tool_calls(
+            tool_calls,
+            call=call,
+            read_only_tools={"read"},
+            slots=asyncio.Semaphore(2),
+        )
+
+        self.assertEqual(
+            results,
+            ["result-r1", "result-r2", "result-r3", "result-w1", "result-r4"],
+        )
+        self.assertEqual(max(len(item) for item in overlaps), 2)
+        self.assertIn(frozenset({"r1", "r2"}), overlaps)
+        self.assertIn(frozenset({"w1"}), overlaps)
+        self.assertIn(frozenset({"r4"}), overlaps)
+
+    async def test_started_calls_do_not_take_a_second_slot(self) -> None:
+        """已占用名额启动的调用只等待结果，不会再占用一个名额。"""
+        slots = asyncio.Semaphore(1)
+        release = asyncio.Event()
+
+        async def run_early() -> str:
+            """模拟流式响应中提前启动并持有名额的调用。"""
+            async with slots:
+                await release.wait()
+                return "result-early"
+
+        early = asyncio.create_task(run_early())
+        await asyncio.sleep(0)
+
+        async def call(tool_call: LLMToolCall) -> str:
+            """等待提前启动的调用结果。"""
+            _ = tool_call
+            release.set()
+            return await early
+
+        results = await asyncio.wait_for(
+            run_tool_calls(
+                [LLMToolCall(id="early", name="read")],
+                call=call,
+                read_only_tools={"read"},
+                slots=slots,
+                started={"early"},
+            ),
+            timeout=1,
+        )
+
+        self.assertEqual(results, ["result-early"])
+        self.assertFalse(slots.locked())
+
+    async def test_register_tool_records_read_only_flag(self) -> None:
+        """注册时声明的只读标记写入工具定义，默认视为有副作用。"""
+        registry = LLMToolRegistry()
+
+        async def handler(arguments: JsonObject) -> JsonValue:
+            """返回固定结果。"""
+            _ = arguments
+            return {"ok": True}
+
+        registry.register_tool(
+            name="reader",
+            description="只读工具。",
+            parameters_model=EmptyToolArgs,
+            handler=handler,
+            read_only=True,
+        )
+        registry.register_tool(
+            name="writer",
+            description="写入工具。",
+            parameters_model=EmptyToolArgs,
+            handler=handler,
+        )
+
+        self.assertEqual(
+            {tool.name: tool.read_only for tool in registry.list_tools()},
+            {"reader": True, "writer": False},
+        )
@@ -1,6 +1,10 @@
 """协议模型边界测试。"""
 
+import json
 import unittest
+from pathlib import Path
+from typing import cast
+from unittest.mock import patch
 
 from pydantic import ValidationError
 
@@ -33,6 +37,33 @@ class StrictModelBoundaryTest(unittest.TestCase):
         with self.assertRaises(ValidationError):
             DemoStrictModel.model_validate({"name": "夜袭", "unexpected": "拒绝"})
 
+    def test_napcat_event_is_frozen(self) -> None:
+        """NapCat 协议模型不可原地修改，只能复制出新实例。"""
+        message = GroupMessage(
+            time=1710000000,
+            self_id="10000",
+            post_type="message",
+            message_type="group",
+            user_id="20000",
+            message_id="30000",
+            group_id="40000",
+            message=[Text.new("原文")],
+            sender=Sender(user_id="20000"),
+        )
+        text = message.message[0]
+        assert isinstance(text, Text)
+
+        with self.assertRaises(ValidationError):
+            message.group_id = "40001"
+        with self.assertRaises(ValidationError):
+            text.data.text = "改写"
+        updated = text.model_copy(
+            update={"data": text.data.model_copy(update={"text": "改写"})}
+        )
+
+        self.assertEqual(text.data.text, "原文")
+        self.assertEqual(updated.data.text, "改写")
+
     def test_napcat_sender_ignores_unknown_field(self) -> None:
         """NapCat 入站模型忽略未消费的上游扩展字段。"""
         sender = Sender.model_validate(
@@ -257,3 +288,51 @@ class StrictModelBoundaryTest(unittest.TestCase):
         self.assertIsInstance(event, NotifyEvent)
         assert isinstance(event, NotifyEvent)
         self.assertEqual(event.raw_info, [{"label": "上游数组"}])
+
+
+NAPCAT_FRAMES_PATH = Path("tests/fixtures/napcat/frames.jsonl")
+
+
+class EventTypeCheckerFastPathTest(unittest.TestCase):
+    """验证判别字段查表快路径与完整联合类型结果一致。"""
+
+    def test_fast_path_matches_full_union_on_recorded_frames(self) -> None:
+        """录制语料中的每一帧都得到与 AllEvent 联合类型相同的模型。"""
+        checker = EventTypeChecker()
+        for line in NAPCAT_FRAMES_PATH.read_text(encoding="utf-8").splitlines():
+            frame = cast(dict[str, object], json.loads(line))
+            with self.subTest(frame=line[:60]):
+                expected = checker.adapter.validate_python(frame)
+                event = checker.get_event(frame)
+                self.assertIs(type(event), type(expected))
+                self.assertEqual(event, expected)
+
+    def test_unknown_discriminator_falls_back_to_full_union(self) -> None:
+        """查表未命中时仍由联合类型给出原有解析失败日志。"""
+        with patch("app.core.event_parser.log_event") as log_event:
+            event = EventTypeChecker().get_event(
+                {
+                    "time": 1710000000,
+                    "self_id": 742654932,
+                    "post_type": "notice",
+                    "notice_type": "future_notice",
+                }
+            )
+        self.assertIsNone(event)
+        self.assertEqual(
+            log_event.call_args.kwargs["event"], "websocket.event.parse_failed"
+        )
+
+    def test_invalid_known_frame_is_logged_once(self) -> None:
+        """快路径校验失败后只记录一次联合类型的失败原因。"""
+        with patch("app.core.event_parser.log_event") as log_event:
+            event = EventTypeChecker().get_event(
+                {
+                    "time": 1710000000,
+                    "self_id": 742654932,
+                    "post_type": "meta_event",
+                    "meta_event_type": "heartbeat",
+                }
+            )
+        self.assertIsNone(event)
+        self.assertEqual(log_event.call_count, 1)
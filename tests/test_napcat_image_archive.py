@@ -3,9 +3,13 @@
 import asyncio
 import base64
 import hashlib
+import shutil
 import tempfile
+import time
 import unittest
-from collections.abc import Sequence
+import unittest.mock
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import replace
 from datetime import UTC, datetime
 from pathlib import Path
 
@@ -27,9 +31,11 @@ from app.services.napcat.image_archive import (
     InvalidInlineImageSourceError,
 )
 from app.services.napcat.image_reader import (
+    ImageChunkConsumer,
+    ImagePathConsumer,
     NapCatImageReader,
-    NapCatImageReadResult,
     NapCatImageResource,
+    NapCatImageStreamResult,
 )
 
 PNG_BYTES = (
@@ -88,17 +94,29 @@ class FakeArchiveRepository:
         return True
 
 
+async def _chunks(image_bytes: bytes, *, chunk_size: int = 16) -> AsyncIterator[bytes]:
+    """把图片按固定大小分块产出。"""
+    for offset in range(0, len(image_bytes), chunk_size):
+        yield image_bytes[offset : offset + chunk_size]
+
+
 class SuccessfulReader:
     """为每个任务返回有效图片。"""
 
-    async def read(
-        self, *, resource: NapCatImageResource
-    ) -> NapCatImageReadResult:
-        """返回成功的 URL 读取结果。"""
-        return NapCatImageReadResult(
+    async def read_into[T](
+        self,
+        *,
+        resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None = None,
+    ) -> NapCatImageStreamResult[T]:
+        """把图片分块交给消费方，返回成功的 URL 读取结果。"""
+        _ = consume_path
+        return NapCatImageStreamResult(
             resource=resource,
-            image_bytes=PNG_BYTES,
+            value=await consume(_chunks(PNG_BYTES)),
             source="direct_url",
+            size_bytes=len(PNG_BYTES),
             error_type=None,
             error=None,
         )
@@ -107,14 +125,20 @@ class SuccessfulReader:
 class FailedReader:
     """为每个任务返回可恢复失败。"""
 
-    async def read(
-        self, *, resource: NapCatImageResource
-    ) -> NapCatImageReadResult:
+    async def read_into[T](
+        self,
+        *,
+        resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None = None,
+    ) -> NapCatImageStreamResult[T]:
         """返回图片暂时不可用。"""
-        return NapCatImageReadResult(
+        _ = (consume, consume_path)
+        return NapCatImageStreamResult(
             resource=resource,
-            image_bytes=None,
+            value=None,
             source=None,
+            size_bytes=0,
             error_type="ReadTimeout",
             error="读取超时",
         )
@@ -129,10 +153,15 @@ class BlockingReader:
         self.active = 0
         self.max_active = 0
 
-    async def read(
-        self, *, resource: NapCatImageResource
-    ) -> NapCatImageReadResult:
+    async def read_into[T](
+        self,
+        *,
+        resource: NapCatImageResource,
+        consume: ImageChunkConsumer[T],
+        consume_path: ImagePathConsumer[T] | None = None,
+    ) -> NapCatImageStreamResult[T]:
         """短暂挂起以暴露 worker 并发上限。"""
+        _ = consume_path
         self.active += 1
         self.max_active = max(self.max_active, self.active)
         try:
@@ -140,10 +169,12 @@ class BlockingReader:
         finally:
             self.active -= 1
         suffix = int(resource.label.rsplit(" ", maxsplit=1)[-1])
-        return NapCatImageReadResult(
+        image_bytes = GIF_BYTES + bytes([suffix])
+        return NapCatImageStreamResult(
             resource=resource,
-            image_bytes=GIF_BYTES + bytes([suffix]),
+            value=await consume(_chunks(image_bytes)),
             source="direct_path",
+            size_bytes=len(image_bytes),
             error_type=None,
             error=None,
         )
@@ -211,6 +242,123 @@ class ImageStoreTest(unittest.IsolatedAsyncioTestCase):
 
             self.assertFalse(root.exists())
 
+    async def test_streamed_image_matches_buffered_store(self) -> None:
+        """分块写入与整块写入得到相同存储键，并发相同内容只留一个文件。"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            store = ImageStore(root=root)
+
+            buffered = await store.store(image_bytes=PNG_BYTES)
+            first, second = await asyncio.gather(
+                store.store_stream(chunks=_chunks(PNG_BYTES, chunk_size=7)),
+                store.store_stream(chunks=_chunks(PNG_BYTES)),
+            )
+
+            stored_files = [path for path in root.rglob("*") if path.is_file()]
+            self.assertEqual(first, buffered)
+            self.assertEqual(second, buffered)
+            self.assertEqual(stored_files, [root / Path(buffered.storage_key)])
+
+    async def test_stream_stops_early_on_non_image_or_oversize(self) -> None:
+        """文件开头无法识别或累计超限时立即停止读取，不留下临时文件。"""
+        pulled: list[int] = []
+
+        async def tracked(image_bytes: bytes) -> AsyncIterator[bytes]:
+            async for chunk in _chunks(image_bytes, chunk_size=4096):
+                pulled.append(len(chunk))
+                yield chunk
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir)
+            store = ImageStore(root=root, max_image_bytes=64 * 1024)
+
+            with self.assertRaises(InvalidImageContentError):
+                _ = await store.store_stream(chunks=tracked(b"x" * 40_000))
+            self.assertEqual(sum(pulled), 8192)
+
+            pulled.clear()
+            with self.assertRaises(ImageTooLargeError):
+                _ = await store.store_stream(
+                    chunks=tracked(PNG_BYTES + b"\x00" * 100_000)
+                )
+            self.assertLessEqual(sum(pulled), 64 * 1024 + 4096)
+            self.assertEqual([path for path in root.rglob("*") if path.is_file()], [])
+
+    async def test_local_file_is_linked_or_copied_without_touching_source(
+        self,
+    ) -> None:
+        """本地文件与字节写入得到相同存储键；开启硬链接时与来源共享 inode。"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "napcat-cache" / "image.dat"
+            source.parent.mkdir()
+            _ = source.write_bytes(PNG_BYTES)
+            expected = await ImageStore(root=Path(temp_dir) / "bytes").store(
+                image_bytes=PNG_BYTES
+            )
+
+            for hardlink in (False, True):
+                root = Path(temp_dir) / f"images-{hardlink}"
+                store = ImageStore(root=root, hardlink_local_files=hardlink)
+
+                stored = await store.store_file(path=source)
+
+                stored_path = root / Path(stored.storage_key)
+                self.assertEqual(stored, expected)
+                self.assertEqual(stored_path.read_bytes(), PNG_BYTES)
+                self.assertEqual(
+                    stored_path.stat().st_ino == source.stat().st_ino, hardlink
+                )
+                self.assertEqual(list(root.rglob("*.tmp")), [])
+            self.assertEqual(source.read_bytes(), PNG_BYTES)
+
+    async def test_local_file_is_rejected_before_publishing(self) -> None:
+        """超限文件不复制，非图片文件的临时副本被清理。"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir) / "images"
+            large = Path(temp_dir) / "large.png"
+            _ = large.write_bytes(PNG_BYTES)
+            text = Path(temp_dir) / "note.png"
+            _ = text.write_bytes(b"not an image")
+
+            with self.assertRaises(ImageTooLargeError):
+                _ = await ImageStore(root=root, max_image_bytes=4).store_file(
+                    path=large
+                )
+            with self.assertRaises(InvalidImageContentError):
+                _ = await ImageStore(root=root).store_file(path=text)
+
+            self.assertEqual([path for path in root.rglob("*") if path.is_file()], [])
+
+    async def test_cancelled_local_ingest_leaves_no_temporary_file(self) -> None:
+        """调用方超时后复制仍在线程中完成，临时文件由线程自行清理。"""
+        real_copyfile = shutil.copyfile
+
+        def slow_copyfile(source: Path, target: Path) -> Path:
+            time.sleep(0.2)
+            return real_copyfile(source, target)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir) / "images"
+            source = Path(temp_dir) / "slow.png"
+            _ = source.write_bytes(PNG_BYTES)
+            store = ImageStore(root=root)
+
+            with (
+                unittest.mock.patch(
+                    "app.services.napcat.image_archive._clone_file",
+                    side_effect=OSError("不支持 reflink"),
+                ),
+                unittest.mock.patch(
+                    "app.services.napcat.image_archive.shutil.copyfile",
+                    side_effect=slow_copyfile,
+                ),
+            ):
+                with self.assertRaises(TimeoutError):
+                    _ = await asyncio.wait_for(store.store_file(path=source), 0.05)
+                await asyncio.sleep(0.4)
+
+            self.assertEqual(list(root.rglob("*.tmp")), [])
+
     async def test_default_limit_is_exactly_fifty_mebibytes(self) -> None:
         """默认上限使用 MiB 而不是十进制 MB。"""
         self.assertEqual(MAX_ARCHIVE_IMAGE_BYTES, 50 * 1024 * 1024)
@@ -376,6 +524,37 @@ class ImageArchiveWorkerTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual((task_id, token), (1, "unpredictable-token-1"))
         self.assertEqual(stored.mime_type, "image/png")
 
+    async def test_local_path_task_is_ingested_without_chunked_read(self) -> None:
+        """真实 reader 把已有本地路径直接交给存储，不走分块读取。"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / "cache.png"
+            _ = source.write_bytes(GIF_BYTES)
+            task = replace(self._task(task_id=1), path=str(source))
+            repository = FakeArchiveRepository(tasks=[task])
+            worker = ImageArchiveWorker(
+                bot_id="bot-10001",
+                repository=repository,
+                reader=NapCatImageReader(
+                    bot=FakeImageBot(),
+                    http_client=None,
+                    fetch_concurrency=1,
+                    download_timeout_seconds=30.0,
+                ),
+                store=ImageStore(
+                    root=Path(temp_dir) / "images", hardlink_local_files=True
+                ),
+            )
+
+            with unittest.mock.patch.object(
+                ImageStore, "store_stream", side_effect=AssertionError
+            ):
+                _ = await worker.run_once()
+
+            stored = repository.complete_calls[0][2]
+            stored_path = Path(temp_dir) / "images" / Path(stored.storage_key)
+            self.assertEqual(stored.mime_type, "image/gif")
+            self.assertEqual(stored_path.stat().st_ino, source.stat().st_ino)
+
     async def test_factory_binds_bot_and_all_archive_limits(self) -> None:
         """工厂在确定 bot_id 后才创建带限量 reader 的 worker。"""
         repository = FakeArchiveRepository(tasks=[])
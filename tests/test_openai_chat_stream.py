@@ -0,0 +1,379 @@
+"""OpenAI Chat Completions 流式响应解析测试。"""
+
+import unittest
+from typing import Self, cast
+
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletionChunk
+
+from app.models import JsonObject
+from app.services.llm.providers.openai import OpenAIService
+from app.services.llm.schemas import (
+    ChatMessage,
+    LLMContentDelta,
+    LLMStreamCompleted,
+    LLMStreamEvent,
+    LLMToolCall,
+    LLMToolCallReady,
+    LLMToolDefinition,
+    LLMUsage,
+)
+
+
+def _chunk(delta: JsonObject, *, finish_reason: str | None = None) -> ChatCompletionChunk:
+    """构造单个流式分片。"""
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "main-model",
+            "choices": [
+                {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            ],
+        }
+    )
+
+
+def _tool_delta(
+    index: int,
+    arguments: str,
+    *,
+    call_id: str | None = None,
+    name: str | None = None,
+) -> JsonObject:
+    """构造单个工具调用增量。"""
+    function: JsonObject = {"arguments": arguments}
+    tool_call: JsonObject = {"index": index, "function": function}
+    if call_id is not None:
+        tool_call["id"] = call_id
+        tool_call["type"] = "function"
+    if name is not None:
+        function["name"] = name
+    return {"tool_calls": [tool_call]}
+
+
+class FakeChunkStream:
+    """按顺序吐出预置分片，并记录每个分片被读取的时刻。"""
+
+    def __init__(self, chunks: list[ChatCompletionChunk], reads: list[int]) -> None:
+        """保存分片和共享读取记录。"""
+        self.chunks: list[ChatCompletionChunk] = chunks
+        self.reads: list[int] = reads
+        self.closed: bool = False
+
+    async def __aenter__(self) -> Self:
+        """进入流上下文。"""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """关闭流。"""
+        self.closed = True
+
+    def __aiter__(self) -> Self:
+        """返回自身作为异步迭代器。"""
+        return self
+
+    async def __anext__(self) -> ChatCompletionChunk:
+        """返回下一个分片。"""
+        if not self.chunks:
+            raise StopAsyncIteration
+        self.reads.append(len(self.reads))
+        return self.chunks.pop(0)
+
+
+class FakeCompletions:
+    """记录请求参数并返回预置分片流。"""
+
+    def __init__(self, chunks: list[ChatCompletionChunk]) -> None:
+        """保存分片。"""
+        self.reads: list[int] = []
+        self.stream: FakeChunkStream = FakeChunkStream(chunks, self.reads)
+        self.kwargs: dict[str, object] = {}
+
+    async def create(self, **kwargs: object) -> FakeChunkStream:
+        """返回分片流。"""
+        self.kwargs = kwargs
+        return self.stream
+
+
+class FakeChat:
+    """提供 chat.completions 入口。"""
+
+    def __init__(self, completions: FakeCompletions) -> None:
+        """保存 completions 资源。"""
+        self.completions: FakeCompletions = completions
+
+
+class FakeOpenAIClient:
+    """提供 OpenAIService 流式接口所需的最小 chat 入口。"""
+
+    def __init__(self, chunks: list[ChatCompletionChunk]) -> None:
+        """创建假的 chat 资源。"""
+        self.completions: FakeCompletions = FakeCompletions(chunks)
+        self.chat: FakeChat = FakeChat(self.completions)
+
+
+TOOL = LLMToolDefinition(
+    name="lookup",
+    description="查询测试信息。",
+    parameters={"type": "object", "properties": {}},
+)
+
+
+class OpenAIChatStreamTest(unittest.IsolatedAsyncioTestCase):
+    """验证流式增量被拼接为与非流式一致的结构化响应。"""
+
+    async def _collect(
+        self, client: FakeOpenAIClient
+    ) -> list[tuple[int, LLMStreamEvent]]:
+        """读取全部事件，并记录每个事件产出时已读取的分片数。"""
+        service = OpenAIService(client=cast(AsyncOpenAI, cast(object, client)))
+        return [
+            (len(client.completions.reads), event)
+            async for event in service.stream_ai_response_with_tools(
+                messages=[ChatMessage(role="user", text="查一下")],
+                model="main-model",
+                tools=[TOOL],
+            )
+        ]
+
+    async def test_tool_call_is_ready_when_next_index_starts(self) -> None:
+        """第二个工具调用开始时第一个调用已完整产出，无需等到流结束。"""
+        client = FakeOpenAIClient(
+            [
+                _chunk({"reasoning_content": "先想"}),
+                _chunk({"reasoning_content": "一下"}),
+                _chunk({"content": "稍等"}),
+                _chunk(_tool_delta(0, '{"q": ', call_id="call-1", name="lookup")),
+                _chunk(_tool_delta(0, '"a"}')),
+                _chunk(_tool_delta(1, "{}", call_id="call-2", name="lookup")),
+                _chunk({}, finish_reason="tool_calls"),
+            ]
+        )
+
+        events = await self._collect(client)
+
+        ready = [
+            (reads, event.tool_call)
+            for reads, event in events
+            if isinstance(event, LLMToolCallReady)
+        ]
+        self.assertEqual([call.id for _, call in ready], ["call-1", "call-2"])
+        self.assertEqual(ready[0][1].arguments, {"q": "a"})
+        self.assertEqual(ready[0][0], 6)
+        self.assertEqual(
+            [event.text for _, event in events if isinstance(event, LLMContentDelta)],
+            ["稍等"],
+        )
+        completed = events[-1][1]
+        assert isinstance(completed, LLMStreamCompleted)
+        self.assertEqual(completed.response.content, "稍等")
+        self.assertEqual(completed.response.reasoning_content, "先想一下")
+        self.assertEqual(
+            [call.id for call in completed.response.tool_calls], ["call-1", "call-2"]
+        )
+        self.assertIs(client.completions.kwargs["stream"], True)
+        self.assertTrue(client.completions.stream.closed)
+
+    async def test_content_only_stream_has_no_tool_calls(self) -> None:
+        """纯正文流逐段产出增量，结束事件携带完整正文。"""
+        client = FakeOpenAIClient(
+            [
+                _chunk({"role": "assistant", "content": "第一段\n\n"}),
+                _chunk({"content": "第二段"}),
+                _chunk({}, finish_reason="stop"),
+            ]
+        )
+
+        events = [event for _, event in await self._collect(client)]
+
+        self.assertEqual(
+            events,
+            [
+                LLMContentDelta(text="第一段\n\n"),
+                LLMContentDelta(text="第二段"),
+                events[-1],
+            ],
+        )
+        completed = events[-1]
+        assert isinstance(completed, LLMStreamCompleted)
+        self.assertEqual(completed.response.content, "第一段\n\n第二段")
+        self.assertIsNone(completed.response.reasoning_content)
+        self.assertEqual(completed.response.tool_calls, [])
+
+    async def test_invalid_tool_arguments_raise_value_error(self) -> None:
+        """拼接后的工具参数不是 JSON 对象时与非流式接口一样报 ValueError。"""
+        client = FakeOpenAIClient(
+            [
+                _chunk(_tool_delta(0, "[1]", call_id="call-1", name="lookup")),
+                _chunk({}, finish_reason="tool_calls"),
+            ]
+        )
+
+        with self.assertRaises(ValueError):
+            _ = await self._collect(client)
+
+    async def test_usage_chunk_is_attached_to_completed_response(self) -> None:
+        """include_usage 的末尾分片没有 choices，用量写入结束事件。"""
+        usage_chunk = ChatCompletionChunk.model_validate(
+            {
+                "id": "chunk",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": "main-model",
+                "choices": [],
+                "usage": {
+                    "prompt_tokens": 321,
+                    "completion_tokens": 7,
+                    "total_tokens": 328,
+                },
+            }
+        )
+        client = FakeOpenAIClient(
+            [
+                _chunk({"content": "好"}),
+                _chunk({}, finish_reason="stop"),
+                usage_chunk,
+            ]
+        )
+
+        events = [event for _, event in await self._collect(client)]
+
+        completed = events[-1]
+        assert isinstance(completed, LLMStreamCompleted)
+        self.assertEqual(
+            completed.response.usage,
+            LLMUsage(prompt_tokens=321, completion_tokens=7),
+        )
+        self.assertEqual(
+            client.completions.kwargs["stream_options"], {"include_usage": True}
+        )
+
+    async def test_cached_prompt_tokens_are_extracted(self) -> None:
+        """OpenAI 的 prompt_tokens_details 与 DeepSeek 的命中字段都记为缓存命中。"""
+        usages: list[JsonObject] = [
+            {"prompt_tokens_details": {"cached_tokens": 256}},
+            {"prompt_cache_hit_tokens": 256, "prompt_cache_miss_tokens": 65},
+        ]
+        for extra in usages:
+            with self.subTest(extra=extra):
+                usage_chunk = ChatCompletionChunk.model_validate(
+                    {
+                        "id": "chunk",
+                        "object": "chat.completion.chunk",
+                        "created": 0,
+                        "model": "main-model",
+                        "choices": [],
+                        "usage": {
+                            "prompt_tokens": 321,
+                            "completion_tokens": 7,
+                            "total_tokens": 328,
+                            **extra,
+                        },
+                    }
+                )
+                client = FakeOpenAIClient(
+                    [_chunk({"content": "好"}, finish_reason="stop"), usage_chunk]
+                )
+
+                completed = [event for _, event in await self._collect(client)][-1]
+
+                assert isinstance(completed, LLMStreamCompleted)
+                self.assertEqual(
+                    completed.response.usage,
+                    LLMUsage(prompt_tokens=321, completion_tokens=7, cached_tokens=256),
+                )
+
+    async def test_tool_call_arguments_are_serialized_with_sorted_keys(self) -> None:
+        """键顺序不同的相同参数序列化结果一致，恢复的历史不破坏请求前缀。"""
+        client = FakeOpenAIClient([_chunk({"content": "好"}, finish_reason="stop")])
+        service = OpenAIService(client=cast(AsyncOpenAI, cast(object, client)))
+        history = [
+            ChatMessage(
+                role="assistant",
+                tool_calls=[
+                    LLMToolCall(id="call-1", name="lookup", arguments=arguments)
+                ],
+            )
+            for arguments in cast(
+                tuple[JsonObject, ...], ({"q": "早", "limit": 3}, {"limit": 3, "q": "早"})
+            )
+        ]
+
+        async for _ in service.stream_ai_response_with_tools(
+            messages=history, model="main-model", tools=[TOOL]
+        ):
+            pass
+
+        request_messages = cast(
+            list[dict[str, list[dict[str, dict[str, str]]]]],
+            client.completions.kwargs["messages"],
+        )
+        arguments = [
+            message["tool_calls"][0]["function"]["arguments"]
+            for message in request_messages
+        ]
+        self.assertEqual(arguments, ['{"limit": 3, "q": "早"}'] * 2)
+
+    async def test_tools_payload_is_reused_for_same_definitions(self) -> None:
+        """同一组工具定义对象只转换一次 tools 参数，内容相同的新对象重新转换。"""
+        client = FakeOpenAIClient([])
+        service = OpenAIService(client=cast(AsyncOpenAI, cast(object, client)))
+        payloads: list[object] = []
+        for tools in ([TOOL], [TOOL], [TOOL.model_copy()]):
+            client.completions.stream = FakeChunkStream(
+                [_chunk({"content": "好"}, finish_reason="stop")], []
+            )
+            async for _ in service.stream_ai_response_with_tools(
+                messages=[ChatMessage(role="user", text="查一下")],
+                model="main-model",
+                tools=tools,
+            ):
+                pass
+            payloads.append(client.completions.kwargs["tools"])
+
+        self.assertIs(payloads[0], payloads[1])
+        self.assertIsNot(payloads[0], payloads[2])
+        self.assertEqual(payloads[0], payloads[2])
+
+    async def test_formatted_messages_are_reused_across_rounds(self) -> None:
+        """后续轮次复用已转换的消息，只转换新追加的消息。"""
+        client = FakeOpenAIClient([])
+        service = OpenAIService(client=cast(AsyncOpenAI, cast(object, client)))
+        messages = [
+            ChatMessage(role="system", text="系统提示词"),
+            ChatMessage(role="user", text="看图", image=[b"\x89PNG\r\n\x1a\n"]),
+        ]
+        requests: list[list[JsonObject]] = []
+        for appended in ("第一轮", "第二轮"):
+            messages.append(ChatMessage(role="assistant", text=appended))
+            client.completions.stream = FakeChunkStream(
+                [_chunk({"content": "好"}, finish_reason="stop")], []
+            )
+            async for _ in service.stream_ai_response_with_tools(
+                messages=messages, model="main-model", tools=[TOOL]
+            ):
+                pass
+            requests.append(
+                cast(list[JsonObject], client.completions.kwargs["messages"])
+            )
+
+        first, second = requests
+        self.assertEqual(len(second), 4)
+        for index in range(3):
+            self.assertIs(second[index], first[index])
+        self.assertEqual(
+            second[3],
+            {"role": "assistant", "content": [{"type": "text", "text": "第二轮"}]},
+        )
+        image_item = cast(list[JsonObject], first[1]["content"])[1]
+        self.assertTrue(
+            cast(dict[str, str], image_item["image_url"])["url"].startswith(
+                "data:image/png;base64,"
+            )
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 """插件 NapCat 事件路由测试。"""
 
+import asyncio
 import unittest
-from typing import cast
+from typing import ClassVar, cast
+from unittest.mock import patch
 
 from app.api import BOTClient
 from app.core.dispatcher import EventDispatcher
@@ -35,8 +37,83 @@ class RoutingPlugin(BasePlugin[GroupMessage | GroupBanEvent]):
         return False
 
 
+class ChainTestPlugin(BasePlugin[GroupMessage]):
+    """按测试设定的结果处理群消息，可在放行前阻塞。"""
+
+    name = "链路测试插件"
+    plugin_id = "chain_test"
+    consumers_count = 1
+    priority = 0
+
+    calls: ClassVar[list[str]]
+    result: bool
+    accepted: bool
+    gate: asyncio.Event
+
+    def setup(self) -> None:
+        """默认接收事件、立即放行且不终止链路。"""
+        self.result = False
+        self.accepted = True
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    def prefilter(self, msg: GroupMessage) -> bool:
+        """按测试设定决定是否入队。"""
+        _ = msg
+        return self.accepted
+
+    async def run(self, msg: GroupMessage) -> bool:
+        """等待放行后记录调用顺序。"""
+        _ = msg
+        await self.gate.wait()
+        self.calls.append(self.name)
+        return self.result
+
+
+class ObserverPlugin(ChainTestPlugin):
+    """声明不终止链路的观察插件。"""
+
+    name = "观察测试插件"
+    plugin_id = "observer_test"
+    priority = 50
+    stops_chain = False
+
+
+class TerminalPlugin(ChainTestPlugin):
+    """可终止链路的高优先级插件。"""
+
+    name = "终止测试插件"
+    plugin_id = "terminal_test"
+    priority = 40
+
+
+class FallbackPlugin(ChainTestPlugin):
+    """排在最后的普通插件。"""
+
+    name = "兜底测试插件"
+    plugin_id = "fallback_test"
+    priority = 10
+
+
+class LateObserverPlugin(ChainTestPlugin):
+    """排在终止插件之后的观察插件。"""
+
+    name = "后置观察测试插件"
+    plugin_id = "late_observer_test"
+    priority = 5
+    stops_chain = False
+
+
 # 测试插件不应进入应用运行期的插件自动发现列表。
-PLUGINS.remove(cast(type[BasePlugin[AllEvent]], cast(object, RoutingPlugin)))
+for _test_plugin in (
+    RoutingPlugin,
+    ChainTestPlugin,
+    ObserverPlugin,
+    TerminalPlugin,
+    FallbackPlugin,
+    LateObserverPlugin,
+):
+    PLUGINS.remove(cast(type[BasePlugin[AllEvent]], cast(object, _test_plugin)))
 
 
 def build_group_message() -> GroupMessage:
@@ -91,5 +168,105 @@ class PluginRoutingTest(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(self.plugin.received_events, [message])
 
 
+class ChainDispatchTest(unittest.IsolatedAsyncioTestCase):
+    """验证不终止链路的插件与其余插件并发运行。"""
+
+    async def asyncSetUp(self) -> None:
+        """按优先级创建观察、终止、兜底和后置观察插件。"""
+        ChainTestPlugin.calls = []
+        self.plugins = [
+            plugin_type(
+                context=cast(Context, object()),
+                plugin_config=plugin_config_view(
+                    FakeConfigManager(build_plugin_snapshot()),
+                    plugin_id=plugin_type.plugin_id,
+                ),
+            )
+            for plugin_type in (
+                ObserverPlugin,
+                TerminalPlugin,
+                FallbackPlugin,
+                LateObserverPlugin,
+            )
+        ]
+        self.observer, self.terminal, _, self.late_observer = self.plugins
+        self.dispatcher = EventDispatcher(
+            plugincontroller=PluginController(
+                plugin_objects=[
+                    cast(BasePlugin[AllEvent], cast(object, plugin))
+                    for plugin in self.plugins
+                ]
+            ),
+            bot=cast(BOTClient, object()),
+        )
+
+    async def asyncTearDown(self) -> None:
+        """停止全部测试插件。"""
+        for plugin in self.plugins:
+            await plugin.stop_consumers()
+
+    async def test_slow_observer_does_not_delay_lower_priority_plugins(self) -> None:
+        """高优先级观察插件阻塞时，后续插件照常完成，分发等待观察插件结束。"""
+        self.observer.gate.clear()
+        dispatching = asyncio.create_task(
+            self.dispatcher.dispatch_event(event=build_group_message())
+        )
+        await asyncio.sleep(0.01)
+
+        self.assertEqual(
+            ChainTestPlugin.calls,
+            ["终止测试插件", "兜底测试插件", "后置观察测试插件"],
+        )
+        self.assertFalse(dispatching.done())
+
+        self.observer.gate.set()
+        await dispatching
+        self.assertEqual(ChainTestPlugin.calls[-1], "观察测试插件")
+
+    async def test_terminal_plugin_still_stops_later_observers(self) -> None:
+        """终止插件返回 True 时，排在它之后的插件和观察插件都不运行。"""
+        self.terminal.result = True
+
+        await self.dispatcher.dispatch_event(event=build_group_message())
+
+        self.assertCountEqual(
+            ChainTestPlugin.calls, ["观察测试插件", "终止测试插件"]
+        )
+
+    async def test_observer_true_result_is_ignored(self) -> None:
+        """观察插件返回 True 不会终止链路。"""
+        self.observer.result = True
+
+        await self.dispatcher.dispatch_event(event=build_group_message())
+
+        self.assertEqual(len(ChainTestPlugin.calls), 4)
+
+    async def test_rejected_prefilter_skips_queue(self) -> None:
+        """预过滤拒绝的插件不入队，不影响后续插件。"""
+        self.terminal.accepted = False
+        self.terminal.result = True
+        with patch.object(
+            self.terminal.task_queue, "put", wraps=self.terminal.task_queue.put
+        ) as put:
+            await self.dispatcher.dispatch_event(event=build_group_message())
+
+        put.assert_not_called()
+        self.assertNotIn("终止测试插件", ChainTestPlugin.calls)
+        self.assertEqual(len(ChainTestPlugin.calls), 3)
+
+    async def test_add_to_queue_applies_prefilter(self) -> None:
+        """直接入队接口同样先执行预过滤，异常按不处理返回。"""
+        self.terminal.accepted = False
+        self.assertFalse(await self.terminal.add_to_queue(build_group_message()))
+
+        def broken(msg: GroupMessage) -> bool:
+            _ = msg
+            raise ValueError("坏的预过滤")
+
+        self.terminal.prefilter = broken
+        self.assertFalse(await self.terminal.add_to_queue(build_group_message()))
+        self.assertEqual(ChainTestPlugin.calls, [])
+
+
 if __name__ == "__main__":
     unittest.main()
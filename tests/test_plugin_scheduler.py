@@ -0,0 +1,266 @@
+"""插件事件队列调度器测试。"""
+
+import asyncio
+import unittest
+from typing import cast, override
+
+from app.models import AllEvent, GroupMessage, Sender, Text
+from app.plugins.base import PLUGINS, BasePlugin, Context
+from app.plugins.scheduler import (
+    SHARED_KEY,
+    FifoScheduler,
+    KeyedScheduler,
+    PluginScheduler,
+    PluginTask,
+    QueueLimit,
+)
+from tests.config_helpers import (
+    FakeConfigManager,
+    build_plugin_snapshot,
+    plugin_config_view,
+)
+
+
+def _key(msg: str) -> str:
+    """测试事件 "A1" 的调度键是 "A"。"""
+    return msg[0]
+
+
+async def _next(scheduler: PluginScheduler[str]) -> PluginTask[str]:
+    """取出下一个事件，超时说明调度器没有可运行事件。"""
+    return await asyncio.wait_for(scheduler.get(), timeout=1)
+
+
+async def _serve_all(scheduler: PluginScheduler[str]) -> list[str]:
+    """单消费者逐个处理直到队列为空，返回处理顺序。"""
+    order: list[str] = []
+    while not scheduler.empty():
+        task = await _next(scheduler)
+        order.append(task.msg)
+        scheduler.task_done(task)
+    return order
+
+
+def _put_all(scheduler: PluginScheduler[str], *messages: str) -> None:
+    """按顺序登记测试事件。"""
+    loop = asyncio.get_running_loop()
+    for msg in messages:
+        scheduler.put(msg, loop.create_future())
+
+
+class SchedulerTest(unittest.IsolatedAsyncioTestCase):
+    """验证 FIFO、轮转和 deficit 调度顺序及等待指标。"""
+
+    async def test_fifo_keeps_arrival_order(self) -> None:
+        """默认调度器按到达顺序出队，所有事件记在共享键下。"""
+        scheduler = FifoScheduler[str]()
+        _put_all(scheduler, "A1", "A2", "B1")
+
+        self.assertEqual(await _serve_all(scheduler), ["A1", "A2", "B1"])
+        self.assertEqual(
+            [item.key for item in scheduler.stats().keys], [SHARED_KEY]
+        )
+
+    async def test_keyed_round_robin_between_groups(self) -> None:
+        """刷屏群不会让其他群排在它全部消息之后。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "A2", "A3", "B1", "B2", "C1")
+
+        self.assertEqual(
+            await _serve_all(scheduler), ["A1", "B1", "C1", "A2", "B2", "A3"]
+        )
+
+    async def test_same_key_runs_serially_in_order(self) -> None:
+        """同键事件在前一个完成前不会交给第二个消费者。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "A2", "B1")
+
+        first = await _next(scheduler)
+        second = await _next(scheduler)
+        self.assertEqual((first.msg, second.msg), ("A1", "B1"))
+        with self.assertRaises(TimeoutError):
+            _ = await asyncio.wait_for(scheduler.get(), timeout=0.01)
+
+        scheduler.task_done(first)
+        self.assertEqual((await _next(scheduler)).msg, "A2")
+
+    async def test_deficit_round_robin_charges_expensive_events(self) -> None:
+        """高代价事件需要累积多轮额度，低代价的群可以先行。"""
+        scheduler = KeyedScheduler[str](
+            key=_key, cost=lambda msg: 3 if msg.startswith("A") else 1
+        )
+        _put_all(scheduler, "A1", "A2", "B1", "B2", "B3")
+
+        self.assertEqual(
+            await _serve_all(scheduler), ["B1", "B2", "A1", "B3", "A2"]
+        )
+
+    async def test_wait_stats_are_recorded_per_key(self) -> None:
+        """每个键分别记录出队次数和等待时间。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "A2", "B1")
+        await asyncio.sleep(0.01)
+        _ = await _serve_all(scheduler)
+
+        stats = {item.key: item for item in scheduler.stats().keys}
+        self.assertEqual(stats["A"].dequeued, 2)
+        self.assertEqual(stats["B"].dequeued, 1)
+        self.assertEqual(stats["A"].pending, 0)
+        self.assertGreaterEqual(stats["B"].max_wait_seconds, 0.01)
+        self.assertEqual(scheduler.stats().peak_depth, 3)
+
+    async def test_drop_newest_rejects_incoming_event(self) -> None:
+        """队列已满时 drop_newest 返回新事件本身，排队内容不变。"""
+        scheduler = FifoScheduler[str]()
+        _put_all(scheduler, "A1", "A2")
+        future = asyncio.get_running_loop().create_future()
+
+        shed = scheduler.put(
+            "A3", future, limit=QueueLimit(max_depth=2, policy="drop_newest")
+        )
+
+        self.assertEqual([task.msg for task in shed], ["A3"])
+        self.assertEqual(await _serve_all(scheduler), ["A1", "A2"])
+        self.assertEqual(scheduler.stats().shed, 1)
+
+    async def test_drop_oldest_evicts_across_keys(self) -> None:
+        """drop_oldest 丢弃所有键中最早排队的事件。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "B1", "A2")
+        future = asyncio.get_running_loop().create_future()
+
+        shed = scheduler.put(
+            "C1", future, limit=QueueLimit(max_depth=3, policy="drop_oldest")
+        )
+
+        self.assertEqual([task.msg for task in shed], ["A1"])
+        self.assertEqual(await _serve_all(scheduler), ["A2", "B1", "C1"])
+
+    async def test_coalesce_keeps_latest_event_per_key(self) -> None:
+        """coalesce 用新事件替换同键排队事件，处理中的事件不受影响。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "A2", "B1")
+        running = await _next(scheduler)
+        loop = asyncio.get_running_loop()
+        limit = QueueLimit(max_depth=10, policy="coalesce")
+
+        shed = scheduler.put("A3", loop.create_future(), limit=limit)
+
+        self.assertEqual(running.msg, "A1")
+        self.assertEqual([task.msg for task in shed], ["A2"])
+        scheduler.task_done(running)
+        self.assertEqual(await _serve_all(scheduler), ["B1", "A3"])
+        stats = {item.key: item for item in scheduler.stats().keys}
+        self.assertEqual((stats["A"].shed, stats["A"].dequeued), (1, 2))
+        await asyncio.wait_for(scheduler.join(), timeout=1)
+
+    async def test_drain_releases_join(self) -> None:
+        """取出全部排队事件后 join 立即返回。"""
+        scheduler = KeyedScheduler[str](key=_key)
+        _put_all(scheduler, "A1", "A2", "B1")
+
+        drained = scheduler.drain()
+
+        self.assertEqual(sorted(task.msg for task in drained), ["A1", "A2", "B1"])
+        self.assertTrue(scheduler.empty())
+        await asyncio.wait_for(scheduler.join(), timeout=1)
+
+
+class GroupFairPlugin(BasePlugin[GroupMessage]):
+    """按群调度、可手动放行的测试插件。"""
+
+    name = "群公平调度测试插件"
+    plugin_id = "group_fair_test"
+    consumers_count = 2
+    priority = 0
+
+    gates: dict[str, asyncio.Event]
+    handled: list[str]
+
+    def setup(self) -> None:
+        """初始化每条消息的放行闸门。"""
+        self.gates = {}
+        self.handled = []
+
+    @override
+    def create_scheduler(self) -> PluginScheduler[GroupMessage]:
+        """按群分子队列。"""
+        return KeyedScheduler(key=lambda msg: str(msg.group_id))
+
+    async def run(self, msg: GroupMessage) -> bool:
+        """等待该消息的闸门后记录处理顺序。"""
+        gate = self.gates.setdefault(str(msg.message_id), asyncio.Event())
+        await gate.wait()
+        self.handled.append(str(msg.message_id))
+        return True
+
+
+# 测试插件不应进入应用运行期的插件自动发现列表。
+PLUGINS.remove(cast(type[BasePlugin[AllEvent]], cast(object, GroupFairPlugin)))
+
+
+def _group_message(*, message_id: str, group_id: str) -> GroupMessage:
+    """构造指定群的最小群消息。"""
+    return GroupMessage(
+        time=1_777_132_900,
+        self_id="10000",
+        post_type="message",
+        message_type="group",
+        user_id="20000",
+        message_id=message_id,
+        group_id=group_id,
+        message=[Text.new("测试消息")],
+        sender=Sender(user_id="20000", nickname="测试用户"),
+    )
+
+
+class GroupFairPluginTest(unittest.IsolatedAsyncioTestCase):
+    """验证刷屏群阻塞时其他群仍能得到消费者。"""
+
+    async def asyncSetUp(self) -> None:
+        """创建两个消费者的按群调度插件。"""
+        self.plugin = GroupFairPlugin(
+            context=cast(Context, object()),
+            plugin_config=plugin_config_view(
+                FakeConfigManager(build_plugin_snapshot()),
+                plugin_id=GroupFairPlugin.plugin_id,
+            ),
+        )
+
+    async def asyncTearDown(self) -> None:
+        """停止消费者。"""
+        await self.plugin.stop_consumers()
+
+    async def test_busy_group_does_not_occupy_every_consumer(self) -> None:
+        """同群排队消息不占消费者，另一个群的消息立即被处理。"""
+        busy = [
+            asyncio.create_task(
+                self.plugin.add_to_queue(
+                    _group_message(message_id=f"a{index}", group_id="40000")
+                )
+            )
+            for index in range(3)
+        ]
+        await asyncio.sleep(0)
+        self.plugin.gates["b0"] = asyncio.Event()
+        self.plugin.gates["b0"].set()
+
+        handled = await asyncio.wait_for(
+            self.plugin.add_to_queue(
+                _group_message(message_id="b0", group_id="40001")
+            ),
+            timeout=1,
+        )
+
+        self.assertTrue(handled)
+        self.assertEqual(self.plugin.handled, ["b0"])
+        for index in range(3):
+            self.plugin.gates.setdefault(f"a{index}", asyncio.Event()).set()
+        _ = await asyncio.gather(*busy)
+        self.assertEqual(self.plugin.handled, ["b0", "a0", "a1", "a2"])
+        stats = {item.key: item for item in self.plugin.queue_stats().keys}
+        self.assertEqual(stats["40000"].dequeued, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1250,6 +1250,48 @@ class PostgreSQLRepositoryTest(unittest.IsolatedAsyncioTestCase):
         self.assertIsNone(tasks[0].url)
         self.assertEqual(tasks[0].file_id, "top-inline-file-id")
 
+    async def test_batch_save_matches_single_writes_and_only_new_rows_get_tasks(
+        self,
+    ) -> None:
+        """批量写入复用首份证据，批内重复与已有消息都不重建图片任务。"""
+        await self.repository.save_incoming(
+            self._message(message_id="existing", text="已有正文")
+        )
+        image = Image.new(
+            "batch.png",
+            file_id="batch-file-id",
+            url="https://example.invalid/batch.png",
+        )
+
+        await self.repository.save_incoming_batch(
+            [
+                self._message(message_id="existing", text="重放正文"),
+                self._message(message_id="fresh", segments=[Text.new("新"), image]),
+                self._message(message_id="fresh", text="批内重复"),
+                self._message(message_id="plain", text="纯文本"),
+            ]
+        )
+
+        existing = await self.repository.get_active(
+            scope=self.scope, message_id="existing"
+        )
+        fresh = await self.repository.get_active(scope=self.scope, message_id="fresh")
+        plain = await self.repository.get_active(scope=self.scope, message_id="plain")
+        if existing is None or fresh is None or plain is None:
+            self.fail("批量写入后三条消息都应该可读")
+        self.assertEqual(existing.segments[0], Text.new("已有正文"))
+        self.assertEqual(fresh.segments[0], Text.new("新"))
+        self.assertEqual(len(fresh.images), 1)
+        self.assertEqual(fresh.images[0].segment_index, 1)
+        self.assertEqual(fresh.images[0].file_id, "batch-file-id")
+        self.assertEqual(plain.images, ())
+        tasks = await self.repository.claim_ready(
+            bot_id=self.bot_id,
+            limit=10,
+            lease_seconds=30,
+        )
+        self.assertEqual([task.task_id for task in tasks], [fresh.images[0].row_id])
+
     async def _image_row(self, *, task_id: int) -> GroupMessageImageRow:
         """按任务 ID 读取图片状态行。"""
         async with self.runtime.session_factory() as session:
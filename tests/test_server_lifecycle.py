@@ -12,6 +12,7 @@ from app.core.di import DirectHttpx, ProxyHttpx
 from app.core.server import NapCatServer
 from app.database import (
     DatabaseMigrator,
+    GroupMessageBatchWriter,
     PostgreSQLMessageRepository,
     PostgreSQLRuntime,
 )
@@ -164,6 +165,7 @@ class NapCatServerLifespanTest(unittest.IsolatedAsyncioTestCase):
             ProxyHttpx | None: None,
             ConfigWatcher: _FakeConfigWatcher(),
             PostgreSQLMessageRepository: object(),
+            GroupMessageBatchWriter | None: None,
             ImageArchiveWorkerFactory: object(),
             LLMHandler | None: None,
         }
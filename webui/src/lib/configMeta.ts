@@ -66,6 +66,7 @@ function defaultAIGroupChat(config: MyBotConfigData): AIGroupChatConfig {
       user_prompt_file: "ai_group_chat/prompts/vision/user.md",
     },
     images: {},
+    queue: {},
     groups: [],
   };
 }
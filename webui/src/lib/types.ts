@@ -34,6 +34,8 @@ export interface NapCatConfig {
   websocket_token?: string | null;
   send_max_attempts?: number;
   send_retry_delay_seconds?: number;
+  pipeline_queue_size?: number;
+  frame_codec?: "stdlib" | "pydantic";
 }
 
 export interface ImageStorageConfig {
@@ -43,6 +45,7 @@ export interface ImageStorageConfig {
   max_bytes?: number;
   retry_delays_seconds?: number[];
   lease_seconds?: number;
+  hardlink_local_files?: boolean;
 }
 
 export interface StorageConfig {
@@ -60,11 +63,19 @@ export interface DatabaseConfig {
   max_overflow?: number;
   pool_timeout_seconds?: number;
   statement_timeout_seconds?: number;
+  incoming_write_mode?: "immediate" | "group_commit";
+  group_commit_delay_seconds?: number;
+  group_commit_max_batch_size?: number;
 }
 
 export interface NetworkConfig {
   proxy?: string | null;
   timeout_seconds?: number;
+  max_connections?: number;
+  max_keepalive_connections?: number;
+  keepalive_expiry_seconds?: number;
+  http2?: boolean;
+  share_llm_connections?: boolean;
 }
 
 export interface LoggingConfig {
@@ -81,6 +92,14 @@ export interface LLMProviderConfig {
   base_url?: string | null;
   max_attempts?: number;
   retry_delay_seconds?: number;
+  response_cache_ttl_seconds?: number;
+  response_cache_max_entries?: number;
+  max_concurrency?: number;
+  requests_per_minute?: number;
+  tokens_per_minute?: number;
+  extra_base_urls?: string[];
+  hedge_requests?: boolean;
+  hedge_min_delay_seconds?: number;
 }
 
 export interface LLMServiceConfig {
@@ -107,6 +126,7 @@ export interface ModelRef {
 
 export interface ChatModelRef extends ModelRef {
   supports_images?: boolean;
+  tokenizer_file?: string | null;
 }
 
 export interface AIGroupConfig {
@@ -123,6 +143,9 @@ export interface AIVisionConfig {
   max_attempts?: number;
   retry_delay_seconds?: number;
   retain_descriptions?: boolean;
+  cache_enabled?: boolean;
+  cache_max_entries?: number;
+  cache_ttl_seconds?: number;
 }
 
 export interface AIImageConfig {
@@ -134,20 +157,34 @@ export interface AIImageConfig {
   forward_max_per_turn?: number;
 }
 
+export type PluginOverloadPolicy = "drop_oldest" | "drop_newest" | "coalesce";
+
+export interface AIQueueConfig {
+  max_depth?: number | null;
+  overload_policy?: PluginOverloadPolicy;
+  busy_notice?: string;
+}
+
 export interface AIGroupChatConfig {
   model: ChatModelRef;
   vision?: AIVisionConfig | null;
   images?: AIImageConfig;
+  queue?: AIQueueConfig;
   max_tool_rounds?: number;
+  tool_concurrency?: number;
   token_safety_factor?: number;
+  background_compression?: boolean;
+  compression_watermark?: number;
   context_compression_notice?: string;
   max_reply_chars?: number;
+  stream_replies?: boolean;
   show_reasoning?: boolean;
   retain_reasoning?: boolean;
   debug_dump_messages?: boolean;
   extra_requirements_file?: string;
   allow_mention_all?: boolean;
   retain_tool_results?: boolean;
+  persist_context?: boolean;
   groups?: AIGroupConfig[];
 }
 
@@ -10,7 +10,12 @@ import { SettingsGrid } from "@/components/SettingsGrid";
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 import { Button } from "@/components/ui/button";
 import { Input } from "@/components/ui/input";
-import { NumberField, TextField } from "@/lib/fields";
+import {
+  NumberField,
+  StringListField,
+  SwitchField,
+  TextField,
+} from "@/lib/fields";
 import type { LLMProviderConfig, MyBotConfigData } from "@/lib/types";
 
 export default function ProvidersPage() {
@@ -40,6 +45,14 @@ export default function ProvidersPage() {
         base_url: null,
         max_attempts: 5,
         retry_delay_seconds: 0,
+        response_cache_ttl_seconds: 0,
+        response_cache_max_entries: 256,
+        max_concurrency: 8,
+        requests_per_minute: 0,
+        tokens_per_minute: 0,
+        extra_base_urls: [],
+        hedge_requests: false,
+        hedge_min_delay_seconds: 1,
       },
     };
     setValue("llm.providers", next, { shouldDirty: true });
@@ -103,6 +116,48 @@ export default function ProvidersPage() {
             path={`llm.providers.${id}.retry_delay_seconds`}
             label="重试间隔（秒）"
           />
+          <NumberField
+            path={`llm.providers.${id}.response_cache_ttl_seconds`}
+            label="文本响应缓存（秒）"
+            description="并发的相同请求总会合并；大于 0 时图片描述等可缓存请求的成功响应再缓存这么久"
+          />
+          <NumberField
+            path={`llm.providers.${id}.response_cache_max_entries`}
+            label="文本响应缓存条数"
+          />
+          <NumberField
+            path={`llm.providers.${id}.max_concurrency`}
+            label="最大并发请求数"
+            description="所有插件共享；收到 429 时自动减半，成功后逐步恢复"
+          />
+          <NumberField
+            path={`llm.providers.${id}.requests_per_minute`}
+            label="每分钟请求数上限"
+            description="0 表示不限制"
+          />
+          <NumberField
+            path={`llm.providers.${id}.tokens_per_minute`}
+            label="每分钟 token 上限"
+            description="按请求粗估预扣，响应返回用量后结算；0 表示不限制"
+          />
+          <div className="xl:col-span-2">
+            <StringListField
+              path={`llm.providers.${id}.extra_base_urls`}
+              label="其他端点"
+              description="提供相同模型的其他网关，共用 API Key；按延迟和错误率自动路由"
+              placeholder="https://gateway.example/v1"
+              addLabel="添加端点"
+            />
+          </div>
+          <SwitchField
+            path={`llm.providers.${id}.hedge_requests`}
+            label="对冲请求"
+            description="耗时超过所选端点近期 p95 时向次优端点补发，先返回者胜出"
+          />
+          <NumberField
+            path={`llm.providers.${id}.hedge_min_delay_seconds`}
+            label="对冲最短等待（秒）"
+          />
         </SectionCard>
       ))}
 
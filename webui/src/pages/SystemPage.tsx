@@ -60,6 +60,21 @@ export default function SystemPage() {
           label="发送重试间隔（秒）"
           placeholder="默认 0"
         />
+        <NumberField
+          path="napcat.pipeline_queue_size"
+          label="接收流水线队列容量"
+          description="每个阶段的排队上限，满时暂停读取形成背压"
+          placeholder="默认 256"
+        />
+        <SelectField
+          path="napcat.frame_codec"
+          label="入站帧解码器"
+          description="pydantic 使用 pydantic-core 的 Rust JSON 解析器"
+          options={["stdlib", "pydantic"].map((value) => ({
+            value,
+            label: value,
+          }))}
+        />
       </SectionCard>
 
       <SectionCard
@@ -96,6 +111,25 @@ export default function SystemPage() {
           label="语句超时（秒）"
           placeholder="默认 5"
         />
+        <SelectField
+          path="database.incoming_write_mode"
+          label="入站写入模式"
+          description="group_commit 把几毫秒内的群消息合并为一次事务"
+          options={["immediate", "group_commit"].map((value) => ({
+            value,
+            label: value,
+          }))}
+        />
+        <NumberField
+          path="database.group_commit_delay_seconds"
+          label="合并窗口（秒）"
+          placeholder="默认 0.005"
+        />
+        <NumberField
+          path="database.group_commit_max_batch_size"
+          label="单批最大消息数"
+          placeholder="默认 64"
+        />
       </SectionCard>
 
       <SectionCard title="网络" description="项目通用 HTTP 访问配置。">
@@ -109,6 +143,31 @@ export default function SystemPage() {
           label="请求超时（秒）"
           placeholder="默认 15"
         />
+        <NumberField
+          path="network.max_connections"
+          label="最大连接数"
+          placeholder="默认 100"
+        />
+        <NumberField
+          path="network.max_keepalive_connections"
+          label="最大空闲连接数"
+          placeholder="默认 20"
+        />
+        <NumberField
+          path="network.keepalive_expiry_seconds"
+          label="空闲连接保留（秒）"
+          placeholder="默认 30"
+        />
+        <SwitchField
+          path="network.http2"
+          label="启用 HTTP/2"
+          description="需要安装 h2，未安装时回退到 HTTP/1.1"
+        />
+        <SwitchField
+          path="network.share_llm_connections"
+          label="LLM 复用直连连接池"
+          description="关闭后每个 provider 各自创建连接池"
+        />
       </SectionCard>
 
       <SectionCard title="图片存储" description="群图片归档目录与下载策略。">
@@ -152,6 +211,11 @@ export default function SystemPage() {
           label="任务租约（秒）"
           placeholder="默认 45"
         />
+        <SwitchField
+          path="storage.images.hardlink_local_files"
+          label="硬链接本地图片"
+          description="与 NapCat 共享文件系统时直接链接缓存文件，不复制"
+        />
       </SectionCard>
 
       <SectionCard title="日志" description="日志输出与归档策略。">
@@ -10,6 +10,7 @@ import { Button } from "@/components/ui/button";
 import { Switch } from "@/components/ui/switch";
 import {
   NumberField,
+  SelectField,
   SwitchField,
   TextField,
   TextareaField,
@@ -92,6 +93,21 @@ function VisionSection() {
             label="保留图片描述"
             description="把视觉描述写入长期上下文"
           />
+          <SwitchField
+            path={`${VISION_BASE}.cache_enabled`}
+            label="缓存图片描述"
+            description="相同图片、视觉提示词和视觉模型复用已有描述"
+          />
+          <NumberField
+            path={`${VISION_BASE}.cache_max_entries`}
+            label="内存缓存条数"
+            placeholder="默认 1024"
+          />
+          <NumberField
+            path={`${VISION_BASE}.cache_ttl_seconds`}
+            label="缓存有效期（秒）"
+            placeholder="默认 604800"
+          />
         </>
       ) : (
         <p className="text-sm text-muted-foreground xl:col-span-2">
@@ -173,6 +189,11 @@ export default function AIGroupChatFields() {
     <>
       <SectionCard title="主模型" description="群聊对话使用的聊天模型。">
         <ModelRefField path="plugins.ai_group_chat.model" withSupportsImages />
+        <TextField
+          path="plugins.ai_group_chat.model.tokenizer_file"
+          label="BPE 词表文件"
+          placeholder="留空按字符规则估算 token"
+        />
       </SectionCard>
 
       <VisionSection />
@@ -209,17 +230,57 @@ export default function AIGroupChatFields() {
         />
       </SectionCard>
 
+      <SectionCard title="过载保护" description="排队消息超过上限时的丢弃策略。">
+        <NumberField
+          path="plugins.ai_group_chat.queue.max_depth"
+          label="排队上限"
+          placeholder="留空不限制"
+        />
+        <SelectField
+          path="plugins.ai_group_chat.queue.overload_policy"
+          label="丢弃策略"
+          description="coalesce 每群只保留最新一条排队消息"
+          options={["coalesce", "drop_oldest", "drop_newest"].map((value) => ({
+            value,
+            label: value,
+          }))}
+        />
+        <div className="xl:col-span-2">
+          <TextareaField
+            path="plugins.ai_group_chat.queue.busy_notice"
+            label="忙碌提示语"
+            description="消息被丢弃时艾特发送者；留空不提示"
+            rows={2}
+          />
+        </div>
+      </SectionCard>
+
       <SectionCard title="对话行为" description="工具循环、上下文与回复控制。">
         <NumberField
           path="plugins.ai_group_chat.max_tool_rounds"
           label="最大工具轮数"
           placeholder="默认 16"
         />
+        <NumberField
+          path="plugins.ai_group_chat.tool_concurrency"
+          label="只读工具并发数"
+          placeholder="默认 4"
+        />
         <NumberField
           path="plugins.ai_group_chat.token_safety_factor"
           label="Token 安全系数"
           placeholder="默认 1.05"
         />
+        <SwitchField
+          path="plugins.ai_group_chat.background_compression"
+          label="后台压缩上下文"
+          description="达到水位后在后台滚动摘要，回复不必等待压缩"
+        />
+        <NumberField
+          path="plugins.ai_group_chat.compression_watermark"
+          label="后台压缩水位"
+          placeholder="默认 0.7（上下文预算的比例）"
+        />
         <NumberField
           path="plugins.ai_group_chat.max_reply_chars"
           label="回复最大字符数"
@@ -237,6 +298,11 @@ export default function AIGroupChatFields() {
             rows={2}
           />
         </div>
+        <SwitchField
+          path="plugins.ai_group_chat.stream_replies"
+          label="流式分段发送"
+          description="正文每写完一段就先发到群里"
+        />
         <SwitchField
           path="plugins.ai_group_chat.show_reasoning"
           label="展示推理过程"
@@ -259,6 +325,11 @@ export default function AIGroupChatFields() {
           label="工具结果写入长期上下文"
           description="默认关闭，避免上下文膨胀"
         />
+        <SwitchField
+          path="plugins.ai_group_chat.persist_context"
+          label="持久化长期上下文"
+          description="重启或重连后从数据库恢复各群记忆"
+        />
       </SectionCard>
 
       <h3 className="col-span-full text-base font-medium">群列表</h3>